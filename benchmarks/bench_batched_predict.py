@@ -0,0 +1,68 @@
+"""Compare rows/sec of serial and batched LlamaGGUFWrapper.predict.
+
+Runs on a tiny random-weight GGUF (see ``tiny_gguf.py``) unless a model is
+given, and prints one JSON object with the results.
+
+Usage:
+    python benchmarks/bench_batched_predict.py --rows 64 --batch-sizes 1 4 8
+"""
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
+import argparse
+import json
+import tempfile
+import time
+
+from tiny_gguf import write_tiny_gguf
+
+
+def run(model_path: Path, rows: int, batch_sizes: List[int], max_tokens: int, n_threads: int) -> dict:
+    """Time predict() over the same prompts for every batch size.
+
+    Args:
+        model_path: GGUF file to load
+        rows: Number of prompts to score
+        batch_sizes: Values of ``max_batch_size`` to compare
+        max_tokens: Tokens generated per prompt
+        n_threads: CPU threads per model
+
+    Returns:
+        dict: Rows/sec per batch size and speedup over the serial loop
+    """
+    from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+    context = SimpleNamespace(artifacts={"model_path": str(model_path)})
+    prompts = [f"the model is {i} and" for i in range(rows)]
+    results = {}
+    for batch_size in batch_sizes:
+        wrapper = LlamaGGUFWrapper(n_threads=n_threads, verbose=False, max_batch_size=batch_size)
+        wrapper.load_context(context)
+        wrapper.predict(context, prompts[:batch_size], max_tokens=max_tokens, temperature=0.0)
+        start = time.perf_counter()
+        wrapper.predict(context, prompts, max_tokens=max_tokens, temperature=0.0, stop=[])
+        elapsed = time.perf_counter() - start
+        results[batch_size] = {"seconds": elapsed, "rows_per_sec": rows / elapsed}
+    baseline = results[batch_sizes[0]]["rows_per_sec"]
+    for result in results.values():
+        result["speedup"] = result["rows_per_sec"] / baseline
+    return {"rows": rows, "max_tokens": max_tokens, "n_threads": n_threads, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-path", type=Path, help="GGUF model, defaults to a tiny generated one")
+    parser.add_argument("--rows", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--n-threads", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model_path or write_tiny_gguf(Path(tmp) / "tiny.gguf")
+        report = run(model_path, args.rows, args.batch_sizes, args.max_tokens, args.n_threads)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measure the import cost of the serve-cmd entry point with ``python -X importtime``.
+
+Imports the module in fresh interpreters and reports the best cumulative
+import time of the module, the modules it pulled in that are known to be
+heavy, and the slowest imports by self time. Exits with status 1 when
+``--budget-ms`` is given and exceeded.
+
+Usage:
+    python benchmarks/bench_cli_import.py --runs 5 --budget-ms 400
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import subprocess
+import sys
+
+
+# Dependencies no serve-cmd startup should pay for before a command runs
+HEAVY_MODULES = ["mlflow", "pandas", "numpy", "llama_cpp", "google.cloud", "pydantic"]
+
+
+def _parse(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse ``-X importtime`` output into ``(module, self_us, cumulative_us)`` rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_profile(module: str = "serve.serve_cli") -> Dict[str, object]:
+    """Import ``module`` in a fresh interpreter.
+
+    Returns:
+        Dict[str, object]: ``import_ms`` of the module, imported ``heavy``
+        modules and the ``slowest`` imports by self time
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    rows = _parse(result.stderr)
+    cumulative = next(cumulative_us for name, _, cumulative_us in rows if name == module)
+    names = {name for name, _, _ in rows}
+    return {
+        "import_ms": cumulative / 1000,
+        "heavy": sorted(heavy for heavy in HEAVY_MODULES if heavy in names),
+        "slowest": [(name, self_us / 1000) for name, self_us, _ in sorted(rows, key=lambda r: -r[1])[:10]],
+    }
+
+
+def run(module: str = "serve.serve_cli", runs: int = 5) -> Dict[str, object]:
+    """Profile ``runs`` fresh imports and keep the fastest, the least noisy one."""
+    profiles = [import_profile(module) for _ in range(runs)]
+    best = min(profiles, key=lambda p: p["import_ms"])
+    return dict(best, module=module, runs=runs, median_ms=sorted(p["import_ms"] for p in profiles)[runs // 2])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="serve.serve_cli")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="Fail when the best import time exceeds this")
+    args = parser.parse_args(argv)
+
+    report = run(args.module, args.runs)
+    print(json.dumps(report, indent=2))
+    if args.budget_ms is not None and report["import_ms"] > args.budget_ms:
+        sys.exit(f"{args.module} imports in {report['import_ms']:.1f} ms, over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""Time the model download paths end to end and per phase, offline.
+
+Stands up an MLflow file-store registry in a temporary directory and a
+``fake_object_server.py`` instance as GCS emulator and Hugging Face
+endpoint, seeded with a synthetic artifact of ``--size-mb``. Each path
+then downloads the model into a fresh directory ``--runs`` times:
+
+* ``get_model``: ``serve.utils.mlflow.model.get_model`` from the MLflow artifact store
+* ``add_model``: ``MLflowModelConfigManager.add_model``, model store ingestion included
+* ``gcs``: ``download_model_artifact`` of ``mlflow_gcp_llamacpp`` through the GCS emulator
+* ``hf``: ``download_model_artifact`` of ``hugging_face``, if ``huggingface_hub`` is installed
+
+Phases are measured by wrapping the functions that implement them:
+``registry`` (alias, run and model info lookups), ``listing`` (object
+listing), ``transfer`` (receiving data), ``write`` (writing it to disk),
+``verify`` (checksums), ``rename`` (moving files into place), ``store``
+(model store hashing and linking) and ``config`` (model config updates).
+Each time is exclusive of nested phases and summed over worker threads.
+Prints the median run of every path as JSON.
+
+Usage:
+    python benchmarks/bench_download.py --size-mb 4096 --runs 3 --workers 8 --output download.json
+"""
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from fake_object_server import FakeObjectServer, write_synthetic
+
+
+PATHS = ["get_model", "add_model", "gcs", "hf"]
+PHASES = ["registry", "listing", "transfer", "write", "verify", "rename", "store", "config"]
+
+MLFLOW_MODEL = "bench-mlflow"
+GCS_MODEL = "bench-gcs"
+GCS_BUCKET = "bench-artifacts"
+HF_REPO = "bench/model-gguf"
+
+
+class PhaseTimer:
+    """Accumulates the time spent in phases, exclusive of nested phases.
+
+    Attributes:
+        seconds: Phase names mapped to seconds, summed over threads
+        calls: Phase names mapped to the calls timed
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = [0.0]
+        stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            with self._lock:
+                self.seconds[name] += elapsed - frame[0]
+                self.calls[name] += 1
+
+    @contextmanager
+    def wrap(self, owner: object, attribute: str, name: str, consume: bool = False) -> Iterator[None]:
+        """Time every call of ``owner.attribute`` as phase ``name`` while in the context.
+
+        Args:
+            owner: Module or class holding the function
+            attribute: Function name
+            name: Phase name
+            consume: Whether to exhaust a returned iterator inside the phase,
+                for lazily paginated listings
+        """
+        original = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                result = original(*args, **kwargs)
+                return list(result) if consume else result
+
+        setattr(owner, attribute, timed)
+        try:
+            yield
+        finally:
+            setattr(owner, attribute, original)
+
+
+@contextmanager
+def _environ(**values: str) -> Iterator[None]:
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _local_path(uri: str) -> Path:
+    return Path(url2pathname(urlsplit(uri).path))
+
+
+def _place(source: Path, target: Path) -> None:
+    """Hardlink the synthetic artifact into a store, copying across file systems."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _register(client, name: str, experiment_id: str) -> str:
+    """Create a run and a model version of ``name`` aliased ``champion``, returning the run ID."""
+    run = client.create_run(experiment_id)
+    client.set_terminated(run.info.run_id)
+    client.create_registered_model(name)
+    version = client.create_model_version(name, f"{run.info.artifact_uri}/model_path", run_id=run.info.run_id)
+    client.set_registered_model_alias(name, "champion", version.version)
+    return run.info.run_id
+
+
+@contextmanager
+def environment(root: Path, size: int) -> Iterator[FakeObjectServer]:
+    """Seed a file-store registry and an object server with a ``size`` byte model.
+
+    The tracking URI, GCS emulator and Hugging Face endpoint environment
+    variables point at them while in the context.
+    """
+    model = write_synthetic(root / "data" / "model.gguf", size)
+    mlmodel = root / "data" / "MLmodel"
+    mlmodel.write_text("flavors: {}\n")
+    server = FakeObjectServer().start()
+    tracking_uri = (root / "mlruns").as_uri()
+    try:
+        with _environ(MLFLOW_TRACKING_URI=tracking_uri, MLFLOW_REGISTRY_URI=tracking_uri,
+                      MLFLOW_ALLOW_FILE_STORE="true", STORAGE_EMULATOR_HOST=server.url,
+                      HF_ENDPOINT=server.url, HF_HUB_DISABLE_PROGRESS_BARS="1", HF_HUB_OFFLINE="0"):
+            from mlflow import MlflowClient
+
+            client = MlflowClient(tracking_uri)
+            run_id = _register(client, MLFLOW_MODEL, "0")
+            artifacts = _local_path(client.get_run(run_id).info.artifact_uri) / "model_path"
+            _place(model.path, artifacts / "artifacts" / "model.gguf")
+            _place(mlmodel, artifacts / "MLmodel")
+
+            # Runs of this experiment resolve to gs://<bucket>/gcs/<run>/artifacts like a proxied artifact store
+            experiment_id = client.create_experiment(GCS_MODEL, artifact_location="mlflow-artifacts:/gcs")
+            run_id = _register(client, GCS_MODEL, experiment_id)
+            prefix = f"gcs/{run_id}/artifacts/model_path"
+            server.add(GCS_BUCKET, f"{prefix}/artifacts/model.gguf", model)
+            server.add_file(GCS_BUCKET, f"{prefix}/MLmodel", mlmodel)
+
+            server.add("hf", f"{HF_REPO}/model.gguf", model)
+            yield server
+    finally:
+        server.close()
+
+
+def _download_get_model(dest: Path, workers: int, chunk_size: int) -> None:
+    from mlflow import MlflowClient
+
+    from serve.utils.mlflow.model import get_model
+
+    get_model(MlflowClient(), MLFLOW_MODEL, "champion", dest, "model_path")
+
+
+def _download_add_model(dest: Path, workers: int, chunk_size: int) -> None:
+    from mlflow import MlflowClient
+
+    from serve.utils.mlflow.config import MLflowModelConfigManager
+
+    manager = MLflowModelConfigManager(MlflowClient(), config_path=dest / "config.json")
+    manager.add_model(MLFLOW_MODEL, model_dir=dest / MLFLOW_MODEL)
+
+
+def _download_gcs(dest: Path, workers: int, chunk_size: int) -> None:
+    from mlflow import MlflowClient
+
+    from serve.experiment_tracker.mlflow.mlflow_gcp_llamacpp.download import download_model_artifact
+
+    download_model_artifact(MlflowClient(), GCS_MODEL, "champion", "model_path", gcs_bucket=GCS_BUCKET,
+                            local_dir=dest, max_workers=workers, chunk_size=chunk_size,
+                            config_path=dest / "config.json")
+
+
+def _download_hf(dest: Path, workers: int, chunk_size: int) -> None:
+    from serve.experiment_tracker.hugging_face.download import download_model_artifact
+
+    from serve.utils.model_store import ModelStore
+
+    download_model_artifact(HF_REPO, dest, model_url="model.gguf", store=ModelStore(dest / ".store"))
+
+
+DOWNLOADS: Dict[str, Callable[[Path, int, int], None]] = {
+    "get_model": _download_get_model,
+    "add_model": _download_add_model,
+    "gcs": _download_gcs,
+    "hf": _download_hf,
+}
+
+
+@contextmanager
+def instrument(timer: PhaseTimer) -> Iterator[None]:
+    """Wrap the functions of every download path in phases of ``timer``."""
+    from google.cloud.storage import Blob, Bucket
+    from mlflow import MlflowClient
+
+    import serve.utils.gcs.download as gcs_download
+    import serve.utils.mlflow.config as mlflow_config
+    import serve.utils.mlflow.model as mlflow_model
+    from serve.utils.model_config import ModelConfig
+    from serve.utils.model_store import ModelStore
+
+    wraps = [
+        (MlflowClient, "get_model_version_by_alias", "registry"),
+        (MlflowClient, "get_model_version", "registry"),
+        (MlflowClient, "get_run", "registry"),
+        (Bucket, "list_blobs", "listing"),
+        (Blob, "download_to_file", "transfer"),
+        (mlflow_model, "download_artifacts", "transfer"),
+        (mlflow_config, "download_artifacts", "transfer"),
+        (gcs_download.TqdmWriter, "write", "write"),
+        (gcs_download._PartialDownload, "prepare", "write"),
+        (gcs_download._PartialDownload, "_write_manifest", "write"),
+        (gcs_download, "_matches_remote", "verify"),
+        (gcs_download._PartialDownload, "finalize", "rename"),
+        (Path, "rename", "rename"),
+        (ModelStore, "ingest", "store"),
+        (ModelStore, "materialize", "store"),
+        (ModelConfig, "update_model_info", "config"),
+    ]
+    try:
+        import serve.experiment_tracker.hugging_face.download as hf_download
+    except ImportError:
+        pass
+    else:
+        wraps += [(hf_download, "hf_hub_download", "transfer"), (hf_download, "snapshot_download", "transfer")]
+    with ExitStack() as stack:
+        for owner, attribute, name in wraps:
+            stack.enter_context(timer.wrap(owner, attribute, name, consume=attribute == "list_blobs"))
+        yield
+
+
+def _tree_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file() and not f.is_symlink())
+
+
+def measure(path: str, root: Path, runs: int, workers: int, chunk_size: int) -> Dict[str, object]:
+    """Download with one path ``runs`` times into fresh directories and keep the median run."""
+    if path == "hf":
+        try:
+            import huggingface_hub  # noqa: F401
+        except ImportError:
+            return {"skipped": "huggingface_hub is not installed"}
+    samples = []
+    for i in range(runs):
+        dest = root / "runs" / f"{path}-{i}"
+        dest.mkdir(parents=True)
+        timer = PhaseTimer()
+        try:
+            with instrument(timer):
+                started = time.perf_counter()
+                DOWNLOADS[path](dest, workers, chunk_size)
+                wall = time.perf_counter() - started
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        size = _tree_size(dest / ".store" / "blobs") if path in ("add_model", "hf") else _tree_size(dest)
+        samples.append({
+            "wall_s": wall,
+            "bytes": size,
+            "mb_per_s": size / wall / 2 ** 20 if wall else None,
+            "phases_s": {name: timer.seconds[name] for name in PHASES if name in timer.seconds},
+            "calls": {name: timer.calls[name] for name in PHASES if name in timer.calls},
+        })
+        shutil.rmtree(dest, ignore_errors=True)
+    median = sorted(samples, key=lambda s: s["wall_s"])[len(samples) // 2]
+    return dict(median, runs_wall_s=[s["wall_s"] for s in samples],
+                stdev_s=statistics.stdev(s["wall_s"] for s in samples) if runs > 1 else 0.0)
+
+
+def run(size_mb: float = 256, runs: int = 3, workers: int = 4, chunk_mb: float = 64,
+        paths: Optional[List[str]] = None, workdir: Optional[Path] = None) -> Dict[str, object]:
+    """Seed the registry and object server, then measure every download path."""
+    paths = paths or PATHS
+    size = int(size_mb * 2 ** 20)
+    chunk_size = max(int(chunk_mb * 2 ** 20), 1)
+    # The download functions print progress, stdout is kept for the report
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp, redirect_stdout(sys.stderr):
+        root = Path(tmp)
+        with environment(root, size) as server:
+            results = {path: measure(path, root, runs, workers, chunk_size) for path in paths}
+            requests = server.requests
+    return {
+        "config": {"size_mb": size_mb, "runs": runs, "workers": workers, "chunk_mb": chunk_mb,
+                   "object_requests": requests},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=256, help="Size of the synthetic model file")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent GCS download streams")
+    parser.add_argument("--chunk-mb", type=float, default=64, help="GCS byte-range request size")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--workdir", type=Path, help="Directory for the registry, objects and downloads")
+    parser.add_argument("--output", type=Path, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+
+    # Per-file progress logs would dominate the output of large runs
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    report = run(args.size_mb, args.runs, args.workers, args.chunk_mb, args.paths, args.workdir)
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
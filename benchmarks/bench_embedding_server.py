@@ -0,0 +1,140 @@
+"""Compare latency and throughput of the embedding server with and without micro-batching.
+
+Concurrent clients send single-text requests to an in-process
+``EmbeddingServer``. The baseline encodes one request per call
+(``max_batch_size=1``, ``max_wait_ms=0``); the other configurations
+batch concurrent requests. Each configuration is run with JSON float and
+base64 responses. Prints one JSON object with p50/p99 latency and
+requests/sec per configuration.
+
+The default encoder is a tiny random-weight GGUF (see ``tiny_gguf.py``)
+run by llama.cpp. ``--encoder projection`` uses a numpy random projection
+with a per-call overhead instead, which behaves like encoders with
+vectorized batch kernels.
+
+Usage:
+    python benchmarks/bench_embedding_server.py --clients 16 --requests 32 --batch-sizes 1 8 32
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, List, Optional
+import argparse
+import http.client
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from tiny_gguf import write_tiny_gguf
+
+
+def projection_encoder(dim: int = 768, call_overhead_ms: float = 2.0) -> Callable[[List[str]], np.ndarray]:
+    """Random projection of byte counts, paying a fixed cost per call."""
+    projection = np.random.default_rng(0).standard_normal((256, dim)).astype(np.float32)
+
+    def encode(texts: List[str]) -> np.ndarray:
+        time.sleep(call_overhead_ms / 1000)
+        counts = np.zeros((len(texts), 256), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts[i] = np.bincount(np.frombuffer(text.encode(), dtype=np.uint8), minlength=256)
+        return counts @ projection
+
+    return encode
+
+
+def _client(port: int, texts: List[str], encoding_format: str) -> List[float]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies = []
+    try:
+        for text in texts:
+            body = json.dumps({"input": text, "encoding_format": encoding_format}).encode()
+            start = time.perf_counter()
+            conn.request("POST", "/v1/embeddings", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                raise RuntimeError(payload.decode())
+            json.loads(payload)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+    return latencies
+
+
+def run(encoder: Callable[[List[str]], np.ndarray], clients: int, requests: int,
+        batch_sizes: List[int], max_wait_ms: float) -> dict:
+    """Run every batch size and encoding against the same encoder.
+
+    Args:
+        encoder: Function embedding a list of texts
+        clients: Concurrent clients
+        requests: Requests sent by each client
+        batch_sizes: Values of ``max_batch_size``, 1 is the per-request baseline
+        max_wait_ms: Batch fill timeout of the batched configurations
+
+    Returns:
+        dict: Latency percentiles, requests/sec and mean batch size per configuration
+    """
+    from serve.servers.embedding.server import EmbeddingServer
+
+    workloads = [[f"chunk {c}-{i} of the document to index" for i in range(requests)] for c in range(clients)]
+    results = {}
+    for batch_size in batch_sizes:
+        for encoding_format in ("float", "base64"):
+            wait = 0.0 if batch_size == 1 else max_wait_ms
+            server = EmbeddingServer(encoder, host="127.0.0.1", port=0, max_batch_size=batch_size,
+                                     max_wait_ms=wait).start()
+            try:
+                _client(server.port, ["warm up"], encoding_format)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=clients) as pool:
+                    latencies = [lat for lats in pool.map(
+                        partial(_client, server.port, encoding_format=encoding_format), workloads
+                    ) for lat in lats]
+                elapsed = time.perf_counter() - start
+                stats = server.batcher.stats()
+            finally:
+                server.close()
+            results[f"batch{batch_size}-{encoding_format}"] = {
+                "max_batch_size": batch_size,
+                "max_wait_ms": wait,
+                "encoding_format": encoding_format,
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p99_ms": float(np.percentile(latencies, 99) * 1000),
+                "requests_per_sec": len(latencies) / elapsed,
+                "mean_batch_size": stats["mean_batch_size"],
+            }
+    baseline = results[f"batch{batch_sizes[0]}-float"]["requests_per_sec"]
+    for result in results.values():
+        result["speedup"] = result["requests_per_sec"] / baseline
+    return {"clients": clients, "requests_per_client": requests, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--encoder", choices=["gguf", "projection"], default="gguf")
+    parser.add_argument("--model-path", type=Path, help="GGUF model, defaults to a tiny generated one")
+    parser.add_argument("--dim", type=int, default=768, help="Vector size of the projection encoder")
+    parser.add_argument("--call-overhead-ms", type=float, default=2.0, help="Per-call cost of the projection encoder")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.encoder == "projection":
+            encoder = projection_encoder(args.dim, args.call_overhead_ms)
+        else:
+            from serve.servers.embedding.server import llama_encoder
+
+            encoder = llama_encoder(args.model_path or write_tiny_gguf(Path(tmp) / "tiny.gguf"))
+        report = run(encoder, args.clients, args.requests, args.batch_sizes, args.max_wait_ms)
+    report["encoder"] = args.encoder
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""Replay a request trace against an OpenAI-compatible server and report latency.
+
+A trace is a JSONL file with one request per line, either a bare request
+body (``prompt`` or ``messages``, ``max_tokens``...) or an object with the
+``endpoint``, the ``body`` and an optional arrival ``offset`` in seconds.
+Requests are sent streaming, so the time to first token (TTFT) and the
+generated tokens, one per server-sent event, are measured per request.
+
+Load is either closed-loop, ``--concurrency`` clients sending their next
+request as soon as the previous one is answered, or open-loop with
+``--rate`` requests per second arriving on a Poisson schedule, or at the
+trace offsets if it has them. Open-loop latencies count from the scheduled
+arrival, so queueing in the server shows up in them.
+
+Without ``--url`` the trace is replayed against ``fake_openai.py`` started
+in-process, with the ``echo`` or tiny GGUF ``gguf`` generator, so the
+suite runs offline. ``compare`` flags metrics of a new result file worse
+than a baseline by more than ``--threshold`` and exits with status 1.
+
+Usage:
+    python benchmarks/bench_serving.py run --trace benchmarks/traces/sample.jsonl --concurrency 8 --output new.json
+    python benchmarks/bench_serving.py run --url http://localhost:8080 --rate 4 --requests 200
+    python benchmarks/bench_serving.py compare baseline.json new.json --threshold 0.1
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import itertools
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+@dataclass
+class TraceRequest:
+    """One request of a trace.
+
+    Attributes:
+        body: OpenAI request body
+        endpoint: Request path, chosen from the body if not given
+        offset: Arrival time in seconds from the start of the trace
+    """
+    body: dict
+    endpoint: str = ""
+    offset: Optional[float] = None
+
+    def __post_init__(self):
+        if not self.endpoint:
+            self.endpoint = "/v1/chat/completions" if "messages" in self.body else "/v1/completions"
+
+
+@dataclass
+class RequestResult:
+    """Timings of one replayed request, in seconds from its arrival.
+
+    Attributes:
+        ok: Whether a complete response was received
+        ttft: Time to the first token
+        latency: Time to the end of the response
+        tokens: Generated tokens
+        error: Error of a failed request
+    """
+    ok: bool
+    ttft: Optional[float] = None
+    latency: Optional[float] = None
+    tokens: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class _Client:
+    """Keep-alive connection of one sender thread."""
+    host: str
+    port: int
+    conn: Optional[http.client.HTTPConnection] = field(default=None)
+
+    def send(self, request: TraceRequest, arrival: float) -> RequestResult:
+        body = dict(request.body, stream=True)
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            self.conn.request("POST", request.endpoint, body=json.dumps(body),
+                              headers={"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            if response.status != 200:
+                response.read()
+                return RequestResult(False, error=f"HTTP {response.status}")
+            ttft, tokens = None, 0
+            for line in response:
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    continue
+                choice = json.loads(data)["choices"][0]
+                text = choice.get("text") or choice.get("delta", {}).get("content")
+                if text:
+                    tokens += 1
+                    if ttft is None:
+                        ttft = time.perf_counter() - arrival
+            return RequestResult(True, ttft, time.perf_counter() - arrival, tokens)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return RequestResult(False, error=f"{type(e).__name__}: {e}")
+
+
+def load_trace(path: Path, requests: Optional[int] = None) -> List[TraceRequest]:
+    """Read a JSONL trace, cycling through it if ``requests`` is more than its length."""
+    trace = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "body" in entry:
+                trace.append(TraceRequest(entry["body"], entry.get("endpoint", ""), entry.get("offset")))
+            else:
+                trace.append(TraceRequest(entry))
+    if not trace:
+        raise ValueError(f"Trace {path} has no requests")
+    if requests is None:
+        return trace
+    # Repeated cycles keep the trace spacing by shifting offsets past the previous cycle
+    span = max((r.offset or 0.0 for r in trace), default=0.0)
+    return [
+        TraceRequest(r.body, r.endpoint, None if r.offset is None else r.offset + (i // len(trace)) * span)
+        for i, r in zip(range(requests), itertools.cycle(trace))
+    ]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    ms = np.asarray(values) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "mean": float(ms.mean()),
+    }
+
+
+def summarize(results: List[RequestResult], duration: float) -> Dict[str, object]:
+    """Aggregate request results into throughput and latency percentiles."""
+    ok = [r for r in results if r.ok]
+    tokens = sum(r.tokens for r in ok)
+    # Time per output token after the first, the decoding speed a client sees
+    tpot = [(r.latency - r.ttft) / (r.tokens - 1) for r in ok if r.tokens > 1 and r.ttft is not None]
+    errors = sorted({r.error for r in results if not r.ok})
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "duration_s": duration,
+        "requests_per_sec": len(ok) / duration if duration else 0.0,
+        "output_tokens": tokens,
+        "output_tokens_per_sec": tokens / duration if duration else 0.0,
+        "ttft_ms": _percentiles([r.ttft for r in ok if r.ttft is not None]),
+        "latency_ms": _percentiles([r.latency for r in ok]),
+        "tpot_ms": _percentiles(tpot),
+        "error_samples": errors[:5],
+    }
+
+
+def _arrival_offsets(trace: List[TraceRequest], rate: Optional[float], seed: int) -> List[float]:
+    """Return the open-loop arrival time of each request, in seconds from the start."""
+    if rate is None:
+        # Requests without an offset arrive with the one before them
+        return list(itertools.accumulate((r.offset for r in trace),
+                                         lambda previous, offset: previous if offset is None else offset,
+                                         initial=0.0))[1:]
+    rng = random.Random(seed)
+    return list(itertools.accumulate(rng.expovariate(rate) for _ in trace))
+
+
+def _closed_loop(send: Callable[[int, float], RequestResult], results: List[Optional[RequestResult]],
+                 concurrency: int) -> None:
+    """Fill ``results`` from ``concurrency`` clients that each send their next request on completion."""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def client() -> None:
+        while True:
+            with lock:
+                index = next(counter)
+            if index >= len(results):
+                return
+            results[index] = send(index, time.perf_counter())
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def replay(url: str, trace: List[TraceRequest], concurrency: int = 4, rate: Optional[float] = None,
+           seed: int = 0) -> Tuple[List[RequestResult], float]:
+    """Send the trace to ``url``.
+
+    Args:
+        url: Base URL of the server
+        trace: Requests to send
+        concurrency: Closed-loop clients, or the sender threads of an open loop
+        rate: Open-loop arrival rate in requests per second, closed loop if None
+        seed: Seed of the Poisson arrivals
+
+    Returns:
+        Tuple[List[RequestResult], float]: Results in trace order and the
+        wall time of the replay
+    """
+    split = urlsplit(url)
+    local = threading.local()
+
+    def send(index: int, arrival: float) -> RequestResult:
+        if not hasattr(local, "client"):
+            local.client = _Client(split.hostname, split.port or 80)
+        return local.client.send(trace[index], arrival)
+
+    results: List[Optional[RequestResult]] = [None] * len(trace)
+    started = time.perf_counter()
+    if rate is None and all(r.offset is None for r in trace):
+        _closed_loop(send, results, concurrency)
+    else:
+        offsets = _arrival_offsets(trace, rate, seed)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+            futures = []
+            for index, offset in sorted(enumerate(offsets), key=lambda item: item[1]):
+                arrival = started + offset
+                time.sleep(max(arrival - time.perf_counter(), 0))
+                futures.append((index, executor.submit(send, index, arrival)))
+            for index, future in futures:
+                results[index] = future.result()
+    return results, time.perf_counter() - started
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    split = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = http.client.HTTPConnection(split.hostname, split.port or 80, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{url} did not become healthy in {timeout:.0f}s")
+        time.sleep(0.2)
+
+
+def run(trace_path: Path, url: Optional[str] = None, concurrency: int = 4, rate: Optional[float] = None,
+        requests: Optional[int] = None, generator: str = "echo", ttft_ms: float = 20.0, token_ms: float = 5.0,
+        seed: int = 0) -> Dict[str, object]:
+    """Replay a trace against ``url``, or a fake server if None, and summarize it."""
+    trace = load_trace(trace_path, requests)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        if url is None:
+            from fake_openai import FakeOpenAIServer, echo_generator, gguf_generator
+            from tiny_gguf import write_tiny_gguf
+
+            generate = (gguf_generator(write_tiny_gguf(Path(tmp) / "tiny.gguf")) if generator == "gguf"
+                        else echo_generator(ttft_ms, token_ms))
+            server = FakeOpenAIServer(generate).start()
+            url = server.url
+        try:
+            _wait_ready(url)
+            results, duration = replay(url, trace, concurrency, rate, seed)
+        finally:
+            if server is not None:
+                server.close()
+    report = summarize(results, duration)
+    report["config"] = {
+        "trace": str(trace_path), "url": url if server is None else f"fake:{generator}",
+        "mode": "closed" if rate is None and all(r.offset is None for r in trace) else "open",
+        "concurrency": concurrency, "rate": rate, "seed": seed,
+    }
+    return report
+
+
+# Compared metrics and whether a higher value is better
+METRICS = {
+    "requests_per_sec": True,
+    "output_tokens_per_sec": True,
+    "error_rate": False,
+    "ttft_ms.p50": False,
+    "ttft_ms.p95": False,
+    "ttft_ms.p99": False,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "tpot_ms.p50": False,
+}
+
+
+def _metric(report: dict, name: str) -> Optional[float]:
+    value = report
+    for part in name.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(baseline: dict, new: dict, threshold: float = 0.1) -> Dict[str, dict]:
+    """Compare the metrics of two result files.
+
+    Args:
+        baseline: Baseline report
+        new: New report
+        threshold: Relative change in the worse direction that counts as a regression
+
+    Returns:
+        Dict[str, dict]: Each metric mapped to its ``baseline`` and ``new``
+        values, relative ``change`` and whether it ``regressed``
+    """
+    rows = {}
+    for name, higher_is_better in METRICS.items():
+        old, current = _metric(baseline, name), _metric(new, name)
+        if old is None or current is None:
+            continue
+        # A metric leaving zero, like the error rate, changes infinitely and always regresses
+        change = (current - old) / old if old else (0.0 if current == old else float("inf"))
+        worse = -change if higher_is_better else change
+        rows[name] = {"baseline": old, "new": current, "change": change, "regressed": worse > threshold}
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Replay a trace")
+    run_parser.add_argument("--trace", type=Path, default=Path(__file__).parent / "traces" / "sample.jsonl")
+    run_parser.add_argument("--url", help="Server to benchmark, a fake server is started if not given")
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--rate", type=float, help="Open-loop arrivals per second")
+    run_parser.add_argument("--requests", type=int, help="Requests to send, cycling through the trace")
+    run_parser.add_argument("--generator", choices=["echo", "gguf"], default="echo")
+    run_parser.add_argument("--ttft-ms", type=float, default=20.0)
+    run_parser.add_argument("--token-ms", type=float, default=5.0)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", type=Path, help="Also write the report to this file")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.trace, args.url, args.concurrency, args.rate, args.requests, args.generator,
+                     args.ttft_ms, args.token_ms, args.seed)
+        if args.output is not None:
+            args.output.write_text(json.dumps(report, indent=2))
+        print(json.dumps(report, indent=2))
+        return
+
+    rows = compare(json.loads(args.baseline.read_text()), json.loads(args.new.read_text()), args.threshold)
+    print(json.dumps(rows, indent=2))
+    regressed = [name for name, row in rows.items() if row["regressed"]]
+    if regressed:
+        sys.exit(f"Regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
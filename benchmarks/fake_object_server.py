@@ -0,0 +1,234 @@
+"""Local object server speaking enough of the GCS JSON API and the Hugging Face Hub to download from.
+
+Objects are files on disk, registered under a bucket and name. The server
+answers the requests ``google-cloud-storage`` sends when
+``STORAGE_EMULATOR_HOST`` points at it (object listing and ranged media
+downloads with ``x-goog-hash`` headers) and those ``huggingface_hub``
+sends when ``HF_ENDPOINT`` does (model info and ``resolve`` downloads of
+the objects of the ``hf`` bucket, named ``<repo_id>/<file>``). Object
+data is streamed from disk, so multi-GB artifacts cost no memory.
+
+``write_synthetic`` creates large artifacts quickly by repeating a random
+block, computing the checksums GCS publishes on the way.
+"""
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+
+import google_crc32c
+
+
+# Object data is sent in blocks of this size
+_COPY_BLOCK_SIZE = 1024 * 1024
+# Revision reported for every Hugging Face repository
+HF_REVISION = "0" * 40
+
+
+@dataclass
+class StoredObject:
+    """An object served from a local file.
+
+    Attributes:
+        path: File holding the data
+        size: Size in bytes
+        crc32c: Base64 CRC32C as published by GCS
+        md5_hash: Base64 MD5 as published by GCS
+        sha256: Hex SHA-256, the ETag of Hugging Face LFS files
+    """
+    path: Path
+    size: int
+    crc32c: str
+    md5_hash: str
+    sha256: str
+
+
+def write_synthetic(path: Path, size: int, block_size: int = 4 * 1024 * 1024, seed: int = 0) -> StoredObject:
+    """Write ``size`` bytes of a repeated random block to ``path``."""
+    block = hashlib.shake_256(str(seed).encode()).digest(block_size)
+    crc, md5, sha256 = google_crc32c.Checksum(), hashlib.md5(), hashlib.sha256()  # noqa: S324
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            data = block[:min(remaining, block_size)]
+            f.write(data)
+            crc.update(data)
+            md5.update(data)
+            sha256.update(data)
+            remaining -= len(data)
+    return StoredObject(path, size, base64.b64encode(crc.digest()).decode(),
+                        base64.b64encode(md5.digest()).decode(), sha256.hexdigest())
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header or "")
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start:
+        return max(size - int(end), 0), size - 1
+    return int(start), min(int(end), size - 1) if end else size - 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _resource(self, bucket: str, name: str, obj: StoredObject) -> dict:
+        return {
+            "kind": "storage#object", "bucket": bucket, "name": name, "id": f"{bucket}/{name}/1",
+            "size": str(obj.size), "generation": "1", "metageneration": "1",
+            "crc32c": obj.crc32c, "md5Hash": obj.md5_hash, "contentType": "application/octet-stream",
+        }
+
+    def _send_object(self, obj: StoredObject, headers: Dict[str, str], body: bool = True) -> None:
+        byte_range = _parse_range(self.headers.get("Range"), obj.size)
+        start, end = byte_range or (0, obj.size - 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(max(end - start + 1, 0)))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{obj.size}")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if not body:
+            return
+        with open(obj.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(remaining, _COPY_BLOCK_SIZE))
+                if not data:
+                    break
+                self.wfile.write(data)
+                remaining -= len(data)
+        self.server.bytes_sent += end - start + 1
+
+    def _gcs(self, path: str, query: dict) -> bool:
+        match = re.fullmatch(r"(?:/download)?/storage/v1/b/([^/]+)/o(?:/(.+))?", path)
+        if not match:
+            return False
+        bucket, name = match.group(1), match.group(2)
+        objects = self.server.buckets.get(bucket, {})
+        if name is None:
+            prefix = query.get("prefix", [""])[0]
+            items = [self._resource(bucket, n, o) for n, o in sorted(objects.items()) if n.startswith(prefix)]
+            self._send_json(200, {"kind": "storage#objects", "items": items})
+            return True
+        name = unquote(name)
+        obj = objects.get(name)
+        if obj is None:
+            self._send_json(404, {"error": {"code": 404, "message": f"No such object: {bucket}/{name}"}})
+        elif query.get("alt", [""])[0] == "media":
+            self._send_object(obj, {"x-goog-generation": "1",
+                                    "x-goog-hash": f"crc32c={obj.crc32c},md5={obj.md5_hash}",
+                                    "x-goog-stored-content-length": str(obj.size)})
+        else:
+            self._send_json(200, self._resource(bucket, name, obj))
+        return True
+
+    def _hf(self, path: str, body: bool) -> bool:
+        objects = self.server.buckets.get("hf", {})
+        match = re.fullmatch(r"/api/models/(.+?)(?:/revision/[^/]+)?", path)
+        if match:
+            repo_id = match.group(1)
+            files = [n[len(repo_id) + 1:] for n in sorted(objects) if n.startswith(repo_id + "/")]
+            if not files:
+                self._send_json(404, {"error": f"Repository {repo_id} not found"})
+            else:
+                self._send_json(200, {"id": repo_id, "modelId": repo_id, "sha": HF_REVISION,
+                                      "siblings": [{"rfilename": f} for f in files]})
+            return True
+        match = re.fullmatch(r"/(.+?)/resolve/[^/]+/(.+)", path)
+        if not match:
+            return False
+        obj = objects.get(f"{match.group(1)}/{unquote(match.group(2))}")
+        if obj is None:
+            self._send_json(404, {"error": "Entry not found"})
+            return True
+        etag = f'"{obj.sha256}"'
+        self._send_object(obj, {"ETag": etag, "X-Linked-Etag": etag, "X-Linked-Size": str(obj.size),
+                                "X-Repo-Commit": HF_REVISION}, body=body)
+        return True
+
+    def _route(self, body: bool = True) -> None:
+        split = urlsplit(self.path)
+        self.server.requests += 1
+        if not (self._gcs(split.path, parse_qs(split.query)) or self._hf(split.path, body)):
+            self._send_json(404, {"error": f"Unknown path {split.path}"})
+
+    def do_GET(self):
+        self._route()
+
+    def do_HEAD(self):
+        self._route(body=False)
+
+
+class FakeObjectServer(ThreadingHTTPServer):
+    """Threaded server of local files as GCS and Hugging Face objects.
+
+    Attributes:
+        port: Bound port
+        buckets: Bucket names mapped to object names and their files
+        requests: Requests served
+        bytes_sent: Object bytes sent
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.port = self.server_address[1]
+        self.buckets: Dict[str, Dict[str, StoredObject]] = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def add(self, bucket: str, name: str, obj: StoredObject) -> None:
+        """Serve ``obj`` as ``name`` in ``bucket``."""
+        self.buckets.setdefault(bucket, {})[name] = obj
+
+    def add_file(self, bucket: str, name: str, path: Path) -> StoredObject:
+        """Serve an existing file, computing its checksums."""
+        crc, md5, sha256 = google_crc32c.Checksum(), hashlib.md5(), hashlib.sha256()  # noqa: S324
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_COPY_BLOCK_SIZE), b""):
+                crc.update(block)
+                md5.update(block)
+                sha256.update(block)
+        obj = StoredObject(Path(path), os.path.getsize(path), base64.b64encode(crc.digest()).decode(),
+                           base64.b64encode(md5.digest()).decode(), sha256.hexdigest())
+        self.add(bucket, name, obj)
+        return obj
+
+    def start(self) -> "FakeObjectServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
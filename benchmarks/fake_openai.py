@@ -0,0 +1,175 @@
+"""OpenAI-compatible stand-in for a llama.cpp server, for offline benchmarks.
+
+Serves ``/v1/completions``, ``/v1/chat/completions`` and ``/health`` like
+``llama-server`` does, streaming one server-sent event per token over a
+chunked keep-alive response when ``stream`` is set. Two generators are
+available:
+
+* ``echo`` sleeps ``ttft_ms`` before the first token and ``token_ms``
+  between tokens, so latency is known in advance.
+* ``gguf`` generates with llama.cpp on a GGUF file, by default the tiny
+  random-weight model of ``tiny_gguf.py``.
+
+Usage:
+    python benchmarks/fake_openai.py --port 8080 --generator gguf
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+import argparse
+import json
+import tempfile
+import threading
+import time
+
+
+# A generator yields the text of each token of a request body
+Generator = Callable[[dict], Iterator[str]]
+
+
+def _prompt(body: dict) -> str:
+    if "messages" in body:
+        return "\n".join(str(m.get("content", "")) for m in body["messages"])
+    prompt = body.get("prompt", "")
+    return prompt if isinstance(prompt, str) else " ".join(map(str, prompt))
+
+
+def echo_generator(ttft_ms: float = 20.0, token_ms: float = 5.0, default_tokens: int = 16) -> Generator:
+    """Generator producing ``max_tokens`` words at a fixed pace."""
+
+    def generate(body: dict) -> Iterator[str]:
+        words = _prompt(body).split() or ["token"]
+        time.sleep(ttft_ms / 1000)
+        for i in range(int(body.get("max_tokens") or default_tokens)):
+            if i:
+                time.sleep(token_ms / 1000)
+            yield f" {words[i % len(words)]}"
+
+    return generate
+
+
+def gguf_generator(model_path: Path, n_ctx: int = 512, default_tokens: int = 16) -> Generator:
+    """Generator running llama.cpp on a GGUF file, one request at a time like a single slot."""
+    from llama_cpp import Llama
+
+    llm = Llama(model_path=str(model_path), n_ctx=n_ctx, verbose=False)
+    lock = threading.Lock()
+
+    def generate(body: dict) -> Iterator[str]:
+        with lock:
+            for chunk in llm.create_completion(
+                _prompt(body), max_tokens=int(body.get("max_tokens") or default_tokens),
+                temperature=float(body.get("temperature", 0.0)), stream=True
+            ):
+                yield chunk["choices"][0]["text"]
+
+    return generate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send_json(200, {"status": "ok"})
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        chat = self.path == "/v1/chat/completions"
+        if not chat and self.path != "/v1/completions":
+            return self._send_json(404, {"error": "not found"})
+        self.server.requests += 1
+        tokens = self.server.generate(body)
+        if not body.get("stream"):
+            text = "".join(tokens)
+            choice = {"index": 0, "finish_reason": "length"}
+            choice.update({"message": {"role": "assistant", "content": text}} if chat else {"text": text})
+            return self._send_json(200, {"object": "chat.completion" if chat else "text_completion",
+                                         "choices": [choice]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for text in tokens:
+            delta = {"delta": {"content": text}} if chat else {"text": text}
+            self._send_chunk(f"data: {json.dumps({'choices': [dict(index=0, **delta)]})}\n\n".encode())
+            self.wfile.flush()
+        self._send_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded OpenAI-compatible server around a token generator.
+
+    Attributes:
+        port: Bound port
+        requests: Completion requests served
+    """
+
+    daemon_threads = True
+
+    def __init__(self, generate: Generator, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.generate = generate
+        self.port = self.server_address[1]
+        self.requests = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--generator", choices=["echo", "gguf"], default="echo")
+    parser.add_argument("--model-path", type=Path, help="GGUF model, defaults to a tiny generated one")
+    parser.add_argument("--ttft-ms", type=float, default=20.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.generator == "gguf":
+            from tiny_gguf import write_tiny_gguf
+
+            generate = gguf_generator(args.model_path or write_tiny_gguf(Path(tmp) / "tiny.gguf"))
+        else:
+            generate = echo_generator(args.ttft_ms, args.token_ms)
+        server = FakeOpenAIServer(generate, host="0.0.0.0", port=args.port)
+        print(f"Serving {args.generator} on port {server.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Generate a tiny random-weight llama GGUF for offline benchmarks and tests.
+
+The model is meaningless but loads in llama.cpp in milliseconds, tokenizes
+any text through byte fallback and generates deterministically with greedy
+sampling, which is all the serving benchmarks need.
+
+Usage:
+    python benchmarks/tiny_gguf.py models/tiny.gguf
+"""
+from pathlib import Path
+from typing import Union
+import argparse
+
+import numpy as np
+
+
+def write_tiny_gguf(
+    path: Union[str, Path],
+    n_embd: int = 64,
+    n_layer: int = 2,
+    n_head: int = 4,
+    n_ff: int = 128,
+    n_ctx: int = 2048,
+    seed: int = 0
+) -> Path:
+    """Write a tiny llama-architecture GGUF file.
+
+    Args:
+        path: Destination file
+        n_embd: Embedding size
+        n_layer: Number of transformer blocks
+        n_head: Number of attention heads
+        n_ff: Feed-forward hidden size
+        n_ctx: Training context length recorded in the metadata
+        seed: Seed for the random weights
+
+    Returns:
+        Path: Path of the written file
+    """
+    import gguf
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    # <unk>, <s>, </s>, the 256 byte-fallback tokens and a few words
+    words = ["▁the", "▁a", "▁model", "▁is", "▁to", "▁and", "▁of", "▁in"]
+    tokens = ["<unk>", "<s>", "</s>"] + [f"<0x{i:02X}>" for i in range(256)] + words
+    token_types = (
+        [gguf.TokenType.UNKNOWN, gguf.TokenType.CONTROL, gguf.TokenType.CONTROL]
+        + [gguf.TokenType.BYTE] * 256
+        + [gguf.TokenType.NORMAL] * len(words)
+    )
+    scores = [0.0] * (3 + 256) + [-float(i) for i in range(len(words))]
+    n_vocab = len(tokens)
+
+    writer = gguf.GGUFWriter(str(path), "llama")
+    writer.add_name("tiny-llama")
+    writer.add_context_length(n_ctx)
+    writer.add_embedding_length(n_embd)
+    writer.add_block_count(n_layer)
+    writer.add_feed_forward_length(n_ff)
+    writer.add_head_count(n_head)
+    writer.add_head_count_kv(n_head)
+    writer.add_rope_dimension_count(n_embd // n_head)
+    writer.add_layer_norm_rms_eps(1e-5)
+    writer.add_file_type(gguf.LlamaFileType.ALL_F32)
+    writer.add_tokenizer_model("llama")
+    writer.add_token_list(tokens)
+    writer.add_token_scores(scores)
+    writer.add_token_types(token_types)
+    writer.add_bos_token_id(1)
+    writer.add_eos_token_id(2)
+    writer.add_unk_token_id(0)
+
+    def weight(*shape: int) -> np.ndarray:
+        return (rng.standard_normal(shape) * 0.02).astype(np.float32)
+
+    writer.add_tensor("token_embd.weight", weight(n_vocab, n_embd))
+    for i in range(n_layer):
+        writer.add_tensor(f"blk.{i}.attn_norm.weight", np.ones(n_embd, dtype=np.float32))
+        writer.add_tensor(f"blk.{i}.attn_q.weight", weight(n_embd, n_embd))
+        writer.add_tensor(f"blk.{i}.attn_k.weight", weight(n_embd, n_embd))
+        writer.add_tensor(f"blk.{i}.attn_v.weight", weight(n_embd, n_embd))
+        writer.add_tensor(f"blk.{i}.attn_output.weight", weight(n_embd, n_embd))
+        writer.add_tensor(f"blk.{i}.ffn_norm.weight", np.ones(n_embd, dtype=np.float32))
+        writer.add_tensor(f"blk.{i}.ffn_gate.weight", weight(n_ff, n_embd))
+        writer.add_tensor(f"blk.{i}.ffn_up.weight", weight(n_ff, n_embd))
+        writer.add_tensor(f"blk.{i}.ffn_down.weight", weight(n_embd, n_ff))
+    writer.add_tensor("output_norm.weight", np.ones(n_embd, dtype=np.float32))
+    writer.add_tensor("output.weight", weight(n_vocab, n_embd))
+
+    writer.write_header_to_file()
+    writer.write_kv_data_to_file()
+    writer.write_tensors_to_file()
+    writer.close()
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help="Destination .gguf file")
+    parser.add_argument("--n-embd", type=int, default=64)
+    parser.add_argument("--n-layer", type=int, default=2)
+    args = parser.parse_args()
+    print(write_tiny_gguf(args.path, n_embd=args.n_embd, n_layer=args.n_layer))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,23 @@
-from serve.servers.llamacpp.main import llama_cpp
+# Subcommands of serve-cmd as name: (import path, short help). Their modules
+# pull in mlflow, llama_cpp and pandas, so they are imported only when the
+# command runs, see serve._cli.LazyGroup.
+COMMANDS = {
+  "llama-cpp": ("serve.servers.llamacpp.main:llama_cpp",
+                "CLI tool for LLaMA.cpp model management and inference."),
+  "embedding": ("serve.servers.embedding.cli:embedding",
+                "CLI tool for embedding model management."),
+  "mlflow-llamacpp": ("serve.experiment_tracker.mlflow.mlflow_llamacpp.cli:mlflow_llamacpp",
+                      "CLI tool for LLaMA.cpp model management with MLflow integration."),
+  "watch": ("serve.servers.watcher:watch",
+            "Keep all configured models on the version behind their alias."),
+}
 
-clis = [
-  llama_cpp,
-]
\ No newline at end of file
+
+def __getattr__(name):
+    # ``clis`` used to be built at import time, it now imports every command on first access
+    if name == "clis":
+        from importlib import import_module
+
+        return [getattr(import_module(module), attribute)
+                for module, _, attribute in (path.partition(":") for path, _ in COMMANDS.values())]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,3 +1,4 @@
+from .lazy import LazyGroup
 from .task import TaskCLI
 
-__all__ = ["TaskCLI"]
\ No newline at end of file
+__all__ = ["LazyGroup", "TaskCLI"]
\ No newline at end of file
@@ -0,0 +1,62 @@
+from importlib import import_module
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+
+class LazyGroup(click.Group):
+    """Click group importing its subcommands only when they are used.
+
+    Subcommands are registered as ``name: (import path, short help)`` where
+    the import path reads ``package.module:attribute``. Listing the group
+    in ``--help`` uses the registered help text, so only the command that
+    actually runs pays for its module and dependencies.
+
+    Attributes:
+        lazy_commands: Registered subcommands not imported yet
+    """
+
+    def __init__(self, *args, lazy_commands: Optional[Dict[str, Tuple[str, str]]] = None, **kwargs):
+        """Initialize the group.
+
+        Args:
+            lazy_commands: Subcommand names mapped to their import path and
+                short help
+        """
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        """Import a registered subcommand.
+
+        Raises:
+            ValueError: If the import path does not point to a click command
+        """
+        import_path, _ = self.lazy_commands[cmd_name]
+        module_name, _, attribute = import_path.partition(":")
+        command = getattr(import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(f"{import_path} is not a click command")
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        rows = []
+        for name in self.list_commands(ctx):
+            command = self.commands.get(name)
+            if command is not None:
+                if command.hidden:
+                    continue
+                rows.append((name, command.get_short_help_str(formatter.width)))
+            else:
+                rows.append((name, self.lazy_commands[name][1]))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -1,5 +1,6 @@
 from loguru import logger
 
+import os
 import subprocess
 
 from pathlib import Path
@@ -27,8 +28,15 @@ class TaskCLI:
         # Build command
         command = ["task", "--dir", self.taskfile_dir, task_name] + task_args
         logger.debug(command)
-        # Run the Task command
-        result = subprocess.run(command, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Imported here to keep it out of the CLI startup
+        from serve.utils import tracing
+
+        with tracing.span("task.run", task=task_name) as span:
+            # Processes started by the task continue the trace
+            env = dict(os.environ, **{tracing.TRACEPARENT_ENV: span.traceparent}) if span.traceparent else None
+            # Run the Task command
+            result = subprocess.run(command, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            span.set_attribute("returncode", result.returncode)
         if result.stderr:
             logger.error(result.stderr)
         if result.stdout:
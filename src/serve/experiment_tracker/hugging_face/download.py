@@ -4,57 +4,76 @@ from huggingface_hub import hf_hub_download, snapshot_download
 import os
 from loguru import logger
 
+from serve.utils.model_store import ModelStore
+
 def download_model_artifact(
     repo_id: str,
     desired_path: Path,
     model_url: Optional[str] = None,
+    store: Optional[ModelStore] = None,
+    revision: Optional[str] = None,
 ):
     """
     Download a model from Hugging Face Hub to a specified path.
-    
+
+    The model is placed at ``<desired_path>/model_path/artifacts/model.gguf``
+    and linked from the shared model store. A repository that is already
+    stored is linked into place without contacting the Hub; without
+    ``revision`` that is the revision stored first, pass ``revision`` to
+    pin or update it.
+
     Args:
         repo_id: The name of the model on Hugging Face Hub (e.g. "bert-base-uncased")
         desired_path: The path where the model should be stored
         model_url: Optional URL to download a specific model file
-        
+        store: Shared model store, defaults to the ``.store`` next to
+            ``desired_path`` as used by the model managers
+        revision: Branch, tag or commit to download, None for the default branch
+
     Returns:
-        Path: The path where the model was downloaded
+        Path: The ``model_path/artifacts`` directory holding the model
     """
     try:
         # Create the directory if it doesn't exist
         os.makedirs(desired_path, exist_ok=True)
-        
-        if model_url:
+        desired_path = Path(desired_path)
+        model_path = desired_path / "model_path" / "artifacts"
+        if store is None:
+            store = ModelStore(desired_path.resolve().parent / ".store")
+
+        filename = model_url.split('/')[-1] if model_url else None
+        store_key = f"hf:{repo_id}@{revision or ''}/{filename or ''}"
+        if store.materialize(store_key, model_path):
+            logger.info(f"{repo_id}@{revision or 'default'} already in model store, skipping download")
+            return model_path
+
+        if filename:
             # If a specific model URL is provided, download that file
-            local_path = hf_hub_download(
+            hf_hub_download(
                 repo_id=repo_id,
-                filename=model_url.split('/')[-1],
-                local_dir=desired_path,
-                local_dir_use_symlinks=False
+                filename=filename,
+                revision=revision,
+                local_dir=desired_path
             )
         else:
             # Download the complete model repository
-            local_path = snapshot_download(
+            snapshot_download(
                 repo_id=repo_id,
-                local_dir=desired_path,
-                local_dir_use_symlinks=False
+                revision=revision,
+                local_dir=desired_path
             )
-        paths = []
-        for guff in Path(local_path).glob("**/*.gguf"):
-            paths.append(guff)
+        paths = sorted(p for p in desired_path.glob("**/*.gguf") if model_path not in p.parents)
 
         if len(paths) == 0:
-            logger.warning(f"No .gguf file found in {local_path}")
-        model_path = Path(local_path) / "model_path" / "artifacts"
+            logger.warning(f"No .gguf file found in {desired_path}")
         model_path.mkdir(parents=True, exist_ok=True)
         if len(paths) == 1:
             paths[0].rename(model_path / "model.gguf")
         elif len(paths) > 1:
-            logger.warning(f"Multiple .gguf files found in {local_path}, using the first one")
+            logger.warning(f"Multiple .gguf files found in {desired_path}, using the first one")
             paths[0].rename(model_path / "model.gguf")
+        store.ingest(store_key, model_path)
         return model_path
-        
+
     except Exception as e:
         raise Exception(f"Failed to download model {repo_id}: {str(e)}")
-    
-
@@ -7,7 +7,7 @@ from typing import Optional
 from mlflow.tracking import MlflowClient
 
 from serve.utils.mlflow.config import MLFlowConfig, ModelConfig
-from serve.utils.gcs.download import download_from_gcs
+from serve.utils.gcs.download import DEFAULT_CHUNK_SIZE, download_from_gcs
 
 def download_model_artifact(
     client: MlflowClient,
@@ -16,7 +16,10 @@ def download_model_artifact(
     artifact_path="model_path",
     gcs_bucket:str = None,
     local_dir: Optional[Path] = None,
-    gcs_credentials: Optional[Path] = None
+    gcs_credentials: Optional[Path] = None,
+    max_workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    config_path: Optional[Path] = None
 ) -> Path:
     """
     Download model artifact directly from Google Cloud Storage using run ID.
@@ -26,6 +29,10 @@ def download_model_artifact(
         alias (str): Alias of the model version (e.g., 'champion', 'challenger')
         artifact_path (str): Name of the artifact to download
         gcs_bucket (str): Name of the GCS bucket
+        max_workers (int): Number of concurrent download streams
+        chunk_size (int): Maximum size in bytes of one byte-range request
+        config_path (Path): Model config file to record the download in, the
+            default location of ``ModelConfig`` if None
     
     Returns:
         Path: Local path to the downloaded model file
@@ -65,14 +72,16 @@ def download_model_artifact(
         gcs_bucket=gcs_bucket,
         source_path=blob_path,
         destination_path=local_dir,
-        credentials=gcs_credentials
+        credentials=gcs_credentials,
+        max_workers=max_workers,
+        chunk_size=chunk_size
     )
     
     if not downloaded_files:
         raise FileNotFoundError(f"No files were downloaded from {blob_path}")
     
     # Update the model config after successful download
-    model_config = ModelConfig()
+    model_config = ModelConfig(config_path=config_path)
     model_config.update_model_info(run_id, model_name, alias)
 
     return local_dir
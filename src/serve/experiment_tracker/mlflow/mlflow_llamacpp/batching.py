@@ -0,0 +1,297 @@
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+import inspect
+
+import numpy as np
+import llama_cpp
+from llama_cpp import Llama
+from llama_cpp._internals import LlamaBatch, LlamaContext
+from loguru import logger
+
+
+# Sampler settings ``Llama.create_completion`` uses unless told otherwise
+SAMPLER_DEFAULTS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(Llama.create_completion).parameters.items()
+    if name in ("top_k", "min_p", "typical_p", "repeat_penalty", "frequency_penalty", "presence_penalty")
+}
+
+# Whether ``sample_token`` reproduces the default sampler of a serial
+# completion, i.e. the defaults apply no filter it leaves out
+SAMPLES_LIKE_SERIAL = (
+    SAMPLER_DEFAULTS.get("typical_p", 1.0) == 1.0
+    and SAMPLER_DEFAULTS.get("repeat_penalty", 1.0) == 1.0
+    and SAMPLER_DEFAULTS.get("frequency_penalty", 0.0) == 0.0
+    and SAMPLER_DEFAULTS.get("presence_penalty", 0.0) == 0.0
+)
+
+
+def token_distribution(
+    logits: np.ndarray,
+    temperature: float,
+    top_p: float,
+    top_k: int = SAMPLER_DEFAULTS.get("top_k", 40),
+    min_p: float = SAMPLER_DEFAULTS.get("min_p", 0.05)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the tokens a non-greedy sample is drawn from and their probabilities.
+
+    Applies the filters of llama.cpp's default sampler chain in its order:
+    top-k, top-p and min-p on the unscaled distribution, then temperature.
+
+    Args:
+        logits: Logits over the vocabulary
+        temperature: Sampling temperature, greater than 0.0
+        top_p: Nucleus sampling threshold
+        top_k: Number of most likely tokens kept, 0 for all of them
+        min_p: Minimum probability relative to the most likely token
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Token ids, most likely first, and
+        their probabilities
+    """
+    logits = logits.astype(np.float64)
+    order = np.argsort(-logits, kind="stable")
+    if 0 < top_k < len(order):
+        order = order[:top_k]
+    if top_p < 1.0:
+        probs = np.exp(logits[order] - logits[order[0]])
+        cumulative = np.cumsum(probs / probs.sum())
+        order = order[:int(np.searchsorted(cumulative, top_p)) + 1]
+    if min_p > 0.0:
+        order = order[logits[order] >= logits[order[0]] + np.log(min_p)]
+    probs = np.exp((logits[order] - logits[order[0]]) / temperature)
+    return order, probs / probs.sum()
+
+
+def sample_token(
+    logits: np.ndarray,
+    temperature: float,
+    top_p: float,
+    rng: np.random.Generator,
+    top_k: int = SAMPLER_DEFAULTS.get("top_k", 40),
+    min_p: float = SAMPLER_DEFAULTS.get("min_p", 0.05)
+) -> int:
+    """Sample a token id from a logits vector.
+
+    Args:
+        logits: Logits over the vocabulary
+        temperature: Sampling temperature, 0.0 selects greedily
+        top_p: Nucleus sampling threshold
+        rng: Random generator used for sampling
+        top_k: Number of most likely tokens kept, 0 for all of them
+        min_p: Minimum probability relative to the most likely token
+
+    Returns:
+        int: Sampled token id
+    """
+    if temperature <= 0.0:
+        return int(np.argmax(logits))
+    tokens, probs = token_distribution(logits, temperature, top_p, top_k, min_p)
+    return int(rng.choice(tokens, p=probs))
+
+
+@dataclass
+class _Sequence:
+    """Decoding state of one prompt occupying a batch slot."""
+    index: int
+    prompt: str
+    prompt_tokens: List[int]
+    n_past: int = 0
+    generated: List[int] = field(default_factory=list)
+    text: str = ""
+    multibyte_fix: int = 0
+
+
+class BatchedGenerator:
+    """Generates completions for many prompts in one shared llama context.
+
+    Each prompt occupies one of ``max_batch_size`` slots, identified by its
+    llama.cpp sequence ID. Every decode step evaluates the next token of
+    all active slots in a single ``llama_decode`` call; finished slots have
+    their KV cells cleared and are refilled with the next pending prompt
+    (continuous batching). The model weights are shared with ``llama``.
+
+    Attributes:
+        llama: Loaded model whose weights and tokenizer are reused
+        max_batch_size: Number of sequences decoded together
+        n_ctx: Context size available to each sequence
+    """
+
+    def __init__(
+        self,
+        llama: Llama,
+        max_batch_size: int,
+        n_ctx: int,
+        n_threads: int,
+        n_batch: int = 512,
+        seed: Optional[int] = None,
+        n_ubatch: Optional[int] = None
+    ):
+        """Create the shared multi-sequence context.
+
+        Args:
+            llama: Loaded model whose weights and tokenizer are reused
+            max_batch_size: Number of sequences decoded together
+            n_ctx: Context size available to each sequence
+            n_threads: Number of CPU threads to use
+            n_batch: Maximum number of tokens per ``llama_decode`` call
+            seed: Seed for sampling, None for a random seed
+            n_ubatch: Tokens computed at once, defaults to ``n_batch``
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.llama = llama
+        self.max_batch_size = max_batch_size
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+        self.n_vocab = llama.n_vocab()
+        self.rng = np.random.default_rng(seed)
+
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx * max_batch_size
+        params.n_batch = n_batch
+        params.n_ubatch = n_ubatch or n_batch
+        params.n_seq_max = max_batch_size
+        params.n_threads = n_threads
+        params.n_threads_batch = n_threads
+        if hasattr(params, "kv_unified"):
+            params.kv_unified = True
+        self._ctx = LlamaContext(model=llama._model, params=params, verbose=llama.verbose)
+        self._batch = LlamaBatch(n_tokens=n_batch, embd=0, n_seq_max=max_batch_size, verbose=llama.verbose)
+
+    def close(self) -> None:
+        """Free the llama context and batch."""
+        self._batch.close()
+        self._ctx.close()
+
+    def _decode(self, entries: List[Tuple[int, int, int, bool]]) -> Dict[int, np.ndarray]:
+        """Evaluate tokens of several sequences and collect their logits.
+
+        Args:
+            entries: ``(token, position, seq_id, want_logits)`` tuples
+
+        Returns:
+            Dict[int, np.ndarray]: Logits of the last requested token of
+            each sequence, keyed by sequence ID
+        """
+        logits: Dict[int, np.ndarray] = {}
+        batch = self._batch.batch
+        for chunk_start in range(0, len(entries), self.n_batch):
+            chunk = entries[chunk_start:chunk_start + self.n_batch]
+            for i, (token, pos, seq_id, want_logits) in enumerate(chunk):
+                batch.token[i] = token
+                batch.pos[i] = pos
+                batch.seq_id[i][0] = seq_id
+                batch.n_seq_id[i] = 1
+                batch.logits[i] = want_logits
+            batch.n_tokens = len(chunk)
+            self._ctx.decode(self._batch)
+            for i, (_, _, seq_id, want_logits) in enumerate(chunk):
+                if want_logits:
+                    row = self._ctx.get_logits_ith(i)
+                    logits[seq_id] = np.ctypeslib.as_array(row, shape=(self.n_vocab,)).copy()
+        return logits
+
+    def _advance(self, seq: _Sequence, token: int, stop: List[str], max_tokens: int) -> bool:
+        """Append a sampled token to a sequence and check stop conditions.
+
+        Mirrors ``Llama.create_completion``: the end-of-sequence token is not
+        part of the output, and neither stop strings nor ``max_tokens`` end
+        a sequence in the middle of a multi-byte UTF-8 character.
+
+        Returns:
+            bool: True if the sequence is finished
+        """
+        if token == self.llama.token_eos():
+            return True
+        seq.generated.append(token)
+        raw = self.llama.detokenize(seq.generated, prev_tokens=seq.prompt_tokens)
+        seq.text = raw.decode("utf-8", errors="ignore")
+        if seq.n_past >= self.n_ctx:
+            return True
+        for k, char in enumerate(raw[-3:]):
+            k = 3 - k
+            for num, pattern in [(2, 192), (3, 224), (4, 240)]:
+                if num > k and pattern & char == pattern:
+                    seq.multibyte_fix = num - k
+        if seq.multibyte_fix > 0:
+            seq.multibyte_fix -= 1
+            return False
+        for stop_str in stop:
+            position = seq.text.find(stop_str)
+            if position != -1:
+                seq.text = seq.text[:position]
+                return True
+        return len(seq.generated) >= max_tokens
+
+    def generate(
+        self,
+        prompts: List[str],
+        max_tokens: int = 128,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        stop: Optional[List[str]] = None,
+        echo: bool = False,
+        top_k: int = SAMPLER_DEFAULTS.get("top_k", 40),
+        min_p: float = SAMPLER_DEFAULTS.get("min_p", 0.05)
+    ) -> List[str]:
+        """Generate a completion for every prompt.
+
+        Args:
+            prompts: Prompt strings
+            max_tokens: Maximum number of tokens to generate per prompt
+            temperature: Sampling temperature, 0.0 for greedy decoding
+            top_p: Nucleus sampling threshold
+            stop: Strings that stop generation when encountered
+            echo: Whether to include the prompt in the output
+            top_k: Number of most likely tokens kept, 0 for all of them
+            min_p: Minimum probability relative to the most likely token
+
+        Returns:
+            List[str]: Generated text, in the order of ``prompts``
+
+        Raises:
+            ValueError: If a prompt does not fit into the context
+        """
+        stop = [s for s in (stop or []) if s]
+        results: List[Optional[str]] = [None] * len(prompts)
+        pending = list(enumerate(prompts))
+        pending.reverse()
+        slots: Dict[int, _Sequence] = {}
+        self._ctx.kv_cache_clear()
+
+        while pending or slots:
+            entries: List[Tuple[int, int, int, bool]] = []
+            # Fill free slots with new prompts
+            for seq_id in range(self.max_batch_size):
+                if seq_id in slots or not pending:
+                    continue
+                index, prompt = pending.pop()
+                tokens = self.llama.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+                if len(tokens) >= self.n_ctx:
+                    raise ValueError(
+                        f"Prompt {index + 1} has {len(tokens)} tokens, exceeding n_ctx={self.n_ctx}"
+                    )
+                slots[seq_id] = _Sequence(index=index, prompt=prompt, prompt_tokens=tokens)
+                entries.extend(
+                    (token, pos, seq_id, pos == len(tokens) - 1)
+                    for pos, token in enumerate(tokens)
+                )
+                slots[seq_id].n_past = len(tokens)
+            # Continue active sequences by their last sampled token
+            for seq_id, seq in slots.items():
+                if seq.generated:
+                    entries.append((seq.generated[-1], seq.n_past, seq_id, True))
+                    seq.n_past += 1
+
+            logits = self._decode(entries)
+            for seq_id in list(slots):
+                seq = slots[seq_id]
+                token = sample_token(logits[seq_id], temperature, top_p, self.rng, top_k, min_p)
+                if self._advance(seq, token, stop, max_tokens):
+                    results[seq.index] = (seq.prompt + seq.text) if echo else seq.text
+                    self._ctx.kv_cache_seq_rm(seq_id, -1, -1)
+                    del slots[seq_id]
+                    logger.debug(f"Finished prompt {seq.index + 1}/{len(prompts)} in slot {seq_id}")
+
+        return results
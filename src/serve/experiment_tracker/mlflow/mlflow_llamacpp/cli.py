@@ -1,9 +1,15 @@
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from pathlib import Path
+import json
 
 import click
+import mlflow
 from loguru import logger
+from mlflow.tracking import MlflowClient
 
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.loading_profile import (
+    best_profile, candidate_profiles, model_artifacts, sweep_profiles
+)
 from serve.experiment_tracker.mlflow.mlflow_llamacpp.manager import ModelManager
 
 
@@ -276,5 +282,110 @@ def stop(model_name: str) -> None:
         raise click.ClickException(str(e))
 
 
+@mlflow_llamacpp.command('sweep-profile')
+@click.argument('model_path', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    '--output',
+    type=click.Path(dir_okay=False, path_type=Path),
+    default='loading_profile.json',
+    help='File the best loading profile is written to'
+)
+@click.option(
+    '--n-threads',
+    type=int,
+    multiple=True,
+    help='Thread count to try, repeatable (default: all CPUs)'
+)
+@click.option(
+    '--n-batch',
+    type=int,
+    multiple=True,
+    help='Prompt batch size to try, repeatable (default: 512 and 2048)'
+)
+@click.option(
+    '--objective',
+    type=click.Choice(['throughput', 'load']),
+    default='throughput',
+    help='Pick the profile with the most tokens/s or the fastest load'
+)
+@click.option('--max-tokens', type=int, default=16, help='Tokens generated per prompt')
+@click.option('--n-ctx', type=int, default=2048, help='Context window size')
+@click.option(
+    '--run-id',
+    type=str,
+    help='MLflow run to log the best profile and the sweep results to'
+)
+@click.option(
+    '--log-model',
+    type=str,
+    help='Artifact path to log the model under in the --run-id run, with the best profile as its loading_profile'
+)
+def sweep_profile(
+    model_path: Path,
+    output: Path,
+    n_threads: Tuple[int, ...],
+    n_batch: Tuple[int, ...],
+    objective: str,
+    max_tokens: int,
+    n_ctx: int,
+    run_id: Optional[str] = None,
+    log_model: Optional[str] = None
+) -> None:
+    """Benchmark loading profiles on this host and record the best one.
+    
+    With ``--log-model`` the GGUF file is logged as a pyfunc model whose
+    ``loading_profile`` artifact is the best profile, so serving and batch
+    scoring of that model load it the same way. Register that model to
+    serve it through the model manager.
+    
+    Args:
+        model_path: GGUF file to benchmark
+        output: File the best profile is written to
+        n_threads: Thread counts to try
+        n_batch: Prompt batch sizes to try
+        objective: ``throughput`` or ``load``
+        max_tokens: Tokens generated per prompt
+        n_ctx: Context window size
+        run_id: MLflow run to log the results to
+        log_model: Artifact path of the model logged to ``run_id``
+    """
+    try:
+        if log_model and not run_id:
+            raise click.BadParameter("--log-model requires --run-id")
+        profiles = candidate_profiles(n_threads=n_threads or None, n_batch=n_batch or (512, 2048))
+        logger.info(f"Sweeping {len(profiles)} loading profiles of {model_path}")
+        results = sweep_profiles(model_path, profiles, max_tokens=max_tokens, n_ctx=n_ctx)
+        best = best_profile(results, objective)
+        best.profile.save(output)
+        sweep_path = output.with_name(f"{output.stem}_sweep.json")
+        sweep_path.write_text(json.dumps([r.to_dict() for r in results], indent=2))
+        logger.info(
+            f"Best profile ({best.profile.describe()}): loaded in {best.load_seconds:.2f}s, "
+            f"{best.tokens_per_second:.1f} tokens/s, written to {output}"
+        )
+        if run_id:
+            client = MlflowClient()
+            client.log_artifact(run_id, str(output))
+            client.log_artifact(run_id, str(sweep_path))
+            client.log_metric(run_id, "loading_profile_load_seconds", best.load_seconds)
+            client.log_metric(run_id, "loading_profile_tokens_per_second", best.tokens_per_second)
+            logger.info(f"Logged loading profile to run {run_id}")
+        if log_model:
+            from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+            with mlflow.start_run(run_id=run_id):
+                mlflow.pyfunc.log_model(
+                    artifact_path=log_model,
+                    python_model=LlamaGGUFWrapper(n_ctx=n_ctx),
+                    artifacts=model_artifacts(model_path, output),
+                    pip_requirements=["mlflow", "llama-cpp-python", "pandas"]
+                )
+            logger.info(f"Logged model with its loading profile to runs:/{run_id}/{log_model}")
+        
+    except Exception as e:
+        logger.error(f"Failed to sweep loading profiles: {str(e)}")
+        raise click.ClickException(str(e))
+
+
 if __name__ == "__main__":
-    mlflow_llamacpp()
\ No newline at end of file
+    mlflow_llamacpp()
@@ -1,11 +1,41 @@
-from typing import Dict, List, Union, Any
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional, Union, Any
 from pathlib import Path
+import hashlib
+import os
+import threading
+import time
 
 import pandas as pd
 from llama_cpp import Llama
 from mlflow.pyfunc import PythonModel
 from loguru import logger
 
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.batching import SAMPLES_LIKE_SERIAL, BatchedGenerator
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.loading_profile import PROFILE_ARTIFACT, LoadingProfile
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.prefix_cache import PrefixKVCache
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.worker_pool import LlamaWorkerPool, autotune_split
+from serve.utils import metrics, tracing
+from serve.utils.response_cache import ResponseCache, cache_key
+
+# Prompts timed by the worker auto-tuner
+_CALIBRATION_PROMPTS = [
+    "Summarize the following paragraph in one sentence.",
+    "Answer the question using the provided context.",
+    "Translate the text below into French.",
+    "List three key facts mentioned in the document.",
+]
+
+
+LOAD_SECONDS = metrics.histogram(
+    "serve_model_load_duration_seconds", "Seconds load_context took to load a GGUF model", ["flavor"]
+)
+PREDICT_SECONDS = metrics.histogram(
+    "serve_predict_duration_seconds", "Seconds of a predict call, all its prompts included", ["method"]
+)
+PREDICT_PROMPTS = metrics.counter("serve_predict_prompts_total", "Prompts received by predict", ["method"])
+TOKENS_GENERATED = metrics.counter("serve_tokens_generated_total", "Tokens generated", ["method"])
+
 
 class LlamaInferenceError(Exception):
     """Custom exception for LLaMA inference errors."""
@@ -27,7 +57,17 @@ class LlamaGGUFWrapper(PythonModel):
         n_ctx: int = 2048,
         n_threads: int = 4,
         n_gpu_layers: int = 0,
-        verbose: bool = True
+        verbose: bool = True,
+        max_batch_size: int = 1,
+        prefix_cache_bytes: int = 0,
+        prefix_cache_dir: Optional[str] = None,
+        prefix_cache_block_size: int = 32,
+        prefix_cache_disk_bytes: int = (8 << 30),
+        n_workers: Union[int, str] = 1,
+        threads_per_worker: Optional[int] = None,
+        response_cache_bytes: int = 0,
+        response_cache_ttl: float = 600.0,
+        loading_profile: Optional[Union[LoadingProfile, Dict[str, Any]]] = None
     ):
         """Initialize the wrapper with model configuration.
         
@@ -36,13 +76,62 @@ class LlamaGGUFWrapper(PythonModel):
             n_threads: Number of CPU threads to use
             n_gpu_layers: Number of layers to offload to GPU
             verbose: Whether to enable verbose logging
+            max_batch_size: Number of prompts decoded together in a shared
+                context. 1 generates one prompt at a time.
+            prefix_cache_bytes: RAM budget for cached KV states of prompt
+                prefixes. 0 disables the prefix cache.
+            prefix_cache_dir: Optional directory persisting cached KV states
+                across restarts, in a subdirectory per model
+            prefix_cache_block_size: Token granularity of prefix matching
+            prefix_cache_disk_bytes: Disk budget for persisted KV states
+            n_workers: Number of worker processes scoring prompts in
+                parallel, each with its own model instance sharing the
+                mmapped weights. 1 scores in-process, "auto" picks the
+                split of all CPUs by a short calibration run at load time.
+            threads_per_worker: CPU threads of each worker process,
+                defaults to ``n_threads``
+            response_cache_bytes: Budget for cached responses of greedy
+                (temperature 0) requests. 0 disables the response cache.
+            response_cache_ttl: Seconds a cached response stays valid
+            loading_profile: How the model is loaded and run (mmap, mlock,
+                NUMA, CPU pinning, threads and batch sizes). A
+                ``loading_profile`` artifact of the logged model, as
+                recorded by ``sweep-profile``, takes precedence.
         """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if prefix_cache_bytes < 0:
+            raise ValueError("prefix_cache_bytes must not be negative")
+        if prefix_cache_disk_bytes < 0:
+            raise ValueError("prefix_cache_disk_bytes must not be negative")
+        if n_workers != "auto" and (not isinstance(n_workers, int) or n_workers < 1):
+            raise ValueError("n_workers must be a positive integer or 'auto'")
+        if response_cache_bytes < 0:
+            raise ValueError("response_cache_bytes must not be negative")
         self.n_ctx = n_ctx
         self.n_threads = n_threads
         self.n_gpu_layers = n_gpu_layers
         self.verbose = verbose
+        self.max_batch_size = max_batch_size
+        self.prefix_cache_bytes = prefix_cache_bytes
+        self.prefix_cache_dir = prefix_cache_dir
+        self.prefix_cache_block_size = prefix_cache_block_size
+        self.prefix_cache_disk_bytes = prefix_cache_disk_bytes
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker or n_threads
+        self.response_cache_bytes = response_cache_bytes
+        self.response_cache_ttl = response_cache_ttl
+        if isinstance(loading_profile, dict):
+            loading_profile = LoadingProfile.from_dict(loading_profile)
+        self.loading_profile = loading_profile or LoadingProfile()
         self.model = None
-        
+        self._batcher = None
+        self._prefix_cache = None
+        self._pool = None
+        self._response_cache = None
+        self._run_key = None
+        self._deferred_load = None
+
     def load_context(self, context: Dict[str, Any]) -> None:
         """Load the GGUF model when the model is loaded.
         
@@ -53,31 +142,208 @@ class LlamaGGUFWrapper(PythonModel):
             LlamaInferenceError: If model loading fails
             ValueError: If model path not found in artifacts
         """
-        try:
-            if "model_path" not in context.artifacts:
-                raise ValueError("No model_path found in artifacts")
+        # Served models are configured through the environment of ``mlflow models serve``
+        metrics.enable_from_env()
+        tracing.enable_from_env(service_name="serve-pyfunc")
+        # Not created in __init__, the wrapper is pickled when logged
+        self._load_lock = threading.Lock()
+        # Continues the trace of the process that started the server, if any
+        with tracing.span("pyfunc.load_context", parent=os.environ.get(tracing.TRACEPARENT_ENV)):
+            started = time.perf_counter()
+            try:
+                if "model_path" not in context.artifacts:
+                    raise ValueError("No model_path found in artifacts")
                 
-            model_path = context.artifacts["model_path"]
-            if not Path(model_path).exists():
-                raise ValueError(f"Model file not found: {model_path}")
+                model_path = context.artifacts["model_path"]
+                if not Path(model_path).exists():
+                    raise ValueError(f"Model file not found: {model_path}")
                 
-            logger.info(f"Loading LLaMA model from {model_path}")
-            logger.info(f"Model config: n_ctx={self.n_ctx}, "
-                       f"n_threads={self.n_threads}, "
-                       f"n_gpu_layers={self.n_gpu_layers}")
+                if PROFILE_ARTIFACT in context.artifacts:
+                    self.loading_profile = LoadingProfile.load(context.artifacts[PROFILE_ARTIFACT])
+                profile = self.loading_profile
+                llama_kwargs = profile.llama_kwargs(self.n_threads)
+                logger.info(f"Loading LLaMA model from {model_path}")
+                logger.info(f"Model config: n_ctx={self.n_ctx}, "
+                           f"n_threads={llama_kwargs['n_threads']}, "
+                           f"n_gpu_layers={self.n_gpu_layers}, "
+                           f"loading profile: {profile.describe()}")
+                profile.pin()
+
+                if self.n_workers != 1:
+                    with tracing.span("pyfunc.start_pool", n_workers=self.n_workers):
+                        self._start_pool(model_path)
+                if self._pool is not None:
+                    # Workers generate, the parent only needs the tokenizer
+                    # until a stream asks for the full model
+                    self.model = Llama(model_path=model_path, vocab_only=True, verbose=self.verbose)
+                    self._deferred_load = (context, model_path, llama_kwargs)
+                    logger.info("Worker pool active, loaded only the vocabulary in the serving process")
+                else:
+                    self._load_model(context, model_path, llama_kwargs, batched=True)
+                if self.response_cache_bytes > 0:
+                    self._response_cache = ResponseCache(self.response_cache_bytes, self.response_cache_ttl)
+                    self._run_key = self._model_run_key(context, model_path)
+                    logger.info(f"Response cache enabled with {self.response_cache_bytes} bytes")
+                LOAD_SECONDS.observe(time.perf_counter() - started, flavor="llamacpp")
+                logger.info("Model loaded successfully")
             
+            except Exception as e:
+                logger.error(f"Failed to load model: {str(e)}")
+                raise LlamaInferenceError(f"Failed to load model: {str(e)}")
+
+    def _load_model(self, context: Any, model_path: str, llama_kwargs: Dict[str, Any], batched: bool) -> None:
+        """Load the model into this process with its prefix cache and, if
+        ``batched``, the batched decoding context."""
+        with tracing.span("pyfunc.load_model", model_path=model_path):
             self.model = Llama(
                 model_path=model_path,
                 n_ctx=self.n_ctx,
-                n_threads=self.n_threads,
                 n_gpu_layers=self.n_gpu_layers,
-                verbose=self.verbose
+                verbose=self.verbose,
+                **llama_kwargs
+            )
+        if self.prefix_cache_bytes > 0:
+            self._prefix_cache = PrefixKVCache(
+                capacity_bytes=self.prefix_cache_bytes,
+                block_size=self.prefix_cache_block_size,
+                cache_dir=self.prefix_cache_dir,
+                disk_bytes=self.prefix_cache_disk_bytes,
+                # KV states are only valid for the weights that produced them
+                namespace=hashlib.sha256(self._model_run_key(context, model_path).encode()).hexdigest()[:16]
+            )
+            self.model.set_cache(self._prefix_cache)
+            logger.info(f"Prefix KV cache enabled with {self.prefix_cache_bytes} bytes")
+        if batched and self.max_batch_size > 1:
+            self._batcher = BatchedGenerator(
+                self.model,
+                max_batch_size=self.max_batch_size,
+                n_ctx=self.n_ctx,
+                n_threads=llama_kwargs["n_threads"],
+                n_batch=llama_kwargs["n_batch"],
+                n_ubatch=llama_kwargs["n_ubatch"]
             )
-            logger.info("Model loaded successfully")
+            logger.info(f"Batched decoding enabled with max_batch_size={self.max_batch_size}")
+
+    def _streaming_model(self) -> Llama:
+        """Return the model generating streams, loading it on first use when the pool generates."""
+        with self._load_lock:
+            if self._deferred_load is not None:
+                logger.info("Loading the full model in the serving process for streaming")
+                self._load_model(*self._deferred_load, batched=False)
+                self._deferred_load = None
+        return self.model
+
+    @staticmethod
+    def _model_run_key(context: Any, model_path: str) -> str:
+        """Identify the loaded model for response cache keys.
+
+        The run ID from the model config is used when present, otherwise
+        the model file's identity, so other weights never share entries.
+        """
+        run_id = (getattr(context, "model_config", None) or {}).get("run_id")
+        if run_id:
+            return str(run_id)
+        stat = Path(model_path).stat()
+        return f"{Path(model_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _start_pool(self, model_path: str) -> None:
+        """Start the worker processes, auto-tuning their split if requested."""
+        # Workers keep prefix caches in RAM only, a shared cache dir would race on its index
+        worker_kwargs = dict(
+            n_ctx=self.n_ctx,
+            n_gpu_layers=self.n_gpu_layers,
+            verbose=self.verbose,
+            max_batch_size=self.max_batch_size,
+            prefix_cache_bytes=self.prefix_cache_bytes,
+            prefix_cache_block_size=self.prefix_cache_block_size,
+            # Workers get their thread count and CPUs from the split
+            loading_profile=replace(self.loading_profile, n_threads=None, n_threads_batch=None, cpu_affinity=None)
+        )
+        if self.n_workers == "auto":
+            self.n_workers, self.threads_per_worker = autotune_split(
+                model_path, _CALIBRATION_PROMPTS, **worker_kwargs
+            )
+        if self.n_workers > 1:
+            self._pool = LlamaWorkerPool(
+                model_path, self.n_workers, self.threads_per_worker,
+                cpu_affinity=self.loading_profile.cpu_affinity, **worker_kwargs
+            )
+
+    def close(self) -> None:
+        """Stop worker processes, free the batched decoding context and
+        write pending prefix cache states."""
+        if self._prefix_cache is not None:
+            self._prefix_cache.close()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+
+    def prefix_cache_stats(self) -> Dict[str, int]:
+        """Return the counters of the prefix KV cache.
+
+        Returns:
+            Dict[str, int]: ``hits``, ``misses``, ``saved_tokens``,
+            ``entries`` and ``ram_bytes``; empty if the cache is disabled
+        """
+        if self._prefix_cache is None:
+            return {}
+        return self._prefix_cache.stats()
+
+    def response_cache_stats(self) -> Dict[str, int]:
+        """Return the counters of the response cache.
+
+        Returns:
+            Dict[str, int]: See ``ResponseCache.stats``; empty if the cache
+            is disabled
+        """
+        if self._response_cache is None:
+            return {}
+        return self._response_cache.stats()
+    
+    @staticmethod
+    def _extract_prompts(model_input: Union[pd.DataFrame, List[str]]) -> List[str]:
+        """Extract prompt strings from the model input.
+        
+        Args:
+            model_input: DataFrame with 'prompt' column or list of prompt strings
             
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            raise LlamaInferenceError(f"Failed to load model: {str(e)}")
+        Returns:
+            List[str]: Prompt strings
+            
+        Raises:
+            ValueError: If input format is invalid
+        """
+        if isinstance(model_input, pd.DataFrame):
+            if "prompt" not in model_input.columns:
+                raise ValueError(
+                    "Input DataFrame must contain a 'prompt' column"
+                )
+            prompts = model_input["prompt"].tolist()
+        else:
+            prompts = model_input
+            
+        if not isinstance(prompts, list):
+            raise ValueError(
+                "model_input must be DataFrame or list of strings"
+            )
+        return prompts
+    
+    @staticmethod
+    def _validate_params(max_tokens: int, temperature: float, top_p: float) -> None:
+        """Validate generation parameters.
+        
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if not (0.0 <= temperature <= 1.0):
+            raise ValueError("temperature must be between 0.0 and 1.0")
+        if not (0.0 <= top_p <= 1.0):
+            raise ValueError("top_p must be between 0.0 and 1.0")
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
     
     def predict(
         self,
@@ -91,6 +357,15 @@ class LlamaGGUFWrapper(PythonModel):
     ) -> List[str]:
         """Generate predictions using the GGUF model.
         
+        With ``max_batch_size`` greater than one, prompts are decoded
+        together in a shared context with the sampler settings of a serial
+        completion; results keep the input order.
+        The prefix KV cache applies to one-at-a-time generation only.
+        With ``n_workers`` greater than one, prompts are sharded across the
+        worker processes. With the response cache enabled, greedy
+        (temperature 0) prompts are answered from the cache and identical
+        prompts in flight are generated once.
+        
         Args:
             context: MLflow model context
             model_input: Input data, either DataFrame with 'prompt' column
@@ -112,58 +387,161 @@ class LlamaGGUFWrapper(PythonModel):
             if self.model is None:
                 raise LlamaInferenceError("Model not loaded")
                 
-            # Extract prompts from input
-            if isinstance(model_input, pd.DataFrame):
-                if "prompt" not in model_input.columns:
-                    raise ValueError(
-                        "Input DataFrame must contain a 'prompt' column"
-                    )
-                prompts = model_input["prompt"].tolist()
-            else:
-                prompts = model_input
-                
-            if not isinstance(prompts, list):
-                raise ValueError(
-                    "model_input must be DataFrame or list of strings"
-                )
-                
-            # Validate parameters
-            if not (0.0 <= temperature <= 1.0):
-                raise ValueError("temperature must be between 0.0 and 1.0")
-            if not (0.0 <= top_p <= 1.0):
-                raise ValueError("top_p must be between 0.0 and 1.0")
-            if max_tokens < 1:
-                raise ValueError("max_tokens must be positive")
-                
-            results = []
-            for i, prompt in enumerate(prompts):
-                try:
-                    logger.debug(f"Processing prompt {i+1}/{len(prompts)}")
-                    output = self.model(
-                        prompt,
-                        max_tokens=max_tokens,
-                        temperature=temperature,
-                        top_p=top_p,
-                        stop=stop,
-                        echo=echo
-                    )
-                    generated_text = output["choices"][0]["text"]
-                    results.append(generated_text)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process prompt {i+1}: {str(e)}")
-                    results.append(None)  # Maintain alignment with input
-                    
-            # Check if any generations failed
-            if any(result is None for result in results):
-                raise LlamaInferenceError(
-                    "Some prompts failed to generate. Check logs for details."
-                )
-                
-            return results
+            prompts = self._extract_prompts(model_input)
+            self._validate_params(max_tokens, temperature, top_p)
+            
+            params = dict(max_tokens=max_tokens, temperature=temperature, top_p=top_p, stop=stop, echo=echo)
+            PREDICT_PROMPTS.inc(len(prompts), method="predict")
+            with PREDICT_SECONDS.time(method="predict"), tracing.span("pyfunc.predict", prompts=len(prompts)):
+                if self._response_cache is not None and temperature <= 0.0:
+                    return self._predict_cached(prompts, params)
+                return self._generate(prompts, params)
             
         except Exception as e:
             if not isinstance(e, (LlamaInferenceError, ValueError)):
                 logger.error(f"Unexpected error during inference: {str(e)}")
                 raise LlamaInferenceError(f"Inference failed: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def _generate(self, prompts: List[str], params: Dict[str, Any]) -> List[str]:
+        """Generate completions through the pool, the batcher or one by one."""
+        if self._pool is not None:
+            return self._count_tokens(self._pool.predict(prompts, **params))
+        # Sampling falls back to the serial loop if the batcher cannot apply llama.cpp's default sampler
+        if self._batcher is not None and (params["temperature"] <= 0.0 or SAMPLES_LIKE_SERIAL):
+            return self._count_tokens(self._batcher.generate(prompts, **params))
+            
+        results = []
+        for i, prompt in enumerate(prompts):
+            try:
+                logger.debug(f"Processing prompt {i+1}/{len(prompts)}")
+                output = self.model(prompt, **params)
+                generated_text = output["choices"][0]["text"]
+                results.append(generated_text)
+                TOKENS_GENERATED.inc(output.get("usage", {}).get("completion_tokens", 0), method="predict")
+                
+            except Exception as e:
+                logger.error(f"Failed to process prompt {i+1}: {str(e)}")
+                results.append(None)  # Maintain alignment with input
+                
+        # Check if any generations failed
+        if any(result is None for result in results):
+            raise LlamaInferenceError(
+                "Some prompts failed to generate. Check logs for details."
+            )
+            
+        return results
+
+    def _count_tokens(self, texts: List[str]) -> List[str]:
+        """Count the tokens of completions generated without usage figures."""
+        if metrics.enabled():
+            TOKENS_GENERATED.inc(
+                sum(len(self.model.tokenize(text.encode("utf-8"), add_bos=False)) for text in texts),
+                method="predict"
+            )
+        return texts
+
+    def _predict_cached(self, prompts: List[str], params: Dict[str, Any]) -> List[str]:
+        """Answer greedy prompts from the response cache, generating the rest once."""
+        keys = [cache_key(self._run_key, dict(params, prompt=prompt)) for prompt in prompts]
+        futures = {}
+        owned = {}
+        for prompt, key in zip(prompts, keys):
+            if key not in futures:
+                owner, futures[key] = self._response_cache.begin(key)
+                if owner:
+                    owned[key] = prompt
+        if owned:
+            try:
+                texts = self._generate(list(owned.values()), params)
+            except BaseException as e:
+                for key in owned:
+                    self._response_cache.fail(key, e)
+                raise
+            for key, text in zip(owned, texts):
+                self._response_cache.finish(key, text)
+        return [futures[key].result() for key in keys]
+
+    def predict_stream(
+        self,
+        context: Dict[str, Any],
+        model_input: Union[pd.DataFrame, List[str]],
+        max_tokens: int = 128,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        stop: List[str] = ["</s>"],
+        echo: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream generated tokens as they are decoded.
+        
+        Prompts are generated one after another. Each chunk carries the
+        index of its prompt, the decoded text and timing metadata:
+        ``elapsed`` seconds since the prompt was submitted (time to first
+        token for the first chunk) and ``delta`` seconds since the previous
+        chunk. The last chunk of each prompt has a ``finish_reason``.
+        
+        Decoding runs lazily inside the generator, so closing it or
+        stopping iteration stops the model before the next token.
+        
+        Args:
+            context: MLflow model context
+            model_input: Input data, either DataFrame with 'prompt' column
+                or list of prompt strings
+            max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature (0.0 to 1.0)
+            top_p: Nucleus sampling threshold (0.0 to 1.0)
+            stop: List of strings that stop generation when encountered
+            echo: Whether to include the prompt in the output
+            
+        Yields:
+            Dict[str, Any]: Chunks with ``index``, ``text``,
+            ``finish_reason`` and ``timing``
+            
+        Raises:
+            LlamaInferenceError: If inference fails
+            ValueError: If input format is invalid
+        """
+        if self.model is None:
+            raise LlamaInferenceError("Model not loaded")
+        prompts = self._extract_prompts(model_input)
+        self._validate_params(max_tokens, temperature, top_p)
+        model = self._streaming_model()
+        PREDICT_PROMPTS.inc(len(prompts), method="stream")
+        
+        stream_started = time.perf_counter()
+        stream_started_ns = time.time_ns()
+        for i, prompt in enumerate(prompts):
+            logger.debug(f"Streaming prompt {i+1}/{len(prompts)}")
+            start = last = time.perf_counter()
+            stream = model(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                top_p=top_p,
+                stop=stop,
+                echo=echo,
+                stream=True
+            )
+            try:
+                for output in stream:
+                    now = time.perf_counter()
+                    choice = output["choices"][0]
+                    TOKENS_GENERATED.inc(method="stream")
+                    yield {
+                        "index": i,
+                        "text": choice["text"],
+                        "finish_reason": choice.get("finish_reason"),
+                        "timing": {"elapsed": now - start, "delta": now - last},
+                    }
+                    last = now
+            except GeneratorExit:
+                logger.debug(f"Stream of prompt {i+1} cancelled by consumer")
+                raise
+            except Exception as e:
+                logger.error(f"Failed to stream prompt {i+1}: {str(e)}")
+                raise LlamaInferenceError(f"Inference failed: {str(e)}")
+            finally:
+                stream.close()
+        PREDICT_SECONDS.observe(time.perf_counter() - stream_started, method="stream")
+        # A span cannot stay current across the yields of a generator
+        tracing.record("pyfunc.predict_stream", stream_started_ns, prompts=len(prompts))
@@ -0,0 +1,322 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import json
+import multiprocessing
+import os
+import time
+
+from loguru import logger
+
+
+# Key of the profile in the artifacts of a logged model
+PROFILE_ARTIFACT = "loading_profile"
+
+# llama.cpp ggml_numa_strategy values
+NUMA_STRATEGIES = {"disabled": 0, "distribute": 1, "isolate": 2, "numactl": 3, "mirror": 4}
+
+# Prompts generated from by the profile sweep
+_SWEEP_PROMPTS = [
+    "Summarize the following paragraph in one sentence.",
+    "Answer the question using the provided context.",
+    "Translate the text below into French.",
+    "List three key facts mentioned in the document.",
+]
+
+
+class LoadingProfileError(Exception):
+    """Custom exception for invalid loading profiles."""
+    pass
+
+
+@dataclass(frozen=True)
+class LoadingProfile:
+    """How a GGUF model is loaded and run on a host.
+
+    A profile is part of the logged model, either pickled with the
+    ``LlamaGGUFWrapper`` it was given to or as the ``loading_profile``
+    artifact logged by ``sweep-profile --log-model``, so ``mlflow models serve`` and
+    batch scoring load the model the same way.
+
+    Attributes:
+        use_mmap: Map the weights from the file instead of reading them
+            into private memory
+        use_mlock: Lock the weights in RAM so they are never paged out
+        numa: NUMA strategy of llama.cpp, one of ``NUMA_STRATEGIES``
+        cpu_affinity: CPUs the process is pinned to, None for all of them
+        n_threads: Threads generating tokens, None for the wrapper's
+            ``n_threads``
+        n_threads_batch: Threads evaluating prompts, None for ``n_threads``
+        n_batch: Tokens submitted per decode call while evaluating prompts
+        n_ubatch: Tokens computed at once, at most ``n_batch``. None for
+            llama.cpp's default of ``n_batch`` capped at 512.
+    """
+    use_mmap: bool = True
+    use_mlock: bool = False
+    numa: str = "disabled"
+    cpu_affinity: Optional[Tuple[int, ...]] = None
+    n_threads: Optional[int] = None
+    n_threads_batch: Optional[int] = None
+    n_batch: int = 512
+    n_ubatch: Optional[int] = None
+
+    def __post_init__(self):
+        if self.numa not in NUMA_STRATEGIES:
+            raise LoadingProfileError(f"numa must be one of {', '.join(NUMA_STRATEGIES)}, got {self.numa!r}")
+        for name in ("n_threads", "n_threads_batch", "n_batch", "n_ubatch"):
+            value = getattr(self, name)
+            if value is not None and value < 1:
+                raise LoadingProfileError(f"{name} must be at least 1")
+        if self.n_ubatch is not None and self.n_ubatch > self.n_batch:
+            raise LoadingProfileError("n_ubatch must not exceed n_batch")
+        if self.cpu_affinity is not None:
+            if not self.cpu_affinity or any(cpu < 0 for cpu in self.cpu_affinity):
+                raise LoadingProfileError("cpu_affinity must list CPU numbers")
+            # Lists read from JSON compare equal to the saved profile
+            object.__setattr__(self, "cpu_affinity", tuple(sorted(set(self.cpu_affinity))))
+
+    def llama_kwargs(self, n_threads: int) -> Dict[str, Any]:
+        """Return the ``Llama`` arguments of this profile.
+
+        Args:
+            n_threads: Threads used when the profile does not set them
+        """
+        n_threads = self.n_threads or n_threads
+        return {
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+            "numa": NUMA_STRATEGIES[self.numa],
+            "n_threads": n_threads,
+            "n_threads_batch": self.n_threads_batch or n_threads,
+            "n_batch": self.n_batch,
+            "n_ubatch": self.n_ubatch or min(self.n_batch, 512),
+        }
+
+    def pin(self) -> None:
+        """Pin the current process to ``cpu_affinity``, if set.
+
+        Threads llama.cpp starts afterwards inherit the affinity.
+        """
+        if self.cpu_affinity is None:
+            return
+        if not hasattr(os, "sched_setaffinity"):
+            logger.warning("CPU affinity is not supported on this platform, not pinning")
+            return
+        os.sched_setaffinity(0, self.cpu_affinity)
+        logger.info(f"Pinned process to CPUs {self.cpu_affinity}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LoadingProfile":
+        """Build a profile, rejecting unknown keys.
+
+        Raises:
+            LoadingProfileError: If a key or value is invalid
+        """
+        unknown = set(data) - {f.name for f in fields(cls)}
+        if unknown:
+            raise LoadingProfileError(f"Unknown loading profile keys: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Write the profile to ``path`` as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LoadingProfile":
+        """Read a profile written by ``save``."""
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    def describe(self) -> str:
+        """Return a short label listing the settings that differ from the defaults."""
+        default = LoadingProfile()
+        changed = [f"{f.name}={getattr(self, f.name)}" for f in fields(self)
+                   if getattr(self, f.name) != getattr(default, f.name)]
+        return ", ".join(changed) or "default"
+
+
+def numa_nodes() -> List[List[int]]:
+    """Return the CPUs of each NUMA node of this host, one list per node.
+
+    Hosts without NUMA information are reported as a single node.
+    """
+    nodes = []
+    for node in sorted(Path("/sys/devices/system/node").glob("node[0-9]*"), key=lambda p: int(p.name[4:])):
+        try:
+            cpulist = (node / "cpulist").read_text().strip()
+        except OSError:
+            continue
+        cpus = []
+        for part in filter(None, cpulist.split(",")):
+            first, _, last = part.partition("-")
+            cpus.extend(range(int(first), int(last or first) + 1))
+        if cpus:
+            nodes.append(cpus)
+    return nodes or [list(range(os.cpu_count() or 1))]
+
+
+def candidate_profiles(
+    n_threads: Optional[Sequence[int]] = None,
+    n_batch: Sequence[int] = (512, 2048),
+    n_ubatch: int = 512
+) -> List[LoadingProfile]:
+    """List the profiles worth comparing on this host.
+
+    Memory modes (mmap, mmap with mlock, read into RAM) are combined with
+    the batch sizes and thread counts. On hosts with several NUMA nodes
+    the ``distribute`` strategy and a profile pinned to the first node
+    with ``isolate`` are added.
+
+    Args:
+        n_threads: Thread counts to try, defaults to all CPUs
+        n_batch: Prompt batch sizes to try
+        n_ubatch: Upper bound of the physical batch size
+
+    Returns:
+        List[LoadingProfile]: Candidate profiles
+    """
+    nodes = numa_nodes()
+    n_threads = list(n_threads or [sum(len(cpus) for cpus in nodes)])
+    memory_modes = [dict(use_mmap=True), dict(use_mmap=True, use_mlock=True), dict(use_mmap=False)]
+    numa_modes = [dict(numa="disabled")]
+    if len(nodes) > 1:
+        numa_modes.append(dict(numa="distribute"))
+    candidates = []
+    for memory in memory_modes:
+        for numa in numa_modes:
+            for threads in n_threads:
+                for batch in n_batch:
+                    candidates.append(LoadingProfile(n_threads=threads, n_batch=batch,
+                                                     n_ubatch=min(n_ubatch, batch), **memory, **numa))
+    if len(nodes) > 1:
+        candidates += [LoadingProfile(numa="isolate", cpu_affinity=nodes[0], n_threads=len(nodes[0]),
+                                      n_batch=batch, n_ubatch=min(n_ubatch, batch)) for batch in n_batch]
+    return candidates
+
+
+@dataclass
+class ProfileResult:
+    """Measurements of one profile in a sweep.
+
+    Attributes:
+        profile: Measured profile
+        load_seconds: Seconds to load the model
+        tokens_per_second: Prompt and generated tokens processed per second
+        error: Error that prevented the measurement, e.g. mlock limits
+    """
+    profile: LoadingProfile
+    load_seconds: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"profile": self.profile.to_dict(), "load_seconds": self.load_seconds,
+                "tokens_per_second": self.tokens_per_second, "error": self.error}
+
+
+def _measure(model_path: str, profile: LoadingProfile, prompts: Sequence[str], max_tokens: int,
+             n_ctx: int) -> Dict[str, float]:
+    """Load the model with ``profile`` and time greedy generation, in a fresh process."""
+    from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+    wrapper = LlamaGGUFWrapper(n_ctx=n_ctx, verbose=False, loading_profile=profile)
+    start = time.perf_counter()
+    wrapper.load_context(SimpleNamespace(artifacts={"model_path": model_path}))
+    load_seconds = time.perf_counter() - start
+    # Warm up the threads and caches before timing
+    wrapper.model(prompts[0], max_tokens=1, temperature=0.0)
+    tokens = 0
+    start = time.perf_counter()
+    for prompt in prompts:
+        usage = wrapper.model(prompt, max_tokens=max_tokens, temperature=0.0)["usage"]
+        tokens += usage["prompt_tokens"] + usage["completion_tokens"]
+    return {"load_seconds": load_seconds, "tokens_per_second": tokens / (time.perf_counter() - start)}
+
+
+def sweep_profiles(
+    model_path: Union[str, Path],
+    profiles: Sequence[LoadingProfile],
+    prompts: Sequence[str] = _SWEEP_PROMPTS,
+    max_tokens: int = 16,
+    n_ctx: int = 2048
+) -> List[ProfileResult]:
+    """Measure load time and throughput of every profile on this host.
+
+    Each profile is measured in its own process, as NUMA initialization
+    and CPU affinity are process-wide and a fresh load shows the cost of
+    mlock or reading the weights.
+
+    Args:
+        model_path: Path of the GGUF file
+        profiles: Profiles to measure
+        prompts: Prompts generated from with greedy decoding
+        max_tokens: Tokens generated per prompt
+        n_ctx: Context window size
+
+    Returns:
+        List[ProfileResult]: One result per profile, in order
+    """
+    results = []
+    for profile in profiles:
+        # Fork would duplicate the parent's llama.cpp state and threads
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                measured = executor.submit(_measure, str(model_path), profile, list(prompts), max_tokens,
+                                           n_ctx).result()
+                result = ProfileResult(profile, **measured)
+                logger.info(f"Profile {profile.describe()}: loaded in {result.load_seconds:.2f}s, "
+                            f"{result.tokens_per_second:.1f} tokens/s")
+            except Exception as e:
+                result = ProfileResult(profile, error=str(e))
+                logger.warning(f"Profile {profile.describe()} failed: {str(e)}")
+        results.append(result)
+    return results
+
+
+def best_profile(results: Sequence[ProfileResult], objective: str = "throughput") -> ProfileResult:
+    """Pick the best measured profile.
+
+    Args:
+        results: Results of ``sweep_profiles``
+        objective: ``throughput`` for the most tokens per second, ``load``
+            for the fastest load
+
+    Returns:
+        ProfileResult: The best result
+
+    Raises:
+        LoadingProfileError: If no profile could be measured
+    """
+    measured = [r for r in results if r.error is None]
+    if not measured:
+        raise LoadingProfileError("No loading profile could be measured")
+    if objective == "throughput":
+        return max(measured, key=lambda r: r.tokens_per_second)
+    if objective == "load":
+        return min(measured, key=lambda r: r.load_seconds)
+    raise ValueError(f"Unknown objective {objective!r}")
+
+
+def model_artifacts(model_path: Union[str, Path], profile_path: Optional[Union[str, Path]] = None) -> Dict[str, str]:
+    """Build the ``artifacts`` of ``mlflow.pyfunc.log_model`` for a GGUF model.
+
+    Args:
+        model_path: GGUF file of the model
+        profile_path: Loading profile written by ``LoadingProfile.save``,
+            applied by ``LlamaGGUFWrapper.load_context`` when the model is
+            served or used for batch scoring
+
+    Returns:
+        Dict[str, str]: Artifact names mapped to local paths
+    """
+    artifacts = {"model_path": str(model_path)}
+    if profile_path is not None:
+        artifacts[PROFILE_ARTIFACT] = str(profile_path)
+    return artifacts
@@ -0,0 +1,320 @@
+from typing import Dict, List, Optional, Sequence, Set, Union
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import pickle  # noqa: S403
+import queue
+import threading
+
+import numpy as np
+from llama_cpp import Llama, LlamaState
+from llama_cpp.llama_cache import BaseLlamaCache
+from loguru import logger
+
+from serve.utils import metrics
+
+
+def block_hashes(tokens: Sequence[int], block_size: int) -> List[str]:
+    """Hash every complete block-aligned prefix of a token sequence.
+
+    The hash of block ``i`` chains the hash of block ``i - 1``, so equal
+    hashes mean equal token prefixes of length ``(i + 1) * block_size``.
+
+    Args:
+        tokens: Token ids
+        block_size: Number of tokens per block
+
+    Returns:
+        List[str]: One hex digest per complete block
+    """
+    hashes = []
+    previous = b""
+    for start in range(0, len(tokens) - block_size + 1, block_size):
+        block = np.asarray(tokens[start:start + block_size], dtype=np.int32).tobytes()
+        previous = hashlib.sha256(previous + block).digest()
+        hashes.append(previous.hex())
+    return hashes
+
+
+class PrefixKVCache(BaseLlamaCache):
+    """LRU cache of llama.cpp KV states looked up by token-prefix hash.
+
+    Each stored state is indexed under the chained hashes of the
+    block-aligned prefixes of the prompt it was generated from. A lookup
+    hashes the prompt the same way and returns the entry sharing the
+    longest block prefix, so prompts that start with the same system prompt
+    or instructions reuse its KV state and only the remaining tokens are
+    evaluated by ``Llama``. Completions of the same prompt share one entry,
+    the generated tokens are not indexed.
+
+    States are kept in RAM up to ``capacity_bytes``. With ``cache_dir``
+    set, new states are also written to disk by a background thread, up to
+    ``disk_bytes``, survive restarts and are loaded back into RAM on a hit
+    after eviction. States are only valid for the weights that produced
+    them, so each model gets its own ``namespace`` directory.
+
+    Attributes:
+        capacity_bytes: RAM budget for cached states
+        block_size: Token granularity of prefix matching
+        cache_dir: Optional directory persisting states, including the namespace
+        disk_bytes: Disk budget for persisted states
+        hits: Number of lookups that found a cached prefix
+        misses: Number of lookups without a cached prefix
+        saved_tokens: Prompt tokens covered by cached states on hits
+    """
+
+    def __init__(
+        self,
+        capacity_bytes: int = (2 << 30),
+        block_size: int = 32,
+        cache_dir: Optional[Union[str, Path]] = None,
+        disk_bytes: int = (8 << 30),
+        namespace: Optional[str] = None,
+        max_pending_writes: int = 16
+    ):
+        """Initialize the cache, loading the disk index if present.
+
+        Args:
+            capacity_bytes: RAM budget for cached states
+            block_size: Token granularity of prefix matching
+            cache_dir: Optional directory persisting states across restarts
+            disk_bytes: Disk budget for persisted states, least recently
+                used files are deleted beyond it
+            namespace: Subdirectory of ``cache_dir`` for the states of one
+                model, e.g. derived from its run ID
+            max_pending_writes: States queued for the disk writer. New
+                states stay in RAM only while the queue is full.
+        """
+        super().__init__(capacity_bytes)
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        if disk_bytes < 0:
+            raise ValueError("disk_bytes must not be negative")
+        self.block_size = block_size
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None and namespace:
+            self.cache_dir = self.cache_dir / namespace
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._ram: "OrderedDict[str, LlamaState]" = OrderedDict()
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._pending: Dict[str, LlamaState] = {}
+        self._blocks: Dict[str, List[str]] = {}
+        self._index: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        # Prompt of the last lookup of each thread, as Llama stores the
+        # state under the prompt and completion tokens
+        self._prompts = threading.local()
+        self._writes: "Optional[queue.Queue[Optional[str]]]" = None
+        self._writer = None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+            self._writes = queue.Queue(maxsize=max_pending_writes)
+            self._writer = threading.Thread(target=self._write_loop, args=(self._writes,),
+                                            name="prefix-cache-writer", daemon=True)
+            self._writer.start()
+        metrics.track_cache("prefix_kv", self)
+
+    @property
+    def cache_size(self) -> int:
+        """Bytes of KV state held in RAM."""
+        return sum(state.llama_state_size for state in self._ram.values())
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and occupancy.
+
+        Returns:
+            Dict[str, int]: ``hits``, ``misses``, ``saved_tokens``,
+            ``entries``, ``ram_bytes`` and ``disk_bytes``
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "saved_tokens": self.saved_tokens,
+            "entries": len(self._blocks),
+            "ram_bytes": self.cache_size,
+            "disk_bytes": sum(self._disk.values()),
+        }
+
+    def _disk_index_path(self) -> Path:
+        return self.cache_dir / "index.json"
+
+    def _state_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.state"
+
+    def _load_disk_index(self) -> None:
+        """Register states persisted by a previous process and delete stray files."""
+        index_path = self._disk_index_path()
+        persisted = {}
+        if index_path.exists():
+            try:
+                with open(index_path, "r") as f:
+                    persisted = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable prefix cache index {index_path}: {str(e)}")
+        # Entries are listed from least to most recently used
+        for key, entry in persisted.items():
+            if self._state_path(key).exists():
+                self._register(key, entry["hashes"])
+                self._disk[key] = entry["bytes"]
+        for path in self.cache_dir.iterdir():
+            if path.suffix in (".state", ".tmp") and path.stem not in self._disk:
+                path.unlink()
+        self._trim_disk()
+        logger.info(f"Loaded {len(self._blocks)} prefix cache entries from {self.cache_dir}")
+
+    def _save_disk_index(self) -> None:
+        """Atomically persist the block hashes and sizes of all disk entries."""
+        with self._lock:
+            persisted = {key: {"hashes": self._blocks[key], "bytes": size} for key, size in self._disk.items()}
+        tmp_path = self._disk_index_path().with_name("index.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(persisted, f)
+        os.replace(tmp_path, self._disk_index_path())
+
+    def _write_loop(self, writes: "queue.Queue[Optional[str]]") -> None:
+        """Write queued states to disk, saving the index once the queue is drained."""
+        while True:
+            key = writes.get()
+            try:
+                if key is not None:
+                    with self._lock:
+                        state = self._pending.get(key)
+                    if state is not None:
+                        self._write_state(key, state)
+                if key is None or writes.qsize() == 0:
+                    self._save_disk_index()
+            except Exception as e:
+                logger.warning(f"Failed to persist prefix cache entry {key}: {str(e)}")
+            finally:
+                writes.task_done()
+            if key is None:
+                return
+
+    def _write_state(self, key: str, state: LlamaState) -> None:
+        path = self._state_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._pending.pop(key, None)
+            if key not in self._blocks:
+                # Evicted while it was written
+                path.unlink()
+                return
+            self._disk[key] = path.stat().st_size
+            self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        """Delete least recently used state files until the disk fits the budget."""
+        while self._disk and sum(self._disk.values()) > self.disk_bytes:
+            key, _ = self._disk.popitem(last=False)
+            self._state_path(key).unlink(missing_ok=True)
+            if key not in self._ram:
+                self._forget(key)
+
+    def flush(self) -> None:
+        """Wait until queued states are written to disk."""
+        writes = self._writes
+        if writes is not None:
+            writes.join()
+
+    def close(self) -> None:
+        """Write queued states and stop the disk writer.
+
+        States stored afterwards are kept in RAM only.
+        """
+        with self._lock:
+            writes, self._writes = self._writes, None
+        if writes is not None:
+            writes.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _register(self, key: str, hashes: List[str]) -> None:
+        self._blocks[key] = hashes
+        for block_hash in hashes:
+            self._index.setdefault(block_hash, set()).add(key)
+
+    def _forget(self, key: str) -> None:
+        for block_hash in self._blocks.pop(key, []):
+            keys = self._index.get(block_hash)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[block_hash]
+
+    def _find_entry(self, tokens: Sequence[int]) -> Optional[str]:
+        """Find the entry sharing the longest block prefix with ``tokens``."""
+        for block_hash in reversed(block_hashes(tokens, self.block_size)):
+            keys = self._index.get(block_hash)
+            if keys:
+                in_ram = [k for k in keys if k in self._ram]
+                return in_ram[0] if in_ram else next(iter(keys))
+        return None
+
+    def _evict(self) -> None:
+        """Drop least recently used states until RAM fits the budget."""
+        while self._ram and self.cache_size > self.capacity_bytes:
+            key, _ = self._ram.popitem(last=False)
+            if key not in self._disk and key not in self._pending:
+                self._forget(key)
+
+    def __contains__(self, key: Sequence[int]) -> bool:
+        return self._find_entry(key) is not None
+
+    def __getitem__(self, key: Sequence[int]) -> LlamaState:
+        self._prompts.tokens = list(key)
+        with self._lock:
+            entry = self._find_entry(key)
+            if entry is None:
+                self.misses += 1
+                raise KeyError("Key not found")
+            state = self._ram.get(entry)
+            if state is None:
+                state = self._pending.get(entry)
+            if state is None:
+                with open(self._state_path(entry), "rb") as f:
+                    state = pickle.load(f)  # noqa: S301
+            self._ram[entry] = state
+            self._ram.move_to_end(entry)
+            if entry in self._disk:
+                self._disk.move_to_end(entry)
+            self._evict()
+            self.hits += 1
+            self.saved_tokens += Llama.longest_token_prefix(
+                state.input_ids[:state.n_tokens].tolist(), list(key)
+            )
+            return state
+
+    def __setitem__(self, key: Sequence[int], value: LlamaState) -> None:
+        # Index the prompt only, the state also holds the generated tokens
+        prompt = getattr(self._prompts, "tokens", None)
+        if prompt is not None and list(key[:len(prompt)]) == prompt:
+            key = prompt
+        hashes = block_hashes(key, self.block_size)
+        if not hashes:
+            return
+        # The last chained hash identifies the block-aligned prompt prefix
+        entry = hashes[-1]
+        with self._lock:
+            known = entry in self._blocks
+            if not known:
+                self._register(entry, hashes)
+            self._ram[entry] = value
+            self._ram.move_to_end(entry)
+            persist = (self._writes is not None and entry not in self._disk
+                       and entry not in self._pending)
+            if persist:
+                try:
+                    self._writes.put_nowait(entry)
+                    self._pending[entry] = value
+                except queue.Full:
+                    logger.debug(f"Prefix cache writer busy, keeping entry {entry} in RAM only")
+            self._evict()
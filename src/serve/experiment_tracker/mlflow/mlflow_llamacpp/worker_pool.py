@@ -0,0 +1,231 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from types import SimpleNamespace
+import math
+import multiprocessing
+import os
+import time
+
+from loguru import logger
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.loading_profile import LoadingProfile
+from serve.utils import metrics, tracing
+
+
+# Wrapper loaded by the initializer of each worker process
+_worker_model = None
+
+# Exporters configured for the serving process, which also reports the work
+# of its workers. A worker exporting too would fail to bind the metrics port.
+_EXPORTER_ENV = [metrics.PORT_ENV, metrics.TEXTFILE_ENV, metrics.INTERVAL_ENV,
+                 tracing.FILE_ENV, tracing.ENDPOINT_ENV, tracing.TIMELINE_ENV, tracing.TRACEPARENT_ENV]
+
+
+def split_cpus(cpus: Sequence[int], n_workers: int) -> List[Tuple[int, ...]]:
+    """Split CPUs into one contiguous set per worker.
+
+    Workers get sets differing by at most one CPU. With fewer CPUs than
+    workers, each worker gets a single CPU shared round-robin.
+
+    Args:
+        cpus: CPUs available to the workers
+        n_workers: Number of worker processes
+
+    Returns:
+        List[Tuple[int, ...]]: CPU set of each worker
+    """
+    cpus = sorted(cpus)
+    if len(cpus) < n_workers:
+        return [(cpus[i % len(cpus)],) for i in range(n_workers)]
+    size, extra = divmod(len(cpus), n_workers)
+    sets, start = [], 0
+    for i in range(n_workers):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(tuple(cpus[start:end]))
+        start = end
+    return sets
+
+
+def _init_worker(model_path: str, wrapper_kwargs: Dict[str, Any],
+                 cpu_sets: Optional[List[Tuple[int, ...]]] = None, started: Any = None) -> None:
+    """Load the model once per worker process.
+
+    Llama mmaps the GGUF by default, so the weights are shared between all
+    workers through the page cache instead of being copied per process.
+    With ``cpu_sets``, each worker pins itself to the next set, counted by
+    the shared ``started`` value.
+    """
+    global _worker_model
+    for name in _EXPORTER_ENV:
+        os.environ.pop(name, None)
+    from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+    if cpu_sets:
+        with started.get_lock():
+            index = started.value
+            started.value += 1
+        profile = wrapper_kwargs.get("loading_profile") or LoadingProfile()
+        wrapper_kwargs = dict(wrapper_kwargs,
+                              loading_profile=replace(profile, cpu_affinity=cpu_sets[index % len(cpu_sets)]))
+
+    _worker_model = LlamaGGUFWrapper(**wrapper_kwargs)
+    _worker_model.load_context(SimpleNamespace(artifacts={"model_path": model_path}))
+
+
+def _predict_shard(prompts: List[str], predict_kwargs: Dict[str, Any]) -> List[str]:
+    """Generate completions for one shard of prompts in a worker."""
+    return _worker_model.predict(None, prompts, **predict_kwargs)
+
+
+class LlamaWorkerPool:
+    """Pool of processes each holding its own Llama instance.
+
+    Prompts are split into shards that are scored by the workers in
+    parallel; results are reassembled in input order. A single Llama stops
+    scaling well beyond a handful of threads, so on large machines several
+    smaller instances sharing the mmapped weights give more throughput.
+
+    Attributes:
+        model_path: Path of the GGUF file
+        n_workers: Number of worker processes
+        threads_per_worker: CPU threads used by each worker
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        n_workers: int,
+        threads_per_worker: int,
+        cpu_affinity: Optional[Sequence[int]] = None,
+        **wrapper_kwargs: Any
+    ):
+        """Start the worker processes.
+
+        Args:
+            model_path: Path of the GGUF file
+            n_workers: Number of worker processes
+            threads_per_worker: CPU threads used by each worker
+            cpu_affinity: CPUs split between the workers, see ``split_cpus``.
+                None leaves the workers on the CPUs of this process.
+            **wrapper_kwargs: Further ``LlamaGGUFWrapper`` arguments for
+                the workers, e.g. ``n_ctx`` or ``max_batch_size``
+        """
+        if n_workers < 1:
+            raise ValueError("n_workers must be at least 1")
+        if threads_per_worker < 1:
+            raise ValueError("threads_per_worker must be at least 1")
+        self.model_path = model_path
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker
+        wrapper_kwargs = dict(wrapper_kwargs, n_threads=threads_per_worker, n_workers=1)
+        cpu_sets = split_cpus(cpu_affinity, n_workers) if cpu_affinity else None
+        # Fork would duplicate the parent's llama.cpp state and threads
+        context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_path, wrapper_kwargs, cpu_sets, context.Value("i", 0))
+        )
+        logger.info(
+            f"Started {n_workers} workers with {threads_per_worker} threads each for {model_path}"
+        )
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "LlamaWorkerPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _shards(self, prompts: Sequence[str]) -> List[List[str]]:
+        """Split prompts into contiguous shards, several per worker to
+        balance prompts of uneven length."""
+        shard_size = max(1, math.ceil(len(prompts) / (self.n_workers * 4)))
+        return [list(prompts[i:i + shard_size]) for i in range(0, len(prompts), shard_size)]
+
+    def predict(self, prompts: Sequence[str], **predict_kwargs: Any) -> List[str]:
+        """Generate completions for all prompts across the workers.
+
+        Args:
+            prompts: Prompt strings
+            **predict_kwargs: Generation arguments of ``LlamaGGUFWrapper.predict``
+
+        Returns:
+            List[str]: Generated text, in the order of ``prompts``
+        """
+        shards = self._shards(prompts)
+        results: List[str] = []
+        for shard_results in self._executor.map(
+            _predict_shard, shards, [predict_kwargs] * len(shards)
+        ):
+            results.extend(shard_results)
+        return results
+
+    def warmup(self) -> None:
+        """Make sure every worker has loaded its model."""
+        list(self._executor.map(_predict_shard, [["warmup"]] * self.n_workers,
+                                [{"max_tokens": 1, "temperature": 0.0}] * self.n_workers))
+
+
+def candidate_splits(total_threads: int) -> List[Tuple[int, int]]:
+    """List ``(n_workers, threads_per_worker)`` splits of a thread budget.
+
+    Args:
+        total_threads: Number of CPU threads to distribute
+
+    Returns:
+        List[Tuple[int, int]]: Splits using powers of two as worker counts
+    """
+    splits = []
+    n_workers = 1
+    while n_workers <= total_threads:
+        splits.append((n_workers, total_threads // n_workers))
+        n_workers *= 2
+    return splits
+
+
+def autotune_split(
+    model_path: str,
+    calibration_prompts: Sequence[str],
+    total_threads: Optional[int] = None,
+    candidates: Optional[Sequence[Tuple[int, int]]] = None,
+    max_tokens: int = 16,
+    **wrapper_kwargs: Any
+) -> Tuple[int, int]:
+    """Pick the worker/thread split with the highest calibration throughput.
+
+    Each candidate pool is started, warmed up and timed on the calibration
+    prompts with greedy decoding.
+
+    Args:
+        model_path: Path of the GGUF file
+        calibration_prompts: Prompts scored for every candidate
+        total_threads: Thread budget, defaults to the number of CPUs
+        candidates: Splits to try, defaults to ``candidate_splits(total_threads)``
+        max_tokens: Tokens generated per calibration prompt
+        **wrapper_kwargs: Further ``LlamaGGUFWrapper`` arguments for the workers
+
+    Returns:
+        Tuple[int, int]: Best ``(n_workers, threads_per_worker)``
+    """
+    total_threads = total_threads or os.cpu_count() or 1
+    candidates = list(candidates or candidate_splits(total_threads))
+    best, best_rate = candidates[0], -1.0
+    for n_workers, threads_per_worker in candidates:
+        # Every worker needs at least one prompt for a fair measurement
+        prompts = list(calibration_prompts) * max(1, math.ceil(n_workers / len(calibration_prompts)))
+        with LlamaWorkerPool(model_path, n_workers, threads_per_worker, **wrapper_kwargs) as pool:
+            pool.warmup()
+            start = time.perf_counter()
+            pool.predict(prompts, max_tokens=max_tokens, temperature=0.0)
+            rate = len(prompts) / (time.perf_counter() - start)
+        logger.info(f"Calibration: {n_workers} workers x {threads_per_worker} threads, {rate:.2f} prompts/s")
+        if rate > best_rate:
+            best, best_rate = (n_workers, threads_per_worker), rate
+    logger.info(f"Selected {best[0]} workers x {best[1]} threads")
+    return best
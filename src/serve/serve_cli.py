@@ -1,5 +1,6 @@
 import click
-from serve import clis  
+from serve import COMMANDS
+from serve._cli import LazyGroup
 
 
 def get_command_help(command, indent=0, max_depth=None, is_last=False):
@@ -42,24 +43,47 @@ def show_tree_help(ctx, param, value):
     depth = None if value is True else int(value) - 1
     help_text = "serve-cmd CLI\n\n-- Available Commands --\n"
     
-    # Get list of top-level commands for last-item check
-    commands = list(clis)
+    # Get list of top-level commands for last-item check, importing all of them
+    group = ctx.command
+    commands = [group.get_command(ctx, name) for name in group.list_commands(ctx)]
     for i, c in enumerate(commands):
         help_text += get_command_help(c, max_depth=depth, is_last=(i == len(commands) - 1))
     
     click.echo(help_text.strip())
     ctx.exit()
 
-@click.group(context_settings={"help_option_names": ["-h", "--help"]})
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS, context_settings={"help_option_names": ["-h", "--help"]})
 @click.option('--help-tree', '-H', is_flag=False, is_eager=True, 
               callback=show_tree_help, flag_value=True, type=click.UNPROCESSED,
               help='Show hierarchical help. Optional: specify depth (e.g., --help-tree 2)')
-def cli(help_tree=None):
+@click.option('--metrics-port', type=int, envvar='SERVE_METRICS_PORT',
+              help='Serve Prometheus metrics on this local port (/metrics)')
+@click.option('--metrics-textfile', type=click.Path(dir_okay=False), envvar='SERVE_METRICS_TEXTFILE',
+              help='Write Prometheus metrics to this file for the node_exporter textfile collector')
+@click.option('--trace-file', type=click.Path(dir_okay=False), envvar='SERVE_TRACE_FILE',
+              help='Append tracing spans of this run to this file as OTLP/JSON')
+@click.option('--trace-endpoint', envvar='SERVE_TRACE_ENDPOINT',
+              help='Send tracing spans to this OTLP/HTTP collector (e.g. http://localhost:4318)')
+@click.option('--trace-timeline', type=click.Path(dir_okay=False, allow_dash=True), envvar='SERVE_TRACE_TIMELINE',
+              help='Append a flame-style timeline of this run to this file, - to log it')
+@click.pass_context
+def cli(ctx, help_tree=None, metrics_port=None, metrics_textfile=None,
+        trace_file=None, trace_endpoint=None, trace_timeline=None):
     """serve-cmd CLI"""
-    pass
+    # Imported here to keep them out of the CLI startup
+    if metrics_port is not None or metrics_textfile:
+        from serve.utils import metrics
+
+        metrics.enable(port=metrics_port, textfile=metrics_textfile)
+        ctx.call_on_close(metrics.disable)
+    if trace_file or trace_endpoint or trace_timeline:
+        from serve.utils import tracing
+
+        tracing.enable(file=trace_file, endpoint=trace_endpoint, timeline=trace_timeline)
+        ctx.call_on_close(tracing.disable)
+        # The whole run is one trace, exported when the command returns
+        ctx.with_resource(tracing.span(f"serve-cmd {ctx.invoked_subcommand}"))
 
 def main():
-    # Add commands and run CLI
-    for c in clis:
-        cli.add_command(c)
+    # Subcommands are imported by LazyGroup when they run
     cli()
\ No newline at end of file
@@ -0,0 +1,48 @@
+from pathlib import Path
+from typing import Union
+
+from .base import BackendError, ContainerBackend, ContainerSpec
+from .docker_api import DockerEngineBackend
+from .fake import FakeBackend
+from .local import LocalProcessBackend
+from .task import TaskCLIBackend
+
+BACKENDS = ["task", "docker", "local", "fake"]
+
+
+def get_backend(name: str, taskfile_dir: Union[str, Path], state_dir: Union[str, Path]) -> ContainerBackend:
+    """Create a backend by name.
+
+    Args:
+        name: One of ``BACKENDS``
+        taskfile_dir: Taskfile directory used by the ``task`` backend
+        state_dir: Directory for pid and log files of the ``local`` backend
+
+    Returns:
+        ContainerBackend: The backend
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    if name == "task":
+        return TaskCLIBackend(taskfile_dir)
+    if name == "docker":
+        return DockerEngineBackend()
+    if name == "local":
+        return LocalProcessBackend(state_dir)
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown backend {name}, expected one of {BACKENDS}")
+
+
+__all__ = [
+    "BACKENDS",
+    "BackendError",
+    "ContainerBackend",
+    "ContainerSpec",
+    "DockerEngineBackend",
+    "FakeBackend",
+    "LocalProcessBackend",
+    "TaskCLIBackend",
+    "get_backend",
+]
@@ -0,0 +1,81 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BackendError(Exception):
+    """Custom exception for container backend errors."""
+    pass
+
+
+class ContainerSpec(BaseModel):
+    """Everything a backend needs to run one model server.
+
+    Each backend uses the fields that apply to it: container backends the
+    image, command, ports and volumes; the local backend ``local_command``
+    and ``workdir``; the Task backend ``task_vars``.
+
+    Attributes:
+        name: Unique container or process name
+        image: Image to run
+        command: Arguments passed to the image entrypoint
+        ports: Host ports mapped to container ports
+        volumes: Host paths mounted at container paths
+        env: Environment variables
+        build_context: Directory with a Dockerfile to build ``image`` from
+            when it does not exist
+        local_command: Command running the server directly on the host
+        workdir: Working directory of ``local_command``
+        task_vars: Variables passed to the Taskfile tasks
+        health_url: URL answering once the server is ready
+    """
+    name: str
+    image: str = ""
+    command: List[str] = Field(default_factory=list)
+    ports: Dict[int, int] = Field(default_factory=dict)
+    volumes: Dict[str, str] = Field(default_factory=dict)
+    env: Dict[str, str] = Field(default_factory=dict)
+    build_context: Optional[Path] = None
+    local_command: Optional[List[str]] = None
+    workdir: Optional[Path] = None
+    task_vars: Dict[str, Any] = Field(default_factory=dict)
+    health_url: Optional[str] = None
+
+
+class ContainerBackend(ABC):
+    """Lifecycle operations on model server containers.
+
+    ``serve`` is idempotent: it starts a stopped container, creates a
+    missing one and leaves a running one alone. ``stop`` and ``delete`` on
+    an unknown container are no-ops.
+    """
+
+    @abstractmethod
+    def serve(self, spec: ContainerSpec) -> None:
+        """Make sure the server described by ``spec`` is running."""
+
+    @abstractmethod
+    def stop(self, spec: ContainerSpec) -> None:
+        """Stop the server, keeping it around for a fast restart."""
+
+    @abstractmethod
+    def delete(self, spec: ContainerSpec) -> None:
+        """Stop and remove the server."""
+
+    @abstractmethod
+    def status(self, spec: ContainerSpec) -> Optional[str]:
+        """Return ``"running"``, another backend specific state such as
+        ``"exited"``, or None if the server does not exist."""
+
+    def build(self, spec: ContainerSpec) -> bool:
+        """Build or pull the image of ``spec`` ahead of ``serve`` if it is
+        missing. Returns whether anything was built; backends without
+        images build nothing."""
+        return False
+
+    def events(self, spec: ContainerSpec, until: float) -> Optional[Iterator[dict]]:
+        """Stream state change events of the server until the UNIX time
+        ``until``, or return None if the backend has no event source."""
+        return None
@@ -0,0 +1,253 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from urllib.parse import quote, urlencode
+import http.client
+import io
+import json
+import socket
+import tarfile
+import time
+
+from loguru import logger
+
+from serve.servers.backends.base import BackendError, ContainerBackend, ContainerSpec
+
+
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def _split_image(image: str) -> Tuple[str, str]:
+    """Split an image reference into repository and tag."""
+    repository, _, tag = image.rpartition(":")
+    if not repository or "/" in tag:
+        return image, "latest"
+    return repository, tag
+
+
+def _tar_context(context: Path) -> bytes:
+    """Pack a build context directory into an in-memory tar archive."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        tar.add(str(context), arcname=".")
+    return buffer.getvalue()
+
+
+class _EventStream:
+    """Iterator over a streamed ``/events`` response.
+
+    ``close`` may be called from another thread to end the iteration.
+    """
+
+    def __init__(self, socket_path: str, path: str, timeout: float):
+        self._conn = _UnixHTTPConnection(socket_path, timeout)
+        self._path = path
+        self._response = None
+        self._closed = False
+
+    def __iter__(self) -> Iterator[dict]:
+        if self._closed:
+            return
+        try:
+            self._conn.request("GET", self._path)
+            self._response = self._conn.getresponse()
+            if self._response.status != 200:
+                return
+            for line in self._response:
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, ValueError, AttributeError) as e:
+            logger.debug(f"Docker event stream closed: {str(e)}")
+        finally:
+            self._conn.close()
+
+    def close(self) -> None:
+        self._closed = True
+        if self._conn.sock is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class DockerEngineBackend(ContainerBackend):
+    """Backend talking to the Docker Engine API over its unix socket.
+
+    Each operation is one or two HTTP requests to the daemon, without the
+    ``task``, shell and ``docker`` CLI processes of the Task backend.
+
+    Attributes:
+        socket_path: Path of the Docker daemon socket
+        timeout: Socket timeout in seconds for regular requests
+        build_timeout: Socket timeout in seconds for image pulls and builds
+    """
+
+    def __init__(
+        self,
+        socket_path: Union[str, Path] = DEFAULT_DOCKER_SOCKET,
+        timeout: float = 30.0,
+        build_timeout: float = 1800.0
+    ):
+        """Initialize the backend.
+
+        Args:
+            socket_path: Path of the Docker daemon socket
+            timeout: Socket timeout in seconds for regular requests
+            build_timeout: Socket timeout in seconds for image pulls and builds
+        """
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.build_timeout = build_timeout
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Union[dict, bytes]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> Tuple[int, bytes]:
+        """Send one request to the daemon.
+
+        Returns:
+            Tuple[int, bytes]: Status code and response body
+
+        Raises:
+            BackendError: If the daemon is unreachable
+        """
+        headers = dict(headers or {})
+        if isinstance(body, dict):
+            body = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        conn = _UnixHTTPConnection(self.socket_path, timeout or self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except OSError as e:
+            raise BackendError(f"Docker daemon unreachable at {self.socket_path}: {str(e)}")
+        finally:
+            conn.close()
+
+    def _check(self, status: int, data: bytes, action: str, allowed: Tuple[int, ...] = ()) -> None:
+        """Raise a BackendError for unexpected error responses."""
+        if status >= 400 and status not in allowed:
+            try:
+                message = json.loads(data).get("message", data.decode())
+            except ValueError:
+                message = data.decode(errors="replace")
+            raise BackendError(f"Failed to {action}: {status} {message}")
+
+    @staticmethod
+    def _check_stream(data: bytes, action: str) -> None:
+        """Raise a BackendError if a streamed pull/build reported an error."""
+        for line in data.splitlines():
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in message:
+                raise BackendError(f"Failed to {action}: {message['error']}")
+
+    def _inspect(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the container description, or None if it does not exist."""
+        status, data = self._request("GET", f"/containers/{quote(name)}/json")
+        if status == 404:
+            return None
+        self._check(status, data, f"inspect {name}")
+        return json.loads(data)
+
+    def _ensure_image(self, spec: ContainerSpec) -> bool:
+        """Build or pull the image of ``spec`` if it is missing.
+
+        Returns:
+            bool: False if the image already existed
+        """
+        status, _ = self._request("GET", f"/images/{quote(spec.image)}/json")
+        if status == 200:
+            logger.info(f"Reusing image {spec.image}")
+            return False
+        if spec.build_context is not None:
+            logger.info(f"Building image {spec.image} from {spec.build_context}")
+            status, data = self._request(
+                "POST", f"/build?{urlencode({'t': spec.image})}",
+                body=_tar_context(Path(spec.build_context)),
+                headers={"Content-Type": "application/x-tar"},
+                timeout=self.build_timeout
+            )
+            self._check(status, data, f"build {spec.image}")
+            self._check_stream(data, f"build {spec.image}")
+        else:
+            repository, tag = _split_image(spec.image)
+            logger.info(f"Pulling image {spec.image}")
+            status, data = self._request(
+                "POST", f"/images/create?{urlencode({'fromImage': repository, 'tag': tag})}",
+                timeout=self.build_timeout
+            )
+            self._check(status, data, f"pull {spec.image}")
+            self._check_stream(data, f"pull {spec.image}")
+        return True
+
+    def _create(self, spec: ContainerSpec) -> None:
+        """Create the container described by ``spec``."""
+        config: Dict[str, Any] = {
+            "Image": spec.image,
+            "Env": [f"{key}={value}" for key, value in spec.env.items()],
+            "ExposedPorts": {f"{port}/tcp": {} for port in spec.ports.values()},
+            "HostConfig": {
+                "PortBindings": {
+                    f"{container_port}/tcp": [{"HostPort": str(host_port)}]
+                    for host_port, container_port in spec.ports.items()
+                },
+                "Binds": [f"{host}:{container}" for host, container in spec.volumes.items()],
+            },
+        }
+        if spec.command:
+            config["Cmd"] = spec.command
+        status, data = self._request("POST", f"/containers/create?{urlencode({'name': spec.name})}", body=config)
+        self._check(status, data, f"create {spec.name}")
+
+    def serve(self, spec: ContainerSpec) -> None:
+        container = self._inspect(spec.name)
+        if container is not None and container["State"]["Status"] == "running":
+            logger.info(f"{spec.name} is already running")
+            return
+        if container is None:
+            self._ensure_image(spec)
+            self._create(spec)
+        status, data = self._request("POST", f"/containers/{quote(spec.name)}/start")
+        self._check(status, data, f"start {spec.name}")
+        logger.info(f"Started {spec.name}")
+
+    def build(self, spec: ContainerSpec) -> bool:
+        return self._ensure_image(spec)
+
+    def stop(self, spec: ContainerSpec) -> None:
+        status, data = self._request("POST", f"/containers/{quote(spec.name)}/stop")
+        self._check(status, data, f"stop {spec.name}", allowed=(404,))
+
+    def delete(self, spec: ContainerSpec) -> None:
+        status, data = self._request("DELETE", f"/containers/{quote(spec.name)}?force=true")
+        self._check(status, data, f"delete {spec.name}", allowed=(404,))
+
+    def status(self, spec: ContainerSpec) -> Optional[str]:
+        container = self._inspect(spec.name)
+        return None if container is None else container["State"]["Status"]
+
+    def events(self, spec: ContainerSpec, until: float) -> Optional[Iterator[dict]]:
+        filters = json.dumps({"container": [spec.name], "type": ["container"]})
+        query = urlencode({"filters": filters, "since": int(time.time()), "until": int(until) + 1})
+        return _EventStream(self.socket_path, f"/events?{query}", timeout=max(1.0, until - time.time() + 5))
@@ -0,0 +1,49 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from serve.servers.backends.base import ContainerBackend, ContainerSpec
+
+
+class FakeBackend(ContainerBackend):
+    """In-memory backend for tests.
+
+    Tracks container states the way Docker would and records every call.
+
+    Attributes:
+        containers: Container names mapped to their state
+        specs: Container names mapped to the spec they were created with
+        calls: ``(operation, name)`` tuples in call order
+        images: Images built so far
+    """
+
+    def __init__(self):
+        self.images: Set[str] = set()
+        self.containers: Dict[str, str] = {}
+        self.specs: Dict[str, ContainerSpec] = {}
+        self.calls: List[Tuple[str, str]] = []
+
+    def build(self, spec: ContainerSpec) -> bool:
+        self.calls.append(("build", spec.image))
+        if spec.image in self.images:
+            return False
+        self.images.add(spec.image)
+        return True
+
+    def serve(self, spec: ContainerSpec) -> None:
+        self.calls.append(("serve", spec.name))
+        self.specs.setdefault(spec.name, spec)
+        if spec.image:
+            self.images.add(spec.image)
+        self.containers[spec.name] = "running"
+
+    def stop(self, spec: ContainerSpec) -> None:
+        self.calls.append(("stop", spec.name))
+        if spec.name in self.containers:
+            self.containers[spec.name] = "exited"
+
+    def delete(self, spec: ContainerSpec) -> None:
+        self.calls.append(("delete", spec.name))
+        self.containers.pop(spec.name, None)
+        self.specs.pop(spec.name, None)
+
+    def status(self, spec: ContainerSpec) -> Optional[str]:
+        return self.containers.get(spec.name)
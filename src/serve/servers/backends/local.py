@@ -0,0 +1,104 @@
+from pathlib import Path
+from typing import Optional, Union
+import os
+import signal
+import subprocess
+import time
+
+from loguru import logger
+
+from serve.servers.backends.base import BackendError, ContainerBackend, ContainerSpec
+
+
+class LocalProcessBackend(ContainerBackend):
+    """Backend running model servers as plain host processes.
+
+    Runs ``spec.local_command`` without any container runtime. The process
+    ID is kept in ``<state_dir>/<name>.pid`` and output goes to
+    ``<state_dir>/<name>.log``, so a later manager instance can stop it.
+
+    Attributes:
+        state_dir: Directory holding pid and log files
+        stop_timeout: Seconds to wait after SIGTERM before sending SIGKILL
+    """
+
+    def __init__(self, state_dir: Union[str, Path], stop_timeout: float = 10.0):
+        """Initialize the backend.
+
+        Args:
+            state_dir: Directory holding pid and log files
+            stop_timeout: Seconds to wait after SIGTERM before sending SIGKILL
+        """
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.stop_timeout = stop_timeout
+
+    def _pid_path(self, name: str) -> Path:
+        return self.state_dir / f"{name}.pid"
+
+    def _pid(self, name: str) -> Optional[int]:
+        """Return the recorded process ID, or None if there is none."""
+        try:
+            return int(self._pid_path(name).read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            # Reap the process if it is our exited child
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                return False
+        except ChildProcessError:
+            pass
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def serve(self, spec: ContainerSpec) -> None:
+        if not spec.local_command:
+            raise BackendError(f"No local command configured for {spec.name}")
+        if self.status(spec) == "running":
+            logger.info(f"{spec.name} is already running")
+            return
+        env = dict(os.environ, **spec.env)
+        with open(self.state_dir / f"{spec.name}.log", "ab") as log:
+            process = subprocess.Popen(
+                spec.local_command,
+                cwd=spec.workdir,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        self._pid_path(spec.name).write_text(str(process.pid))
+        logger.info(f"Started {spec.name} as process {process.pid}")
+
+    def stop(self, spec: ContainerSpec) -> None:
+        pid = self._pid(spec.name)
+        if pid is None or not self._alive(pid):
+            return
+        # The server runs in its own session, signal the whole group
+        os.killpg(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.stop_timeout
+        while self._alive(pid):
+            if time.monotonic() > deadline:
+                os.killpg(pid, signal.SIGKILL)
+                break
+            time.sleep(0.05)
+        logger.info(f"Stopped {spec.name}")
+
+    def delete(self, spec: ContainerSpec) -> None:
+        self.stop(spec)
+        self._pid_path(spec.name).unlink(missing_ok=True)
+        (self.state_dir / f"{spec.name}.log").unlink(missing_ok=True)
+
+    def status(self, spec: ContainerSpec) -> Optional[str]:
+        pid = self._pid(spec.name)
+        if pid is None:
+            return None
+        return "running" if self._alive(pid) else "exited"
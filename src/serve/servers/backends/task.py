@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Optional, Union
+
+from serve._cli.task import TaskCLI
+from serve.servers.backends.base import BackendError, ContainerBackend, ContainerSpec
+
+
+class TaskCLIBackend(ContainerBackend):
+    """Backend running the ``serve``/``stop``/``delete`` tasks of a Taskfile.
+
+    Every call spawns ``task``, a shell and ``docker`` CLI processes, so it
+    is the slowest backend, but it keeps the Taskfile as the single source
+    of truth for users who customize it.
+
+    Attributes:
+        task_cli: Task runner bound to the Taskfile directory
+    """
+
+    def __init__(self, taskfile_dir: Union[str, Path], status_task: str = "healthcheck"):
+        """Initialize the backend.
+
+        Args:
+            taskfile_dir: Directory where Taskfile.yml is located
+            status_task: Task that succeeds while the server is running
+        """
+        self.task_cli = TaskCLI(taskfile_dir)
+        self.status_task = status_task
+
+    def _run(self, task_name: str, spec: ContainerSpec) -> None:
+        result = self.task_cli.run(task_name, **spec.task_vars)
+        if result.returncode != 0:
+            raise BackendError(f"Task {task_name} failed for {spec.name}: {result.stderr}")
+
+    def serve(self, spec: ContainerSpec) -> None:
+        self._run("serve", spec)
+
+    def build(self, spec: ContainerSpec) -> bool:
+        result = self.task_cli.run("build", **spec.task_vars)
+        if result.returncode != 0:
+            raise BackendError(f"Failed to build {spec.image}: {result.stderr}")
+        # The task prints this line only when it skipped the build
+        return "already built" not in (result.stdout or "")
+
+    def stop(self, spec: ContainerSpec) -> None:
+        self._run("stop", spec)
+
+    def delete(self, spec: ContainerSpec) -> None:
+        self._run("delete", spec)
+
+    def status(self, spec: ContainerSpec) -> Optional[str]:
+        # The health check probes the host port of the server
+        server_ports = next(iter(spec.ports), None)
+        result = self.task_cli.run(self.status_task, server_ports=server_ports, **spec.task_vars)
+        return "running" if result.returncode == 0 else None
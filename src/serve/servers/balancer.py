@@ -0,0 +1,584 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+import asyncio
+import json
+import threading
+import time
+
+from loguru import logger
+
+from serve.utils.response_cache import ResponseCache, cache_key, is_deterministic
+
+
+_BUFFER = 64 * 1024
+_MAX_HEAD = 64 * 1024
+
+# Headers that only apply to one connection and are not forwarded
+_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "te", "trailer", "upgrade", "expect"}
+
+_REASONS = {200: "OK", 404: "Not Found", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+Headers = List[Tuple[str, str]]
+
+
+def _parse_head(head: bytes) -> Tuple[str, Headers]:
+    """Split an HTTP head into its start line and headers."""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def _header(headers: Headers, name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _keep_alive(version: str, headers: Headers) -> bool:
+    connection = (_header(headers, "connection") or "").lower()
+    if "close" in connection:
+        return False
+    if version == "HTTP/1.0":
+        return "keep-alive" in connection
+    return True
+
+
+def _is_chunked(headers: Headers) -> bool:
+    return "chunked" in (_header(headers, "transfer-encoding") or "").lower()
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Headers) -> bytes:
+    """Read a request body, decoding chunked transfer encoding."""
+    if _is_chunked(headers):
+        body = bytearray()
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0].strip(), 16)
+            if size == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return bytes(body)
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+    length = int(_header(headers, "content-length") or 0)
+    return await reader.readexactly(length) if length else b""
+
+
+async def _relay_exactly(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, length: int) -> None:
+    while length > 0:
+        data = await reader.read(min(length, _BUFFER))
+        if not data:
+            raise ConnectionError("Backend closed the connection mid-response")
+        writer.write(data)
+        length -= len(data)
+        await writer.drain()
+
+
+async def _relay_chunked(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Relay a chunked body as is, flushing each chunk for streamed completions."""
+    while True:
+        size_line = await reader.readuntil(b"\r\n")
+        writer.write(size_line)
+        size = int(size_line.split(b";")[0].strip(), 16)
+        if size == 0:
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                writer.write(line)
+                if line == b"\r\n":
+                    break
+            await writer.drain()
+            return
+        await _relay_exactly(reader, writer, size + 2)
+
+
+async def _relay_until_close(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while True:
+        data = await reader.read(_BUFFER)
+        if not data:
+            return
+        writer.write(data)
+        await writer.drain()
+
+
+def _close(writer: asyncio.StreamWriter) -> None:
+    try:
+        writer.close()
+    except RuntimeError:
+        pass
+
+
+class _BackendFailure(Exception):
+    """The replica failed before sending a response, so the request can be retried."""
+    pass
+
+
+@dataclass
+class ReplicaState:
+    """A replica behind the load balancer and its request metrics.
+
+    Attributes:
+        host: Host of the replica
+        port: Port of the replica
+        healthy: False while the replica is ejected
+        in_flight: Requests currently forwarded to the replica
+        requests: Requests forwarded in total
+        errors: Requests that failed on the replica
+        ejections: Times the replica was ejected
+        consecutive_failures: Failures since the last success
+    """
+    host: str
+    port: int
+    healthy: bool = True
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    ejections: int = 0
+    consecutive_failures: int = 0
+    last_pick: int = field(default=0, repr=False)
+    idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter, float]] = field(default_factory=list, repr=False)
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def as_dict(self) -> Dict[str, Union[str, int, bool]]:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "idle_connections": len(self.idle),
+        }
+
+
+class LoadBalancer:
+    """HTTP load balancer fanning requests out to replicas of one model.
+
+    Each request goes to the healthy replica with the fewest outstanding
+    requests, ties rotating round robin. Backend connections are kept
+    alive and pooled per replica. A replica is ejected after
+    ``max_failures`` consecutive connection errors or failed health checks
+    and readmitted by the next passing health check; a request that fails
+    before any response byte is retried on another replica. ``stats_path``
+    answers with the per-replica metrics as JSON. The balancer runs on an
+    asyncio loop in a daemon thread of the current process.
+
+    With a ``cache``, greedy (temperature 0) non-streamed JSON POST
+    requests are keyed by ``run_id()`` and their normalized body:
+    identical requests in flight share one upstream call and successful
+    responses are served from the cache until the run changes.
+
+    Attributes:
+        listen_port: Public port clients connect to
+        replicas: Replica states
+        host: Interface to listen on
+        health_path: Health endpoint of the replicas
+        health_interval: Seconds between health checks
+        max_failures: Consecutive failures ejecting a replica
+        pool_size: Idle keep-alive connections kept per replica
+        idle_timeout: Seconds a pooled connection may stay idle
+        connect_timeout: Seconds to wait for a backend connection
+        stats_path: Path answering with the replica metrics
+        cache: Optional response cache
+        run_id: Returns the run ID of the served model, None bypasses the cache
+    """
+
+    def __init__(
+        self,
+        listen_port: int,
+        replicas: Sequence[Union[int, Tuple[str, int]]],
+        host: str = "0.0.0.0",  # noqa: S104
+        health_path: str = "/health",
+        health_interval: float = 1.0,
+        max_failures: int = 2,
+        pool_size: int = 8,
+        idle_timeout: float = 5.0,
+        connect_timeout: float = 5.0,
+        stats_path: str = "/lb/stats",
+        cache: Optional[ResponseCache] = None,
+        run_id: Optional[Callable[[], Optional[str]]] = None
+    ):
+        """Initialize the balancer without starting it.
+
+        Args:
+            listen_port: Public port clients connect to
+            replicas: Replica ports on 127.0.0.1 or ``(host, port)`` pairs
+            host: Interface to listen on
+            health_path: Health endpoint of the replicas
+            health_interval: Seconds between health checks
+            max_failures: Consecutive failures ejecting a replica
+            pool_size: Idle keep-alive connections kept per replica
+            idle_timeout: Seconds a pooled connection may stay idle, closed
+                at the next health check after that
+            connect_timeout: Seconds to wait for a backend connection
+            stats_path: Path answering with the replica metrics
+            cache: Optional response cache
+            run_id: Returns the run ID of the served model, None bypasses
+                the cache
+        """
+        if cache is not None and run_id is None:
+            raise ValueError("A response cache needs a run_id function")
+        if not replicas:
+            raise ValueError("At least one replica is required")
+        self.listen_port = listen_port
+        self.replicas = [
+            ReplicaState("127.0.0.1", r) if isinstance(r, int) else ReplicaState(r[0], r[1]) for r in replicas
+        ]
+        self.host = host
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.stats_path = stats_path
+        self.cache = cache
+        self.run_id = run_id
+        self._picks = 0
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "LoadBalancer":
+        """Start listening in a background thread.
+
+        Returns:
+            LoadBalancer: self, once the port is bound
+
+        Raises:
+            OSError: If the port cannot be bound
+        """
+        started = threading.Event()
+        error = []
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._handle, self.host, self.listen_port, limit=_MAX_HEAD)
+                )
+            except OSError as e:
+                error.append(e)
+                started.set()
+                return
+            self._health_task = self._loop.create_task(self._health_loop())
+            started.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name=f"balancer-{self.listen_port}", daemon=True)
+        self._thread.start()
+        started.wait()
+        if error:
+            raise error[0]
+        logger.info(f"Load balancer on {self.listen_port} serving {', '.join(r.address for r in self.replicas)}")
+        return self
+
+    def close(self) -> None:
+        """Stop listening, close all connections and the event loop."""
+        if self._loop is None or self._server is None:
+            return
+
+        async def shutdown() -> None:
+            self._health_task.cancel()
+            self._server.close()
+            for writer in list(self._clients):
+                _close(writer)
+            for replica in self.replicas:
+                self._drop_idle(replica)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._server = None
+
+    def join(self) -> None:
+        """Block until the balancer is closed, closing it on Ctrl-C."""
+        try:
+            while self._thread is not None and self._thread.is_alive():
+                self._thread.join(0.5)
+        except KeyboardInterrupt:
+            self.close()
+
+    def stats(self) -> List[Dict[str, Union[str, int, bool]]]:
+        """Return the metrics of every replica."""
+        return [replica.as_dict() for replica in self.replicas]
+
+    def _pick(self, exclude: Set[int]) -> Optional[ReplicaState]:
+        candidates = [r for i, r in enumerate(self.replicas) if r.healthy and i not in exclude]
+        if not candidates:
+            return None
+        replica = min(candidates, key=lambda r: (r.in_flight, r.last_pick))
+        self._picks += 1
+        replica.last_pick = self._picks
+        return replica
+
+    def _drop_idle(self, replica: ReplicaState, older_than: Optional[float] = None) -> None:
+        """Close pooled connections, all or those idle since before ``older_than``."""
+        keep = []
+        for reader, writer, since in replica.idle:
+            if older_than is None or since < older_than:
+                _close(writer)
+            else:
+                keep.append((reader, writer, since))
+        replica.idle[:] = keep
+
+    def _record_failure(self, replica: ReplicaState, reason: str, request: bool = True) -> None:
+        if request:
+            replica.errors += 1
+        replica.consecutive_failures += 1
+        self._drop_idle(replica)
+        if replica.healthy and replica.consecutive_failures >= self.max_failures:
+            replica.healthy = False
+            replica.ejections += 1
+            logger.warning(f"Ejected replica {replica.address}: {reason}")
+
+    def _record_success(self, replica: ReplicaState) -> None:
+        replica.consecutive_failures = 0
+        if not replica.healthy:
+            replica.healthy = True
+            logger.info(f"Readmitted replica {replica.address}")
+
+    async def _connect(self, replica: ReplicaState) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(
+            asyncio.open_connection(replica.host, replica.port, limit=_MAX_HEAD), self.connect_timeout
+        )
+
+    async def _exchange(
+        self, replica: ReplicaState, request: bytes
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bytes]:
+        """Send a request and read the response head, preferring a pooled connection.
+
+        A pooled connection the replica already closed is replaced by a
+        fresh one without counting as a failure.
+
+        Raises:
+            _BackendFailure: If the replica did not answer
+        """
+        while True:
+            reused = bool(replica.idle)
+            reader, writer, _ = replica.idle.pop() if reused else (None, None, None)
+            try:
+                if not reused:
+                    reader, writer = await self._connect(replica)
+                writer.write(request)
+                await writer.drain()
+                return reader, writer, await reader.readuntil(b"\r\n\r\n")
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+                if writer is not None:
+                    _close(writer)
+                if not reused:
+                    raise _BackendFailure(str(e) or type(e).__name__) from e
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, status: int, payload: bytes, keep_alive: bool,
+        content_type: Optional[str] = "application/json", extra_headers: Headers = ()
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {_REASONS[status]}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines += [f"{k}: {v}" for k, v in extra_headers]
+        lines.append(f"Content-Length: {len(payload)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    def _cache_key(self, method: str, target: str, body: bytes) -> Optional[str]:
+        """Return the cache key of a cacheable request, None otherwise."""
+        if self.cache is None or method != "POST":
+            return None
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or payload.get("stream") or not is_deterministic(payload):
+            return None
+        run_id = self.run_id()
+        if run_id is None:
+            return None
+        return cache_key(run_id, payload, endpoint=target)
+
+    async def _forward_cached(
+        self, key: str, method: str, target: str, headers: Headers, body: bytes,
+        client_writer: asyncio.StreamWriter, keep_alive: bool
+    ) -> bool:
+        """Serve a cacheable request from the cache or the request in flight."""
+        owner, future = self.cache.begin(key)
+        if not owner:
+            cached = await asyncio.wrap_future(future)
+            if cached is None:
+                # The owner's response was not cacheable
+                return await self._forward(method, target, headers, body, client_writer, keep_alive)
+            content_type, payload = cached
+            await self._respond(client_writer, 200, payload, keep_alive, content_type, [("X-Cache", "HIT")])
+            return keep_alive
+        capture: Dict[str, Any] = {}
+        try:
+            return await self._forward(method, target, headers, body, client_writer, keep_alive, capture)
+        finally:
+            cacheable = capture.get("status") == 200 and "body" in capture
+            value = (capture.get("content_type"), capture["body"]) if cacheable else None
+            self.cache.finish(key, value, store=cacheable)
+
+    async def _forward(
+        self, method: str, target: str, headers: Headers, body: bytes,
+        client_writer: asyncio.StreamWriter, keep_alive: bool, capture: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Forward one request and relay the response.
+
+        Args:
+            capture: Receives ``status``, ``content_type`` and ``body`` of
+                a response with a known length
+
+        Returns:
+            bool: Whether the client connection can serve another request
+        """
+        lines = [f"{method} {target} HTTP/1.1"]
+        lines += [f"{k}: {v}" for k, v in headers if k.lower() not in _HOP_HEADERS and k.lower() != "content-length"]
+        if body or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: keep-alive")
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+        tried: Set[int] = set()
+        while True:
+            replica = self._pick(tried)
+            if replica is None:
+                payload = json.dumps({"error": "No healthy replica"}).encode()
+                await self._respond(client_writer, 503, payload, keep_alive)
+                return keep_alive
+            tried.add(self.replicas.index(replica))
+            replica.in_flight += 1
+            replica.requests += 1
+            try:
+                try:
+                    reader, writer, head = await self._exchange(replica, request)
+                except _BackendFailure as e:
+                    self._record_failure(replica, str(e))
+                    continue
+                try:
+                    return await self._relay(
+                        method, head, reader, writer, replica, client_writer, keep_alive, capture
+                    )
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                    # The response already started, so it cannot be retried
+                    _close(writer)
+                    self._record_failure(replica, str(e) or type(e).__name__)
+                    return False
+            finally:
+                replica.in_flight -= 1
+
+    async def _relay(
+        self, method: str, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+        replica: ReplicaState, client_writer: asyncio.StreamWriter, keep_alive: bool,
+        capture: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        status_line, headers = _parse_head(head)
+        version, _, rest = status_line.partition(" ")
+        status = int(rest.split(" ", 1)[0])
+        if method == "HEAD" or status < 200 or status in (204, 304):
+            mode = "none"
+        elif _is_chunked(headers):
+            mode = "chunked"
+        elif _header(headers, "content-length") is not None:
+            mode = "length"
+        else:
+            mode = "close"
+        backend_alive = mode != "close" and _keep_alive(version, headers)
+        keep_alive = keep_alive and mode != "close"
+
+        lines = [f"HTTP/1.1 {rest}"]
+        lines += [f"{k}: {v}" for k, v in headers if k.lower() not in ("connection", "keep-alive")]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        client_writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if mode == "chunked":
+            await _relay_chunked(reader, client_writer)
+        elif mode == "length" and capture is not None:
+            payload = await reader.readexactly(int(_header(headers, "content-length")))
+            client_writer.write(payload)
+            capture.update(status=status, content_type=_header(headers, "content-type"), body=payload)
+        elif mode == "length":
+            await _relay_exactly(reader, client_writer, int(_header(headers, "content-length")))
+        elif mode == "close":
+            await _relay_until_close(reader, client_writer)
+        await client_writer.drain()
+
+        self._record_success(replica)
+        if backend_alive and replica.healthy and len(replica.idle) < self.pool_size:
+            replica.idle.append((reader, writer, time.monotonic()))
+        else:
+            _close(writer)
+        return keep_alive
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        self._clients.add(client_writer)
+        try:
+            while True:
+                try:
+                    head = await client_reader.readuntil(b"\r\n\r\n")
+                    request_line, headers = _parse_head(head)
+                    method, target, version = request_line.split(" ", 2)
+                    body = await _read_body(client_reader, headers)
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                    break
+                keep_alive = _keep_alive(version, headers)
+                key = self._cache_key(method, target, body)
+                if target == self.stats_path:
+                    stats = {"replicas": self.stats()}
+                    if self.cache is not None:
+                        stats["cache"] = self.cache.stats()
+                    await self._respond(client_writer, 200, json.dumps(stats).encode(), keep_alive)
+                elif key is not None:
+                    keep_alive = await self._forward_cached(
+                        key, method, target, headers, body, client_writer, keep_alive
+                    )
+                else:
+                    keep_alive = await self._forward(method, target, headers, body, client_writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(client_writer)
+            _close(client_writer)
+
+    async def _check(self, replica: ReplicaState) -> bool:
+        try:
+            reader, writer = await self._connect(replica)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        try:
+            writer.write(
+                f"GET {self.health_path} HTTP/1.1\r\nHost: {replica.address}\r\nConnection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readuntil(b"\r\n"), self.connect_timeout)
+            return status_line.split(b" ")[1] == b"200"
+        except (OSError, IndexError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            return False
+        finally:
+            _close(writer)
+
+    async def _health_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            results = await asyncio.gather(*(self._check(r) for r in self.replicas))
+            idle_deadline = time.monotonic() - self.idle_timeout
+            for replica, ok in zip(self.replicas, results):
+                self._drop_idle(replica, older_than=idle_deadline)
+                if ok:
+                    self._record_success(replica)
+                else:
+                    self._record_failure(replica, f"health check of {self.health_path} failed", request=False)
+            await asyncio.sleep(max(0.0, self.health_interval - (time.monotonic() - started)))
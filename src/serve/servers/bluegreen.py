@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Type
+import shutil
+import socket
+import time
+
+from loguru import logger
+from pydantic import BaseModel
+
+from serve.servers.front import FrontPort
+from serve.servers.readiness import ReadinessProbe
+
+
+SLOTS = ("blue", "green")
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on the loopback interface."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class SwapResult:
+    """Outcome of a blue/green update.
+
+    Attributes:
+        model_name: Model name
+        slot: Slot serving after the update
+        slot_port: Local port of the slot container
+        run_id: Run ID serving after the update
+        switched: False if the model was already up to date
+        downtime: Seconds the public port had no ready server
+    """
+    model_name: str
+    slot: Optional[str]
+    slot_port: Optional[int]
+    run_id: str
+    switched: bool
+    downtime: float = 0.0
+
+
+class BlueGreenDeployer:
+    """Zero-downtime model updates for a server manager.
+
+    The new run is downloaded into the free slot under ``.slots/<slot>``,
+    started on a free local port and health-checked while the current slot
+    keeps serving. A ``FrontPort`` on the public port is then switched to
+    the new slot, connections to the old slot are drained and the old
+    container and files are removed. Failures before the switch leave the
+    current slot untouched.
+
+    A model still served the classic way, with its container bound to the
+    public port, has to release that port once for the front port to take
+    over, so its first blue/green update has a short gap.
+
+    Attributes:
+        manager: ``LlamaCppServer`` or ``EmbeddingManager`` to update
+        config_cls: Config model of the manager
+        drain_timeout: Seconds to wait for open connections to the old slot
+    """
+
+    def __init__(self, manager: Any, config_cls: Type[BaseModel], drain_timeout: float = 30.0):
+        """Initialize the deployer.
+
+        Args:
+            manager: ``LlamaCppServer`` or ``EmbeddingManager`` to update
+            config_cls: Config model of the manager
+            drain_timeout: Seconds to wait for open connections to the old slot
+        """
+        self.manager = manager
+        self.config_cls = config_cls
+        self.drain_timeout = drain_timeout
+
+    def _remove_dir(self, path: Path) -> None:
+        if path.exists():
+            self.manager.store.release(path)
+            shutil.rmtree(path)
+
+    def _retire(self, model_name: str, old_slot: Optional[str], previous_port: Optional[int]) -> None:
+        """Drain and remove the deployment the front port switched away from."""
+        m = self.manager
+        if previous_port is not None:
+            m.fronts[model_name].drain(previous_port, self.drain_timeout)
+        if old_slot is not None:
+            m.backend.delete(m.container_spec(model_name, slot=old_slot))
+            self._remove_dir(m.desrie_path / ".slots" / old_slot / model_name)
+        else:
+            self._remove_dir(m.desrie_path / model_name)
+        # Managers keeping per-run caches on disk drop those of the old run
+        if hasattr(m, "drop_stale_caches"):
+            m.drop_stale_caches(model_name)
+
+    def update(self, model_name: str, alias: str, port: int) -> SwapResult:
+        """Bring a model to the version behind ``alias`` without downtime.
+
+        Args:
+            model_name: Model name
+            alias: Registry alias to deploy
+            port: Public port of the model
+
+        Returns:
+            SwapResult: The serving slot and measured downtime
+
+        Raises:
+            Exception: Any download or startup error of the new slot, after
+                the new slot has been cleaned up
+        """
+        m = self.manager
+        old = m.get_configs().get(model_name)
+        if old is not None and not m.new_model_status(model_name, alias):
+            m.run_serve(model_name, port=port)
+            return SwapResult(model_name, old.get("slot"), old.get("slot_port"), old["run_id"], switched=False)
+
+        old_slot = old.get("slot") if old else None
+        new_slot = SLOTS[1] if old_slot == SLOTS[0] else SLOTS[0]
+        slot_root = m.desrie_path / ".slots" / new_slot
+        slot_root.mkdir(parents=True, exist_ok=True)
+        self._remove_dir(slot_root / model_name)
+        slot_port = free_port()
+        probe = m.readiness or ReadinessProbe()
+
+        spec = None
+        try:
+            model_dir, run_id = m.download_model(model_name, alias, slot_root)
+            spec = m.container_spec(model_name, slot_port, slot=new_slot,
+                                    model_path=m.artifact_dir(model_dir), run_id=run_id)
+            m.backend.delete(spec)
+            probe.serve(m.backend, spec, model=model_name)
+        except Exception:
+            logger.error(f"New {new_slot} slot of {model_name} failed, keeping the current one")
+            if spec is not None:
+                m.backend.delete(spec)
+            self._remove_dir(slot_root / model_name)
+            raise
+
+        downtime = 0.0
+        front = m.fronts.get(model_name)
+        if front is None:
+            gap_start = time.monotonic()
+            if old is not None and old_slot is None:
+                # The classic container holds the public port
+                m.backend.delete(m.container_spec(model_name, port))
+            m.fronts[model_name] = FrontPort(port, slot_port).start()
+            if old is not None and old_slot is None:
+                downtime = time.monotonic() - gap_start
+            previous_port = None
+        else:
+            previous_port = front.switch(slot_port)
+
+        m.config_update(self.config_cls(
+            model_name=model_name, alias=alias, model_path=m.artifact_dir(model_dir),
+            run_id=run_id, slot=new_slot, slot_port=slot_port
+        ))
+
+        if old is not None:
+            self._retire(model_name, old_slot, previous_port)
+        logger.info(f"{model_name} now served from {new_slot} slot on port {slot_port} behind {port}")
+        return SwapResult(model_name, new_slot, slot_port, run_id, switched=True, downtime=downtime)
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+from serve.utils import metrics
+
+
+_DIGEST_SIZE = 32
+_INITIAL_ROWS = 1024
+
+
+def text_digest(text: str) -> bytes:
+    """Return the SHA-256 digest keying a text in the cache."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache of one model run.
+
+    Vectors are keyed by the SHA-256 of their text and live in two tiers:
+    an LRU dict of recently used vectors in memory and a memory-mapped
+    float32 matrix on disk. Everything of a run sits under
+    ``<cache_dir>/<run_id>``, so a new run never sees vectors of another
+    and ``drop_runs`` removes stale runs at once.
+
+    Layout::
+
+        <cache_dir>/<run_id>/vectors.f32  float32 rows, grown by doubling
+        <cache_dir>/<run_id>/keys.bin     32 byte text digests in row order
+        <cache_dir>/<run_id>/meta.json    vector size
+        <cache_dir>/<run_id>/stats.json   hit counters, for ``status``
+
+    Attributes:
+        cache_dir: Directory holding the caches of all runs of a model
+        run_id: Run ID of the served model
+        memory_entries: Vectors kept in the memory tier
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], run_id: str, memory_entries: int = 10000,
+                 stats_interval: float = 5.0):
+        """Open or create the cache of a run.
+
+        Args:
+            cache_dir: Directory holding the caches of all runs of a model
+            run_id: Run ID of the served model
+            memory_entries: Vectors kept in the memory tier
+            stats_interval: Seconds between writes of ``stats.json``
+        """
+        self.cache_dir = Path(cache_dir)
+        self.run_id = run_id
+        self.memory_entries = memory_entries
+        self.stats_interval = stats_interval
+        self.path = self.cache_dir / run_id
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._keys_file = None
+        self._dim: Optional[int] = None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        metrics.track_cache("embedding", self)
+        self._stats_written = time.monotonic()
+        # Counters accumulate across restarts of the server
+        previous = self.read_stats(self.cache_dir, run_id)
+        for name in self._counters:
+            self._counters[name] = int(previous.get(name, 0))
+        self._load()
+
+    def _load(self) -> None:
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            return
+        with open(meta_path, "r") as f:
+            self._dim = json.load(f)["dim"]
+        keys = (self.path / "keys.bin").read_bytes() if (self.path / "keys.bin").exists() else b""
+        n_rows = len(keys) // _DIGEST_SIZE
+        self._open_vectors(max(n_rows, _INITIAL_ROWS))
+        # Rows are written before their key, so every recorded key has its vector
+        self._rows = {keys[i * _DIGEST_SIZE:(i + 1) * _DIGEST_SIZE]: i for i in range(n_rows)}
+        logger.info(f"Loaded {n_rows} cached embeddings of run {self.run_id}")
+
+    def _open_vectors(self, capacity: int) -> None:
+        vectors_path = self.path / "vectors.f32"
+        size = capacity * self._dim * 4
+        if not vectors_path.exists() or vectors_path.stat().st_size < size:
+            with open(vectors_path, "ab") as f:
+                f.truncate(size)
+        capacity = vectors_path.stat().st_size // (self._dim * 4)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _append(self, digest: bytes, vector: np.ndarray) -> None:
+        if self._dim is None:
+            self._dim = int(vector.shape[0])
+            with open(self.path / "meta.json", "w") as f:
+                json.dump({"dim": self._dim}, f)
+            self._open_vectors(_INITIAL_ROWS)
+        row = len(self._rows)
+        if row >= self._vectors.shape[0]:
+            self._vectors.flush()
+            self._open_vectors(self._vectors.shape[0] * 2)
+        self._vectors[row] = vector
+        if self._keys_file is None:
+            self._keys_file = open(self.path / "keys.bin", "ab")
+        self._keys_file.write(digest)
+        self._rows[digest] = row
+
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        self._memory[digest] = vector
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector of every text, None for misses."""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                digest = text_digest(text)
+                vector = self._memory.get(digest)
+                if vector is not None:
+                    self._memory.move_to_end(digest)
+                    self._counters["memory_hits"] += 1
+                elif digest in self._rows:
+                    vector = np.array(self._vectors[self._rows[digest]])
+                    self._remember(digest, vector)
+                    self._counters["disk_hits"] += 1
+                else:
+                    self._counters["misses"] += 1
+                results.append(vector)
+            self._maybe_write_stats()
+        return results
+
+    def store(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Cache freshly encoded vectors in both tiers."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if self._dim is not None and vector.shape[0] != self._dim:
+                    raise ValueError(f"Vector size {vector.shape[0]} does not match cached size {self._dim}")
+                digest = text_digest(text)
+                if digest not in self._rows:
+                    self._append(digest, vector)
+                self._remember(digest, vector.copy())
+            if self._keys_file is not None:
+                self._keys_file.flush()
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        """Return hit counters and tier sizes.
+
+        Returns:
+            Dict[str, Union[int, float, str]]: ``memory_hits``,
+            ``disk_hits``, ``misses``, ``hit_rate``, ``memory_entries``,
+            ``disk_entries`` and ``run_id``
+        """
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, Union[int, float, str]]:
+        lookups = sum(self._counters.values())
+        hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+        return dict(
+            self._counters,
+            hit_rate=hits / lookups if lookups else 0.0,
+            memory_entries=len(self._memory),
+            disk_entries=len(self._rows),
+            run_id=self.run_id
+        )
+
+    def _maybe_write_stats(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._stats_written < self.stats_interval:
+            return
+        tmp_path = self.path / "stats.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._stats(), f)
+        os.replace(tmp_path, self.path / "stats.json")
+        self._stats_written = time.monotonic()
+
+    def close(self) -> None:
+        """Flush the vectors and write the counters."""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._keys_file is not None:
+                self._keys_file.close()
+                self._keys_file = None
+            self._maybe_write_stats(force=True)
+
+    @staticmethod
+    def read_stats(cache_dir: Union[str, Path], run_id: str) -> Dict[str, Union[int, float, str]]:
+        """Read the counters last written by the cache of a run, empty if none."""
+        stats_path = Path(cache_dir) / run_id / "stats.json"
+        if not stats_path.exists():
+            return {}
+        with open(stats_path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def drop_runs(cache_dir: Union[str, Path], keep: Optional[str] = None) -> List[str]:
+        """Delete the caches of all runs except ``keep``.
+
+        Returns:
+            List[str]: Run IDs whose caches were deleted
+        """
+        cache_dir = Path(cache_dir)
+        if not cache_dir.exists():
+            return []
+        dropped = []
+        for run_dir in cache_dir.iterdir():
+            if run_dir.is_dir() and run_dir.name != keep:
+                shutil.rmtree(run_dir)
+                dropped.append(run_dir.name)
+        if dropped:
+            logger.info(f"Dropped embedding caches of runs {', '.join(dropped)}")
+        return dropped
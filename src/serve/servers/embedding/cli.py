@@ -0,0 +1,43 @@
+from pathlib import Path
+from typing import Optional
+
+import click
+from loguru import logger
+
+from serve.servers.backends import BACKENDS
+
+
+@click.group()
+def embedding():
+    """CLI tool for embedding model management."""
+
+
+@embedding.command()
+@click.option('--model-name', type=str, required=True, help='Registered model name')
+@click.option('--alias', type=str, default='champion', help='Model alias to warm')
+@click.option('--path', type=click.Path(path_type=Path), default=Path('.'),
+              help='Directory of the deployed embedding models')
+@click.option('--tracking-uri', type=str, default=None, help='MLflow tracking URI')
+@click.option('--gcp', is_flag=True, help='Download the artifacts from GCS')
+@click.option('--backend', type=click.Choice(BACKENDS), default='task', help='Container backend')
+@click.option('--download-workers', type=click.IntRange(min=1), default=None,
+              help='Concurrent byte-range streams of a GCS download (default: 8)')
+def warm(model_name: str, alias: str, path: Path, tracking_uri: Optional[str], gcp: bool, backend: str,
+         download_workers: Optional[int]) -> None:
+    """Download a model version and build its server image without serving it.
+
+    Run this ahead of a deploy; serving the same version afterwards skips
+    the download and the image build.
+    """
+    # The manager pulls in mlflow, which only this command needs
+    from serve.servers.embedding.main import EmbeddingManager
+    from mlflow import MlflowClient
+
+    try:
+        download = {"download_workers": download_workers} if download_workers else {}
+        manager = EmbeddingManager(path, MlflowClient(tracking_uri), gcp=gcp, backend=backend, readiness_timeout=None,
+                                   **download)
+        click.echo(manager.warm(model_name, alias))
+    except Exception as e:
+        logger.error(f"Failed to warm {model_name}: {str(e)}")
+        raise click.ClickException(str(e))
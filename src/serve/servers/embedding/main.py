@@ -1,65 +1,227 @@
 from pathlib import Path
 import shutil
-from typing import Optional, List, Union, Dict
+import sys
+from typing import Optional, List, Union, Dict, Tuple
 from loguru import logger
 
 from pydantic import BaseModel, field_validator, FieldValidationInfo
-from serve._cli.task import TaskCLI
+from serve.servers.backends import ContainerBackend, ContainerSpec, LocalProcessBackend, get_backend
 from mlflow import MlflowClient
-import json
 from mlflow.artifacts import download_artifacts
 from serve.utils.mlflow.model import get_model, get_model_run_id
+from serve.utils.config_store import ConfigStore
+from serve.utils.gcs.download import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
+from serve.utils.model_store import ModelStore, directory_digest
+from serve.servers.readiness import MODEL_UPDATE_SECONDS, ColdStartHistogram, ReadinessProbe
+from serve.servers.bluegreen import BlueGreenDeployer, SwapResult
+from serve.servers.front import FrontPort
+from serve.servers.embedding.cache import EmbeddingCache
 
 class EmbeddingConfig(BaseModel):
     model_name: str
     alias: str
     model_path: Path
     run_id: str
+    slot: Optional[str] = None
+    slot_port: Optional[int] = None
 
     def model_dump(self):
-        return {
+        config = {
             "model_name": self.model_name,
             "alias": self.alias,
             "model_path": str(self.model_path),
             "run_id": self.run_id
         }
+        if self.slot is not None:
+            config["slot"] = self.slot
+            config["slot_port"] = self.slot_port
+        return config
+CONTAINER_NAME = "lmorbits-embedding"
+IMAGE_NAME = f"{CONTAINER_NAME}-image"
+
+
 class EmbeddingManager():
 
-    def __init__(self , desrie_path: Path, mlflow_client: MlflowClient, gcp: bool = False):
+    def __init__(self , desrie_path: Path, mlflow_client: MlflowClient, gcp: bool = False, store_budget: Optional[int] = None,
+                 backend: Union[str, ContainerBackend] = "task", readiness_timeout: Optional[float] = 300.0,
+                 builtin_server: bool = False, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 embedding_cache: bool = False, cache_memory_entries: int = 10000,
+                 download_workers: int = DEFAULT_MAX_WORKERS, download_chunk_size: int = DEFAULT_CHUNK_SIZE):
         Path(desrie_path).mkdir(parents=True, exist_ok=True)
         configs_dir = Path(desrie_path) / "embedding_configs.json"
         self.condir = configs_dir
-        if not configs_dir.exists():
-            configs = {}
-            with open(configs_dir, "w") as f:
-                json.dump(configs, f)
-        self.configs = self.get_configs()
+        # Shared with other processes managing the same directory
+        self.config_store = ConfigStore(configs_dir)
+        self.config_store.ensure()
         self.desrie_path = Path(desrie_path).resolve().absolute()
         self.mlflow_client = mlflow_client
-        self.task_cli = TaskCLI(Path(__file__).parent)
+        if isinstance(backend, str):
+            backend = get_backend(backend, Path(__file__).parent, self.desrie_path / ".run")
+        self.backend = backend
+        # None leaves readiness to the caller
+        self.readiness = None
+        if readiness_timeout is not None:
+            self.readiness = ReadinessProbe(
+                timeout=readiness_timeout,
+                histogram=ColdStartHistogram(self.desrie_path / "cold_starts.json")
+            )
+        # docker=False runs the server on the host, whatever the backend
+        self.local_backend = backend if isinstance(backend, LocalProcessBackend) else LocalProcessBackend(self.desrie_path / ".run")
         self.artifact_path = "serve"
+        self.store = ModelStore(self.desrie_path / ".store", budget_bytes=store_budget)
+        # Concurrent byte-range streams and their size of GCS downloads
+        self.download_workers = download_workers
+        self.download_chunk_size = download_chunk_size
         self.gcp = gcp
+        # Front ports of blue/green models, living in this process
+        self.fronts: Dict[str, FrontPort] = {}
+        # The local path runs serve.servers.embedding.server instead of the project's own server
+        self.builtin_server = builtin_server
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        # Persistent vectors of the builtin server under .embedding_cache/<model>/<run_id>
+        self.embedding_cache = embedding_cache
+        self.cache_memory_entries = cache_memory_entries
+
+    @property
+    def configs(self):
+        """Read-only view of the model configs, reloaded when the file changes."""
+        return self.config_store.view()
+
     def get_configs(self):
-        with open(self.condir, "r") as f:
-            configs = json.load(f) 
-        return configs
+        return self.config_store.all()
     
     def config_update(self, config: EmbeddingConfig):
-        self.configs = self.get_configs()
-        self.configs[config.model_name] = config.model_dump()
-        with open(self.condir, "w") as f:
-            json.dump(self.configs, f, indent=4)
+        self.config_store.put(config.model_name, config.model_dump())
+
+    def artifact_dir(self, model_dir: Path) -> Path:
+        """Return the directory holding the server project inside a downloaded model."""
+        return Path(model_dir) / self.artifact_path
+
+    def download_model(self, model_name: str, alias: str, desired_path: Optional[Path] = None) -> Tuple[Path, str]:
+        """Download the model version behind ``alias`` into ``desired_path/model_name``.
+
+        Returns:
+            Tuple[Path, str]: Model directory and run ID
+        """
+        return get_model(self.mlflow_client, model_name, alias, desired_path or self.desrie_path,
+                         self.artifact_path, self.gcp, store=self.store,
+                         max_workers=self.download_workers, chunk_size=self.download_chunk_size)
+
+    def cache_dir(self, model_name: str) -> Path:
+        """Return the directory holding the embedding caches of a model's runs."""
+        return self.desrie_path / ".embedding_cache" / model_name
 
-    def run_serve(self, model_name: str, docker: bool = True):
+    def image_tag(self, model_path: Path, run_id: Optional[str] = None) -> str:
+        """Return the image of a server project, tagged with the digest of its content.
+
+        Models whose project directory did not change share one image, so a
+        redeploy or a new run with the same files reuses it instead of
+        building again. File digests are remembered by stat in
+        ``.build_digests.json``, so unchanged store blobs are not read twice.
+
+        Args:
+            model_path: Server project directory
+            run_id: Tag used while the directory does not exist yet
+        """
+        if not Path(model_path).is_dir():
+            return f"{IMAGE_NAME}:{run_id}" if run_id else IMAGE_NAME
+        digest = directory_digest(model_path, stat_cache=self.desrie_path / ".build_digests.json")
+        return f"{IMAGE_NAME}:{digest[:16]}"
+
+    def container_spec(self, model_name: str, port: int = 1111, slot: Optional[str] = None,
+                       model_path: Optional[Path] = None, run_id: Optional[str] = None) -> ContainerSpec:
+        """Describe the embedding server of a model for the backend.
+
+        Args:
+            model_name: Model name
+            port: Host port of the server
+            slot: Blue/green slot, defaults to the configured one
+            model_path: Server project directory, defaults to the configured one
+            run_id: Run ID baked into the image, defaults to the configured one
+        """
+        config = self.configs.get(model_name, {})
+        slot = slot or config.get("slot")
+        run_id = run_id or config.get("run_id")
+        if model_path is None:
+            model_path = Path(config["model_path"]) if config else self.desrie_path / model_name
+        model_id = f"{model_name}-{slot}" if slot else model_name
+        local_command = ["sh", "-c", "uv sync && uv run task serve"]
+        if self.builtin_server:
+            local_command = [
+                sys.executable, "-m", "serve.servers.embedding.server",
+                "--model-path", str(model_path), "--port", str(port), "--model-name", model_name,
+                "--max-batch-size", str(self.max_batch_size), "--max-wait-ms", str(self.max_wait_ms)
+            ]
+            if self.embedding_cache and run_id:
+                local_command += [
+                    "--cache-dir", str(self.cache_dir(model_name)), "--run-id", run_id,
+                    "--cache-memory-entries", str(self.cache_memory_entries)
+                ]
+        image = self.image_tag(model_path, run_id)
+        return ContainerSpec(
+            name=f"{CONTAINER_NAME}-{model_id}",
+            image=image,
+            ports={port: 1111},
+            build_context=model_path,
+            local_command=local_command,
+            workdir=model_path,
+            task_vars={"model_name": model_id, "model_path": model_path, "port": port, "image": image},
+            health_url=f"http://127.0.0.1:{port}/health"
+        )
+
+    def run_serve(self, model_name: str, docker: bool = True, port: int = 1111):
         if model_name in self.configs:
-            if docker:
-                self.task_cli.run("serve", model_name=model_name , model_path=self.configs[model_name]["model_path"])
+            config = self.configs[model_name]
+            backend = self.backend if docker else self.local_backend
+            # Blue/green models run on their slot port behind a front port
+            server_port = config.get("slot_port") or port
+            spec = self.container_spec(model_name, server_port)
+            if self.readiness is not None:
+                self.readiness.serve(backend, spec, model=model_name)
             else:
-                self.task_cli.run("local", model_name=model_name , model_path=self.configs[model_name]["model_path"])
-                
+                backend.serve(spec)
+            if config.get("slot_port") and model_name not in self.fronts:
+                self.fronts[model_name] = FrontPort(port, server_port).start()
         else:
             raise ValueError(f"Model {model_name} not found")
 
+    def build_image(self, model_name: str) -> str:
+        """Build the image of a configured model unless it exists.
+
+        Returns:
+            str: The image
+        """
+        if model_name not in self.configs:
+            raise ValueError(f"Model {model_name} not found")
+        spec = self.container_spec(model_name)
+        if self.backend.build(spec):
+            logger.info(f"Built image {spec.image} for {model_name}")
+        return spec.image
+
+    def warm(self, model_name: str, alias: str) -> str:
+        """Download the model version behind ``alias`` and build its image without serving it.
+
+        The files are fetched into ``.warm/`` and released once the image is
+        built, leaving the blobs in the model store. A later ``add_serve`` or
+        ``update_model`` of the same version then materializes the files from
+        the store and finds the image by its content tag.
+
+        Returns:
+            str: The image
+        """
+        warm_dir = self.desrie_path / ".warm"
+        warm_dir.mkdir(exist_ok=True)
+        model_path, run_id = self.download_model(model_name, alias, warm_dir)
+        try:
+            spec = self.container_spec(model_name, model_path=self.artifact_dir(model_path), run_id=run_id)
+            built = self.backend.build(spec)
+            logger.info(f"{'Built' if built else 'Reusing'} image {spec.image} for {model_name} ({alias})")
+            return spec.image
+        finally:
+            self.store.release(model_path)
+            shutil.rmtree(model_path, ignore_errors=True)
+
     def add_serve(self, model_name: str, alias: str, force: bool = False, docker: bool = True):
         if model_name in self.configs and not force:
             self.run_serve(model_name, docker)
@@ -69,15 +231,25 @@ class EmbeddingManager():
                 logger.info(f"Deleting old model {model_name} from {self.desrie_path}")
                 model_path = self.desrie_path / model_name
                 if model_path.exists():
+                    # Only the links go away, the blobs stay in the store
+                    self.store.release(model_path)
                     shutil.rmtree(model_path)
             
             logger.info(f"Downloading model {model_name} from mlflow")
-            model_path , run_id = get_model(self.mlflow_client, model_name, alias, self.desrie_path, self.artifact_path, self.gcp)
+            model_path , run_id = self.download_model(model_name, alias)
             logger.info(f"Model {model_name} downloaded to {model_path}")
-            self.config_update(EmbeddingConfig(model_name=model_name, alias=alias, model_path=model_path/"serve", run_id=run_id))
+            self.config_update(EmbeddingConfig(model_name=model_name, alias=alias, model_path=self.artifact_dir(model_path), run_id=run_id))
             logger.info(f"Running model {model_name} with alias {alias}")
             self.run_serve(model_name, docker)
     
+    def drop_stale_caches(self, model_name: str) -> None:
+        """Delete the embedding caches of all runs but the configured one.
+
+        Called once the server of the old run is gone, as vectors of other
+        runs can never be served again.
+        """
+        EmbeddingCache.drop_runs(self.cache_dir(model_name), keep=self.configs[model_name]["run_id"])
+
     def new_model_status(self, model_name: str, alias: str):
         try:
             if model_name in self.configs:
@@ -92,20 +264,69 @@ class EmbeddingManager():
             logger.warning(f"Error checking model {model_name} with alias {alias}: {e}")
             return True
     
-    def update_model(self, model_name: str, alias: str,  docker: bool = True):
-        if self.new_model_status(model_name, alias):
-            logger.info(f"Updating model {model_name} with alias {alias}")
-            self.delete_serve(model_name)
-            self.add_serve(model_name, alias, force=True, docker=docker)
-        else:
-            self.run_serve(model_name, docker)
+    def update_model(self, model_name: str, alias: str,  docker: bool = True, port: int = 1111,
+                     blue_green: bool = False) -> Optional[SwapResult]:
+        with MODEL_UPDATE_SECONDS.time(kind="embedding", model=model_name):
+            if blue_green:
+                return BlueGreenDeployer(self, EmbeddingConfig).update(model_name, alias, port)
+            if self.new_model_status(model_name, alias):
+                logger.info(f"Updating model {model_name} with alias {alias}")
+                self.delete_serve(model_name)
+                self.add_serve(model_name, alias, force=True, docker=docker)
+                self.drop_stale_caches(model_name)
+            else:
+                self.run_serve(model_name, docker)
 
     def stop_serve(self, model_name: str):
-        self.task_cli.run("stop", model_name=model_name)
+        spec = self.container_spec(model_name)
+        self.backend.stop(spec)
+        if self.local_backend is not self.backend:
+            self.local_backend.stop(spec)
 
     def delete_serve(self, model_name: str):
-        self.task_cli.run("delete", model_name=model_name)
+        front = self.fronts.pop(model_name, None)
+        if front is not None:
+            front.close()
+        spec = self.container_spec(model_name)
+        self.backend.delete(spec)
+        if self.local_backend is not self.backend:
+            self.local_backend.delete(spec)
     
+    def status(self, model_name: Optional[str] = None) -> Dict[str, dict]:
+        """Report the configured models with their server state and cache statistics.
+
+        Args:
+            model_name: Model to report, all configured models if None
+
+        Returns:
+            Dict[str, dict]: Model names mapped to ``run_id``, ``alias``,
+            ``status`` of the server and ``cache`` hit statistics as last
+            written by the server
+        """
+        names = [model_name] if model_name else list(self.configs)
+        report = {}
+        for name in names:
+            if name not in self.configs:
+                raise ValueError(f"Model {name} not found")
+            config = self.configs[name]
+            spec = self.container_spec(name)
+            state = self.backend.status(spec)
+            if state is None and self.local_backend is not self.backend:
+                state = self.local_backend.status(spec)
+            report[name] = {
+                "run_id": config["run_id"],
+                "alias": config["alias"],
+                "status": state,
+                "cache": EmbeddingCache.read_stats(self.cache_dir(name), config["run_id"]),
+            }
+            cache = report[name]["cache"]
+            if cache:
+                logger.info(f"{name}: {state}, embedding cache hit rate {cache['hit_rate']:.1%} "
+                            f"({cache['disk_entries']} vectors)")
+            else:
+                logger.info(f"{name}: {state}")
+        return report
+
     def delete_all_serve(self):
         for model_name in self.configs:
             self.delete_serve(model_name)
@@ -113,5 +334,3 @@ class EmbeddingManager():
     def stop_all_serve(self):
         for model_name in self.configs:
             self.stop_serve(model_name)
-        
-        
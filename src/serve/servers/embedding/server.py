@@ -0,0 +1,473 @@
+"""First-party embedding server with dynamic micro-batching.
+
+Concurrent requests are queued and encoded together in micro-batches of
+up to ``max_batch_size`` texts, waiting at most ``max_wait_ms`` for a
+batch to fill. Vectors are float32 and can be returned as JSON floats,
+base64 encoded little-endian float32 (``encoding_format: base64``, as in
+the OpenAI API) or one raw float32 matrix
+(``Accept: application/octet-stream``).
+
+Usage:
+    python -m serve.servers.embedding.server --model-path model.gguf --port 1111
+"""
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import base64
+import importlib
+import json
+import queue
+import threading
+import time
+
+import click
+import numpy as np
+from loguru import logger
+
+from serve.servers.embedding.cache import EmbeddingCache
+
+
+# Maps a list of texts to a (len(texts), dim) float32 matrix
+Encoder = Callable[[List[str]], np.ndarray]
+
+EMBEDDING_PATHS = ("/embed", "/embeddings", "/v1/embeddings")
+
+
+class EmbeddingServerError(Exception):
+    """Custom exception for embedding server errors."""
+    pass
+
+
+def llama_encoder(model_path: Union[str, Path], n_threads: int = 4, n_ctx: int = 2048) -> Encoder:
+    """Load a GGUF model with llama.cpp as a mean-pooled sentence encoder.
+
+    Args:
+        model_path: GGUF file
+        n_threads: CPU threads
+        n_ctx: Context size, also the token budget of one batch
+
+    Returns:
+        Encoder: Function embedding a list of texts
+    """
+    try:
+        import llama_cpp
+    except ImportError as e:
+        raise EmbeddingServerError("llama-cpp-python is required for GGUF models") from e
+
+    llama = llama_cpp.Llama(
+        model_path=str(model_path),
+        embedding=True,
+        pooling_type=llama_cpp.LLAMA_POOLING_TYPE_MEAN,
+        n_ctx=n_ctx,
+        n_batch=n_ctx,
+        n_ubatch=n_ctx,
+        n_threads=n_threads,
+        verbose=False
+    )
+
+    def encode(texts: List[str]) -> np.ndarray:
+        return np.asarray(llama.embed(texts), dtype=np.float32)
+
+    return encode
+
+
+def load_encoder(model_path: Union[str, Path], encoder: Optional[str] = None) -> Encoder:
+    """Create the encoder of a model.
+
+    Args:
+        model_path: GGUF file, or a directory searched for one
+        encoder: Optional ``module:factory`` import path; the factory is
+            called with ``model_path`` and returns an ``Encoder``
+
+    Returns:
+        Encoder: Function embedding a list of texts
+
+    Raises:
+        EmbeddingServerError: If no encoder can be created
+    """
+    model_path = Path(model_path)
+    if encoder is not None:
+        module_name, _, factory = encoder.partition(":")
+        if not factory:
+            raise EmbeddingServerError(f"Encoder must look like module:factory, got {encoder}")
+        return getattr(importlib.import_module(module_name), factory)(model_path)
+    if model_path.is_dir():
+        candidates = sorted(model_path.rglob("*.gguf"))
+        if not candidates:
+            raise EmbeddingServerError(f"No GGUF model found in {model_path}")
+        model_path = candidates[0]
+    if not model_path.exists():
+        raise EmbeddingServerError(f"Model not found: {model_path}")
+    return llama_encoder(model_path)
+
+
+class MicroBatcher:
+    """Collects concurrent embedding requests into micro-batches.
+
+    A single thread owns the encoder. It takes the oldest queued request
+    and keeps adding requests until the batch holds ``max_batch_size``
+    texts or ``max_wait_ms`` passed, then encodes the batch in one call.
+    Requests larger than ``max_batch_size`` are encoded in several calls.
+    ``max_batch_size=1`` with ``max_wait_ms=0`` encodes one request per
+    call.
+
+    Attributes:
+        encoder: Function embedding a list of texts
+        max_batch_size: Texts encoded in one call
+        max_wait_ms: Milliseconds a request may wait for a batch to fill
+    """
+
+    def __init__(self, encoder: Encoder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """Start the batching thread.
+
+        Args:
+            encoder: Function embedding a list of texts
+            max_batch_size: Texts encoded in one call
+            max_wait_ms: Milliseconds a request may wait for a batch to fill
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "texts": 0, "batches": 0, "encoder_calls": 0}
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding.
+
+        Returns:
+            Future: Resolves to a ``(len(texts), dim)`` float32 matrix
+        """
+        future: Future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, blocking until their batch is encoded."""
+        return self.submit(texts).result()
+
+    def close(self) -> None:
+        """Encode the queued requests and stop the batching thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the batching counters.
+
+        Returns:
+            Dict[str, float]: ``requests``, ``texts``, ``batches``,
+            ``encoder_calls`` and ``mean_batch_size`` in texts
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats["mean_batch_size"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _run(self) -> None:
+        pending = None
+        closing = False
+        while not closing:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is None:
+                break
+            batch = [item]
+            size = len(item[0])
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    closing = True
+                    break
+                if size + len(nxt[0]) > self.max_batch_size:
+                    pending = nxt
+                    break
+                batch.append(nxt)
+                size += len(nxt[0])
+            self._encode(batch)
+
+    def _encode(self, batch: List[Tuple[List[str], Future]]) -> None:
+        batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        if not batch:
+            return
+        try:
+            chunks = [
+                np.asarray(self.encoder(texts[i:i + self.max_batch_size]), dtype=np.float32)
+                for i in range(0, len(texts), self.max_batch_size)
+            ]
+            vectors = np.concatenate(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+            if len(vectors) != len(texts):
+                raise EmbeddingServerError(f"Encoder returned {len(vectors)} vectors for {len(texts)} texts")
+        except Exception as e:
+            logger.error(f"Failed to encode a batch of {len(texts)} texts: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._counters["requests"] += len(batch)
+            self._counters["texts"] += len(texts)
+            self._counters["batches"] += 1
+            self._counters["encoder_calls"] += len(chunks)
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+
+def encode_vectors(vectors: np.ndarray, encoding_format: str) -> List[Union[List[float], str]]:
+    """Serialize vectors for a JSON response.
+
+    Args:
+        vectors: ``(n, dim)`` float32 matrix
+        encoding_format: ``float`` for JSON numbers, ``base64`` for base64
+            encoded little-endian float32
+
+    Returns:
+        List[Union[List[float], str]]: One entry per vector
+    """
+    if encoding_format == "base64":
+        return [base64.b64encode(v.astype("<f4").tobytes()).decode("ascii") for v in vectors]
+    if encoding_format == "float":
+        return vectors.tolist()
+    raise ValueError(f"Unknown encoding_format {encoding_format}")
+
+
+def decode_base64(data: str) -> np.ndarray:
+    """Decode a base64 embedding back into a float32 vector."""
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, Nagle would hold the body for the delayed ACK
+    disable_nagle_algorithm = True
+    server: "_HTTPServer"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json",
+              headers: Tuple[Tuple[str, str], ...] = ()) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        self._send(status, json.dumps(payload).encode())
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, encoding only those missing from the cache."""
+        cache = self.server.cache
+        if cache is None:
+            return self.server.batcher.embed(texts)
+        cached = cache.lookup(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self.server.batcher.embed(missing_texts)
+            cache.store(missing_texts, encoded)
+            for i, vector in zip(missing, encoded):
+                cached[i] = vector
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            stats = self.server.batcher.stats()
+            if self.server.cache is not None:
+                stats["cache"] = self.server.cache.stats()
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path not in EMBEDDING_PATHS:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            payload = json.loads(body)
+            texts = payload["input"]
+            if isinstance(texts, str):
+                texts = [texts]
+            if not texts or not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError("input must be a string or a non-empty list of strings")
+            encoding_format = payload.get("encoding_format", "float")
+            binary = "application/octet-stream" in (self.headers.get("Accept") or "")
+            if not binary and encoding_format not in ("float", "base64"):
+                raise ValueError(f"Unknown encoding_format {encoding_format}")
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            vectors = self._embed(texts)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        if binary:
+            self._send(200, vectors.astype("<f4").tobytes(), "application/octet-stream", (
+                ("X-Embedding-Count", str(vectors.shape[0])),
+                ("X-Embedding-Dim", str(vectors.shape[1])),
+            ))
+            return
+        data = [
+            {"object": "embedding", "index": i, "embedding": embedding}
+            for i, embedding in enumerate(encode_vectors(vectors, encoding_format))
+        ]
+        self._send_json(200, {"object": "list", "model": self.server.model_name, "data": data})
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients are the point of micro-batching
+    request_queue_size = 1024
+    batcher: MicroBatcher
+    cache: Optional[EmbeddingCache]
+    model_name: str
+
+
+class EmbeddingServer:
+    """HTTP embedding server backed by a ``MicroBatcher``.
+
+    Serves ``/health``, ``/stats`` and POST ``/embed`` (also
+    ``/embeddings`` and ``/v1/embeddings``) with an OpenAI style body
+    ``{"input": ..., "encoding_format": "float" | "base64"}``. With a
+    ``cache``, only texts missing from it are encoded.
+
+    Attributes:
+        batcher: Micro-batcher owning the encoder
+        cache: Optional embedding cache of the served run
+        host: Interface to listen on
+        port: Port to listen on, 0 picks a free one
+        model_name: Model name reported in responses
+    """
+
+    def __init__(
+        self,
+        encoder: Encoder,
+        host: str = "0.0.0.0",  # noqa: S104
+        port: int = 1111,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        model_name: str = "embedding",
+        cache: Optional[EmbeddingCache] = None
+    ):
+        """Initialize the server without listening yet.
+
+        Args:
+            encoder: Function embedding a list of texts
+            host: Interface to listen on
+            port: Port to listen on, 0 picks a free one
+            max_batch_size: Texts encoded in one call
+            max_wait_ms: Milliseconds a request may wait for a batch to fill
+            model_name: Model name reported in responses
+            cache: Optional embedding cache of the served run
+        """
+        self.batcher = MicroBatcher(encoder, max_batch_size, max_wait_ms)
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self.model_name = model_name
+        self._httpd: Optional[_HTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _bind(self) -> _HTTPServer:
+        httpd = _HTTPServer((self.host, self.port), _Handler)
+        httpd.batcher = self.batcher
+        httpd.cache = self.cache
+        httpd.model_name = self.model_name
+        self.port = httpd.server_address[1]
+        self._httpd = httpd
+        return httpd
+
+    def start(self) -> "EmbeddingServer":
+        """Serve in a background thread.
+
+        Returns:
+            EmbeddingServer: self, once the port is bound
+        """
+        httpd = self._bind()
+        self._thread = threading.Thread(target=httpd.serve_forever, name=f"embedding-{self.port}", daemon=True)
+        self._thread.start()
+        logger.info(f"Embedding server listening on {self.host}:{self.port}")
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve in the current thread until interrupted."""
+        httpd = self._bind()
+        logger.info(f"Embedding server listening on {self.host}:{self.port}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            self.batcher.close()
+            if self.cache is not None:
+                self.cache.close()
+
+    def close(self) -> None:
+        """Stop serving and stop the batcher."""
+        if self._httpd is not None and self._thread is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+            self.batcher.close()
+            if self.cache is not None:
+                self.cache.close()
+
+
+@click.command()
+@click.option('--model-path',
+              type=click.Path(exists=True, path_type=Path),
+              required=True,
+              help='GGUF model or directory containing one')
+@click.option('--port', type=int, default=1111, help='Server port')
+@click.option('--host', type=str, default='0.0.0.0', help='Interface to listen on')  # noqa: S104
+@click.option('--max-batch-size', type=click.IntRange(min=1), default=32, help='Texts encoded in one call')
+@click.option('--max-wait-ms', type=click.FloatRange(min=0), default=5.0,
+              help='Milliseconds a request may wait for a batch to fill')
+@click.option('--encoder', type=str, default=None, help='module:factory creating a custom encoder')
+@click.option('--model-name', type=str, default='embedding', help='Model name reported in responses')
+@click.option('--cache-dir', type=click.Path(path_type=Path), default=None,
+              help='Directory of the persistent embedding cache, disabled if unset')
+@click.option('--run-id', type=str, default=None, help='Run ID keying the embedding cache')
+@click.option('--cache-memory-entries', type=click.IntRange(min=0), default=10000,
+              help='Vectors kept in the memory tier of the cache')
+def main(model_path: Path, port: int, host: str, max_batch_size: int, max_wait_ms: float,
+         encoder: Optional[str], model_name: str, cache_dir: Optional[Path], run_id: Optional[str],
+         cache_memory_entries: int) -> None:
+    """Run the micro-batching embedding server."""
+    cache = None
+    if cache_dir is not None:
+        if run_id is None:
+            raise click.BadParameter("--cache-dir needs --run-id")
+        cache = EmbeddingCache(cache_dir, run_id, memory_entries=cache_memory_entries)
+    EmbeddingServer(
+        load_encoder(model_path, encoder), host=host, port=port,
+        max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, model_name=model_name, cache=cache
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
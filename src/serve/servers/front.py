@@ -0,0 +1,191 @@
+from collections import defaultdict
+from typing import Dict, Optional, Set
+import asyncio
+import threading
+import time
+
+from loguru import logger
+
+
+_PIPE_BUFFER = 64 * 1024
+
+
+class FrontPort:
+    """TCP front port forwarding to a switchable local target port.
+
+    Clients connect to ``listen_port``; every new connection is forwarded
+    to the current ``target_port``. ``switch`` changes the target
+    atomically for new connections while open connections stay on the old
+    target until they close, which ``drain`` waits for. The proxy runs on
+    an asyncio loop in a daemon thread of the current process.
+
+    Attributes:
+        listen_port: Public port clients connect to
+        target_port: Local port new connections are forwarded to
+        host: Interface to listen on
+        target_host: Host of the target servers
+    """
+
+    def __init__(
+        self,
+        listen_port: int,
+        target_port: int,
+        host: str = "0.0.0.0",  # noqa: S104
+        target_host: str = "127.0.0.1"
+    ):
+        """Initialize the front port without starting it.
+
+        Args:
+            listen_port: Public port clients connect to
+            target_port: Local port new connections are forwarded to
+            host: Interface to listen on
+            target_host: Host of the target servers
+        """
+        self.listen_port = listen_port
+        self.target_port = target_port
+        self.host = host
+        self.target_host = target_host
+        self._active: Dict[int, int] = defaultdict(int)
+        self._writers: Dict[int, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FrontPort":
+        """Start listening in a background thread.
+
+        Returns:
+            FrontPort: self, once the port is bound
+
+        Raises:
+            OSError: If the port cannot be bound
+        """
+        started = threading.Event()
+        error = []
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._handle, self.host, self.listen_port)
+                )
+            except OSError as e:
+                error.append(e)
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name=f"front-{self.listen_port}", daemon=True)
+        self._thread.start()
+        started.wait()
+        if error:
+            raise error[0]
+        logger.info(f"Front port {self.listen_port} forwarding to {self.target_port}")
+        return self
+
+    def close(self) -> None:
+        """Stop listening and close the event loop."""
+        if self._loop is None or self._server is None:
+            return
+
+        async def shutdown() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._server = None
+
+    def switch(self, target_port: int) -> int:
+        """Send new connections to ``target_port``.
+
+        Args:
+            target_port: New local target port
+
+        Returns:
+            int: The previous target port
+        """
+        with self._lock:
+            previous, self.target_port = self.target_port, target_port
+        logger.info(f"Front port {self.listen_port} switched from {previous} to {target_port}")
+        return previous
+
+    def active(self, target_port: int) -> int:
+        """Return the number of open connections to ``target_port``."""
+        with self._lock:
+            return self._active[target_port]
+
+    def drain(self, target_port: int, timeout: float = 30.0) -> bool:
+        """Wait until no connection to ``target_port`` is open.
+
+        Connections still open after ``timeout``, such as idle keep-alive
+        connections, are closed so their clients reconnect to the current
+        target.
+
+        Args:
+            target_port: Previous target port
+            timeout: Seconds to wait
+
+        Returns:
+            bool: True if drained, False if connections had to be closed
+        """
+        deadline = time.monotonic() + timeout
+        while self.active(target_port) > 0:
+            if time.monotonic() > deadline:
+                logger.warning(f"Closing {self.active(target_port)} connections to {target_port} still open after {timeout}s")
+                self._close_connections(target_port)
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _close_connections(self, target_port: int) -> None:
+        if self._loop is None:
+            return
+        with self._lock:
+            writers = list(self._writers[target_port])
+        for writer in writers:
+            self._loop.call_soon_threadsafe(writer.close)
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                data = await reader.read(_PIPE_BUFFER)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except RuntimeError:
+                pass
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        with self._lock:
+            target_port = self.target_port
+            self._active[target_port] += 1
+        try:
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(self.target_host, target_port)
+            except OSError as e:
+                logger.warning(f"Front port {self.listen_port} cannot reach {target_port}: {str(e)}")
+                client_writer.close()
+                return
+            with self._lock:
+                self._writers[target_port].add(client_writer)
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer)
+            )
+        finally:
+            with self._lock:
+                self._active[target_port] -= 1
+                self._writers[target_port].discard(client_writer)
+                if not self._active[target_port]:
+                    self._writers.pop(target_port, None)
@@ -1,9 +1,12 @@
 import click
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 from loguru import logger
 
 from serve._cli import TaskCLI
+from serve.servers.balancer import LoadBalancer
+from serve.servers.bluegreen import free_port
+from serve.servers.readiness import ReadinessProbe
 
 
 def setup_logger():
@@ -28,6 +31,35 @@ def llama_cpp():
     logger.info("Starting LLaMA.cpp CLI tool")
 
 
+def _start_instances(cli: TaskCLI, instances: List[Tuple[str, int]], started: List[str], **variables) -> None:
+    """Serve each ``(model_id, port)`` instance and wait until all are ready.
+
+    Args:
+        cli: Task runner of the llama.cpp Taskfile
+        instances: Model IDs and ports to serve
+        started: Receives each model ID before its container is started
+        **variables: Task variables shared by every instance
+
+    Raises:
+        RuntimeError: If an instance fails to start
+    """
+    probe = ReadinessProbe()
+    for instance_id, port in instances:
+        started.append(instance_id)
+        result = cli.run("serve", PORT=port, SERVER_PORTS=port, MODEL_ID=instance_id, **variables)
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to start {instance_id}: {result.stderr}")
+    for instance_id, port in instances:
+        probe.wait(f"http://localhost:{port}/health", model=instance_id)
+
+
+def _delete_instances(cli: TaskCLI, model_ids: List[str]) -> None:
+    """Delete the containers of ``model_ids``, logging the ones that fail."""
+    for instance_id in model_ids:
+        if cli.run("delete", MODEL_ID=instance_id).returncode != 0:
+            logger.error(f"Failed to delete replica {instance_id}")
+
+
 @llama_cpp.command()
 @click.option('--model-path', 
               type=click.Path(exists=True, path_type=Path),
@@ -50,12 +82,22 @@ def llama_cpp():
               type=str,
               default='model',
               help='Unique model identifier')
+@click.option('--replicas',
+              type=click.IntRange(min=1),
+              default=1,
+              help='Server replicas behind a load balancer on the server port')
 def serve(model_path: Optional[Path],
          server_port: int,
          ui_port: int,
          model_name: str,
-         model_id: str) -> None:
+         model_id: str,
+         replicas: int) -> None:
     """Start the LLaMA.cpp server with specified configuration.
+
+    With more than one replica, the replicas run as ``<model-id>-<i>`` on
+    free local ports and a load balancer on the server port fans requests
+    out to them. The command then keeps running the balancer until
+    interrupted.
     
     Args:
         model_path: Directory containing the model file
@@ -63,6 +105,7 @@ def serve(model_path: Optional[Path],
         ui_port: Port for the web UI (1024-65535)
         model_name: Name of the model file
         model_id: Unique identifier for this model instance
+        replicas: Number of server replicas
     """
     try:
         cli = TaskCLI(Path(__file__).parent)
@@ -78,15 +121,34 @@ def serve(model_path: Optional[Path],
             
         logger.info(f"Starting LLaMA.cpp server with model {model_name} at {model_path}")
         
-        cli.run("serve",
-                MODEL_PATH=model_path.absolute(),
-                SERVER_PORTS=server_port,
-                UI_PORT=ui_port,
-                MODEL_NAME=model_name,
-                MODEL_ID=model_id)
-                
-        logger.info(f"Server started successfully with model ID: {model_id}")
-        
+        if replicas == 1:
+            instances = [(model_id, server_port)]
+        else:
+            instances = [(f"{model_id}-{i}", free_port()) for i in range(replicas)]
+
+        started: List[str] = []
+        balancer = None
+        try:
+            _start_instances(cli, instances, started,
+                             MODEL_PATH=model_path.absolute(),
+                             UI_PORT=ui_port,
+                             MODEL_NAME=model_name)
+
+            logger.info(f"Server started successfully with model ID: {model_id}")
+
+            if replicas > 1:
+                balancer = LoadBalancer(server_port, [port for _, port in instances]).start()
+                logger.info(f"Balancing {replicas} replicas on port {server_port}, press Ctrl-C to stop")
+                balancer.join()
+        except KeyboardInterrupt:
+            logger.info("Interrupted, stopping the replicas")
+        finally:
+            # A single server keeps running detached, replicas only live as long as their balancer
+            if balancer is not None:
+                balancer.close()
+            if replicas > 1:
+                _delete_instances(cli, started)
+
     except Exception as e:
         logger.error(f"Failed to start server: {str(e)}")
         raise click.ClickException(str(e))
@@ -1,15 +1,26 @@
 import os
 from pathlib import Path
 import shutil
-from typing import Optional, List, Union, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, List, Union, Dict, Tuple
 from loguru import logger
 
 from pydantic import BaseModel 
-from serve._cli.task import TaskCLI
+from serve.servers.backends import ContainerBackend, ContainerSpec, get_backend
 from mlflow import MlflowClient
-import json
 from serve.utils.mlflow.model import get_model, get_model_run_id
+from serve.utils.config_store import ConfigStore
+from serve.utils.gcs.download import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
+from serve.utils.model_store import ModelStore
+from serve.servers.readiness import MODEL_UPDATE_SECONDS, ColdStartHistogram, ReadinessProbe
+from serve.servers.balancer import LoadBalancer
+from serve.servers.bluegreen import BlueGreenDeployer, SwapResult
+from serve.servers.front import FrontPort
+from serve.utils import tracing
+from serve.utils.response_cache import ResponseCache
 
+if TYPE_CHECKING:
+    from serve.servers.rollout import RolloutReport, RolloutTarget
 
 
 class LlamaCppConfig(BaseModel):
@@ -17,47 +28,179 @@ class LlamaCppConfig(BaseModel):
     alias: str
     model_path: Path
     run_id: str
+    slot: Optional[str] = None
+    slot_port: Optional[int] = None
 
     def model_dump(self):
-        return {
+        config = {
             "model_name": self.model_name,
             "alias": self.alias,
             "model_path": str(self.model_path),
             "run_id": self.run_id
         }
+        if self.slot is not None:
+            config["slot"] = self.slot
+            config["slot_port"] = self.slot_port
+        return config
+CONTAINER_NAME = "lmorbits-llamacpp"
+IMAGE_NAME = "ghcr.io/ggerganov/llama.cpp:server"
+
+
 class LlamaCppServer():
 
-    def __init__(self , desrie_path: Path, mlflow_client: MlflowClient , gcp: bool = False):
+    def __init__(self , desrie_path: Path, mlflow_client: MlflowClient , gcp: bool = False, store_budget: Optional[int] = None,
+                 backend: Union[str, ContainerBackend] = "task", readiness_timeout: Optional[float] = 300.0,
+                 response_cache: Optional[ResponseCache] = None,
+                 download_workers: int = DEFAULT_MAX_WORKERS, download_chunk_size: int = DEFAULT_CHUNK_SIZE):
         Path(desrie_path).mkdir(parents=True, exist_ok=True)
         configs_dir = Path(desrie_path) / "lm_configs.json"
         self.condir = configs_dir
-        if not configs_dir.exists():
-            configs = {}
-            with open(configs_dir, "w") as f:
-                json.dump(configs, f)
-        self.configs = self.get_configs()
+        # Shared with other processes managing the same directory
+        self.config_store = ConfigStore(configs_dir)
+        self.config_store.ensure()
         self.desrie_path = Path(desrie_path).resolve().absolute()
         self.mlflow_client = mlflow_client
-        self.task_cli = TaskCLI(Path(__file__).parent)
+        if isinstance(backend, str):
+            backend = get_backend(backend, Path(__file__).parent, self.desrie_path / ".run")
+        self.backend = backend
+        # None leaves readiness to the caller
+        self.readiness = None
+        if readiness_timeout is not None:
+            self.readiness = ReadinessProbe(
+                timeout=readiness_timeout,
+                histogram=ColdStartHistogram(self.desrie_path / "cold_starts.json")
+            )
         self.artifact_path = "model_path"
+        self.store = ModelStore(self.desrie_path / ".store", budget_bytes=store_budget)
+        # Concurrent byte-range streams and their size of GCS downloads
+        self.download_workers = download_workers
+        self.download_chunk_size = download_chunk_size
+        # Front ports of blue/green models, living in this process
+        self.fronts: Dict[str, FrontPort] = {}
+        # Caching endpoints of models, keyed by the configured run ID
+        self.response_cache = response_cache
+        self.cache_fronts: Dict[str, LoadBalancer] = {}
+
+    @property
+    def configs(self):
+        """Read-only view of the model configs, reloaded when the file changes."""
+        return self.config_store.view()
 
     def get_configs(self):
-        with open(self.condir, "r") as f:
-            configs = json.load(f) 
-        return configs
+        return self.config_store.all()
     
     def config_update(self, config: LlamaCppConfig):
-        self.configs = self.get_configs()
-        self.configs[config.model_name] = config.model_dump()
-        with open(self.condir, "w") as f:
-            json.dump(self.configs, f, indent=4)
+        self.config_store.put(config.model_name, config.model_dump())
+
+    def config_remove(self, model_name: str):
+        self.config_store.remove(model_name)
+
+    def artifact_dir(self, model_dir: Path) -> Path:
+        """Return the directory holding model.gguf inside a downloaded model."""
+        return Path(model_dir) / self.artifact_path / "artifacts"
+
+    def container_spec(self, model_name: str, port: int = 8080, slot: Optional[str] = None,
+                       model_path: Optional[Path] = None, run_id: Optional[str] = None) -> ContainerSpec:
+        """Describe the llama.cpp server of a model for the backend.
+
+        Args:
+            model_name: Model name
+            port: Host port of the server
+            slot: Blue/green slot, defaults to the configured one
+            model_path: Directory holding model.gguf, defaults to the configured one
+            run_id: Run ID of the model, unused as the image does not depend on it
+        """
+        config = self.configs.get(model_name, {})
+        slot = slot or config.get("slot")
+        if model_path is None:
+            model_path = self.desrie_path / config["model_path"] if config else self.desrie_path / model_name
+        model_id = f"{model_name}-{slot}" if slot else model_name
+        return ContainerSpec(
+            name=f"{CONTAINER_NAME}-{model_id}",
+            image=IMAGE_NAME,
+            command=["-m", "/models/model.gguf"],
+            ports={port: 8080},
+            volumes={str(model_path): "/models"},
+            local_command=["llama-server", "-m", str(model_path / "model.gguf"), "--port", str(port)],
+            task_vars={"model_id": model_id, "model_path": model_path, "port": port},
+            health_url=f"http://127.0.0.1:{port}/health"
+        )
 
     def run_serve(self, model_name: str, port: int = 8080):
         if model_name in self.configs:
-            self.task_cli.run("serve", model_id=model_name , model_path=self.desrie_path / self.configs[model_name]["model_path"], port=port)
+            config = self.configs[model_name]
+            # Blue/green models run on their slot port behind a front port
+            server_port = config.get("slot_port") or port
+            spec = self.container_spec(model_name, server_port)
+            with tracing.span("llamacpp.run_serve", model=model_name, port=server_port):
+                if self.readiness is not None:
+                    self.readiness.serve(self.backend, spec, model=model_name)
+                else:
+                    with tracing.span("backend.serve", container=spec.name, backend=type(self.backend).__name__):
+                        self.backend.serve(spec)
+                if config.get("slot_port") and model_name not in self.fronts:
+                    self.fronts[model_name] = FrontPort(port, server_port).start()
         else:
             raise ValueError(f"Model {model_name} not found")
 
+    def serve_cached(self, model_name: str, port: int, upstream_port: int = 8080) -> LoadBalancer:
+        """Serve a model's endpoints through the response cache on another port.
+
+        Greedy requests are keyed by the model's configured run ID, so
+        entries of a previous run are never served once ``update_model``
+        changed it. The endpoint outlives container restarts and updates
+        until ``close_cached`` is called.
+
+        Args:
+            model_name: Model name
+            port: Port of the caching endpoint
+            upstream_port: Public port of the model
+
+        Returns:
+            LoadBalancer: The running caching endpoint
+        """
+        if self.response_cache is None:
+            raise ValueError("No response cache configured")
+        if model_name not in self.configs:
+            raise ValueError(f"Model {model_name} not found")
+        if model_name in self.cache_fronts:
+            return self.cache_fronts[model_name]
+        front = LoadBalancer(
+            port, [upstream_port], cache=self.response_cache,
+            run_id=lambda: self.configs.get(model_name, {}).get("run_id")
+        ).start()
+        self.cache_fronts[model_name] = front
+        return front
+
+    def close_cached(self, model_name: str):
+        front = self.cache_fronts.pop(model_name, None)
+        if front is not None:
+            front.close()
+
+    def _gcp_enabled(self) -> bool:
+        credentials = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        mlflow_gcp = os.getenv("MLFLOW_GCS_BUCKET")
+        gcp = False
+        if mlflow_gcp is not None or credentials is not None:
+            if mlflow_gcp is None:
+                logger.info("No MLFLOW_GCS_BUCKET environment variable found, using default model path")
+            if credentials is None:
+                logger.info("No GOOGLE_APPLICATION_CREDENTIALS environment variable found, using default model path")
+            else:
+                logger.info("Using GCP credentials and GCS bucket")
+                gcp = True
+        return gcp
+
+    def download_model(self, model_name: str, alias: str, desired_path: Optional[Path] = None) -> Tuple[Path, str]:
+        """Download the model version behind ``alias`` into ``desired_path/model_name``.
+
+        Returns:
+            Tuple[Path, str]: Model directory and run ID
+        """
+        return get_model(self.mlflow_client, model_name, alias, desired_path or self.desrie_path,
+                         self.artifact_path, self._gcp_enabled(), store=self.store,
+                         max_workers=self.download_workers, chunk_size=self.download_chunk_size)
+
     def add_serve(self, model_name: str, alias: str, force: bool = False ,port: int = 8080):
         if model_name in self.configs and not force:
             self.run_serve(model_name , port)
@@ -67,23 +210,16 @@ class LlamaCppServer():
                 logger.info(f"Deleting old model {model_name} from {self.desrie_path}")
                 model_path = self.desrie_path / model_name
                 if model_path.exists():
-                    shutil.rmtree(model_path)
+                    with tracing.span("llamacpp.remove_files", model=model_name):
+                        # Only the links go away, the blobs stay in the store
+                        self.store.release(model_path)
+                        shutil.rmtree(model_path)
             
             logger.info(f"Downloading model {model_name} from mlflow")
-            credentials = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            mlflow_gcp = os.getenv("MLFLOW_GCS_BUCKET")
-            gcp = False
-            if mlflow_gcp is not None or credentials is not None:
-                if mlflow_gcp is None:
-                    logger.info("No MLFLOW_GCS_BUCKET environment variable found, using default model path")
-                if credentials is None:
-                    logger.info("No GOOGLE_APPLICATION_CREDENTIALS environment variable found, using default model path")
-                else:
-                    logger.info("Using GCP credentials and GCS bucket")
-                    gcp = True
-            model_path , run_id = get_model(self.mlflow_client, model_name, alias, self.desrie_path, self.artifact_path, gcp)
+            model_path , run_id = self.download_model(model_name, alias)
             logger.info(f"Model {model_name} downloaded to {model_path}")
-            self.config_update(LlamaCppConfig(model_name=model_name, alias=alias, model_path=model_path/"model_path"/"artifacts", run_id=run_id))
+            with tracing.span("llamacpp.config_update", model=model_name):
+                self.config_update(LlamaCppConfig(model_name=model_name, alias=alias, model_path=self.artifact_dir(model_path), run_id=run_id))
             logger.info(f"Running model {model_name} with alias {alias}")
             self.run_serve(model_name , port)
     
@@ -101,26 +237,41 @@ class LlamaCppServer():
             logger.warning(f"Error checking model {model_name} with alias {alias}: {e}")
             return True
     
-    def update_model(self, model_name: str, alias: str , port: int = 8080):
-        if self.new_model_status(model_name, alias):
-            logger.info(f"Updating model {model_name} with alias {alias}")
-            self.delete_serve(model_name)
-            self.add_serve(model_name, alias, force=True, port=port)
-        else:
-            self.run_serve(model_name)
+    def update_model(self, model_name: str, alias: str , port: int = 8080, blue_green: bool = False) -> Optional[SwapResult]:
+        with MODEL_UPDATE_SECONDS.time(kind="llamacpp", model=model_name), \
+                tracing.span("llamacpp.update_model", model=model_name, alias=alias, blue_green=blue_green):
+            if blue_green:
+                return BlueGreenDeployer(self, LlamaCppConfig).update(model_name, alias, port)
+            if self.new_model_status(model_name, alias):
+                logger.info(f"Updating model {model_name} with alias {alias}")
+                self.delete_serve(model_name)
+                self.add_serve(model_name, alias, force=True, port=port)
+            else:
+                self.run_serve(model_name)
 
     def stop_serve(self, model_name: str):
-        self.task_cli.run("stop", model_id=model_name)
+        self.backend.stop(self.container_spec(model_name))
 
     def delete_serve(self, model_name: str):
-        self.task_cli.run("delete", model_id=model_name)
+        with tracing.span("llamacpp.delete_serve", model=model_name):
+            front = self.fronts.pop(model_name, None)
+            if front is not None:
+                front.close()
+            self.backend.delete(self.container_spec(model_name))
     
-    def delete_all_serve(self):
-        for model_name in self.configs:
-            self.delete_serve(model_name)
+    def delete_all_serve(self, max_workers: int = 8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(tracing.propagate(self.delete_serve), list(self.configs)))
     
-    def stop_all_serve(self):
-        for model_name in self.configs:
-            self.stop_serve(model_name)
+    def stop_all_serve(self, max_workers: int = 8):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(tracing.propagate(self.stop_serve), list(self.configs)))
+
+    def rollout(self, targets: List["RolloutTarget"], network_concurrency: int = 4,
+                start_concurrency: int = 2) -> "RolloutReport":
+        """Update and start many models concurrently, see ``RolloutOrchestrator``."""
+        from serve.servers.rollout import RolloutOrchestrator
+
+        return RolloutOrchestrator(self, network_concurrency, start_concurrency).rollout(targets)
 
    
@@ -0,0 +1,267 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+import json
+import math
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from loguru import logger
+
+from serve.servers.backends import ContainerBackend, ContainerSpec
+from serve.utils import metrics, tracing
+
+
+# Upper bounds in seconds of the cold-start histogram buckets
+COLD_START_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, math.inf]
+
+# Container events that mean the server will never become ready
+_FATAL_EVENTS = {"die", "oom", "destroy"}
+
+COLD_START_SECONDS = metrics.histogram(
+    "serve_cold_start_duration_seconds", "Seconds from a server start request until it is ready", ["model"],
+    buckets=COLD_START_BUCKETS
+)
+START_FAILURES = metrics.counter(
+    "serve_start_failures_total", "Servers that did not become ready", ["model"]
+)
+MODEL_UPDATE_SECONDS = metrics.histogram(
+    "serve_model_update_duration_seconds", "Seconds update_model took, download and restart included",
+    ["kind", "model"], buckets=COLD_START_BUCKETS
+)
+
+
+class ReadinessError(Exception):
+    """Custom exception for servers that did not become ready."""
+    pass
+
+
+class ColdStartHistogram:
+    """Per-model histogram of start-to-ready durations.
+
+    Counts are cumulative like Prometheus histograms: bucket ``le`` counts
+    every observation of at most ``le`` seconds. With ``path`` set, the
+    histogram is persisted as JSON after each observation so it
+    accumulates across CLI invocations.
+
+    Attributes:
+        path: Optional JSON file holding the histogram
+        buckets: Upper bounds of the buckets in seconds
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, buckets: Optional[List[float]] = None):
+        """Initialize the histogram, loading persisted observations.
+
+        Args:
+            path: Optional JSON file holding the histogram
+            buckets: Upper bounds of the buckets in seconds
+        """
+        self.path = Path(path) if path else None
+        self.buckets = buckets or COLD_START_BUCKETS
+        self._lock = threading.Lock()
+        self._models: Dict[str, dict] = {}
+        if self.path is not None and self.path.exists():
+            with open(self.path, "r") as f:
+                self._models = json.load(f)
+
+    def _empty(self) -> dict:
+        return {"buckets": {str(le): 0 for le in self.buckets}, "count": 0, "sum": 0.0}
+
+    def observe(self, model: str, seconds: float) -> None:
+        """Record one start-to-ready duration.
+
+        Args:
+            model: Model name
+            seconds: Duration from start request to ready
+        """
+        with self._lock:
+            entry = self._models.setdefault(model, self._empty())
+            for le in self.buckets:
+                if seconds <= le:
+                    entry["buckets"][str(le)] += 1
+            entry["count"] += 1
+            entry["sum"] += seconds
+            if self.path is not None:
+                tmp_path = self.path.with_name(self.path.name + ".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(self._models, f, indent=4)
+                os.replace(tmp_path, self.path)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Return the histogram of every model.
+
+        Returns:
+            Dict[str, dict]: Model names mapped to ``buckets`` (bound to
+            cumulative count), ``count`` and ``sum``
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._models))
+
+
+class _EventWaker:
+    """Consumes container events in a thread and wakes the prober."""
+
+    def __init__(self, events: Iterable[dict]):
+        self.wake = threading.Event()
+        self.fatal: Optional[str] = None
+        self._events = events
+        self._thread = threading.Thread(target=self._run, args=(events,), daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop consuming events if the stream supports it."""
+        close = getattr(self._events, "close", None)
+        if close is not None:
+            close()
+
+    def _run(self, events: Iterable[dict]) -> None:
+        try:
+            for event in events:
+                action = str(event.get("Action", event.get("status", "")))
+                if action in _FATAL_EVENTS:
+                    self.fatal = action
+                self.wake.set()
+        except Exception as e:
+            logger.debug(f"Container event stream ended: {str(e)}")
+
+
+class ReadinessProbe:
+    """Waits for a server's health endpoint with exponential backoff.
+
+    Polling starts after ``initial_delay`` and doubles the delay up to
+    ``max_delay``, so fast starts are detected within milliseconds while
+    slow model loads are polled about once per ``max_delay``. An optional
+    container event stream wakes the probe early on container state
+    changes and aborts it when the container dies.
+
+    Attributes:
+        timeout: Overall seconds to wait before giving up
+        initial_delay: First delay between polls in seconds
+        max_delay: Upper bound of the delay between polls in seconds
+        histogram: Cold-start durations recorded per model
+    """
+
+    def __init__(
+        self,
+        timeout: float = 300.0,
+        initial_delay: float = 0.005,
+        max_delay: float = 1.0,
+        histogram: Optional[ColdStartHistogram] = None
+    ):
+        """Initialize the probe.
+
+        Args:
+            timeout: Overall seconds to wait before giving up
+            initial_delay: First delay between polls in seconds
+            max_delay: Upper bound of the delay between polls in seconds
+            histogram: Histogram recording cold starts, a fresh in-memory
+                one by default
+        """
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.histogram = histogram or ColdStartHistogram()
+
+    @staticmethod
+    def check(url: str, timeout: float = 2.0) -> bool:
+        """Probe a health endpoint once.
+
+        Args:
+            url: Health endpoint URL
+            timeout: Request timeout in seconds
+
+        Returns:
+            bool: True if the endpoint answered with status 200
+        """
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:  # noqa: S310
+                return response.status == 200
+        except (urllib.error.URLError, OSError, ValueError):
+            return False
+
+    def wait(
+        self,
+        url: str,
+        model: Optional[str] = None,
+        events: Optional[Iterable[dict]] = None,
+        started_at: Optional[float] = None
+    ) -> float:
+        """Block until ``url`` answers with status 200.
+
+        Args:
+            url: Health endpoint URL
+            model: Model name to record the cold start under, None to skip
+                recording
+            events: Optional container event stream waking the probe
+            started_at: ``time.monotonic()`` of the start request, defaults
+                to now
+
+        Returns:
+            float: Seconds from ``started_at`` until ready
+
+        Raises:
+            ReadinessError: If the server is not ready within ``timeout``
+                or its container died
+        """
+        started_at = time.monotonic() if started_at is None else started_at
+        deadline = started_at + self.timeout
+        waker = _EventWaker(events) if events is not None else None
+        delay = self.initial_delay
+        polls = 0
+        try:
+            while True:
+                polls += 1
+                if self.check(url, timeout=min(2.0, max(0.1, deadline - time.monotonic()))):
+                    break
+                if waker is not None and waker.fatal is not None:
+                    START_FAILURES.inc(model=model or "")
+                    raise ReadinessError(f"Container {waker.fatal} before {url} became ready")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    START_FAILURES.inc(model=model or "")
+                    raise ReadinessError(f"{url} not ready after {self.timeout:.0f}s")
+                if waker is not None:
+                    waker.wake.wait(min(delay, remaining))
+                    waker.wake.clear()
+                else:
+                    time.sleep(min(delay, remaining))
+                delay = min(delay * 2, self.max_delay)
+        finally:
+            if waker is not None:
+                waker.close()
+
+        elapsed = time.monotonic() - started_at
+        logger.info(f"{url} ready after {elapsed:.3f}s ({polls} polls)")
+        if model is not None:
+            self.histogram.observe(model, elapsed)
+            COLD_START_SECONDS.observe(elapsed, model=model)
+        return elapsed
+
+    def serve(self, backend: ContainerBackend, spec: ContainerSpec, model: Optional[str] = None) -> float:
+        """Start a server through ``backend`` and wait until it is ready.
+
+        The cold start is only recorded if the server was not already
+        answering before the start request.
+
+        Args:
+            backend: Backend starting the server
+            spec: Server to start, must have a ``health_url``
+            model: Model name to record the cold start under
+
+        Returns:
+            float: Seconds from the start request until ready
+
+        Raises:
+            ReadinessError: If the server does not become ready
+        """
+        if spec.health_url is None:
+            raise ReadinessError(f"No health URL configured for {spec.name}")
+        warm = self.check(spec.health_url)
+        started_at = time.monotonic()
+        with tracing.span("backend.serve", container=spec.name, backend=type(backend).__name__, warm=warm):
+            backend.serve(spec)
+        events = backend.events(spec, until=time.time() + self.timeout)
+        with tracing.span("readiness.wait", url=spec.health_url):
+            return self.wait(spec.health_url, model=None if warm else model, events=events, started_at=started_at)
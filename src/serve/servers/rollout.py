@@ -0,0 +1,234 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+import shutil
+import threading
+import time
+
+from loguru import logger
+
+from serve.servers.llamacpp.serve import LlamaCppConfig, LlamaCppServer
+from serve.utils import tracing
+
+
+PHASES = ["check", "download", "swap", "start"]
+
+
+@dataclass
+class RolloutTarget:
+    """A model to bring to the version behind an alias."""
+    model_name: str
+    alias: str
+    port: int = 8080
+
+
+@dataclass
+class ModelRolloutResult:
+    """Outcome of one model in a rollout.
+
+    Attributes:
+        model_name: Model name
+        status: ``updated``, ``unchanged``, ``failed`` (nothing changed) or
+            ``rolled_back`` (the previous version was restored)
+        phases: Seconds spent in each phase, including waits for a slot
+        run_id: Run ID serving after the rollout
+        error: Error message if the rollout of this model failed
+    """
+    model_name: str
+    status: str = "unchanged"
+    phases: Dict[str, float] = field(default_factory=dict)
+    run_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class RolloutReport:
+    """Per-model results and wall time of a rollout."""
+    results: List[ModelRolloutResult]
+    wall_seconds: float
+
+    @property
+    def failed(self) -> List[ModelRolloutResult]:
+        return [r for r in self.results if r.status in ("failed", "rolled_back")]
+
+    def phase_totals(self) -> Dict[str, float]:
+        """Return the summed seconds of each phase over all models."""
+        return {phase: sum(r.phases.get(phase, 0.0) for r in self.results) for phase in PHASES}
+
+    def summary(self) -> str:
+        """Format the report as a table of phase timings per model."""
+        header = f"{'model':<30} {'status':<12}" + "".join(f"{phase:>10}" for phase in PHASES)
+        lines = [header, "-" * len(header)]
+        for r in self.results:
+            timings = "".join(f"{r.phases.get(phase, 0.0):>10.2f}" for phase in PHASES)
+            lines.append(f"{r.model_name:<30} {r.status:<12}{timings}")
+            if r.error:
+                lines.append(f"    error: {r.error}")
+        totals = self.phase_totals()
+        lines.append("-" * len(header))
+        lines.append(f"{'total (sum)':<30} {'':<12}" + "".join(f"{totals[phase]:>10.2f}" for phase in PHASES))
+        lines.append(f"wall time: {self.wall_seconds:.2f}s")
+        return "\n".join(lines)
+
+
+class RolloutOrchestrator:
+    """Updates and starts many llama.cpp models concurrently.
+
+    Every model runs through check, download, swap and start. Checks and
+    downloads share ``network_concurrency`` slots; container starts, which
+    load a model into RAM, share ``start_concurrency`` slots. New versions
+    are downloaded into a staging directory while the old container keeps
+    serving, so a failed download changes nothing. If the new version
+    fails to start, only that model is rolled back to its previous files,
+    config and container.
+
+    Attributes:
+        server: Server whose models are rolled out
+        network_concurrency: Concurrent checks and downloads
+        start_concurrency: Concurrent container starts
+    """
+
+    def __init__(self, server: LlamaCppServer, network_concurrency: int = 4, start_concurrency: int = 2):
+        """Initialize the orchestrator.
+
+        Args:
+            server: Server whose models are rolled out
+            network_concurrency: Concurrent checks and downloads
+            start_concurrency: Concurrent container starts
+        """
+        self.server = server
+        self.network_concurrency = network_concurrency
+        self.start_concurrency = start_concurrency
+        self._network = threading.Semaphore(network_concurrency)
+        self._start = threading.Semaphore(start_concurrency)
+        self.staging_dir = server.desrie_path / ".staging"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def rollout(self, targets: List[RolloutTarget]) -> RolloutReport:
+        """Roll out all targets and wait for them to finish.
+
+        Args:
+            targets: Models to update and start
+
+        Returns:
+            RolloutReport: Per-model results with phase timings
+        """
+        started = time.perf_counter()
+        max_workers = max(1, min(len(targets), self.network_concurrency + self.start_concurrency))
+        with tracing.span("rollout", models=len(targets)), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Spans of every model nest under the rollout
+            results = list(executor.map(tracing.propagate(self._rollout_one), targets))
+        report = RolloutReport(results=results, wall_seconds=time.perf_counter() - started)
+        logger.info(f"Rollout finished\n{report.summary()}")
+        return report
+
+    def _rollout_one(self, target: RolloutTarget) -> ModelRolloutResult:
+        """Run all phases for one model in a span recording its outcome."""
+        with tracing.span("rollout.model", model=target.model_name, alias=target.alias) as span:
+            result = self._roll_out(target)
+            span.set_attribute("status", result.status)
+            if result.error:
+                span.set_attribute("error", result.error)
+            return result
+
+    def _roll_out(self, target: RolloutTarget) -> ModelRolloutResult:
+        """Run all phases for one model, rolling back on failure."""
+        server = self.server
+        name = target.model_name
+        result = ModelRolloutResult(model_name=name)
+        phase = "check"
+        clock = time.perf_counter()
+        old_config = server.get_configs().get(name)
+        staged_dir = self.staging_dir / name
+        backup_dir = self.staging_dir / f"{name}.old"
+        swapped = False
+
+        def finish_phase(next_phase: str) -> None:
+            nonlocal phase, clock
+            now = time.perf_counter()
+            result.phases[phase] = now - clock
+            phase, clock = next_phase, now
+
+        try:
+            with self._network:
+                changed = server.new_model_status(name, target.alias)
+            if not changed:
+                finish_phase("start")
+                with self._start:
+                    server.run_serve(name, target.port)
+                finish_phase("done")
+                result.run_id = old_config["run_id"]
+                return result
+
+            finish_phase("download")
+            if staged_dir.exists():
+                server.store.release(staged_dir)
+                shutil.rmtree(staged_dir)
+            with self._network:
+                _, run_id = server.download_model(name, target.alias, self.staging_dir)
+
+            finish_phase("swap")
+            final_dir = server.desrie_path / name
+            swapped = True
+            server.delete_serve(name)
+            with tracing.span("rollout.swap", model=name):
+                if backup_dir.exists():
+                    server.store.release(backup_dir)
+                    shutil.rmtree(backup_dir)
+                if final_dir.exists():
+                    server.store.move(final_dir, backup_dir)
+                server.store.move(staged_dir, final_dir)
+                server.config_update(LlamaCppConfig(
+                    model_name=name, alias=target.alias,
+                    model_path=server.artifact_dir(final_dir), run_id=run_id
+                ))
+
+            finish_phase("start")
+            with self._start:
+                server.run_serve(name, target.port)
+            finish_phase("done")
+
+            if backup_dir.exists():
+                server.store.release(backup_dir)
+                shutil.rmtree(backup_dir)
+            result.status = "updated"
+            result.run_id = run_id
+            return result
+
+        except Exception as e:
+            finish_phase("done")
+            logger.error(f"Rollout of {name} failed: {str(e)}")
+            result.error = str(e)
+            result.status = "failed"
+            if swapped:
+                self._roll_back(target, old_config, backup_dir)
+                result.status = "rolled_back"
+                result.run_id = old_config["run_id"] if old_config else None
+            elif staged_dir.exists():
+                server.store.release(staged_dir)
+                shutil.rmtree(staged_dir)
+            return result
+
+    def _roll_back(self, target: RolloutTarget, old_config: Optional[dict], backup_dir: Path) -> None:
+        """Restore the previous files, config and container of a model."""
+        server = self.server
+        name = target.model_name
+        final_dir = server.desrie_path / name
+        try:
+            with tracing.span("rollout.roll_back", model=name):
+                server.delete_serve(name)
+                if final_dir.exists() and (backup_dir.exists() or old_config is None):
+                    server.store.release(final_dir)
+                    shutil.rmtree(final_dir)
+                if backup_dir.exists():
+                    server.store.move(backup_dir, final_dir)
+                if old_config is None:
+                    server.config_remove(name)
+                    return
+                server.config_update(LlamaCppConfig(**old_config))
+                with self._start:
+                    server.run_serve(name, target.port)
+            logger.info(f"Rolled back {name} to run {old_config['run_id']}")
+        except Exception as e:
+            logger.error(f"Rollback of {name} failed: {str(e)}")
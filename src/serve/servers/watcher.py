@@ -0,0 +1,319 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import json
+import os
+import random
+import shutil
+import threading
+import time
+
+import click
+from loguru import logger
+
+from serve.servers.backends import BACKENDS
+from serve.utils.mlflow.registry import RegistryClient
+
+
+@dataclass
+class WatchState:
+    """Polling state and timings of one watched model.
+
+    Attributes:
+        kind: Name of the manager serving the model
+        model_name: Model name
+        alias: Registry alias followed
+        run_id: Run ID serving
+        last_check: UNIX time of the last registry check
+        last_check_seconds: Duration of the last check
+        last_swap: UNIX time the last update finished
+        last_swap_seconds: Duration of the last update, pre-download included
+        last_download_seconds: Duration of the last pre-download
+        next_check: UNIX time of the next check
+        failures: Consecutive failed checks or updates
+        last_error: Error of the last failure
+    """
+    kind: str
+    model_name: str
+    alias: str
+    run_id: Optional[str] = None
+    last_check: Optional[float] = None
+    last_check_seconds: Optional[float] = None
+    last_swap: Optional[float] = None
+    last_swap_seconds: Optional[float] = None
+    last_download_seconds: Optional[float] = None
+    next_check: float = 0.0
+    failures: int = 0
+    last_error: Optional[str] = None
+
+
+class UpdateWatcher:
+    """Background daemon updating served models when their alias moves.
+
+    Every model in the configs of the managers (``lm_configs.json`` of a
+    ``LlamaCppServer``, ``embedding_configs.json`` of an
+    ``EmbeddingManager``) is checked against the registry every
+    ``interval`` seconds, spread by ``jitter`` so checks of many models do
+    not line up. Due models are resolved in one concurrent round of
+    ``RegistryClient.get_many``. A moved alias has its new run downloaded
+    into the model store under ``.prefetch`` while the old version keeps
+    serving; the manager's ``update_model`` then swaps, materializing the
+    files from the store instead of downloading them. Failed checks and
+    updates back off exponentially up to ``max_backoff``.
+
+    Downloads run on at most ``concurrency`` threads. Swaps of one manager
+    run one at a time, as the managers rewrite their config file.
+
+    Attributes:
+        managers: Manager names mapped to ``LlamaCppServer`` or ``EmbeddingManager``
+        interval: Seconds between checks of a model
+        jitter: Fraction of ``interval`` checks are randomly moved by
+        max_backoff: Upper bound of the retry delay after failures
+        concurrency: Models downloaded and swapped at once
+        blue_green: Whether swaps go through ``BlueGreenDeployer``
+        ports: Public port of each model, the manager default otherwise
+        status_path: JSON file receiving ``status`` after every round
+    """
+
+    def __init__(self, managers: Dict[str, Any], interval: float = 60.0, jitter: float = 0.1,
+                 max_backoff: float = 900.0, concurrency: int = 2, blue_green: bool = False,
+                 ports: Optional[Dict[str, int]] = None, status_path: Optional[Union[str, Path]] = None,
+                 seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        """Initialize the watcher.
+
+        Args:
+            managers: Manager names mapped to ``LlamaCppServer`` or ``EmbeddingManager``
+            interval: Seconds between checks of a model
+            jitter: Fraction of ``interval`` checks are randomly moved by
+            max_backoff: Upper bound of the retry delay after failures
+            concurrency: Models downloaded and swapped at once
+            blue_green: Whether swaps go through ``BlueGreenDeployer``
+            ports: Public port of each model, the manager default otherwise
+            status_path: JSON file receiving ``status`` after every round
+            seed: Seed of the jitter
+            clock: UNIX time source
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.managers = managers
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.blue_green = blue_green
+        self.ports = dict(ports or {})
+        self.status_path = Path(status_path) if status_path is not None else None
+        self._random = random.Random(seed)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._states: Dict[Tuple[str, str], WatchState] = {}
+        self._swap_locks = {kind: threading.Lock() for kind in managers}
+        # Managers built with a RegistryClient reuse the watcher's fresh lookups in update_model
+        self._registries = {
+            kind: m.mlflow_client if isinstance(m.mlflow_client, RegistryClient) else RegistryClient(m.mlflow_client)
+            for kind, m in managers.items()
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="watch")
+
+    def _delay(self, failures: int) -> float:
+        base = self.interval if failures == 0 else min(self.interval * 2 ** failures, self.max_backoff)
+        return base * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def _sync_states(self, now: float) -> None:
+        """Start watching newly configured models and forget removed ones."""
+        configured = set()
+        for kind, manager in self.managers.items():
+            for name, config in manager.get_configs().items():
+                key = (kind, name)
+                configured.add(key)
+                state = self._states.get(key)
+                if state is None:
+                    # Spread the first checks over the jitter window
+                    state = self._states[key] = WatchState(
+                        kind, name, config["alias"], config["run_id"],
+                        next_check=now + self._random.uniform(0, self.jitter) * self.interval
+                    )
+                state.alias = config["alias"]
+                state.run_id = config["run_id"]
+        for key in set(self._states) - configured:
+            del self._states[key]
+
+    def _fail(self, state: WatchState, error: BaseException) -> None:
+        state.failures += 1
+        state.last_error = str(error)
+        state.next_check = self._clock() + self._delay(state.failures)
+        logger.warning(f"Watching {state.kind} model {state.model_name} failed {state.failures} times, "
+                       f"retrying in {state.next_check - self._clock():.0f}s: {error}")
+
+    def check(self) -> List[WatchState]:
+        """Check all due models once and update those whose alias moved.
+
+        Returns:
+            List[WatchState]: States of the models that were swapped
+        """
+        with self._lock:
+            now = self._clock()
+            self._sync_states(now)
+            due = [state for state in self._states.values() if state.next_check <= now]
+        if not due:
+            return []
+
+        changed: List[WatchState] = []
+        for kind in self.managers:
+            states = [state for state in due if state.kind == kind]
+            if not states:
+                continue
+            started = time.perf_counter()
+            versions = self._registries[kind].get_many([(s.model_name, s.alias) for s in states], max_age=0)
+            elapsed = time.perf_counter() - started
+            for state in states:
+                state.last_check = self._clock()
+                state.last_check_seconds = elapsed
+                version = versions[(state.model_name, state.alias)]
+                if isinstance(version, Exception):
+                    self._fail(state, version)
+                elif version.run_id != state.run_id:
+                    logger.info(f"{state.model_name} moved from run {state.run_id} to {version.run_id}")
+                    changed.append(state)
+                else:
+                    state.failures = 0
+                    state.next_check = self._clock() + self._delay(0)
+
+        swapped = [state for state, ok in zip(changed, self._executor.map(self._update, changed)) if ok]
+        self._write_status()
+        return swapped
+
+    def _update(self, state: WatchState) -> bool:
+        """Pre-download the new run of a model, then swap it in."""
+        manager = self.managers[state.kind]
+        started = time.perf_counter()
+        prefetch_dir = manager.desrie_path / ".prefetch"
+        prefetch_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            model_dir, run_id = manager.download_model(state.model_name, state.alias, prefetch_dir)
+            # The blobs stay in the model store for the swap to materialize
+            manager.store.release(model_dir)
+            shutil.rmtree(model_dir, ignore_errors=True)
+            state.last_download_seconds = time.perf_counter() - started
+
+            kwargs = {"blue_green": self.blue_green}
+            if state.model_name in self.ports:
+                kwargs["port"] = self.ports[state.model_name]
+            with self._swap_locks[state.kind]:
+                manager.update_model(state.model_name, state.alias, **kwargs)
+        except Exception as e:
+            self._fail(state, e)
+            return False
+        state.run_id = manager.get_configs()[state.model_name]["run_id"]
+        state.last_swap = self._clock()
+        state.last_swap_seconds = time.perf_counter() - started
+        state.failures = 0
+        state.last_error = None
+        state.next_check = self._clock() + self._delay(0)
+        logger.info(f"Swapped {state.model_name} to run {run_id} in {state.last_swap_seconds:.1f}s "
+                    f"({state.last_download_seconds:.1f}s pre-download)")
+        return True
+
+    def status(self) -> Dict[str, dict]:
+        """Return the state and timings of every watched model.
+
+        Returns:
+            Dict[str, dict]: ``<manager>/<model>`` mapped to the fields of
+            ``WatchState``
+        """
+        with self._lock:
+            return {f"{kind}/{name}": asdict(state) for (kind, name), state in sorted(self._states.items())}
+
+    def _write_status(self) -> None:
+        if self.status_path is None:
+            return
+        tmp_path = self.status_path.with_name(self.status_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.status(), f, indent=4)
+        os.replace(tmp_path, self.status_path)
+
+    def run_forever(self) -> None:
+        """Check models as they become due until ``close`` is called."""
+        logger.info(f"Watching {', '.join(self.managers)} models every {self.interval:.0f}s")
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Watch round failed: {str(e)}")
+            with self._lock:
+                next_checks = [state.next_check for state in self._states.values()]
+            wait = min(next_checks, default=self._clock() + self.interval) - self._clock()
+            self._stop.wait(min(max(wait, 0.1), self.interval))
+
+    def start(self) -> "UpdateWatcher":
+        """Run ``run_forever`` in a daemon thread."""
+        self._thread = threading.Thread(target=self.run_forever, name="update-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop watching, letting running updates finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+def _parse_ports(ctx, param, values) -> Dict[str, int]:
+    ports = {}
+    for value in values:
+        name, _, port = value.rpartition("=")
+        if not name or not port.isdigit():
+            raise click.BadParameter(f"Expected MODEL=PORT, got {value}")
+        ports[name] = int(port)
+    return ports
+
+
+@click.command()
+@click.option('--path', type=click.Path(path_type=Path), default=Path('.'),
+              help='Directory holding lm_configs.json and embedding_configs.json')
+@click.option('--tracking-uri', type=str, default=None, help='MLflow tracking URI')
+@click.option('--interval', type=float, default=60.0, help='Seconds between checks of a model')
+@click.option('--jitter', type=float, default=0.1, help='Fraction of the interval checks are spread by')
+@click.option('--max-backoff', type=float, default=900.0, help='Longest retry delay after failures')
+@click.option('--concurrency', type=click.IntRange(min=1), default=2, help='Models updated at once')
+@click.option('--blue-green', is_flag=True, help='Swap through blue/green slots without downtime')
+@click.option('--port', 'ports', multiple=True, callback=_parse_ports, help='Public port of a model as MODEL=PORT')
+@click.option('--backend', type=click.Choice(BACKENDS), default='task', help='Container backend')
+@click.option('--gcp', is_flag=True,
+              help='Download embedding artifacts from GCS, llama.cpp models do when MLFLOW_GCS_BUCKET is set')
+@click.option('--download-workers', type=click.IntRange(min=1), default=None,
+              help='Concurrent byte-range streams of a GCS download (default: 8)')
+def watch(path: Path, tracking_uri: Optional[str], interval: float, jitter: float, max_backoff: float,
+          concurrency: int, blue_green: bool, ports: Dict[str, int], backend: str, gcp: bool,
+          download_workers: Optional[int]) -> None:
+    """Keep all configured models on the version behind their alias.
+
+    Runs until interrupted and writes the last check and swap timings of
+    every model to watch_status.json in the models directory.
+    """
+    from mlflow import MlflowClient
+
+    from serve.servers.embedding.main import EmbeddingManager
+    from serve.servers.llamacpp.serve import LlamaCppServer
+
+    # Half an interval lets update_model reuse the watcher's lookup
+    registry = RegistryClient(MlflowClient(tracking_uri), ttl=interval / 2)
+    download = {"download_workers": download_workers} if download_workers else {}
+    managers = {
+        "llamacpp": LlamaCppServer(path, registry, backend=backend, **download),
+        "embedding": EmbeddingManager(path, registry, gcp=gcp, backend=backend, **download),
+    }
+    watcher = UpdateWatcher(managers, interval=interval, jitter=jitter, max_backoff=max_backoff,
+                            concurrency=concurrency, blue_green=blue_green, ports=ports,
+                            status_path=path / "watch_status.json")
+    try:
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping watcher")
+    finally:
+        watcher.close()
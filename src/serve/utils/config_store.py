@@ -0,0 +1,174 @@
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+import json
+import os
+import threading
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, the in-process lock still applies
+    fcntl = None
+
+
+class ConfigStoreError(Exception):
+    """Custom exception for config store errors."""
+    pass
+
+
+class ConfigStore:
+    """JSON object file of named config entries, kept in memory.
+
+    Lookups are answered from an in-memory copy of the file. Before every
+    lookup the file is stat'ed and only parsed again if its inode,
+    modification time or size changed, so another process's write is
+    picked up without reading the file on every call.
+
+    Changes are written through under an exclusive ``flock`` on
+    ``<path>.lock``: the file is reloaded if it changed, the change is
+    applied and the whole object is written to a temporary file that
+    replaces the config atomically. Concurrent CLI invocations and daemons
+    therefore never lose each other's updates, and readers never see a
+    partial file.
+
+    Attributes:
+        path: Config file
+        indent: JSON indentation of the written file
+    """
+
+    def __init__(self, path: Union[str, Path], indent: Optional[int] = 4):
+        """Initialize the store. A missing file reads as empty.
+
+        Args:
+            path: Config file
+            indent: JSON indentation of the written file
+        """
+        self.path = Path(path)
+        self.indent = indent
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] = {}
+        self._stat_key: Optional[Tuple[int, int, int]] = None
+        self.reloads = 0
+
+    def _file_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        """Parse the file again if it changed since it was last read or written."""
+        stat_key = self._file_stat()
+        if stat_key == self._stat_key:
+            return
+        if stat_key is None:
+            data = {}
+        else:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                raise ConfigStoreError(f"Corrupted config file {self.path}: {str(e)}")
+            if not isinstance(data, dict):
+                raise ConfigStoreError(f"Config file {self.path} does not hold a JSON object")
+        self._data = data
+        self._stat_key = stat_key
+        self.reloads += 1
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the in-process lock and the exclusive file lock."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """Atomically replace the file with ``data``."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=self.indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._data = data
+        self._stat_key = self._file_stat()
+
+    def view(self) -> Mapping[str, Any]:
+        """Return a read-only view of the current entries, without copying them."""
+        with self._lock:
+            self._refresh()
+            return MappingProxyType(self._data)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Return a copy of an entry, or ``default`` if there is none."""
+        with self._lock:
+            self._refresh()
+            entry = self._data.get(name)
+        if entry is None:
+            return default
+        return dict(entry) if isinstance(entry, dict) else entry
+
+    def all(self) -> Dict[str, Any]:
+        """Return a copy of all entries."""
+        with self._lock:
+            self._refresh()
+            return {name: dict(entry) if isinstance(entry, dict) else entry for name, entry in self._data.items()}
+
+    def names(self) -> List[str]:
+        """Return the names of all entries."""
+        return list(self.view())
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.view()
+
+    def __len__(self) -> int:
+        return len(self.view())
+
+    def put(self, name: str, entry: Any) -> None:
+        """Add or replace an entry."""
+        with self._locked():
+            self._refresh()
+            data = dict(self._data)
+            data[name] = entry
+            self._write(data)
+
+    def remove(self, name: str) -> bool:
+        """Remove an entry.
+
+        Returns:
+            bool: False if there was no such entry
+        """
+        with self._locked():
+            self._refresh()
+            if name not in self._data:
+                return False
+            data = dict(self._data)
+            del data[name]
+            self._write(data)
+            return True
+
+    def replace(self, entries: Dict[str, Any]) -> None:
+        """Replace all entries."""
+        with self._locked():
+            self._write(dict(entries))
+        logger.debug(f"Replaced {len(entries)} entries of {self.path}")
+
+    def ensure(self) -> None:
+        """Create the file with no entries if it does not exist."""
+        with self._locked():
+            if self._file_stat() is None:
+                self._write({})
@@ -1,16 +1,32 @@
 from pathlib import Path
 from google.cloud import storage
+import base64
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+import google_crc32c
 from loguru import logger
-from typing import Optional, List, Union
+from typing import Optional, List, Tuple, Union
 from google.cloud.storage.blob import Blob
 from google.cloud.storage.bucket import Bucket
 from google.api_core.exceptions import GoogleAPIError
 from google.auth.exceptions import DefaultCredentialsError
 from google.oauth2 import service_account
 
+from serve.utils import metrics, tracing
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+# Concurrent byte-range streams of model downloads made by the managers
+DEFAULT_MAX_WORKERS = 8
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+_progress_lock = threading.Lock()
+
 class DownloadError(Exception):
     """Custom exception for download-related errors."""
     pass
@@ -19,22 +35,26 @@ class TqdmWriter:
     """Custom file writer with progress bar for downloads.
     
     This class wraps a file object with tqdm progress bar functionality
-    to show download progress.
+    to show download progress. Several writers may share one progress bar
+    so that concurrent workers report a single aggregated total.
     
     Attributes:
         file_obj: The file object to write to
         pbar: tqdm progress bar instance
     """
     
-    def __init__(self, file_obj, total_bytes: int):
+    def __init__(self, file_obj, total_bytes: int, pbar: Optional[tqdm] = None):
         """Initialize the writer with a file object and total size.
         
         Args:
             file_obj: File object to write to
             total_bytes: Total size of the file in bytes
+            pbar: Shared progress bar to update instead of creating one.
+                A shared bar is not closed by this writer.
         """
         self.file_obj = file_obj
-        self.pbar = tqdm(
+        self._owns_pbar = pbar is None
+        self.pbar = pbar or tqdm(
             total=total_bytes,
             unit="B",
             unit_scale=True,
@@ -52,7 +72,8 @@ class TqdmWriter:
             int: Number of bytes written
         """
         bytes_written = self.file_obj.write(data)
-        self.pbar.update(len(data))
+        with _progress_lock:
+            self.pbar.update(len(data))
         return bytes_written
         
     def flush(self) -> None:
@@ -60,26 +81,393 @@ class TqdmWriter:
         self.file_obj.flush()
         
     def close(self) -> None:
-        """Close the progress bar."""
-        self.pbar.close()
+        """Close the progress bar if this writer owns it."""
+        if self._owns_pbar:
+            self.pbar.close()
+
+
+def _plan_slices(size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a blob of ``size`` bytes into inclusive byte ranges.
+    
+    Args:
+        size: Total size of the blob in bytes
+        chunk_size: Maximum size of a single slice in bytes
+        
+    Returns:
+        List[Tuple[int, int]]: ``(start, end)`` pairs, ``end`` inclusive
+    """
+    return [
+        (start, min(start + chunk_size, size) - 1)
+        for start in range(0, size, chunk_size)
+    ]
+
+
+def _remote_checksum(blob: Blob) -> Optional[Tuple[str, str]]:
+    """Return the strongest checksum GCS publishes for a blob.
+    
+    Args:
+        blob: Blob whose metadata to inspect
+        
+    Returns:
+        Optional[Tuple[str, str]]: ``(algorithm, base64 digest)`` or None if
+        the blob carries neither a CRC32C nor an MD5 hash
+    """
+    if getattr(blob, "crc32c", None):
+        return "crc32c", blob.crc32c
+    if getattr(blob, "md5_hash", None):
+        return "md5", blob.md5_hash
+    return None
+
+
+def _file_checksum(path: Path, algorithm: str) -> str:
+    """Compute the base64 digest of a local file in GCS format.
+    
+    Args:
+        path: File to hash
+        algorithm: Either ``crc32c`` or ``md5``
+        
+    Returns:
+        str: Base64-encoded digest comparable with blob metadata
+    """
+    hasher = google_crc32c.Checksum() if algorithm == "crc32c" else hashlib.md5()  # noqa: S324
+    with open(path, "rb") as file_obj:
+        for block in iter(lambda: file_obj.read(_HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return base64.b64encode(hasher.digest()).decode("ascii")
+
+
+def _matches_remote(path: Path, blob: Blob) -> Optional[bool]:
+    """Check a local file against a blob's size and checksum.
+    
+    Args:
+        path: Local file to check
+        blob: Blob to compare with
+        
+    Returns:
+        Optional[bool]: True if size and checksum match, False if either
+        differs, None if the size matches but the blob has no checksum
+    """
+    if not path.is_file() or path.stat().st_size != (blob.size or 0):
+        return False
+    checksum = _remote_checksum(blob)
+    if checksum is None:
+        return None
+    algorithm, expected = checksum
+    return _file_checksum(path, algorithm) == expected
+
+
+class _PartialDownload:
+    """Tracks the ``.part`` sidecar and progress manifest of one blob.
+    
+    Slices are written into ``<name>.part`` and their start offsets recorded
+    in ``<name>.part.json`` as they complete, so an interrupted download can
+    resume with only the missing byte ranges. The manifest also stores the
+    blob's identity; a manifest for another generation is discarded.
+    
+    Attributes:
+        blob: Blob being downloaded
+        local_path: Final destination of the file
+        part_path: Sidecar file receiving the data
+        manifest_path: JSON manifest of completed slices
+        slices: Planned ``(start, end)`` byte ranges
+    """
+    
+    def __init__(self, blob: Blob, local_path: Path, chunk_size: int):
+        self.blob = blob
+        self.local_path = local_path
+        self.part_path = local_path.with_name(local_path.name + ".part")
+        self.manifest_path = local_path.with_name(local_path.name + ".part.json")
+        self.chunk_size = chunk_size
+        self.slices = _plan_slices(blob.size or 0, chunk_size)
+        self._lock = threading.Lock()
+        self._completed = self._load_completed()
+        
+    def _identity(self) -> dict:
+        """Describe the blob so stale manifests can be detected."""
+        return {
+            "name": self.blob.name,
+            "generation": getattr(self.blob, "generation", None),
+            "size": self.blob.size or 0,
+            "crc32c": getattr(self.blob, "crc32c", None),
+            "md5_hash": getattr(self.blob, "md5_hash", None),
+            "chunk_size": self.chunk_size,
+        }
+        
+    def _load_completed(self) -> set:
+        """Load completed slice offsets from a matching manifest."""
+        if not self.part_path.is_file() or not self.manifest_path.is_file():
+            return set()
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {str(e)}")
+            return set()
+        if manifest.get("blob") != self._identity():
+            logger.info(f"Discarding partial download of {self.blob.name}: remote object changed")
+            return set()
+        if self.part_path.stat().st_size != (self.blob.size or 0):
+            return set()
+        return set(manifest.get("completed", []))
+        
+    def _write_manifest(self) -> None:
+        """Atomically persist the manifest. Caller must hold the lock."""
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"blob": self._identity(), "completed": sorted(self._completed)}, f)
+        os.replace(tmp_path, self.manifest_path)
+        
+    @property
+    def pending(self) -> List[Tuple[int, int]]:
+        """Byte ranges that still have to be downloaded."""
+        return [(start, end) for start, end in self.slices if start not in self._completed]
+        
+    @property
+    def resumed_bytes(self) -> int:
+        """Number of bytes already present from a previous attempt."""
+        return sum(end - start + 1 for start, end in self.slices if start in self._completed)
+        
+    def prepare(self) -> None:
+        """Create the preallocated ``.part`` file unless resuming."""
+        if not self._completed:
+            with open(self.part_path, "wb") as file_obj:
+                file_obj.truncate(self.blob.size or 0)
+        with self._lock:
+            self._write_manifest()
+            
+    def download_slice(self, start: int, end: int, pbar: tqdm) -> None:
+        """Download one byte range into its offset in the ``.part`` file.
+        
+        Args:
+            start: First byte of the range
+            end: Last byte of the range (inclusive)
+            pbar: Shared progress bar
+        """
+        with open(self.part_path, "r+b") as file_obj:
+            file_obj.seek(start)
+            writer = TqdmWriter(file_obj, end - start + 1, pbar=pbar)
+            # The object hash covers the whole blob, so ranged reads cannot be
+            # validated by the client library; finalize() verifies the file.
+            self.blob.download_to_file(writer, start=start, end=end, checksum=None)
+        with self._lock:
+            self._completed.add(start)
+            self._write_manifest()
+            
+    def finalize(self, verify: bool) -> None:
+        """Verify the ``.part`` file and atomically move it into place.
+        
+        Args:
+            verify: Whether to compare the file against the blob checksum
+            
+        Raises:
+            DownloadError: If the downloaded data does not match the blob
+        """
+        if verify and _matches_remote(self.part_path, self.blob) is False:
+            self.part_path.unlink(missing_ok=True)
+            self.manifest_path.unlink(missing_ok=True)
+            raise DownloadError(f"Checksum mismatch for {self.blob.name}")
+        os.replace(self.part_path, self.local_path)
+        self.manifest_path.unlink(missing_ok=True)
+
+
+def _download_blobs(
+    jobs: List[Tuple[Blob, Path]],
+    max_workers: int,
+    chunk_size: int,
+    verify: bool = True
+) -> None:
+    """Download blobs through resumable ``.part`` files.
+    
+    Every blob is cut into slices of at most ``chunk_size`` bytes. All
+    slices of all blobs share one worker pool, so many small files and a
+    few large files both keep ``max_workers`` streams busy. Slices finished
+    by an earlier, interrupted attempt are skipped.
+    
+    Args:
+        jobs: ``(blob, local_path)`` pairs to download
+        max_workers: Number of concurrent download streams
+        chunk_size: Maximum size of a single byte-range request
+        verify: Whether to verify checksums before renaming into place
+        
+    Raises:
+        DownloadError: If any slice fails or a checksum does not match
+    """
+    partials = [_PartialDownload(blob, local_path, chunk_size) for blob, local_path in jobs]
+    for partial in partials:
+        if partial.resumed_bytes:
+            logger.info(
+                f"Resuming {partial.blob.name} with {partial.resumed_bytes} of "
+                f"{partial.blob.size} bytes already downloaded"
+            )
+        partial.prepare()
+    
+    pbar = tqdm(
+        total=sum((p.blob.size or 0) - p.resumed_bytes for p in partials),
+        unit="B",
+        unit_scale=True,
+        desc="Downloading",
+        miniters=1
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for partial in partials:
+                for start, end in partial.pending:
+                    future = executor.submit(partial.download_slice, start, end, pbar)
+                    futures[future] = partial
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except (OSError, GoogleAPIError) as e:
+                    for pending in futures:
+                        pending.cancel()
+                    raise DownloadError(
+                        f"Failed to download {futures[future].blob.name}: {str(e)}"
+                    )
+    finally:
+        pbar.close()
+    
+    for partial in partials:
+        partial.finalize(verify)
+
 
+def _validate_args(gcs_bucket: str, source_path: str, max_workers: int, chunk_size: int) -> None:
+    """Raise ``ValueError`` for download arguments that cannot be used."""
+    if not gcs_bucket:
+        raise ValueError("GCS bucket name cannot be empty")
+    if not source_path:
+        raise ValueError("Source path cannot be empty")
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+
+def _open_bucket(gcs_bucket: str, credentials: Optional[Union[str, Path]],
+                 client: Optional[storage.Client]) -> Bucket:
+    """Return the bucket through ``client`` or a client built from ``credentials``.
+
+    Raises:
+        ValueError: If no credentials are configured outside an emulator
+        DefaultCredentialsError: If the credentials are invalid
+        DownloadError: If the bucket cannot be accessed
+    """
+    if client is None:
+        if credentials:
+            credentials = str(Path(credentials).resolve())
+        else:
+            credentials = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+            if not credentials and not os.environ.get("STORAGE_EMULATOR_HOST"):
+                raise ValueError(
+                    "No credentials provided and GOOGLE_APPLICATION_CREDENTIALS "
+                    "environment variable not set"
+                )
+        # A storage emulator is accessed anonymously by the client library
+        credentials = service_account.Credentials.from_service_account_file(
+            credentials
+        ) if credentials else None
+    try:
+        storage_client = client or storage.Client(credentials=credentials)
+        return storage_client.bucket(gcs_bucket)
+    except DefaultCredentialsError as e:
+        raise DefaultCredentialsError(
+            f"Failed to initialize GCS client with credentials: {str(e)}"
+        )
+    except Exception as e:
+        raise DownloadError(f"Failed to access GCS bucket: {str(e)}")
+
+
+def _plan_jobs(
+    blobs: List[Blob],
+    source_path: str,
+    destination_path: Path
+) -> Tuple[List[Path], List[Tuple[Blob, Path]]]:
+    """Map blobs under ``source_path`` to local files, skipping up-to-date ones.
+
+    Returns:
+        Tuple[List[Path], List[Tuple[Blob, Path]]]: Every local file of the
+        download, and the ``(blob, local_path)`` pairs still to fetch
+
+    Raises:
+        DownloadError: If a parent directory cannot be created
+    """
+    local_files: List[Path] = []
+    jobs: List[Tuple[Blob, Path]] = []
+    for blob in blobs:
+        if blob.name != source_path and not blob.name.startswith(source_path + '/'):
+            continue
+        # Calculate relative path from source_path
+        rel_path = blob.name[len(source_path):].lstrip('/')
+        if not rel_path:  # Skip directory itself
+            continue
+
+        local_path = destination_path / rel_path
+        try:
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            raise DownloadError(
+                f"Failed to create directory {local_path.parent}: {str(e)}"
+            )
+
+        local_files.append(local_path)
+        if _matches_remote(local_path, blob):
+            logger.info(f"Skipping {blob.name}, {local_path} is up to date")
+            continue
+        jobs.append((blob, local_path))
+    return local_files, jobs
+
+
+def _fetch(jobs: List[Tuple[Blob, Path]], max_workers: int, chunk_size: int, verify: bool) -> None:
+    """Download ``jobs`` in ranged slices, recording a span and download metrics."""
+    logger.info(
+        f"Downloading {len(jobs)} files with {max_workers} "
+        f"workers in slices of {chunk_size} bytes"
+    )
+    total_bytes = sum(blob.size or 0 for blob, _ in jobs)
+    started = time.perf_counter()
+    with tracing.span("gcs.fetch", files=len(jobs), bytes=total_bytes, workers=max_workers):
+        _download_blobs(jobs, max_workers, chunk_size, verify)
+    metrics.observe_download("gcs", total_bytes, time.perf_counter() - started)
+
+
+@tracing.traced("gcs.download")
 def download_from_gcs(
     gcs_bucket: str,
     source_path: str,
     destination_path: Union[str, Path],
-    credentials: Optional[Union[str, Path]] = None
+    credentials: Optional[Union[str, Path]] = None,
+    max_workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    client: Optional[storage.Client] = None,
+    verify: bool = True
 ) -> List[Path]:
     """Download files from Google Cloud Storage.
     
     This function can handle both single files and directories. For directories,
     it preserves the directory structure when downloading.
     
+    Each blob is fetched in byte ranges of ``chunk_size`` into a ``.part``
+    sidecar whose progress is recorded in a manifest, so a failed run resumes
+    where it stopped. Completed files are verified against the blob's
+    CRC32C/MD5 and atomically renamed into place. Local files whose size and
+    checksum already match the remote are not downloaded again. With
+    ``max_workers`` greater than one, slices of all blobs are downloaded
+    concurrently.
+    
     Args:
         gcs_bucket: Name of the GCS bucket
         source_path: Path in GCS to download from
         destination_path: Local path to save files to
         credentials: Path to Google Cloud credentials file
-            If None, uses GOOGLE_APPLICATION_CREDENTIALS environment variable
+            If None, uses GOOGLE_APPLICATION_CREDENTIALS environment variable,
+            or no credentials if STORAGE_EMULATOR_HOST points to an emulator
+        max_workers: Number of concurrent download streams. 1 downloads
+            slices one after another.
+        chunk_size: Maximum size in bytes of one byte-range request, which
+            is also the granularity at which downloads resume
+        client: Pre-configured storage client. When given, ``credentials``
+            is ignored.
+        verify: Whether to verify checksums of downloaded files
             
     Returns:
         List[Path]: List of paths to downloaded files
@@ -90,106 +478,47 @@ def download_from_gcs(
         DefaultCredentialsError: If credentials not found/invalid
     """
     try:
-        # Validate inputs
-        if not gcs_bucket:
-            raise ValueError("GCS bucket name cannot be empty")
-        if not source_path:
-            raise ValueError("Source path cannot be empty")
-            
-        # Convert paths to proper types
+        _validate_args(gcs_bucket, source_path, max_workers, chunk_size)
+
         destination_path = Path(destination_path)
-        print('destination_path', destination_path)
-        if credentials:
-            credentials = str(Path(credentials).resolve())
-        else:
-            credentials = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-            if not credentials:
-                raise ValueError(
-                    "No credentials provided and GOOGLE_APPLICATION_CREDENTIALS "
-                    "environment variable not set"
-                )
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials
-        ) 
-        # Initialize GCS client and get bucket
-        try:
-            storage_client = storage.Client(credentials=credentials)
-            bucket: Bucket = storage_client.bucket(gcs_bucket)
-        except DefaultCredentialsError as e:
-            raise DefaultCredentialsError(
-                f"Failed to initialize GCS client with credentials: {str(e)}"
-            )
-        except Exception as e:
-            raise DownloadError(f"Failed to access GCS bucket: {str(e)}")
-            
-        downloaded_files: List[Path] = []
-        
+        logger.debug(f"Downloading gs://{gcs_bucket}/{source_path} to {destination_path}")
+        bucket = _open_bucket(gcs_bucket, credentials, client)
+
         # List all blobs with the given prefix
         try:
-            blobs: List[Blob] = list(bucket.list_blobs(prefix=source_path))
+            with tracing.span("gcs.list", bucket=gcs_bucket, prefix=source_path) as span:
+                blobs: List[Blob] = list(bucket.list_blobs(prefix=source_path))
+                span.set_attribute("blobs", len(blobs))
             if not blobs:
                 raise DownloadError(
                     f"No files found at gs://{gcs_bucket}/{source_path}"
                 )
-                
+
             logger.info(
                 f"Found {len(blobs)} files to download from "
                 f"gs://{gcs_bucket}/{source_path}"
             )
-            
-            # Download each blob
-            for blob in blobs:
-                if blob.name == source_path or blob.name.startswith(source_path + '/'):
-                    # Calculate relative path from source_path
-                    rel_path = blob.name[len(source_path):].lstrip('/')
-                    if not rel_path:  # Skip directory itself
-                        continue
-                        
-                    local_path = destination_path / rel_path
-                    
-                    # Create parent directories
-                    try:
-                        local_path.parent.mkdir(parents=True, exist_ok=True)
-                    except OSError as e:
-                        raise DownloadError(
-                            f"Failed to create directory {local_path.parent}: {str(e)}"
-                        )
-                    
-                    # Download file with progress bar
-                    logger.info(f"Downloading {blob.name} to {local_path}")
-                    try:
-                        with open(local_path, "wb") as file_obj:
-                            writer = TqdmWriter(file_obj, blob.size)
-                            blob.download_to_file(writer)
-                            writer.close()
-                        downloaded_files.append(local_path)
-                    except (OSError, GoogleAPIError) as e:
-                        raise DownloadError(
-                            f"Failed to download {blob.name}: {str(e)}"
-                        )
-                        
+
+            downloaded_files, jobs = _plan_jobs(blobs, source_path, destination_path)
+            if jobs:
+                _fetch(jobs, max_workers, chunk_size, verify)
+
             if not downloaded_files:
                 raise DownloadError(
                     f"No files were downloaded from gs://{gcs_bucket}/{source_path}"
                 )
-                
+
             logger.info(
                 f"Successfully downloaded {len(downloaded_files)} files to "
                 f"{destination_path}"
             )
             return downloaded_files
-            
+
         except GoogleAPIError as e:
             raise DownloadError(f"GCS API error: {str(e)}")
-            
+
     except Exception as e:
+        metrics.DOWNLOAD_FAILURES.inc(source="gcs")
         if not isinstance(e, (DownloadError, ValueError, DefaultCredentialsError)):
             raise DownloadError(f"Unexpected error during download: {str(e)}")
         raise
-
-
-
-    
-
-        
-   
@@ -0,0 +1,459 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import math
+import os
+import threading
+import time
+import weakref
+
+from loguru import logger
+
+
+# Upper bounds in seconds of latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf)
+
+# Environment variables read by ``enable_from_env``
+PORT_ENV = "SERVE_METRICS_PORT"
+TEXTFILE_ENV = "SERVE_METRICS_TEXTFILE"
+INTERVAL_ENV = "SERVE_METRICS_INTERVAL"
+
+
+class MetricsError(Exception):
+    """Custom exception for metrics errors."""
+    pass
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Metric family with one value per combination of label values."""
+
+    type_name = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str]):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise MetricsError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as e:
+            raise MetricsError(f"{self.name} is missing label {e}")
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        with self._lock:
+            samples = self._samples()
+        return "".join([f"# HELP {self.name} {self.documentation}\n", f"# TYPE {self.name} {self.type_name}\n"]
+                       + [sample + "\n" for sample in samples])
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """Add ``amount`` to the count of ``labels``, nothing while metrics are disabled."""
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        """Set the value of ``labels``, nothing while metrics are disabled."""
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        buckets = sorted(buckets)
+        if not buckets or buckets[-1] != math.inf:
+            buckets.append(math.inf)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """Record one observation of ``labels``, nothing while metrics are disabled."""
+        if not self._registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the seconds spent in the context."""
+        if not self._registry.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            for le, bucket_count in zip(self.buckets, counts):
+                le_label = f'le="{_format_value(le)}"'
+                samples.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {bucket_count}")
+            samples.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered in the Prometheus text format.
+
+    Metrics are declared once at import time by the modules they measure.
+    Recording is a no-op until the registry is enabled, so instrumented
+    hot paths pay a single attribute check when metrics are off.
+
+    Components that already count their cache hits, such as
+    ``ResponseCache`` or ``RegistryClient``, are tracked instead of
+    instrumented: their ``stats()`` are read at render time and summed per
+    cache name into ``serve_cache_hits_total`` and
+    ``serve_cache_misses_total``.
+
+    Attributes:
+        enabled: Whether metrics are recorded
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._caches: Dict[str, "weakref.WeakSet"] = {}
+
+    def _register(self, cls: type, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise MetricsError(f"Metric {name} already registered as {metric.type_name} {metric.labelnames}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter ``name``, declaring it on first use."""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Return the gauge ``name``, declaring it on first use."""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram ``name``, declaring it on first use."""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def track_cache(self, cache_name: str, cache: Any) -> None:
+        """Report the hits and misses of ``cache.stats()`` while ``cache`` is alive.
+
+        Counters of the stats ending in ``hits`` and ``misses`` are summed,
+        so ``memory_hits`` and ``disk_hits`` both count as hits.
+
+        Args:
+            cache_name: Value of the ``cache`` label
+            cache: Object with a ``stats()`` method returning counters
+        """
+        with self._lock:
+            self._caches.setdefault(cache_name, weakref.WeakSet()).add(cache)
+
+    def _render_caches(self) -> str:
+        with self._lock:
+            caches = {name: list(tracked) for name, tracked in self._caches.items()}
+        totals = {"hits": {}, "misses": {}}
+        for name, tracked in sorted(caches.items()):
+            for kind in totals:
+                totals[kind][name] = 0
+            for cache in tracked:
+                for key, value in cache.stats().items():
+                    for kind in totals:
+                        if key.endswith(kind) and isinstance(value, (int, float)):
+                            totals[kind][name] += value
+        lines = []
+        for kind, values in totals.items():
+            if not values:
+                continue
+            lines.append(f"# HELP serve_cache_{kind}_total Cache {kind} of live caches\n")
+            lines.append(f"# TYPE serve_cache_{kind}_total counter\n")
+            lines += [f'serve_cache_{kind}_total{{cache="{_escape(name)}"}} {_format_value(value)}\n'
+                      for name, value in values.items()]
+        return "".join(lines)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "".join(metric.render() for metric in metrics) + self._render_caches()
+
+    def write_textfile(self, path: Union[str, Path]) -> None:
+        """Atomically write ``render()`` to ``path`` for the node_exporter textfile collector."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        """Forget all recorded values, keeping the declared metrics."""
+        with self._lock:
+            for metric in self._metrics.values():
+                with metric._lock:
+                    metric._values.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Return the counter ``name`` of the process registry."""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Return the gauge ``name`` of the process registry."""
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Return the histogram ``name`` of the process registry."""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def track_cache(cache_name: str, cache: Any) -> None:
+    """Report the hit counters of ``cache`` in the process registry."""
+    REGISTRY.track_cache(cache_name, cache)
+
+
+def enabled() -> bool:
+    """Return whether metrics are recorded."""
+    return REGISTRY.enabled
+
+
+class MetricsExporter:
+    """Exports the process registry over HTTP and to a textfile.
+
+    The HTTP endpoint serves ``/metrics`` on a local port. The textfile is
+    rewritten every ``interval`` seconds and once more on ``close``, so
+    short-lived CLI invocations leave their final values for node_exporter.
+
+    Attributes:
+        port: Bound port of the ``/metrics`` endpoint, None without one
+        textfile: File rewritten with the metrics, None without one
+        interval: Seconds between textfile writes
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: Optional[int] = None, host: str = "127.0.0.1",
+                 textfile: Optional[Union[str, Path]] = None, interval: float = 15.0):
+        """Initialize the exporter.
+
+        Args:
+            registry: Registry to export
+            port: Port of the ``/metrics`` endpoint, 0 for any free port,
+                None for no endpoint
+            host: Address the endpoint binds to
+            textfile: File rewritten with the metrics, None for no file
+            interval: Seconds between textfile writes
+        """
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.textfile = Path(textfile) if textfile is not None else None
+        self.interval = interval
+        self._server = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def start(self) -> "MetricsExporter":
+        """Start the endpoint and the textfile writer in daemon threads."""
+        if self.port is not None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            registry = self.registry
+
+            class _Handler(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    data = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="metrics-http",
+                                                  daemon=True))
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        if self.textfile is not None:
+            self._threads.append(threading.Thread(target=self._write_textfile, name="metrics-textfile",
+                                                  daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _write_textfile(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.write_textfile(self.textfile)
+            except OSError as e:
+                logger.warning(f"Failed to write metrics to {self.textfile}: {str(e)}")
+
+    def close(self) -> None:
+        """Stop exporting, writing the textfile a last time."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.textfile is not None:
+            self.registry.write_textfile(self.textfile)
+
+
+_exporter: Optional[MetricsExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def enable(port: Optional[int] = None, textfile: Optional[Union[str, Path]] = None, interval: float = 15.0,
+           host: str = "127.0.0.1") -> Optional[MetricsExporter]:
+    """Start recording metrics and export them.
+
+    Only the first call starts an exporter; later calls return it.
+
+    Args:
+        port: Port of the local ``/metrics`` endpoint, None for no endpoint
+        textfile: File rewritten for the node_exporter textfile collector,
+            None for no file
+        interval: Seconds between textfile writes
+        host: Address the endpoint binds to
+
+    Returns:
+        Optional[MetricsExporter]: The running exporter, None if metrics are
+        only recorded
+    """
+    global _exporter
+    with _exporter_lock:
+        REGISTRY.enabled = True
+        if _exporter is None and (port is not None or textfile is not None):
+            _exporter = MetricsExporter(REGISTRY, port=port, host=host, textfile=textfile,
+                                        interval=interval).start()
+        return _exporter
+
+
+def enable_from_env() -> Optional[MetricsExporter]:
+    """Enable metrics if ``SERVE_METRICS_PORT`` or ``SERVE_METRICS_TEXTFILE`` is set.
+
+    Returns:
+        Optional[MetricsExporter]: The running exporter, None if neither is set
+    """
+    port, textfile = os.environ.get(PORT_ENV), os.environ.get(TEXTFILE_ENV)
+    if not port and not textfile:
+        return None
+    return enable(port=int(port) if port else None, textfile=textfile or None,
+                  interval=float(os.environ.get(INTERVAL_ENV, 15.0)))
+
+
+def disable() -> None:
+    """Stop recording and close the exporter, writing its textfile a last time."""
+    global _exporter
+    with _exporter_lock:
+        REGISTRY.enabled = False
+        exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.close()
+
+
+DOWNLOAD_BYTES = counter("serve_download_bytes_total", "Bytes of model files downloaded", ["source"])
+DOWNLOAD_SECONDS = histogram("serve_download_duration_seconds", "Seconds spent downloading model files", ["source"])
+DOWNLOAD_THROUGHPUT = gauge("serve_download_throughput_bytes_per_second", "Throughput of the last download",
+                            ["source"])
+DOWNLOAD_FAILURES = counter("serve_download_failures_total", "Failed model downloads", ["source"])
+
+
+def observe_download(source: str, nbytes: int, seconds: float) -> None:
+    """Record a finished download of ``nbytes`` from ``source`` (``gcs``, ``mlflow``...)."""
+    if not REGISTRY.enabled:
+        return
+    DOWNLOAD_BYTES.inc(nbytes, source=source)
+    DOWNLOAD_SECONDS.observe(seconds, source=source)
+    if seconds > 0:
+        DOWNLOAD_THROUGHPUT.set(nbytes / seconds, source=source)
@@ -6,12 +6,15 @@ from dataclasses import dataclass
 
 import mlflow
 from mlflow import MlflowClient
+from mlflow.entities.model_registry import ModelVersion
 from mlflow.exceptions import MlflowException
 from mlflow.artifacts import download_artifacts
 from pydantic import BaseModel, model_validator, Field, ValidationError
 from loguru import logger
 
 from serve.utils.model_config import ModelConfig
+from serve.utils.model_store import ModelStore
+from serve.utils.mlflow.registry import RegistryClient
 
 
 @dataclass
@@ -102,12 +105,22 @@ class MLflowModelConfigManager:
     including downloading models, checking for updates, and managing model configurations.
     """
     
-    def __init__(self, mlflow_client: Optional[MlflowClient] = None, config_path: Optional[Path] = None) -> None:
+    def __init__(self,
+                 mlflow_client: Optional[MlflowClient] = None,
+                 config_path: Optional[Path] = None,
+                 store_budget: Optional[int] = None,
+                 registry_ttl: float = 30.0,
+                 max_workers: int = 8) -> None:
         """Initialize MLflow model configuration manager.
         
         Args:
-            mlflow_client: Custom MLflow client instance
+            mlflow_client: Custom MLflow client instance, used as is if it
+                is a RegistryClient
             config_path: Path to the configuration file
+            store_budget: Disk budget in bytes for the shared model store,
+                None for unlimited
+            registry_ttl: Seconds alias lookups are cached
+            max_workers: Concurrent registry lookups of ``check_for_updates``
             
         Raises:
             ValidationError: If MLflow configuration is invalid
@@ -122,8 +135,17 @@ class MLflowModelConfigManager:
                 )
             else:
                 self.mlflow_client = mlflow_client
+            # Alias lookups of every method go through one cache
+            if isinstance(self.mlflow_client, RegistryClient):
+                self.registry = self.mlflow_client
+            else:
+                self.registry = RegistryClient(self.mlflow_client, ttl=registry_ttl, max_workers=max_workers)
 
             self.model_config = ModelConfig(config_path=config_path)
+            self.store = ModelStore(
+                self.model_config.config_path.parent / ".store",
+                budget_bytes=store_budget
+            )
             logger.info("Initialized MLflow model configuration manager")
             
         except Exception as e:
@@ -182,7 +204,8 @@ class MLflowModelConfigManager:
                     return self.get_model_path(model_name)
             except Exception as e:
 
-                model_version = self.mlflow_client.get_model_version_by_alias(model_name, alias)
+                # Cached by the lookup of check_for_update
+                model_version = self.registry.get_model_version_by_alias(model_name, alias)
                 if not model_version:
                     raise ValueError(f"No model version found for {model_name} with alias {alias}")
                     
@@ -191,8 +214,13 @@ class MLflowModelConfigManager:
                 
                 model_dir = model_dir or self.model_config.config_path.parent / "models" / model_name
                 
-                # Download artifacts
-                self.download_artifacts(run_id=run_id, artifact_path=artifact_path, dst_path=model_dir)
+                # Reuse artifacts already in the model store, download otherwise
+                store_key = f"mlflow:{run_id}/{artifact_path}"
+                if self.store.materialize(store_key, model_dir / artifact_path):
+                    logger.info(f"Run {run_id} of {model_name} already in model store, skipping download")
+                else:
+                    self.download_artifacts(run_id=run_id, artifact_path=artifact_path, dst_path=model_dir)
+                    self.store.ingest(store_key, model_dir / artifact_path)
                     
                 # Update configuration
                 self.model_config.update_model_info(
@@ -226,21 +254,8 @@ class MLflowModelConfigManager:
             MlflowException: If unable to check version
         """
         try:
-            model_version = self.mlflow_client.get_model_version_by_alias(model_name, alias)
-            if not model_version:
-                raise ValueError(f"No model version found for {model_name} with alias {alias}")
-                
-            current_run_id = model_version.run_id
-            stored_config = self.model_config.load_model_config(model_name)
-            
-            if not stored_config.run_id:
-                logger.info(f"No local version found for {model_name}")
-                return True
-                
-            needs_update = stored_config.run_id != current_run_id
-            if needs_update:
-                logger.info(f"Update available for {model_name}")
-            return needs_update
+            model_version = self.registry.get_model_version_by_alias(model_name, alias)
+            return self._needs_update(model_name, model_version, alias)
             
         except MlflowException as e:
             logger.error(f"MLflow error checking {model_name} version: {str(e)}")
@@ -249,6 +264,23 @@ class MLflowModelConfigManager:
             logger.error(f"Error checking {model_name} version: {str(e)}")
             raise
 
+    def _needs_update(self, model_name: str, model_version: Optional[ModelVersion], alias: str) -> bool:
+        """Compare the run of a registry model version with the stored one."""
+        if not model_version:
+            raise ValueError(f"No model version found for {model_name} with alias {alias}")
+            
+        current_run_id = model_version.run_id
+        stored_config = self.model_config.load_model_config(model_name)
+        
+        if not stored_config.run_id:
+            logger.info(f"No local version found for {model_name}")
+            return True
+            
+        needs_update = stored_config.run_id != current_run_id
+        if needs_update:
+            logger.info(f"Update available for {model_name}")
+        return needs_update
+
     def check_for_updates(self) -> Dict[str, Optional[bool]]:
         """Check for updates for all models.
         
@@ -262,13 +294,16 @@ class MLflowModelConfigManager:
                 logger.info("No models configured locally")
                 return {}
                 
+            # One concurrent round of registry lookups for all models
+            aliases = {name: stored_config.alias or "champion" for name, stored_config in all_configs.items()}
+            versions = self.registry.get_many(aliases.items())
             updates = {}
-            for model_name, stored_config in all_configs.items():
+            for model_name, alias in aliases.items():
                 try:
-                    updates[model_name] = self.check_for_update(
-                        model_name, 
-                        stored_config.alias or "champion"
-                    )
+                    model_version = versions[(model_name, alias)]
+                    if isinstance(model_version, Exception):
+                        raise model_version
+                    updates[model_name] = self._needs_update(model_name, model_version, alias)
                 except Exception as e:
                     logger.warning(f"Failed to check updates for {model_name}: {str(e)}")
                     updates[model_name] = None
@@ -299,6 +334,7 @@ class MLflowModelConfigManager:
                 model_path = Path(stored_config.model_dir)
                 if model_path.exists():
                     try:
+                        self.store.release(model_path)
                         shutil.rmtree(model_path)
                         logger.info(f"Deleted model directory: {model_path}")
                     except OSError as e:
@@ -375,7 +411,7 @@ class MLflowModelConfigManager:
                 raise ValueError(f"Model {model_name} not found in configuration")
                 
             # Get current version from MLflow
-            model_version = self.mlflow_client.get_model_version_by_alias(
+            model_version = self.registry.get_model_version_by_alias(
                 model_name,
                 stored_config.alias or "champion"
             )
@@ -1,37 +1,90 @@
 from pathlib import Path
+from typing import Optional
+import time
 
+from loguru import logger
 from mlflow import MlflowClient
 from mlflow.artifacts import download_artifacts
 
+from serve.utils import metrics, tracing
+from serve.utils.gcs.download import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
+from serve.utils.model_store import ModelStore
+
+
+MODEL_FETCH_SECONDS = metrics.histogram(
+    "serve_model_fetch_duration_seconds",
+    "Seconds get_model took to provide a model, by where the files came from",
+    ["source"]
+)
+
 
 def get_model_run_id(mlflow_client: MlflowClient, model_name: str, alias: str ):
-    model_version = mlflow_client.get_model_version_by_alias(model_name, alias)
+    """Return the run ID behind a model alias, cached when ``mlflow_client`` is a RegistryClient."""
+    with tracing.span("mlflow.resolve_alias", model=model_name, alias=alias):
+        model_version = mlflow_client.get_model_version_by_alias(model_name, alias)
     if not model_version:
         raise ValueError(f"No model version found for {model_name} with alias {alias}")
     return model_version.run_id
 
-def get_model(mlflow_client: MlflowClient, model_name: str, alias: str, desired_path: Path, artifact_path: str , gcp: bool = False):
-    model_version = mlflow_client.get_model_version_by_alias(model_name, alias)
-    if not model_version:
-        raise ValueError(f"No model version found for {model_name} with alias {alias}")
+def get_model(mlflow_client: MlflowClient, model_name: str, alias: str, desired_path: Path, artifact_path: str , gcp: bool = False, store: Optional[ModelStore] = None,
+              max_workers: int = DEFAULT_MAX_WORKERS, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Provide the model version behind ``alias`` under ``desired_path/model_name``.
+
+    ``max_workers`` and ``chunk_size`` set the concurrent byte-range
+    streams and their size of a GCS download.
+    """
+    with tracing.span("mlflow.get_model", model=model_name, alias=alias) as span:
+        with tracing.span("mlflow.resolve_alias"):
+            model_version = mlflow_client.get_model_version_by_alias(model_name, alias)
+        if not model_version:
+            raise ValueError(f"No model version found for {model_name} with alias {alias}")
+        span.set_attribute("run_id", model_version.run_id)
+
+        model_save_dir = Path(desired_path) / f"{model_name}"
+        model_save_dir.mkdir(exist_ok=True)
+        started = time.perf_counter()
+        store_key = f"mlflow:{model_version.run_id}/{artifact_path}"
+        if store is not None:
+            with tracing.span("store.materialize"):
+                materialized = store.materialize(store_key, model_save_dir / artifact_path)
+            if materialized:
+                logger.info(f"Run {model_version.run_id} of {model_name} already in model store, skipping download")
+                MODEL_FETCH_SECONDS.observe(time.perf_counter() - started, source="store")
+                span.set_attribute("source", "store")
+                return model_save_dir , model_version.run_id
+
+        span.set_attribute("source", "gcs" if gcp else "mlflow")
+        if gcp:
+            # Download the model
+            from serve.experiment_tracker.mlflow.mlflow_gcp_llamacpp.download import download_model_artifact
+            download_model_artifact(
+                client=mlflow_client,
+                model_name=model_name,
+                alias=alias,
+                artifact_path=artifact_path,
+                local_dir=model_save_dir,
+                max_workers=max_workers,
+                chunk_size=chunk_size
+            )
 
-    model_save_dir = Path(desired_path) / f"{model_name}"
-    model_save_dir.mkdir(exist_ok=True)
-    if gcp:
-        # Download the model
-        from serve.experiment_tracker.mlflow.mlflow_gcp_llamacpp.download import download_model_artifact
-        download_model_artifact(
-            client=mlflow_client,
-            model_name=model_name,
-            alias=alias,
-            artifact_path=artifact_path,
-            local_dir=model_save_dir
-        )
-
-    else:   
-        download_artifacts(
-            run_id=model_version.run_id,
-            artifact_path=artifact_path,
-            dst_path=str(model_save_dir)
-        )
-    return model_save_dir , model_version.run_id
\ No newline at end of file
+        else:   
+            try:
+                with tracing.span("mlflow.download_artifacts"):
+                    download_artifacts(
+                        run_id=model_version.run_id,
+                        artifact_path=artifact_path,
+                        dst_path=str(model_save_dir)
+                    )
+            except Exception:
+                metrics.DOWNLOAD_FAILURES.inc(source="mlflow")
+                raise
+            if metrics.enabled():
+                local = model_save_dir / artifact_path
+                files = [local] if local.is_file() else [f for f in local.rglob("*") if f.is_file()]
+                nbytes = sum(f.stat().st_size for f in files)
+                metrics.observe_download("mlflow", nbytes, time.perf_counter() - started)
+        if store is not None:
+            with tracing.span("store.ingest"):
+                store.ingest(store_key, model_save_dir / artifact_path)
+        MODEL_FETCH_SECONDS.observe(time.perf_counter() - started, source="gcs" if gcp else "mlflow")
+        return model_save_dir , model_version.run_id
@@ -0,0 +1,200 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import os
+import threading
+import time
+
+from loguru import logger
+from mlflow import MlflowClient
+from mlflow.entities.model_registry import ModelVersion
+
+from serve.utils import metrics
+
+
+class RegistryClient:
+    """MLflow client caching model registry lookups.
+
+    Wraps an ``MlflowClient`` and answers ``get_model_version_by_alias``
+    from a cache whose entries are refreshed once they are older than
+    ``ttl``. Concurrent lookups of the same alias share one request, and
+    ``get_many`` refreshes only the stale aliases of many models,
+    concurrently on at most ``max_workers`` threads. Model versions never
+    change once registered, so ``get_model_version`` is cached for good.
+
+    Every other attribute is delegated to the wrapped client, so a
+    registry client can be passed wherever an ``MlflowClient`` is
+    expected, for example to ``get_model`` or the server managers.
+
+    Attributes:
+        client: Wrapped MLflow client
+        ttl: Seconds an alias lookup stays valid
+        max_workers: Concurrent lookups of ``get_many``
+    """
+
+    def __init__(self, client: MlflowClient, ttl: float = 30.0, max_workers: int = 8,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize the registry client.
+
+        ``MLFLOW_HTTP_POOL_MAXSIZE`` defaults to ``max_workers``, so every
+        worker keeps its connection to the tracking server alive instead of
+        reconnecting. It only applies to clients that have not sent a
+        request yet.
+
+        Args:
+            client: MLflow client to wrap
+            ttl: Seconds an alias lookup stays valid
+            max_workers: Concurrent lookups of ``get_many``
+            clock: Monotonic time source
+        """
+        self.client = client
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._aliases: Dict[Tuple[str, str], Tuple[ModelVersion, float]] = {}
+        self._versions: Dict[Tuple[str, str], ModelVersion] = {}
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        os.environ.setdefault("MLFLOW_HTTP_POOL_MAXSIZE", str(max_workers))
+        metrics.track_cache("registry", self)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _cached(self, key: Tuple[str, str], max_age: float) -> Optional[ModelVersion]:
+        entry = self._aliases.get(key)
+        if entry is not None and self._clock() - entry[1] < max_age:
+            return entry[0]
+        return None
+
+    def get_model_version_by_alias(self, name: str, alias: str, max_age: Optional[float] = None) -> ModelVersion:
+        """Return the model version an alias points to.
+
+        Args:
+            name: Registered model name
+            alias: Alias of the version
+            max_age: Seconds a cached lookup may be old, defaults to ``ttl``;
+                0 always asks the registry
+
+        Returns:
+            ModelVersion: The model version
+
+        Raises:
+            MlflowException: If the registry lookup fails, errors are not cached
+        """
+        key = (name, alias)
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            version = self._cached(key, max_age)
+            if version is not None:
+                self._counters["hits"] += 1
+                return version
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._counters["misses"] += 1
+            else:
+                self._counters["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            version = self.client.get_model_version_by_alias(name, alias)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._counters["errors"] += 1
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._aliases[key] = (version, self._clock())
+            self._inflight.pop(key, None)
+        future.set_result(version)
+        return version
+
+    def get_model_version(self, name: str, version: Union[str, int]) -> ModelVersion:
+        """Return a registered model version, cached as versions are immutable."""
+        key = (name, str(version))
+        with self._lock:
+            cached = self._versions.get(key)
+        if cached is None:
+            cached = self.client.get_model_version(name, str(version))
+            with self._lock:
+                self._versions[key] = cached
+        return cached
+
+    def get_many(self, lookups: Iterable[Tuple[str, str]],
+                 max_age: Optional[float] = None) -> Dict[Tuple[str, str], Union[ModelVersion, Exception]]:
+        """Resolve the aliases of many models at once.
+
+        Fresh cache entries are returned as they are, the others are looked
+        up concurrently.
+
+        Args:
+            lookups: ``(model name, alias)`` pairs
+            max_age: Seconds a cached lookup may be old, defaults to ``ttl``
+
+        Returns:
+            Dict[Tuple[str, str], Union[ModelVersion, Exception]]: Each pair
+            mapped to its model version, or the error its lookup raised
+        """
+        lookups = list(dict.fromkeys(lookups))
+        max_age = self.ttl if max_age is None else max_age
+        results: Dict[Tuple[str, str], Union[ModelVersion, Exception]] = {}
+        stale: List[Tuple[str, str]] = []
+        with self._lock:
+            for key in lookups:
+                version = self._cached(key, max_age)
+                if version is not None:
+                    self._counters["hits"] += 1
+                    results[key] = version
+                else:
+                    stale.append(key)
+
+        def lookup(key: Tuple[str, str]) -> Union[ModelVersion, Exception]:
+            try:
+                return self.get_model_version_by_alias(*key, max_age=max_age)
+            except Exception as e:
+                return e
+
+        if len(stale) == 1:
+            results[stale[0]] = lookup(stale[0])
+        elif stale:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="registry")
+                executor = self._executor
+            results.update(zip(stale, executor.map(lookup, stale)))
+            logger.debug(f"Refreshed {len(stale)} of {len(lookups)} registry aliases")
+        return {key: results[key] for key in lookups}
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Forget the cached aliases of a model, or of all models if None."""
+        with self._lock:
+            if name is None:
+                self._aliases.clear()
+            else:
+                for key in [key for key in self._aliases if key[0] == name]:
+                    del self._aliases[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters.
+
+        Returns:
+            Dict[str, int]: ``hits``, ``misses``, ``coalesced``, ``errors``
+            and cached ``aliases``
+        """
+        with self._lock:
+            return dict(self._counters, aliases=len(self._aliases))
+
+    def close(self) -> None:
+        """Stop the lookup threads of ``get_many``."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
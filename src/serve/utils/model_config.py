@@ -1,11 +1,12 @@
 from typing import Dict, Optional, Union
 from pathlib import Path
 import os
-import json
 from loguru import logger
 
 from pydantic import BaseModel, Field, field_validator
 
+from serve.utils.config_store import ConfigStore
+
 
 
 class ModelConfigStatus(BaseModel):
@@ -62,6 +63,8 @@ class ModelConfig:
             if config_path.is_dir():
                 config_path = config_path / "config.json"
         self.config_path = config_path or Path(__file__).parents[4] / "models" / "config.json"
+        # Lookups are served from memory, the file is parsed again only when it changes
+        self.store = ConfigStore(self.config_path)
         self.config = self.get_config()
         logger.info(f"Initialized model configuration manager with config path: {self.config_path}")
 
@@ -73,7 +76,7 @@ class ModelConfig:
             
         Raises:
             OSError: If unable to create necessary directories
-            JSONDecodeError: If configuration file is corrupted
+            ConfigStoreError: If configuration file is corrupted
         """
         try:
             self._ensure_config_exists()
@@ -150,15 +153,14 @@ class ModelConfig:
             ModelConfigStatus: Configuration status for the model
             
         Raises:
-            JSONDecodeError: If configuration file is corrupted
+            ConfigStoreError: If configuration file is corrupted
         """
         try:
-            with open(self.config_path, 'r') as f:
-                config_data = json.load(f)
-                if model_name not in config_data:
-                    logger.warning(f"No configuration found for model: {model_name}")
-                    return ModelConfigStatus()
-                return ModelConfigStatus(**config_data[model_name])
+            entry = self.store.get(model_name)
+            if entry is None:
+                logger.warning(f"No configuration found for model: {model_name}")
+                return ModelConfigStatus()
+            return ModelConfigStatus(**entry)
         except Exception as e:
             logger.error(f"Failed to load model configuration for {model_name}: {str(e)}")
             raise
@@ -173,7 +175,7 @@ class ModelConfig:
             Optional[Path]: Path to the model directory if it exists, None otherwise
             
         Raises:
-            JSONDecodeError: If configuration file is corrupted
+            ConfigStoreError: If configuration file is corrupted
         """
         try:
             model_config = self.load_model_config(model_name)
@@ -189,12 +191,10 @@ class ModelConfig:
             Dict[str, ModelConfigStatus]: Dictionary mapping model names to their configurations
             
         Raises:
-            JSONDecodeError: If configuration file is corrupted
+            ConfigStoreError: If configuration file is corrupted
         """
         try:
-            with open(self.config_path, 'r') as f:
-                data = json.load(f)
-            return {k: ModelConfigStatus(**v) for k, v in data.items()} if data else {}
+            return {k: ModelConfigStatus(**v) for k, v in self.store.view().items()}
         except Exception as e:
             logger.error(f"Failed to load configuration: {str(e)}")
             raise
@@ -209,8 +209,7 @@ class ModelConfig:
             OSError: If unable to write configuration file
         """
         try:
-            with open(self.config_path, 'w') as f:
-                json.dump(config, f, indent=4)
+            self.store.replace(config)
             logger.info("Configuration saved successfully")
         except Exception as e:
             logger.error(f"Failed to save configuration: {str(e)}")
@@ -224,14 +223,11 @@ class ModelConfig:
             model_status: New configuration status for the model
             
         Raises:
-            JSONDecodeError: If configuration file is corrupted
+            ConfigStoreError: If configuration file is corrupted
             OSError: If unable to write configuration file
         """
         try:
-            config = self.load_config()
-            config[model_name] = model_status
-            config = {k: v.model_dump() for k, v in config.items()} if config else {}
-            self.save_config(config)
+            self.store.put(model_name, model_status.model_dump())
             logger.info(f"Updated configuration for model: {model_name}")
         except Exception as e:
             logger.error(f"Failed to update configuration for {model_name}: {str(e)}")
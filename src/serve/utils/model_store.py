@@ -0,0 +1,449 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from pathlib import Path
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, the in-process lock still applies
+    fcntl = None
+
+
+_HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class ModelStoreError(Exception):
+    """Custom exception for model store errors."""
+    pass
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """Compute the SHA-256 digest of a file.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        str: Hex encoded SHA-256 digest
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+# Entries of a build context that never change what an image serves
+_UNHASHED_NAMES = {".git", "__pycache__", ".venv", ".pytest_cache"}
+
+
+def directory_digest(directory: Union[str, Path], stat_cache: Optional[Union[str, Path]] = None) -> str:
+    """Compute the SHA-256 digest of a directory tree.
+
+    The digest covers the relative path, executable bit and content of
+    every file, so two trees with the same files share a digest wherever
+    they live. Files materialized from a ``ModelStore`` are links to their
+    blob, so with ``stat_cache`` a file whose device, inode, size and
+    modification time were seen before is not read again.
+
+    Args:
+        directory: Root of the tree
+        stat_cache: JSON file remembering file digests by their stat
+
+    Returns:
+        str: Hex encoded SHA-256 digest
+
+    Raises:
+        ModelStoreError: If ``directory`` does not exist
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise ModelStoreError(f"Directory not found: {directory}")
+    cache: Dict[str, str] = {}
+    if stat_cache is not None and Path(stat_cache).exists():
+        with open(stat_cache, "r") as f:
+            cache = json.load(f)
+    updated = False
+    hasher = hashlib.sha256()
+    for path in sorted(directory.rglob("*")):
+        relative = path.relative_to(directory)
+        if _UNHASHED_NAMES.intersection(relative.parts) or not path.is_file():
+            continue
+        stat = path.stat()
+        stat_key = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = cache.get(stat_key)
+        if digest is None:
+            digest = cache[stat_key] = file_digest(path)
+            updated = True
+        executable = "x" if stat.st_mode & 0o111 else "-"
+        hasher.update(f"{relative.as_posix()}\0{executable}\0{digest}\n".encode())
+    if stat_cache is not None and updated:
+        tmp_path = Path(f"{stat_cache}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, stat_cache)
+    return hasher.hexdigest()
+
+
+def _move_file(source: Path, target: Path) -> None:
+    """Rename ``source`` to ``target``, copying it across file systems."""
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.copy")
+        try:
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        source.unlink()
+
+
+class ModelStore:
+    """Content-addressed blob store shared by all locally deployed models.
+
+    Model files live once under ``blobs/`` keyed by their SHA-256 digest and
+    are hardlinked (or symlinked across file systems) into the per-model
+    directories the servers expect. Files ingested from another file system
+    are copied into the store. A snapshot records which files make up
+    an artifact, keyed by a caller-chosen string such as the MLflow run ID
+    and artifact path, so a known artifact can be materialized again
+    without touching the network.
+
+    Every link is tracked as a reference on its blob. Blobs without
+    references are kept as a cache and evicted least recently used first
+    once the store exceeds ``budget_bytes``. Changes of the index hold an
+    exclusive ``flock`` on ``index.json.lock``, as the managers of every
+    server kind and concurrent CLI invocations share one store.
+
+    Layout::
+
+        <root>/blobs/<ab>/<abcdef...>
+        <root>/snapshots/<sha256 of key>.json
+        <root>/index.json
+
+    Attributes:
+        root: Directory holding the store
+        budget_bytes: Disk budget for blobs, None for unlimited
+    """
+
+    def __init__(self, root: Union[str, Path], budget_bytes: Optional[int] = None):
+        """Initialize the store, creating its directories if needed.
+
+        Args:
+            root: Directory holding the store
+            budget_bytes: Disk budget for blobs, None for unlimited
+        """
+        self.root = Path(root).resolve()
+        self.budget_bytes = budget_bytes
+        self.blobs_dir = self.root / "blobs"
+        self.snapshots_dir = self.root / "snapshots"
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / "index.json.lock"
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+    def _load_index(self) -> Dict[str, dict]:
+        """Load the blob index mapping digests to size, refs and last use."""
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path, "r") as f:
+            return json.load(f)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the in-process lock and, outside nested calls, the exclusive file lock."""
+        with self._lock:
+            if fcntl is None or self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_index(self, index: Dict[str, dict]) -> None:
+        """Atomically write the blob index."""
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, digest: str) -> Path:
+        """Return the location of a blob in the store.
+
+        Args:
+            digest: SHA-256 digest of the blob
+
+        Returns:
+            Path: Path of the blob file
+        """
+        return self.blobs_dir / digest[:2] / digest
+
+    def _snapshot_path(self, key: str) -> Path:
+        """Return the snapshot file for an artifact key."""
+        return self.snapshots_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def _load_snapshot(self, key: str) -> Optional[Dict[str, str]]:
+        """Load the relative path to digest mapping of a snapshot."""
+        snapshot_path = self._snapshot_path(key)
+        if not snapshot_path.exists():
+            return None
+        with open(snapshot_path, "r") as f:
+            return json.load(f)["files"]
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> None:
+        """Link ``target`` to ``source``, preferring a hardlink."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        try:
+            os.link(source, target)
+        except OSError:
+            os.symlink(source, target)
+
+    def has_snapshot(self, key: str) -> bool:
+        """Check whether an artifact is fully available in the store.
+
+        Args:
+            key: Artifact key, e.g. ``mlflow:<run_id>/<artifact_path>``
+
+        Returns:
+            bool: True if the snapshot and all of its blobs exist
+        """
+        files = self._load_snapshot(key)
+        return files is not None and all(self.blob_path(d).exists() for d in files.values())
+
+    def materialize(self, key: str, target_dir: Union[str, Path]) -> bool:
+        """Link a stored artifact into ``target_dir``.
+
+        Args:
+            key: Artifact key
+            target_dir: Directory to populate
+
+        Returns:
+            bool: True if the artifact was materialized, False if it is not
+            in the store
+        """
+        with self._locked():
+            if not self.has_snapshot(key):
+                return False
+            files = self._load_snapshot(key)
+            target_dir = Path(target_dir).resolve()
+            index = self._load_index()
+            now = time.time()
+            for rel_path, digest in files.items():
+                target = target_dir / rel_path
+                self._link(self.blob_path(digest), target)
+                entry = index.setdefault(digest, {"size": self.blob_path(digest).stat().st_size, "refs": []})
+                if str(target) not in entry["refs"]:
+                    entry["refs"].append(str(target))
+                entry["last_used"] = now
+            self._save_index(index)
+            logger.info(f"Materialized {key} from model store into {target_dir}")
+            return True
+
+    def _stage(self, source_dir: Path) -> List[Tuple[Path, str, Path]]:
+        """Hash the files under ``source_dir`` and move new ones next to their blob.
+
+        Returns ``(path, digest, source)`` triples, where ``source`` is the
+        staged file or ``path`` itself if the blob already exists. Staged
+        files are moved back if hashing fails.
+        """
+        staged = []
+        try:
+            for path in sorted(source_dir.rglob("*")):
+                if path.is_symlink() or not path.is_file():
+                    continue
+                digest = file_digest(path)
+                blob = self.blob_path(digest)
+                source = path
+                if not blob.exists():
+                    blob.parent.mkdir(parents=True, exist_ok=True)
+                    source = blob.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.{len(staged)}.ingest")
+                    _move_file(path, source)
+                staged.append((path, digest, source))
+        except BaseException:
+            for path, _, source in staged:
+                if source != path:
+                    _move_file(source, path)
+            raise
+        return staged
+
+    def ingest(self, key: str, source_dir: Union[str, Path]) -> Dict[str, str]:
+        """Move the files of a downloaded artifact into the store.
+
+        Each regular file under ``source_dir`` is hashed, moved into the store
+        (or dropped if an identical blob exists) and replaced by a link.
+        Files are hashed and staged next to their blob before the store is
+        locked, so concurrent ingests and materializations only wait for the
+        index update.
+
+        Args:
+            key: Artifact key to record the snapshot under
+            source_dir: Directory holding the downloaded artifact
+
+        Returns:
+            Dict[str, str]: Relative paths mapped to blob digests
+
+        Raises:
+            ModelStoreError: If ``source_dir`` does not exist
+        """
+        source_dir = Path(source_dir).resolve()
+        if not source_dir.is_dir():
+            raise ModelStoreError(f"Artifact directory not found: {source_dir}")
+
+        staged = self._stage(source_dir)
+        with self._locked():
+            index = self._load_index()
+            files: Dict[str, str] = {}
+            now = time.time()
+            for path, digest, source in staged:
+                blob = self.blob_path(digest)
+                # Another ingest may have stored the blob, or gc removed it, since staging
+                if blob.exists():
+                    source.unlink()
+                else:
+                    os.replace(source, blob)
+                self._link(blob, path)
+                entry = index.setdefault(digest, {"size": blob.stat().st_size, "refs": []})
+                if str(path) not in entry["refs"]:
+                    entry["refs"].append(str(path))
+                entry["last_used"] = now
+                files[str(path.relative_to(source_dir))] = digest
+            self._save_index(index)
+
+            snapshot_path = self._snapshot_path(key)
+            tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"key": key, "files": files}, f, indent=4)
+            os.replace(tmp_path, snapshot_path)
+            logger.info(f"Stored {len(files)} files of {key} in model store")
+
+        if self.budget_bytes is not None:
+            self.gc()
+        return files
+
+    def release(self, target_dir: Union[str, Path]) -> int:
+        """Drop the references held by links under ``target_dir``.
+
+        Call this before deleting a model directory. The blobs stay in the
+        store until garbage collected.
+
+        Args:
+            target_dir: Model directory about to be removed
+
+        Returns:
+            int: Number of references released
+        """
+        prefix = str(Path(target_dir).resolve()) + os.sep
+        released = 0
+        with self._locked():
+            index = self._load_index()
+            for entry in index.values():
+                kept = [ref for ref in entry["refs"] if not ref.startswith(prefix)]
+                released += len(entry["refs"]) - len(kept)
+                entry["refs"] = kept
+            self._save_index(index)
+        return released
+
+    def move(self, source_dir: Union[str, Path], target_dir: Union[str, Path]) -> None:
+        """Move a model directory, keeping its references valid.
+
+        Args:
+            source_dir: Model directory to move
+            target_dir: New location, must not exist
+        """
+        source = str(Path(source_dir).resolve())
+        target = str(Path(target_dir).resolve())
+        with self._locked():
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, target)
+            index = self._load_index()
+            for entry in index.values():
+                entry["refs"] = [
+                    target + ref[len(source):] if ref.startswith(source + os.sep) else ref
+                    for ref in entry["refs"]
+                ]
+            self._save_index(index)
+
+    def _live_refs(self, digest: str, refs: List[str]) -> List[str]:
+        """Filter out references whose link was removed or replaced."""
+        blob = self.blob_path(digest)
+        live = []
+        for ref in refs:
+            try:
+                if os.path.samefile(ref, blob):
+                    live.append(ref)
+            except OSError:
+                continue
+        return live
+
+    def usage(self) -> int:
+        """Return the number of bytes held by blobs in the store."""
+        return sum(entry["size"] for entry in self._load_index().values())
+
+    def gc(self, budget_bytes: Optional[int] = None) -> List[str]:
+        """Evict unreferenced blobs until the store fits its budget.
+
+        Stale references are pruned first. Unreferenced blobs are then
+        removed least recently used first; referenced blobs are never
+        removed, so the store may remain above budget.
+
+        Args:
+            budget_bytes: Budget to enforce, defaults to ``self.budget_bytes``.
+                0 removes every unreferenced blob.
+
+        Returns:
+            List[str]: Digests of evicted blobs
+        """
+        budget = self.budget_bytes if budget_bytes is None else budget_bytes
+        evicted: List[str] = []
+        with self._locked():
+            index = self._load_index()
+            for digest, entry in index.items():
+                entry["refs"] = self._live_refs(digest, entry["refs"])
+
+            total = sum(entry["size"] for entry in index.values())
+            candidates = sorted(
+                (d for d, e in index.items() if not e["refs"]),
+                key=lambda d: index[d].get("last_used", 0)
+            )
+            for digest in candidates:
+                if budget is None or total <= budget:
+                    break
+                self.blob_path(digest).unlink(missing_ok=True)
+                total -= index.pop(digest)["size"]
+                evicted.append(digest)
+            self._save_index(index)
+
+            if evicted:
+                for snapshot_path in self.snapshots_dir.glob("*.json"):
+                    with open(snapshot_path, "r") as f:
+                        snapshot = json.load(f)
+                    if any(d in evicted for d in snapshot["files"].values()):
+                        snapshot_path.unlink()
+                logger.info(f"Evicted {len(evicted)} blobs from model store, {total} bytes in use")
+        return evicted
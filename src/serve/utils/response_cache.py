@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+
+from serve.utils import metrics
+
+
+# Request fields that do not change the generated output
+_VOLATILE_FIELDS = {"stream", "stream_options", "user", "cache_prompt", "id_slot"}
+
+
+def is_deterministic(params: Mapping[str, Any]) -> bool:
+    """Return whether generation parameters select tokens greedily.
+
+    Only an explicit ``temperature`` of 0 or ``top_k`` of 1 counts, as the
+    llama.cpp server samples by default.
+
+    Args:
+        params: Generation parameters of a request
+
+    Returns:
+        bool: True if identical requests produce identical outputs
+    """
+    try:
+        if "temperature" in params and float(params["temperature"]) <= 0.0:
+            return True
+        return "top_k" in params and int(params["top_k"]) == 1
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_key(run_id: str, params: Mapping[str, Any], endpoint: str = "") -> str:
+    """Build the cache key of a request.
+
+    Parameters are normalized so requests differing only in field order,
+    number formatting or fields without effect on the output share a key.
+
+    Args:
+        run_id: Run ID of the serving model, so a new run never hits
+            entries of the previous one
+        params: Prompt and generation parameters
+        endpoint: Endpoint the request was sent to
+
+    Returns:
+        str: Hex encoded SHA-256 key
+    """
+    normalized = {k: v for k, v in params.items() if k not in _VOLATILE_FIELDS}
+    if isinstance(normalized.get("stop"), str):
+        normalized["stop"] = [normalized["stop"]]
+    for k, v in normalized.items():
+        if isinstance(v, float) and v.is_integer():
+            normalized[k] = int(v)
+    payload = json.dumps([run_id, endpoint, normalized], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (tuple, list)):
+        return sum(_size(v) for v in value)
+    return len(repr(value))
+
+
+class ResponseCache:
+    """LRU cache with TTL for generated responses, coalescing identical requests.
+
+    ``begin`` is called with the key of a request. The first caller of a
+    key that is neither cached nor in flight becomes its owner and has to
+    compute the response and hand it to ``finish`` or ``fail``; every other
+    caller gets a future resolving to the owner's result, so identical
+    concurrent requests cost one upstream call. Futures are
+    ``concurrent.futures.Future`` objects and can be awaited with
+    ``asyncio.wrap_future``.
+
+    Attributes:
+        max_bytes: Size budget of the cached responses
+        ttl: Seconds a response stays valid
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize an empty cache.
+
+        Args:
+            max_bytes: Size budget of the cached responses
+            ttl: Seconds a response stays valid
+            clock: Monotonic time source
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+        metrics.track_cache("response", self)
+
+    def _lookup(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, size, expires = entry
+        if self._clock() >= expires:
+            del self._entries[key]
+            self._bytes -= size
+            self._counters["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached response without claiming the key, None on a miss."""
+        with self._lock:
+            found, value = self._lookup(key)
+            self._counters["hits" if found else "misses"] += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a response, evicting least recently used ones over budget."""
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, self._clock() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters["evictions"] += 1
+
+    def begin(self, key: str) -> Tuple[bool, Future]:
+        """Claim a key or join the request already computing it.
+
+        Args:
+            key: Key from ``cache_key``
+
+        Returns:
+            Tuple[bool, Future]: Whether the caller owns the key, and a
+            future of the response. Cache hits return a resolved future.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self._counters["hits"] += 1
+                future = Future()
+                future.set_result(value)
+                return False, future
+            if key in self._inflight:
+                self._counters["coalesced"] += 1
+                return False, self._inflight[key]
+            self._counters["misses"] += 1
+            future = self._inflight[key] = Future()
+            return True, future
+
+    def finish(self, key: str, value: Any, store: bool = True) -> None:
+        """Hand the owner's response to the waiters and cache it.
+
+        Args:
+            key: Key claimed with ``begin``
+            value: Computed response
+            store: False to pass the response to current waiters only
+        """
+        if store:
+            self.put(key, value)
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key: str, error: BaseException) -> None:
+        """Pass the owner's error to the waiters without caching anything."""
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached response or compute it once for all concurrent callers."""
+        owner, future = self.begin(key)
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.finish(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters.
+
+        Returns:
+            Dict[str, int]: ``hits``, ``misses``, ``coalesced``,
+            ``evictions``, ``expirations``, ``entries``, ``bytes`` and
+            ``in_flight``
+        """
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), bytes=self._bytes,
+                        in_flight=len(self._inflight))
@@ -0,0 +1,522 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+
+from loguru import logger
+
+
+# Environment variables read by ``enable_from_env``
+FILE_ENV = "SERVE_TRACE_FILE"
+ENDPOINT_ENV = "SERVE_TRACE_ENDPOINT"
+TIMELINE_ENV = "SERVE_TRACE_TIMELINE"
+# W3C trace context handed to child processes, see ``TaskCLI.run``
+TRACEPARENT_ENV = "TRACEPARENT"
+
+_TRACEPARENT_RE = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}")
+
+
+class TracingError(Exception):
+    """Custom exception for tracing errors."""
+    pass
+
+
+@dataclass
+class Span:
+    """A timed operation, part of a trace.
+
+    Attributes:
+        name: Operation name, such as ``gcs.download``
+        trace_id: Hex ID shared by all spans of a trace
+        span_id: Hex ID of this span
+        parent_id: Span ID of the parent, None for the root of a trace
+        start_ns: Start in nanoseconds since the epoch
+        end_ns: End in nanoseconds since the epoch, None while running
+        attributes: Details of the operation
+        error: Error that ended the operation, None if it succeeded
+        local_root: Whether no span of this process is its parent. The
+            trace is exported when its local root ends.
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    local_root: bool = True
+
+    @property
+    def seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    @property
+    def traceparent(self) -> str:
+        """W3C ``traceparent`` header continuing the trace under this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off."""
+
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional[Span]] = ContextVar("serve_span", default=None)
+
+
+def _parse_traceparent(traceparent: Optional[str]) -> Optional[tuple]:
+    match = _TRACEPARENT_RE.fullmatch((traceparent or "").strip())
+    if traceparent and not match:
+        logger.warning(f"Ignoring malformed traceparent {traceparent!r}")
+    return match.groups() if match else None
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span], service_name: str = "serve") -> Dict[str, Any]:
+    """Encode spans as an OTLP/JSON ``ExportTraceServiceRequest``.
+
+    Args:
+        spans: Finished spans
+        service_name: Value of the ``service.name`` resource attribute
+
+    Returns:
+        Dict[str, Any]: Request body accepted by OTLP/HTTP collectors on
+        ``/v1/traces``
+    """
+    encoded = []
+    for span in spans:
+        entry = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in span.attributes.items()],
+            # STATUS_CODE_OK or STATUS_CODE_ERROR
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            entry["parentSpanId"] = span.parent_id
+        encoded.append(entry)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "serve"}, "spans": encoded}],
+    }]}
+
+
+def render_timeline(spans: List[Span], width: int = 60) -> str:
+    """Draw spans as a flame-style timeline, children indented below their parent.
+
+    Every line places a bar at the span's offset from the start of the
+    trace, its length proportional to the span's duration. Failed spans
+    are marked with ``!``.
+
+    Args:
+        spans: Spans of one trace
+        width: Characters spanned by the whole trace
+
+    Returns:
+        str: The timeline, one line per span
+    """
+    if not spans:
+        return ""
+    start = min(s.start_ns for s in spans)
+    end = max(s.end_ns or s.start_ns for s in spans)
+    total = max(end - start, 1)
+    ids = {s.span_id for s in spans}
+    children: Dict[Optional[str], List[Span]] = {}
+    for span in spans:
+        children.setdefault(span.parent_id if span.parent_id in ids else None, []).append(span)
+
+    rows = []
+
+    def visit(parent_id: Optional[str], depth: int) -> None:
+        for span in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+            rows.append((depth, span))
+            visit(span.span_id, depth + 1)
+
+    visit(None, 0)
+    label_width = max(2 * depth + len(span.name) for depth, span in rows)
+    lines = [f"trace {spans[0].trace_id} {total / 1e6:.1f} ms"]
+    for depth, span in rows:
+        offset = min(int((span.start_ns - start) / total * width), width - 1)
+        length = max(1, round(((span.end_ns or end) - span.start_ns) / total * width))
+        bar = (" " * offset + "#" * min(length, width - offset)).ljust(width)
+        label = ("  " * depth + span.name).ljust(label_width)
+        lines.append(f"{label} |{bar}| {span.seconds * 1000:>10.1f} ms{' !' if span.error else ''}")
+    return "\n".join(lines)
+
+
+class JsonFileExporter:
+    """Appends every trace to a file as one line of OTLP/JSON.
+
+    This is the format of the OpenTelemetry collector's file exporter, so
+    the file can be replayed into a collector or read with ``jq``.
+    """
+
+    def __init__(self, path: Union[str, Path], service_name: str = "serve"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(to_otlp(spans, self.service_name)) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+class OTLPHttpExporter:
+    """Sends traces to an OTLP/HTTP collector as JSON from a background thread.
+
+    ``export`` only queues the spans, so a slow or unreachable collector
+    never delays the traced code. The thread posts them in batches of up to
+    ``max_batch_size`` spans. Spans arriving while ``max_queue_size`` are
+    queued are dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, endpoint: str, service_name: str = "serve", timeout: float = 5.0,
+                 max_queue_size: int = 2048, max_batch_size: int = 512, schedule_delay: float = 1.0):
+        """Initialize the exporter.
+
+        Args:
+            endpoint: Collector URL, such as ``http://localhost:4318``.
+                ``/v1/traces`` is appended unless already present.
+            service_name: Value of the ``service.name`` resource attribute
+            timeout: Seconds to wait for the collector
+            max_queue_size: Spans waiting to be sent before new ones are dropped
+            max_batch_size: Spans sent per request
+            schedule_delay: Seconds a batch waits for more spans before it is sent
+        """
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._send_loop, name="otlp-exporter", daemon=True)
+                self._thread.start()
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                if self.dropped == 0:
+                    logger.warning(f"OTLP export queue for {self.url} is full, dropping spans")
+                self.dropped += 1
+
+    def _send_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.schedule_delay
+            while batch[-1] is not None and len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            spans = [span for span in batch if span is not None]
+            try:
+                if spans:
+                    self.send(spans)
+            except Exception as e:
+                logger.warning(f"Failed to send {len(spans)} spans to {self.url}: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def send(self, spans: List[Span]) -> None:
+        """Post spans to the collector in the calling thread.
+
+        Raises:
+            TracingError: If the collector rejects them
+        """
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url, data=json.dumps(to_otlp(spans, self.service_name)).encode(),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:  # noqa: S310
+            if response.status >= 300:
+                raise TracingError(f"Collector at {self.url} answered {response.status}")
+
+    def flush(self) -> None:
+        """Wait until the queued spans are sent."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self) -> None:
+        """Send the queued spans and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class TimelineExporter:
+    """Appends the timeline of every trace to a file, or logs it."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, width: int = 60):
+        """Initialize the exporter.
+
+        Args:
+            path: File the timelines are appended to, None or ``-`` to log
+                them instead
+            width: Characters spanned by a whole trace
+        """
+        self.path = Path(path) if path not in (None, "-") else None
+        self.width = width
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        timeline = render_timeline(spans, self.width)
+        if self.path is None:
+            logger.info(f"Trace timeline\n{timeline}")
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(timeline + "\n\n")
+
+
+class Tracer:
+    """Records spans and exports them trace by trace.
+
+    Spans nest through a context variable, so a span opened while another
+    one is current becomes its child. A trace is exported once its local
+    root span ends. Spans are not recorded until the tracer is enabled, so
+    instrumented code pays a single attribute check when tracing is off.
+
+    Attributes:
+        enabled: Whether spans are recorded
+        exporters: Objects whose ``export(spans)`` receives finished traces
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.exporters: List[Any] = []
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[Span]] = {}
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[str] = None, **attributes: Any) -> Iterator[Union[Span, _NoopSpan]]:
+        """Time the enclosed block as a span.
+
+        Args:
+            name: Operation name
+            parent: ``traceparent`` of a span in another process to attach
+                to, used only when no span is current
+            **attributes: Details of the operation
+
+        Yields:
+            Span: The running span, ``NOOP_SPAN`` while tracing is off
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self._start(name, attributes, parent)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            self._end(span)
+
+    def record(self, name: str, start_ns: int, end_ns: Optional[int] = None, error: Optional[str] = None,
+               **attributes: Any) -> None:
+        """Record a finished span, for operations that cannot be enclosed in a block such as generators.
+
+        Args:
+            name: Operation name
+            start_ns: Start from ``time.time_ns()``
+            end_ns: End from ``time.time_ns()``, defaults to now
+            error: Error that ended the operation
+            **attributes: Details of the operation
+        """
+        if not self.enabled:
+            return
+        span = self._start(name, attributes, None, start_ns)
+        span.error = error
+        self._end(span, end_ns)
+
+    def _start(self, name: str, attributes: Dict[str, Any], parent: Optional[str],
+               start_ns: Optional[int] = None) -> Span:
+        current = _current.get()
+        if current is not None:
+            trace_id, parent_id = current.trace_id, current.span_id
+        else:
+            trace_id, parent_id = _parse_traceparent(parent) or (secrets.token_hex(16), None)
+        attributes.setdefault("thread", threading.current_thread().name)
+        return Span(name, trace_id, secrets.token_hex(8), parent_id, start_ns or time.time_ns(),
+                    attributes=dict(attributes), local_root=current is None)
+
+    def _end(self, span: Span, end_ns: Optional[int] = None) -> None:
+        span.end_ns = end_ns or time.time_ns()
+        with self._lock:
+            spans = self._pending.setdefault(span.trace_id, [])
+            spans.append(span)
+            if not span.local_root:
+                return
+            del self._pending[span.trace_id]
+        self._export(spans)
+
+    def _export(self, spans: List[Span]) -> None:
+        for exporter in list(self.exporters):
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(spans)} spans with {type(exporter).__name__}: {str(e)}")
+
+    def flush(self) -> None:
+        """Export the spans of traces whose root has not ended yet."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for spans in pending.values():
+            self._export(spans)
+
+
+TRACER = Tracer()
+
+
+def span(name: str, parent: Optional[str] = None, **attributes: Any):
+    """Time the enclosed block as a span of the process tracer, see ``Tracer.span``."""
+    return TRACER.span(name, parent=parent, **attributes)
+
+
+def record(name: str, start_ns: int, end_ns: Optional[int] = None, error: Optional[str] = None,
+           **attributes: Any) -> None:
+    """Record a finished span in the process tracer, see ``Tracer.record``."""
+    TRACER.record(name, start_ns, end_ns, error, **attributes)
+
+
+def traced(name: str) -> Callable:
+    """Decorate a function to run in a span named ``name``."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: Callable) -> Callable:
+    """Bind ``func`` to the current span, so spans it opens in worker threads join the trace."""
+    parent = _current.get()
+    if parent is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+
+def current_traceparent() -> Optional[str]:
+    """Return the ``traceparent`` of the current span, None outside spans."""
+    current = _current.get()
+    return current.traceparent if current is not None else None
+
+
+def enabled() -> bool:
+    """Return whether spans are recorded."""
+    return TRACER.enabled
+
+
+def enable(file: Optional[Union[str, Path]] = None, endpoint: Optional[str] = None,
+           timeline: Optional[Union[str, Path]] = None, service_name: str = "serve") -> Tracer:
+    """Start recording spans and export every finished trace.
+
+    Args:
+        file: File every trace is appended to as a line of OTLP/JSON
+        endpoint: OTLP/HTTP collector URL, such as ``http://localhost:4318``
+        timeline: File the flame-style timeline of every trace is appended
+            to, ``-`` to log it
+        service_name: Value of the ``service.name`` resource attribute
+
+    Returns:
+        Tracer: The process tracer
+    """
+    exporters = []
+    if file:
+        exporters.append(JsonFileExporter(file, service_name))
+    if endpoint:
+        exporters.append(OTLPHttpExporter(endpoint, service_name))
+    if timeline:
+        exporters.append(TimelineExporter(timeline))
+    TRACER.exporters = exporters
+    TRACER.enabled = True
+    return TRACER
+
+
+def enable_from_env(service_name: str = "serve") -> bool:
+    """Enable tracing if ``SERVE_TRACE_FILE``, ``SERVE_TRACE_ENDPOINT`` or ``SERVE_TRACE_TIMELINE`` is set.
+
+    Returns:
+        bool: Whether tracing is enabled
+    """
+    file, endpoint, timeline = (os.environ.get(name) for name in (FILE_ENV, ENDPOINT_ENV, TIMELINE_ENV))
+    if TRACER.enabled or not (file or endpoint or timeline):
+        return TRACER.enabled
+    enable(file=file, endpoint=endpoint, timeline=timeline, service_name=service_name)
+    return True
+
+
+def disable() -> None:
+    """Stop recording spans, exporting those of unfinished traces."""
+    TRACER.enabled = False
+    TRACER.flush()
+    exporters, TRACER.exporters = TRACER.exporters, []
+    for exporter in exporters:
+        # Exporters sending from a background thread finish their queue
+        shutdown = getattr(exporter, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
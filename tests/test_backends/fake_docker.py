@@ -0,0 +1,153 @@
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, unquote, urlparse
+from pathlib import Path
+import json
+import os
+import sys
+import threading
+
+
+class FakeDockerDaemon(ThreadingMixIn, UnixStreamServer):
+    """Minimal Docker Engine API on a unix socket, enough for the backend."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, images=()):
+        self.containers = {}
+        self.images = set(images)
+        self.requests = []
+        super().__init__(str(socket_path), _Handler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+_CLI_SCRIPT = """
+import fcntl, json, re, sys
+from pathlib import Path
+
+# Tasks of several models may run at once
+lock = open(Path(__file__).with_name("docker.lock"), "w")
+fcntl.flock(lock, fcntl.LOCK_EX)
+state = Path(__file__).with_name("containers.json")
+containers = json.loads(state.read_text())
+args = sys.argv[1:]
+with open(Path(__file__).with_name("calls.jsonl"), "a") as f:
+    f.write(json.dumps(args) + "\\n")
+if args[0] in json.loads(Path(__file__).with_name("failing.json").read_text()):
+    sys.exit(f"docker {args[0]} failed")
+if args[0] == "ps":
+    filters = [args[i + 1] for i, arg in enumerate(args) if arg in ("-f", "--filter")]
+    # Like docker, a status filter also lists stopped containers
+    every = "-a" in args or "-aq" in args or any(f.startswith("status=") for f in filters)
+    for name, status in containers.items():
+        if not every and status != "running":
+            continue
+        if all(re.search(value, "/" + name) if key == "name" else status == value
+               for key, _, value in (f.partition("=") for f in filters)):
+            print(name)
+elif args[0] == "run":
+    name = args[args.index("--name") + 1]
+    if name in containers:
+        sys.exit(f"Conflict. The container name {name} is already in use")
+    containers[name] = "running"
+    print(name)
+elif args[0] == "start":
+    containers[args[1]] = "running"
+elif args[0] == "stop":
+    containers.update({name: "exited" for name in args[1:]})
+elif args[0] == "rm":
+    for name in args[1:]:
+        if name != "-f":
+            containers.pop(name)
+state.write_text(json.dumps(containers))
+"""
+
+
+class FakeDockerCLI:
+    """``docker`` executable recording its arguments, put first on PATH.
+
+    It implements ``ps`` with name and status filters, ``run``, ``start``,
+    ``stop`` and ``rm``, enough to run the Taskfile tasks against a set of
+    containers. Subcommands listed in ``failing`` exit with an error.
+    """
+
+    def __init__(self, bin_dir, containers, failing=()):
+        self.bin_dir = Path(bin_dir)
+        self.bin_dir.mkdir(parents=True, exist_ok=True)
+        self._state = self.bin_dir / "containers.json"
+        self._state.write_text(json.dumps(containers))
+        (self.bin_dir / "failing.json").write_text(json.dumps(list(failing)))
+        script = self.bin_dir / "docker"
+        script.write_text(f"#!{sys.executable}\n{_CLI_SCRIPT}")
+        script.chmod(0o755)
+        self.path = f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+
+    @property
+    def containers(self):
+        return json.loads(self._state.read_text())
+
+    @property
+    def calls(self):
+        calls = self.bin_dir / "calls.jsonl"
+        return [json.loads(line) for line in calls.read_text().splitlines()] if calls.exists() else []
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def address_string(self):
+        return "unix"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _handle(self):
+        daemon = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        parts = unquote(url.path).strip("/").split("/")
+        daemon.requests.append((self.command, url.path))
+
+        if parts[0] == "images" and parts[-1] == "json":
+            return self._reply(200 if "/".join(parts[1:-1]) in daemon.images else 404, {})
+        if parts == ["images", "create"]:
+            daemon.images.add(f"{query['fromImage'][0]}:{query['tag'][0]}")
+            return self._reply(200, {"status": "pulled"})
+        if parts == ["build"]:
+            daemon.images.add(query["t"][0])
+            return self._reply(200, {"stream": "built"})
+        if parts == ["containers", "create"]:
+            name = query["name"][0]
+            daemon.containers[name] = {"State": {"Status": "created"}, "Config": json.loads(body)}
+            return self._reply(201, {"Id": name})
+
+        name = parts[1]
+        container = daemon.containers.get(name)
+        if container is None:
+            return self._reply(404, {"message": f"No such container: {name}"})
+        if self.command == "GET":
+            return self._reply(200, container)
+        if self.command == "DELETE":
+            del daemon.containers[name]
+            return self._reply(204)
+        if parts[2] == "start":
+            container["State"]["Status"] = "running"
+        elif parts[2] == "stop":
+            container["State"]["Status"] = "exited"
+        return self._reply(204)
+
+    do_GET = do_POST = do_DELETE = _handle
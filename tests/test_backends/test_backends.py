@@ -0,0 +1,267 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import shutil
+import sys
+import threading
+
+import pytest
+
+from serve.servers.backends import (
+    BackendError,
+    ContainerSpec,
+    DockerEngineBackend,
+    FakeBackend,
+    LocalProcessBackend,
+    TaskCLIBackend,
+    get_backend,
+)
+from serve.servers.bluegreen import free_port
+from serve.servers.embedding.main import EmbeddingConfig, EmbeddingManager
+from serve.servers.llamacpp.serve import LlamaCppConfig, LlamaCppServer
+from test_backends.fake_docker import FakeDockerCLI, FakeDockerDaemon
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+LLAMACPP_TASKFILE_DIR = Path(__file__).parents[2] / "src" / "serve" / "servers" / "llamacpp"
+
+requires_task = pytest.mark.skipif(shutil.which("task") is None, reason="go-task is not installed")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = FakeDockerDaemon(tmp_path / "docker.sock")
+    yield daemon
+    daemon.close()
+
+
+@pytest.fixture
+def docker_cli(tmp_path, monkeypatch):
+    docker = FakeDockerCLI(tmp_path / "bin", {
+        "lmorbits-llamacpp-m1": "running",
+        "lmorbits-llamacpp-m1-blue": "running",
+        "lmorbits-llamacpp-m1-green": "running",
+        "lmorbits-llamacpp-m10": "running",
+        "other-m1": "running",
+    })
+    monkeypatch.setenv("PATH", docker.path)
+    return docker
+
+
+def test_llamacpp_lifecycle_with_fake_backend(tmp_path):
+    backend = FakeBackend()
+    server = LlamaCppServer(tmp_path, None, backend=backend, readiness_timeout=None)
+    server.config_update(LlamaCppConfig(model_name="m1", alias="prod", model_path=tmp_path / "m1", run_id="r1"))
+
+    server.run_serve("m1", port=8081)
+    spec = backend.specs["lmorbits-llamacpp-m1"]
+    assert backend.containers == {"lmorbits-llamacpp-m1": "running"}
+    assert spec.ports == {8081: 8080}
+    assert spec.volumes == {str(tmp_path / "m1"): "/models"}
+
+    server.stop_all_serve()
+    assert backend.containers == {"lmorbits-llamacpp-m1": "exited"}
+    server.delete_all_serve()
+    assert backend.containers == {}
+    assert [op for op, _ in backend.calls] == ["serve", "stop", "delete"]
+
+
+def test_embedding_lifecycle_with_fake_backend(tmp_path):
+    backend = FakeBackend()
+    manager = EmbeddingManager(tmp_path, None, backend=backend, readiness_timeout=None)
+    manager.config_update(EmbeddingConfig(model_name="e1", alias="prod", model_path=tmp_path / "e1", run_id="r1"))
+
+    manager.run_serve("e1")
+    assert backend.specs["lmorbits-embedding-e1"].build_context == tmp_path / "e1"
+    manager.delete_serve("e1")
+    assert backend.containers == {}
+    with pytest.raises(ValueError):
+        manager.run_serve("missing")
+
+
+def test_docker_backend_pulls_creates_and_starts(daemon):
+    backend = DockerEngineBackend(daemon.server_address)
+    spec = ContainerSpec(name="c1", image="ghcr.io/org/img:server", command=["-m", "/models/model.gguf"],
+                         ports={8000: 8080}, volumes={"/data": "/models"})
+
+    backend.serve(spec)
+    assert backend.status(spec) == "running"
+    assert "ghcr.io/org/img:server" in daemon.images
+    config = daemon.containers["c1"]["Config"]
+    assert config["HostConfig"]["PortBindings"] == {"8080/tcp": [{"HostPort": "8000"}]}
+    assert config["HostConfig"]["Binds"] == ["/data:/models"]
+
+    created = len(daemon.requests)
+    backend.serve(spec)
+    assert len(daemon.requests) == created + 1
+
+    backend.stop(spec)
+    assert backend.status(spec) == "exited"
+    backend.delete(spec)
+    assert backend.status(spec) is None
+    backend.delete(spec)
+
+
+def test_docker_backend_builds_from_context(daemon, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM scratch\n")
+    backend = DockerEngineBackend(daemon.server_address)
+    backend.serve(ContainerSpec(name="e1", image="emb-image", build_context=tmp_path))
+
+    assert ("POST", "/build") in daemon.requests
+    assert daemon.containers["e1"]["State"]["Status"] == "running"
+
+
+def test_docker_backend_unreachable(tmp_path):
+    backend = DockerEngineBackend(tmp_path / "missing.sock")
+    with pytest.raises(BackendError):
+        backend.status(ContainerSpec(name="c1"))
+
+
+def test_local_backend_lifecycle(tmp_path):
+    backend = LocalProcessBackend(tmp_path, stop_timeout=5)
+    spec = ContainerSpec(name="p1", local_command=[sys.executable, "-c", "import time; time.sleep(60)"])
+
+    assert backend.status(spec) is None
+    backend.serve(spec)
+    pid = (tmp_path / "p1.pid").read_text()
+    assert backend.status(spec) == "running"
+    backend.serve(spec)
+    assert (tmp_path / "p1.pid").read_text() == pid
+
+    backend.stop(spec)
+    assert backend.status(spec) == "exited"
+    backend.delete(spec)
+    assert backend.status(spec) is None
+
+
+def test_local_backend_requires_command(tmp_path):
+    with pytest.raises(BackendError):
+        LocalProcessBackend(tmp_path).serve(ContainerSpec(name="p1"))
+
+
+@requires_task
+def test_task_backend_stop_and_delete_target_one_container(tmp_path, docker_cli):
+    backend = TaskCLIBackend(LLAMACPP_TASKFILE_DIR)
+    server = LlamaCppServer(tmp_path, None, backend=backend, readiness_timeout=None)
+
+    backend.stop(server.container_spec("m1", slot="blue"))
+    assert ["stop", "lmorbits-llamacpp-m1-blue"] in docker_cli.calls
+    assert docker_cli.containers["lmorbits-llamacpp-m1-blue"] == "exited"
+    assert docker_cli.containers["lmorbits-llamacpp-m1-green"] == "running"
+
+    backend.delete(server.container_spec("m1"))
+    assert [call for call in docker_cli.calls if call[0] in ("stop", "rm")] == [
+        ["stop", "lmorbits-llamacpp-m1-blue"],
+        ["rm", "-f", "lmorbits-llamacpp-m1"],
+    ]
+    assert set(docker_cli.containers) == {"lmorbits-llamacpp-m1-blue", "lmorbits-llamacpp-m1-green",
+                                          "lmorbits-llamacpp-m10", "other-m1"}
+
+    # A container that is already gone is not an error
+    backend.delete(server.container_spec("m1"))
+
+
+@requires_task
+def test_task_backend_delete_all_keeps_other_containers(tmp_path, docker_cli):
+    TaskCLIBackend(LLAMACPP_TASKFILE_DIR).task_cli.run("delete", all="true")
+    assert docker_cli.containers == {"other-m1": "running"}
+
+
+@requires_task
+def test_task_backend_raises_when_docker_fails(tmp_path, monkeypatch):
+    docker = FakeDockerCLI(tmp_path / "bin", {"lmorbits-llamacpp-m1": "running"}, failing=("run", "rm"))
+    monkeypatch.setenv("PATH", docker.path)
+    backend = TaskCLIBackend(LLAMACPP_TASKFILE_DIR)
+    server = LlamaCppServer(tmp_path, None, backend=backend, readiness_timeout=None)
+
+    backend.serve(server.container_spec("m1"))
+    with pytest.raises(BackendError, match="delete"):
+        backend.delete(server.container_spec("m1"))
+    with pytest.raises(BackendError, match="serve"):
+        backend.serve(server.container_spec("m2"))
+
+
+@requires_task
+def test_task_backend_status_checks_server_port(tmp_path, docker_cli):
+    health = ThreadingHTTPServer(("127.0.0.1", 0), _HealthHandler)
+    threading.Thread(target=health.serve_forever, daemon=True).start()
+    backend = TaskCLIBackend(LLAMACPP_TASKFILE_DIR)
+    server = LlamaCppServer(tmp_path, None, backend=backend, readiness_timeout=None)
+    try:
+        assert backend.status(server.container_spec("m1", port=health.server_address[1])) == "running"
+        assert backend.status(server.container_spec("m1", port=free_port())) is None
+        assert backend.status(server.container_spec("m2", port=health.server_address[1])) is None
+    finally:
+        health.shutdown()
+        health.server_close()
+
+
+def test_get_backend(tmp_path):
+    assert isinstance(get_backend("fake", tmp_path, tmp_path), FakeBackend)
+    with pytest.raises(ValueError):
+        get_backend("podman", tmp_path, tmp_path)
+
+
+def test_docker_backend_builds_missing_image_once(daemon, tmp_path):
+    (tmp_path / "Dockerfile").write_text("FROM scratch\n")
+    backend = DockerEngineBackend(daemon.server_address)
+    spec = ContainerSpec(name="e1", image="emb-image:abc", build_context=tmp_path)
+
+    assert backend.build(spec)
+    assert not backend.build(spec)
+    backend.serve(spec)
+    assert daemon.requests.count(("POST", "/build")) == 1
+
+
+def _write_project(path, payload="weights"):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "Dockerfile").write_text("FROM scratch\n")
+    (path / "model.bin").write_text(payload)
+    return path
+
+
+def test_embedding_image_tagged_by_content(tmp_path):
+    backend = FakeBackend()
+    manager = EmbeddingManager(tmp_path, None, backend=backend, readiness_timeout=None)
+    manager.config_update(EmbeddingConfig(model_name="e1", alias="prod", model_path=_write_project(tmp_path / "e1"),
+                                          run_id="r1"))
+    manager.config_update(EmbeddingConfig(model_name="e2", alias="prod", model_path=_write_project(tmp_path / "e2"),
+                                          run_id="r2"))
+
+    image = manager.build_image("e1")
+    assert image.startswith("lmorbits-embedding-image:")
+    assert manager.container_spec("e2").image == image
+    assert manager.container_spec("e2").task_vars["image"] == image
+    assert not backend.build(manager.container_spec("e2"))
+
+    _write_project(tmp_path / "e2", payload="retrained")
+    assert manager.container_spec("e2").image != image
+
+
+def test_embedding_warm_builds_without_serving(tmp_path, monkeypatch):
+    backend = FakeBackend()
+    manager = EmbeddingManager(tmp_path, None, backend=backend, readiness_timeout=None)
+
+    def download_model(model_name, alias, desired_path=None):
+        model_dir = Path(desired_path or tmp_path) / model_name
+        _write_project(model_dir / "serve")
+        return model_dir, "r1"
+
+    monkeypatch.setattr(manager, "download_model", download_model)
+    image = manager.warm("e1", "prod")
+
+    assert backend.images == {image}
+    assert backend.containers == {}
+    assert not (tmp_path / ".warm" / "e1").exists()
+    manager.add_serve("e1", "prod")
+    assert backend.specs["lmorbits-embedding-e1"].image == image
+    assert [op for op, _ in backend.calls] == ["build", "serve"]
@@ -0,0 +1,205 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from serve.servers.balancer import LoadBalancer
+from serve.servers.bluegreen import free_port
+from serve.utils.response_cache import ResponseCache
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(b"ok")
+        elif self.path == "/slow":
+            self.server.release.wait(5)
+            self._send(self.server.name)
+        elif self.path == "/stream":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in (b"data: a\n\n", b"data: b\n\n"):
+                self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self._send(self.server.name)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.peers.add(self.client_address)
+        if self.path == "/slow":
+            self.server.release.wait(5)
+        self._send(self.server.name + b":" + body)
+
+
+def _replica(name: str, port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.name = name.encode()
+    server.peers = set()
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _stop(server: ThreadingHTTPServer) -> None:
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def replicas():
+    servers = [_replica("a"), _replica("b")]
+    yield servers
+    for server in servers:
+        _stop(server)
+
+
+@pytest.fixture
+def balancer(replicas):
+    balancer = LoadBalancer(free_port(), [s.server_address[1] for s in replicas], health_interval=0.05).start()
+    yield balancer
+    balancer.close()
+
+
+def _get(port: int, path: str = "/") -> str:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().read().decode()
+    finally:
+        conn.close()
+
+
+def test_requests_are_spread_over_replicas(balancer):
+    assert sorted(_get(balancer.listen_port) for _ in range(4)) == ["a", "a", "b", "b"]
+
+
+def test_least_outstanding_requests(balancer, replicas):
+    slow = threading.Thread(target=_get, args=(balancer.listen_port, "/slow"))
+    slow.start()
+    while sum(r["in_flight"] for r in balancer.stats()) == 0:
+        time.sleep(0.01)
+    busy = next(r for r in balancer.stats() if r["in_flight"] == 1)["address"]
+    idle_name = "b" if busy.endswith(str(replicas[0].server_address[1])) else "a"
+
+    assert [_get(balancer.listen_port) for _ in range(3)] == [idle_name] * 3
+
+    for server in replicas:
+        server.release.set()
+    slow.join()
+
+
+def test_backend_connections_are_kept_alive(balancer, replicas):
+    conn = http.client.HTTPConnection("127.0.0.1", balancer.listen_port, timeout=5)
+    for i in range(6):
+        conn.request("POST", "/v1/completions", body=f"req{i}".encode())
+        assert conn.getresponse().read().decode().endswith(f":req{i}")
+    conn.close()
+
+    assert [len(s.peers) for s in replicas] == [1, 1]
+    assert sum(r["requests"] for r in balancer.stats()) == 6
+
+
+def test_chunked_responses_are_relayed(balancer):
+    assert _get(balancer.listen_port, "/stream") == "data: a\n\ndata: b\n\n"
+
+
+def test_dead_replica_is_ejected_and_readmitted(balancer, replicas):
+    port = replicas[1].server_address[1]
+    _stop(replicas[1])
+
+    assert [_get(balancer.listen_port) for _ in range(4)] == ["a"] * 4
+    deadline = time.monotonic() + 5
+    while balancer.stats()[1]["healthy"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert balancer.stats()[1]["ejections"] == 1
+
+    replicas[1] = _replica("b", port)
+    while not balancer.stats()[1]["healthy"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(_get(balancer.listen_port) for _ in range(2)) == ["a", "b"]
+
+
+def test_no_healthy_replica_answers_503(balancer, replicas):
+    for server in replicas:
+        _stop(server)
+
+    conn = http.client.HTTPConnection("127.0.0.1", balancer.listen_port, timeout=5)
+    conn.request("GET", "/")
+    response = conn.getresponse()
+    assert response.status == 503
+    response.read()
+    conn.close()
+
+    stats = json.loads(_get(balancer.listen_port, "/lb/stats"))["replicas"]
+    assert all(r["errors"] >= 1 for r in stats)
+
+
+def _post(port: int, payload: dict, path: str = "/completion"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("POST", path, body=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.read().decode(), response.getheader("X-Cache")
+    finally:
+        conn.close()
+
+
+def test_greedy_requests_are_cached_per_run(replicas):
+    run = {"id": "run-a"}
+    balancer = LoadBalancer(free_port(), [s.server_address[1] for s in replicas],
+                            cache=ResponseCache(), run_id=lambda: run["id"]).start()
+    try:
+        greedy = {"prompt": "hi", "temperature": 0}
+        first, hit = _post(balancer.listen_port, greedy)
+        assert hit is None
+        assert _post(balancer.listen_port, greedy) == (first, "HIT")
+        assert _post(balancer.listen_port, {"prompt": "hi", "temperature": 0.7})[1] is None
+        assert _post(balancer.listen_port, dict(greedy, stream=True))[1] is None
+
+        run["id"] = "run-b"
+        assert _post(balancer.listen_port, greedy)[1] is None
+        assert balancer.cache.stats()["hits"] == 1
+    finally:
+        balancer.close()
+
+
+def test_identical_requests_share_one_upstream_call(replicas):
+    balancer = LoadBalancer(free_port(), [s.server_address[1] for s in replicas],
+                            cache=ResponseCache(), run_id=lambda: "run-a").start()
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            _post(balancer.listen_port, {"prompt": "slow", "temperature": 0}, "/slow")[0]
+        )) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while balancer.cache.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        for server in replicas:
+            server.release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(results)) == 1
+        assert sum(r["requests"] for r in balancer.stats()) == 1
+    finally:
+        balancer.close()
@@ -0,0 +1,30 @@
+import time
+
+from bench_download import PhaseTimer, run
+
+
+def test_phase_timer_excludes_nested_phases():
+    timer = PhaseTimer()
+    with timer.phase("transfer"):
+        time.sleep(0.01)
+        with timer.phase("write"):
+            time.sleep(0.05)
+
+    assert timer.calls == {"transfer": 1, "write": 1}
+    assert 0.01 <= timer.seconds["transfer"] < 0.05 <= timer.seconds["write"]
+
+
+def test_download_paths_are_timed_per_phase(tmp_path):
+    report = run(size_mb=2, runs=2, workers=2, chunk_mb=0.5, paths=["get_model", "add_model", "gcs"],
+                 workdir=tmp_path)
+
+    results = report["results"]
+    for path in ("get_model", "add_model", "gcs"):
+        assert results[path]["bytes"] >= 2 * 2 ** 20, results[path]
+        assert len(results[path]["runs_wall_s"]) == 2
+        assert results[path]["phases_s"]["registry"] > 0
+    assert results["add_model"]["calls"]["store"] >= 1
+    # Four slices of the model and one of MLmodel, then both files verified and renamed
+    assert results["gcs"]["calls"]["transfer"] == 5
+    assert {"listing", "write", "verify", "rename"} <= set(results["gcs"]["phases_s"])
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from bench_serving import TraceRequest, compare, load_trace, main, replay, summarize
+from fake_openai import FakeOpenAIServer, echo_generator
+
+
+@pytest.fixture
+def server():
+    server = FakeOpenAIServer(echo_generator(ttft_ms=20, token_ms=2)).start()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def trace_path(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    lines = [
+        {"prompt": "one two three", "max_tokens": 4},
+        {"messages": [{"role": "user", "content": "hello"}], "max_tokens": 6},
+        {"endpoint": "/v1/completions", "body": {"prompt": "x", "max_tokens": 3}, "offset": 0.05},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+    return path
+
+
+def test_load_trace_cycles_with_offsets(trace_path):
+    trace = load_trace(trace_path, requests=7)
+
+    assert [r.endpoint for r in trace[:3]] == ["/v1/completions", "/v1/chat/completions", "/v1/completions"]
+    assert len(trace) == 7
+    assert trace[5].offset == pytest.approx(0.1)
+
+
+def test_closed_loop_measures_tokens_and_ttft(server, trace_path):
+    trace = [r for r in load_trace(trace_path, requests=6) if r.offset is None]
+
+    results, duration = replay(server.url, trace, concurrency=2)
+    report = summarize(results, duration)
+
+    assert report["errors"] == 0
+    assert report["output_tokens"] == 20
+    assert server.requests == 4
+    assert 20 <= report["ttft_ms"]["p50"] <= report["latency_ms"]["p50"]
+    assert report["output_tokens_per_sec"] > 0
+
+
+def test_open_loop_counts_from_arrival(server, trace_path):
+    trace = load_trace(trace_path, requests=6)
+
+    results, _ = replay(server.url, trace, concurrency=1, rate=200.0)
+
+    assert all(r.ok for r in results)
+    # One sender serializes six 20ms+ requests arriving within ~30ms, so later ones queue
+    assert max(r.latency for r in results) > 3 * min(r.latency for r in results)
+
+
+def test_failed_requests_are_reported(server):
+    results, duration = replay(server.url, [TraceRequest({"prompt": "x"}, "/missing")])
+
+    report = summarize(results, duration)
+    assert report["errors"] == 1
+    assert report["error_samples"] == ["HTTP 404"]
+
+
+def test_compare_flags_regressions():
+    baseline = {"requests_per_sec": 10.0, "error_rate": 0.0, "latency_ms": {"p50": 100.0, "p99": 200.0}}
+    new = {"requests_per_sec": 9.5, "error_rate": 0.1, "latency_ms": {"p50": 90.0, "p99": 260.0}}
+
+    rows = compare(baseline, new, threshold=0.1)
+
+    assert {name for name, row in rows.items() if row["regressed"]} == {"error_rate", "latency_ms.p99"}
+    assert rows["latency_ms.p50"]["change"] == pytest.approx(-0.1)
+    assert "ttft_ms.p50" not in rows
+
+
+def test_cli_run_and_compare(tmp_path, trace_path, capsys):
+    result_path = tmp_path / "result.json"
+    main(["run", "--trace", str(trace_path), "--requests", "3", "--ttft-ms", "1", "--token-ms", "0",
+          "--output", str(result_path)])
+    report = json.loads(result_path.read_text())
+    assert report["requests"] == 3
+    assert report["config"]["mode"] == "open"
+
+    slower = dict(report, latency_ms={k: v * 2 for k, v in report["latency_ms"].items()})
+    slower_path = tmp_path / "slower.json"
+    slower_path.write_text(json.dumps(slower))
+    main(["compare", str(result_path), str(result_path)])
+    with pytest.raises(SystemExit, match="latency_ms.p50"):
+        main(["compare", str(result_path), str(slower_path)])
@@ -0,0 +1,202 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+import http.client
+import threading
+import time
+
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.bluegreen import free_port
+from serve.servers.llamacpp.serve import LlamaCppServer
+from serve.servers.readiness import ReadinessError
+from serve.utils.response_cache import ResponseCache
+
+
+class FakeRegistry:
+
+    def __init__(self, runs):
+        self.runs = runs
+
+    def get_model_version_by_alias(self, name, alias):
+        return SimpleNamespace(run_id=self.runs[name])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b"ok" if self.path == "/health" else self.server.payload
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HttpBackend(FakeBackend):
+    """Fake backend running a tiny HTTP server that answers with model.gguf."""
+
+    def __init__(self):
+        super().__init__()
+        self.servers = {}
+        self.broken_runs = set()
+
+    def serve(self, spec):
+        super().serve(spec)
+        if spec.name in self.servers:
+            return
+        payload = (Path(next(iter(spec.volumes))) / "model.gguf").read_bytes()
+        if payload.decode() in self.broken_runs:
+            return
+        server = ThreadingHTTPServer(("127.0.0.1", next(iter(spec.ports))), _Handler)
+        server.payload = payload
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers[spec.name] = server
+
+    def delete(self, spec):
+        super().delete(spec)
+        server = self.servers.pop(spec.name, None)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def downloads(monkeypatch):
+    def download_artifacts(run_id, artifact_path, dst_path):
+        artifacts = Path(dst_path) / artifact_path / "artifacts"
+        artifacts.mkdir(parents=True)
+        (artifacts / "model.gguf").write_text(run_id)
+
+    monkeypatch.setattr("serve.utils.mlflow.model.download_artifacts", download_artifacts)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = LlamaCppServer(tmp_path, FakeRegistry({"m1": "run-a"}), backend=HttpBackend(), readiness_timeout=2,
+                            response_cache=ResponseCache())
+    yield server
+    for name in list(server.cache_fronts):
+        server.close_cached(name)
+    for front in server.fronts.values():
+        front.close()
+    for name in list(server.backend.servers):
+        server.backend.delete(SimpleNamespace(name=name))
+
+
+def _get(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        conn.request("GET", "/v1/completions")
+        return conn.getresponse().read().decode()
+    finally:
+        conn.close()
+
+
+def test_swap_serves_without_errors(server):
+    port = free_port()
+    first = server.update_model("m1", "prod", port=port, blue_green=True)
+    assert first.slot == "blue"
+    assert _get(port) == "run-a"
+
+    responses, errors, done = [], [], threading.Event()
+
+    def client():
+        while not done.is_set():
+            try:
+                responses.append(_get(port))
+            except OSError as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    server.mlflow_client.runs["m1"] = "run-b"
+    time.sleep(0.05)
+    result = server.update_model("m1", "prod", port=port, blue_green=True)
+    time.sleep(0.05)
+    done.set()
+    thread.join()
+
+    assert result.switched and result.slot == "green"
+    assert errors == []
+    assert responses[0] == "run-a" and responses[-1] == "run-b"
+    assert server.get_configs()["m1"]["slot"] == "green"
+    assert set(server.backend.containers) == {"lmorbits-llamacpp-m1-green"}
+    assert not (server.desrie_path / ".slots" / "blue" / "m1").exists()
+
+
+def test_unchanged_model_is_not_swapped(server):
+    port = free_port()
+    server.update_model("m1", "prod", port=port, blue_green=True)
+
+    result = server.update_model("m1", "prod", port=port, blue_green=True)
+
+    assert not result.switched
+    assert result.slot == "blue"
+
+
+def test_failed_new_slot_keeps_current_one(server):
+    port = free_port()
+    server.update_model("m1", "prod", port=port, blue_green=True)
+    server.readiness.timeout = 0.3
+    server.backend.broken_runs.add("run-b")
+    server.mlflow_client.runs["m1"] = "run-b"
+
+    with pytest.raises(ReadinessError):
+        server.update_model("m1", "prod", port=port, blue_green=True)
+
+    assert _get(port) == "run-a"
+    assert server.get_configs()["m1"]["run_id"] == "run-a"
+    assert set(server.backend.containers) == {"lmorbits-llamacpp-m1-blue"}
+    assert not (server.desrie_path / ".slots" / "green" / "m1").exists()
+
+
+def test_classic_model_migrates_to_front_port(server):
+    port = free_port()
+    server.add_serve("m1", "prod", port=port)
+    assert _get(port) == "run-a"
+    server.mlflow_client.runs["m1"] = "run-b"
+
+    result = server.update_model("m1", "prod", port=port, blue_green=True)
+
+    assert result.downtime < 1
+    assert _get(port) == "run-b"
+    assert "lmorbits-llamacpp-m1" not in server.backend.containers
+    assert not (server.desrie_path / "m1").exists()
+
+
+def _post_greedy(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+    try:
+        conn.request("POST", "/completion", body=b'{"prompt": "hi", "temperature": 0}')
+        response = conn.getresponse()
+        return response.read().decode(), response.getheader("X-Cache")
+    finally:
+        conn.close()
+
+
+class _PostHandler(_Handler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.do_GET()
+
+
+def test_cached_endpoint_follows_model_updates(server, monkeypatch):
+    monkeypatch.setattr(__name__ + "._Handler.do_POST", _PostHandler.do_POST, raising=False)
+    port, cached_port = free_port(), free_port()
+    server.update_model("m1", "prod", port=port, blue_green=True)
+    # Pooled connections pin the old slot until they idle out
+    server.serve_cached("m1", cached_port, upstream_port=port).idle_timeout = 0.1
+
+    assert _post_greedy(cached_port) == ("run-a", None)
+    assert _post_greedy(cached_port) == ("run-a", "HIT")
+
+    server.mlflow_client.runs["m1"] = "run-b"
+    server.update_model("m1", "prod", port=port, blue_green=True)
+
+    assert _post_greedy(cached_port) == ("run-b", None)
@@ -0,0 +1,109 @@
+import os
+import subprocess
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from serve._cli import LazyGroup
+from serve.serve_cli import cli
+
+from bench_cli_import import run
+
+
+# Best of a few fresh imports, loading any command module (mlflow alone takes seconds) blows it
+IMPORT_BUDGET_MS = float(os.environ.get("SERVE_CLI_IMPORT_BUDGET_MS", 400))
+
+
+def test_cli_import_within_budget():
+    report = run("serve.serve_cli", runs=3)
+
+    assert report["heavy"] == []
+    assert report["import_ms"] < IMPORT_BUDGET_MS, report["slowest"]
+
+
+def test_lazy_group_imports_command_when_used():
+    group = LazyGroup(name="root", lazy_commands={
+        "tree": ("serve.serve_cli:get_command_help", "Not a command"),
+        "run": ("test_cli.test_cli:_command", "Run something"),
+    })
+    runner = CliRunner()
+
+    result = runner.invoke(group, ["--help"])
+    assert "Run something" in result.output
+    assert group.commands == {}
+
+    assert runner.invoke(group, ["run"]).output == "ran\n"
+    assert set(group.commands) == {"run"}
+    with pytest.raises(ValueError):
+        group.get_command(click.Context(group), "tree")
+
+
+@click.command()
+def _command():
+    click.echo("ran")
+
+
+def test_serve_cmd_help_lists_commands_without_loading_them():
+    result = CliRunner().invoke(cli, ["--help"])
+
+    assert result.exit_code == 0
+    for name in ("llama-cpp", "embedding", "mlflow-llamacpp"):
+        assert name in result.output
+    assert "embedding" not in cli.commands
+    assert "warm" in CliRunner().invoke(cli, ["embedding", "--help"]).output
+
+
+class _RecordingTaskCLI:
+    """TaskCLI stand-in recording tasks, failing ``serve`` of the models in ``failing``."""
+
+    calls = []
+    failing = set()
+
+    def __init__(self, taskfile_dir=None):
+        pass
+
+    def run(self, task_name, **kwargs):
+        self.calls.append((task_name, kwargs["MODEL_ID"]))
+        failed = task_name == "serve" and kwargs["MODEL_ID"] in self.failing
+        return subprocess.CompletedProcess([task_name], 1 if failed else 0, "", "docker failed" if failed else "")
+
+
+@pytest.fixture
+def task_cli(tmp_path, monkeypatch):
+    from serve.servers.llamacpp import main
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "TaskCLI", _RecordingTaskCLI)
+    monkeypatch.setattr(main.ReadinessProbe, "wait", lambda self, url, model=None: None)
+    _RecordingTaskCLI.calls = []
+    _RecordingTaskCLI.failing = set()
+    return _RecordingTaskCLI
+
+
+def _serve_replicas(tmp_path):
+    return CliRunner().invoke(cli, ["llama-cpp", "serve", "--model-path", str(tmp_path), "--model-id", "m",
+                                    "--replicas", "3"])
+
+
+def test_failed_replica_start_deletes_started_replicas(tmp_path, task_cli):
+    task_cli.failing = {"m-1"}
+
+    result = _serve_replicas(tmp_path)
+
+    assert result.exit_code != 0
+    assert "Failed to start m-1" in result.output
+    assert task_cli.calls == [("serve", "m-0"), ("serve", "m-1"), ("delete", "m-0"), ("delete", "m-1")]
+
+
+def test_interrupted_replicas_are_deleted(tmp_path, task_cli, monkeypatch):
+    from serve.servers.llamacpp import main
+
+    def join(self):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(main.LoadBalancer, "join", join)
+    result = _serve_replicas(tmp_path)
+
+    assert result.exit_code == 0
+    assert [call for call in task_cli.calls if call[0] == "delete"] == [("delete", f"m-{i}") for i in range(3)]
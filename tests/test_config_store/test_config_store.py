@@ -0,0 +1,84 @@
+import json
+import multiprocessing
+
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.llamacpp.serve import LlamaCppConfig, LlamaCppServer
+from serve.utils.config_store import ConfigStore, ConfigStoreError
+from serve.utils.model_config import ModelConfig
+
+
+def test_write_through_and_read_only_view(tmp_path):
+    store = ConfigStore(tmp_path / "configs.json")
+    assert store.all() == {}
+
+    store.put("m1", {"run_id": "r1"})
+    store.put("m2", {"run_id": "r2"})
+    assert store.remove("m2")
+    assert not store.remove("m2")
+
+    assert json.loads((tmp_path / "configs.json").read_text()) == {"m1": {"run_id": "r1"}}
+    entry = store.get("m1")
+    entry["run_id"] = "changed"
+    assert store.get("m1") == {"run_id": "r1"}
+    with pytest.raises(TypeError):
+        store.view()["m3"] = {}
+    assert "m1" in store and len(store) == 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_reloads_only_when_the_file_changes(tmp_path):
+    path = tmp_path / "configs.json"
+    store, other = ConfigStore(path), ConfigStore(path)
+    store.put("m1", {"run_id": "r1"})
+    reloads = store.reloads
+    for _ in range(100):
+        store.get("m1")
+    assert store.reloads == reloads
+
+    other.put("m2", {"run_id": "r2"})
+    assert store.get("m2") == {"run_id": "r2"}
+    assert store.reloads == reloads + 1
+
+
+def _writer(path, worker, count):
+    store = ConfigStore(path)
+    for i in range(count):
+        store.put(f"w{worker}-{i}", {"run_id": str(i)})
+
+
+def test_concurrent_processes_keep_every_update(tmp_path):
+    path = tmp_path / "configs.json"
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_writer, args=(path, w, 25)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert len(ConfigStore(path).all()) == 100
+
+
+def test_corrupted_file(tmp_path):
+    (tmp_path / "configs.json").write_text("{not json")
+    with pytest.raises(ConfigStoreError):
+        ConfigStore(tmp_path / "configs.json").get("m1")
+
+
+def test_managers_and_model_config_share_the_file(tmp_path):
+    first = LlamaCppServer(tmp_path, None, backend=FakeBackend(), readiness_timeout=None)
+    second = LlamaCppServer(tmp_path, None, backend=FakeBackend(), readiness_timeout=None)
+    first.config_update(LlamaCppConfig(model_name="m1", alias="prod", model_path=tmp_path / "m1", run_id="r1"))
+    assert second.configs["m1"]["run_id"] == "r1"
+    second.config_remove("m1")
+    assert "m1" not in first.configs
+
+    model_config = ModelConfig(tmp_path / "config.json")
+    model_config.update_model_info("r1", "qa", "champion", model_dir=tmp_path / "qa")
+    assert ModelConfig(tmp_path / "config.json").get_model_path("qa") == tmp_path / "qa"
+    reloads = model_config.store.reloads
+    for _ in range(50):
+        model_config.load_model_config("qa")
+    assert model_config.store.reloads == reloads
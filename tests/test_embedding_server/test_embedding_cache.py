@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.embedding.cache import EmbeddingCache
+from serve.servers.embedding.main import EmbeddingConfig, EmbeddingManager
+from serve.servers.embedding.server import EmbeddingServer
+
+from test_embedding_server.test_embedding_server import HashingEncoder, _post
+
+
+def _vectors(n, dim=4, offset=0):
+    return np.arange(offset, offset + n * dim, dtype=np.float32).reshape(n, dim)
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    cache = EmbeddingCache(tmp_path, "run-a", memory_entries=2)
+    texts = ["a", "b", "c"]
+    cache.store(texts, _vectors(3))
+
+    assert cache.lookup(["x"]) == [None]
+    assert cache.lookup(["c"])[0].tolist() == [8, 9, 10, 11]
+    assert cache.lookup(["a"])[0].tolist() == [0, 1, 2, 3]
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["memory_entries"] == 2
+    assert stats["disk_entries"] == 3
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path, "run-a")
+    np.testing.assert_array_equal(np.stack(reopened.lookup(texts)), _vectors(3))
+    assert reopened.stats()["disk_hits"] == 4
+    assert EmbeddingCache(tmp_path, "run-b").lookup(["a"]) == [None]
+
+
+def test_vectors_grow_past_initial_capacity(tmp_path):
+    cache = EmbeddingCache(tmp_path, "run-a")
+    texts = [f"chunk {i}" for i in range(2500)]
+    cache.store(texts, _vectors(2500))
+    cache.close()
+
+    reopened = EmbeddingCache(tmp_path, "run-a", memory_entries=0)
+    np.testing.assert_array_equal(np.stack(reopened.lookup(texts)), _vectors(2500))
+
+
+def test_drop_runs_and_persisted_stats(tmp_path):
+    for run in ("run-a", "run-b"):
+        cache = EmbeddingCache(tmp_path, run)
+        cache.store(["a"], _vectors(1))
+        cache.lookup(["a", "b"])
+        cache.close()
+
+    assert EmbeddingCache.read_stats(tmp_path, "run-a")["hit_rate"] == 0.5
+    assert EmbeddingCache.drop_runs(tmp_path, keep="run-b") == ["run-a"]
+    assert EmbeddingCache.read_stats(tmp_path, "run-a") == {}
+    assert EmbeddingCache.read_stats(tmp_path, "run-b")["disk_entries"] == 1
+
+
+def test_server_encodes_only_misses(tmp_path):
+    encoder = HashingEncoder()
+    server = EmbeddingServer(encoder, host="127.0.0.1", port=0, max_wait_ms=0,
+                             cache=EmbeddingCache(tmp_path, "run-a")).start()
+    try:
+        first = _post(server, {"input": ["a", "b"]})[1]
+        second = _post(server, {"input": ["b", "c", "a"]})[1]
+    finally:
+        server.close()
+
+    assert encoder.calls == [2, 1]
+    assert first != second
+    assert EmbeddingCache.read_stats(tmp_path, "run-a")["hit_rate"] == pytest.approx(2 / 5)
+
+
+class FakeRegistry:
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+
+    def get_model_version_by_alias(self, name, alias):
+        return SimpleNamespace(run_id=self.run_id)
+
+
+def test_manager_invalidates_and_reports_cache(tmp_path):
+    manager = EmbeddingManager(tmp_path, FakeRegistry("run-a"), backend=FakeBackend(), readiness_timeout=None,
+                               builtin_server=True, embedding_cache=True)
+    manager.config_update(EmbeddingConfig(model_name="e1", alias="prod", model_path=tmp_path, run_id="run-a"))
+    cache = EmbeddingCache(manager.cache_dir("e1"), "run-a")
+    cache.store(["a"], _vectors(1))
+    cache.lookup(["a"])
+    cache.close()
+
+    spec = manager.container_spec("e1")
+    assert spec.local_command[spec.local_command.index("--run-id") + 1] == "run-a"
+    report = manager.status("e1")["e1"]
+    assert report["cache"]["hit_rate"] == 1.0
+    assert not manager.new_model_status("e1", "prod")
+
+    manager.mlflow_client.run_id = "run-b"
+    assert manager.new_model_status("e1", "prod")
+    # The cache of the serving run stays until the new run replaced it
+    assert (manager.cache_dir("e1") / "run-a").exists()
+
+    def download_model(model_name, alias, desired_path=None):
+        model_dir = tmp_path / "models" / model_name
+        (model_dir / "serve").mkdir(parents=True)
+        (model_dir / "serve" / "Dockerfile").write_text("FROM scratch\n")
+        return model_dir, "run-b"
+
+    manager.download_model = download_model
+    manager.update_model("e1", "prod")
+    assert manager.status()["e1"]["cache"] == {}
+    assert not (manager.cache_dir("e1") / "run-a").exists()
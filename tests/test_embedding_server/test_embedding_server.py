@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import http.client
+import json
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.embedding.main import EmbeddingManager
+from serve.servers.embedding.server import EmbeddingServer, MicroBatcher, decode_base64, load_encoder
+
+
+class HashingEncoder:
+    """Deterministic bag-of-bytes encoder recording its batch sizes."""
+
+    def __init__(self, dim: int = 8, fail: bool = False):
+        self.projection = np.random.default_rng(0).standard_normal((256, dim)).astype(np.float32)
+        self.calls = []
+        self.fail = fail
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, texts):
+        self.entered.set()
+        self.gate.wait(5)
+        self.calls.append(len(texts))
+        if self.fail:
+            raise RuntimeError("encoder failed")
+        counts = np.zeros((len(texts), 256), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts[i] = np.bincount(np.frombuffer(text.encode(), dtype=np.uint8), minlength=256)
+        return counts @ self.projection
+
+
+def test_concurrent_requests_share_a_batch():
+    encoder = HashingEncoder()
+    encoder.gate.clear()
+    batcher = MicroBatcher(encoder, max_batch_size=8, max_wait_ms=0)
+    # The first request blocks the encoder while the others queue up
+    first = batcher.submit(["warm"])
+    encoder.entered.wait(5)
+    futures = [batcher.submit([f"text {i}"]) for i in range(8)]
+    encoder.gate.set()
+
+    results = [f.result(5) for f in futures]
+    batcher.close()
+
+    assert encoder.calls == [1, 8]
+    assert first.result().shape == (1, 8)
+    np.testing.assert_allclose(np.concatenate(results), encoder([f"text {i}" for i in range(8)]))
+    assert batcher.stats()["mean_batch_size"] == 4.5
+
+
+def test_batches_are_capped():
+    encoder = HashingEncoder()
+    encoder.gate.clear()
+    batcher = MicroBatcher(encoder, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit([f"text {i}"]) for i in range(6)] + [batcher.submit(["a"] * 9)]
+    encoder.gate.set()
+
+    assert [f.result(5).shape[0] for f in futures] == [1] * 6 + [9]
+    batcher.close()
+    assert max(encoder.calls) <= 4
+    assert sum(encoder.calls) == 15
+
+
+def test_encoder_errors_reach_every_request():
+    batcher = MicroBatcher(HashingEncoder(fail=True), max_wait_ms=20)
+    futures = [batcher.submit(["x"]), batcher.submit(["y"])]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(5)
+    batcher.close()
+
+
+@pytest.fixture
+def server():
+    server = EmbeddingServer(HashingEncoder(), host="127.0.0.1", port=0, max_wait_ms=1).start()
+    yield server
+    server.close()
+
+
+def _post(server, payload, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    try:
+        conn.request("POST", "/v1/embeddings", body=json.dumps(payload).encode(), headers=headers or {})
+        response = conn.getresponse()
+        return response, response.read()
+    finally:
+        conn.close()
+
+
+def test_encodings_agree(server):
+    texts = ["hello", "world"]
+    response, body = _post(server, {"input": texts})
+    floats = np.array([d["embedding"] for d in json.loads(body)["data"]], dtype=np.float32)
+
+    _, body = _post(server, {"input": texts, "encoding_format": "base64"})
+    decoded = np.stack([decode_base64(d["embedding"]) for d in json.loads(body)["data"]])
+
+    response, body = _post(server, {"input": texts}, {"Accept": "application/octet-stream"})
+    shape = int(response.getheader("X-Embedding-Count")), int(response.getheader("X-Embedding-Dim"))
+    binary = np.frombuffer(body, dtype="<f4").reshape(shape)
+
+    np.testing.assert_array_equal(floats, decoded)
+    np.testing.assert_array_equal(decoded, binary)
+    assert binary.shape == (2, 8)
+
+
+def test_invalid_requests(server):
+    assert _post(server, {"input": []})[0].status == 400
+    assert _post(server, {"input": [1, 2]})[0].status == 400
+    assert _post(server, {"input": "x", "encoding_format": "int8"})[0].status == 400
+
+
+def test_parallel_clients_are_batched(server):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(pool.map(lambda i: _post(server, {"input": f"text {i}"})[0].status, range(64)))
+
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    conn.request("GET", "/stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    assert statuses == [200] * 64
+    assert stats["texts"] == 64
+    assert stats["batches"] <= 64
+
+
+def test_gguf_encoder(tmp_path):
+    pytest.importorskip("llama_cpp")
+    pytest.importorskip("gguf")
+    from tiny_gguf import write_tiny_gguf
+
+    write_tiny_gguf(tmp_path / "model" / "model.gguf")
+    encode = load_encoder(tmp_path / "model")
+    vectors = encode(["the model is", "a model of the"])
+
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (2, 64)
+
+
+def test_manager_runs_builtin_server_locally(tmp_path):
+    manager = EmbeddingManager(tmp_path, SimpleNamespace(), backend=FakeBackend(), readiness_timeout=None,
+                               builtin_server=True, max_batch_size=16, max_wait_ms=2)
+    spec = manager.container_spec("e1", 1112)
+
+    assert spec.local_command[:3] == [sys.executable, "-m", "serve.servers.embedding.server"]
+    assert spec.local_command[spec.local_command.index("--port") + 1] == "1112"
+    assert spec.local_command[spec.local_command.index("--max-batch-size") + 1] == "16"
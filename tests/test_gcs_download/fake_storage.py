@@ -0,0 +1,54 @@
+"""In-process stand-in for the parts of ``google.cloud.storage`` used by serve."""
+import base64
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import google_crc32c
+from google.api_core.exceptions import ServiceUnavailable
+
+
+class FakeBlob:
+    def __init__(self, name: str, data: bytes, generation: int = 1, piece_size: int = 7):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.generation = generation
+        self.crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode()
+        self.md5_hash = base64.b64encode(hashlib.md5(data).digest()).decode()  # noqa: S324
+        self.piece_size = piece_size
+        self.requests: List[Tuple[Optional[int], Optional[int]]] = []
+        self.fail_after: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def download_to_file(self, file_obj, start=None, end=None, **kwargs):
+        with self._lock:
+            self.requests.append((start, end))
+            if self.fail_after is not None and len(self.requests) > self.fail_after:
+                raise ServiceUnavailable("fake transient failure")
+        begin = start or 0
+        stop = self.size if end is None else end + 1
+        for offset in range(begin, stop, self.piece_size):
+            file_obj.write(self.data[offset:min(offset + self.piece_size, stop)])
+
+
+class FakeBucket:
+    def __init__(self, name: str):
+        self.name = name
+        self.blobs: Dict[str, FakeBlob] = {}
+
+    def add(self, name: str, data: bytes, **kwargs) -> FakeBlob:
+        blob = FakeBlob(name, data, **kwargs)
+        self.blobs[name] = blob
+        return blob
+
+    def list_blobs(self, prefix: str = ""):
+        return [blob for name, blob in sorted(self.blobs.items()) if name.startswith(prefix)]
+
+
+class FakeClient:
+    def __init__(self):
+        self.buckets: Dict[str, FakeBucket] = {}
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self.buckets.setdefault(name, FakeBucket(name))
@@ -0,0 +1,99 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from serve.utils.gcs.download import DEFAULT_CHUNK_SIZE, DownloadError, _plan_slices, download_from_gcs
+from test_gcs_download.fake_storage import FakeClient
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    bucket = client.bucket("artifacts")
+    bucket.add("run/model_path/artifacts/model.gguf", os.urandom(1000))
+    bucket.add("run/model_path/MLmodel", b"flavors: {}\n")
+    bucket.add("run/model_path/empty.txt", b"")
+    return client
+
+
+def _read_all(paths):
+    return {p.name: p.read_bytes() for p in paths}
+
+
+def test_plan_slices_covers_blob():
+    assert _plan_slices(10, 4) == [(0, 3), (4, 7), (8, 9)]
+    assert _plan_slices(8, 4) == [(0, 3), (4, 7)]
+    assert _plan_slices(0, 4) == []
+
+
+def test_sequential_download(client, tmp_path):
+    files = download_from_gcs("artifacts", "run/model_path", tmp_path, client=client)
+    bucket = client.bucket("artifacts")
+
+    assert len(files) == 3
+    assert (tmp_path / "artifacts" / "model.gguf").read_bytes() == bucket.blobs["run/model_path/artifacts/model.gguf"].data
+    assert bucket.blobs["run/model_path/artifacts/model.gguf"].requests == [(0, 999)]
+
+
+def test_parallel_download_matches_sequential(client, tmp_path):
+    sequential = download_from_gcs("artifacts", "run/model_path", tmp_path / "seq", client=client)
+    parallel = download_from_gcs(
+        "artifacts", "run/model_path", tmp_path / "par",
+        client=client, max_workers=4, chunk_size=128
+    )
+
+    assert _read_all(parallel) == _read_all(sequential)
+    gguf = client.bucket("artifacts").blobs["run/model_path/artifacts/model.gguf"]
+    assert sorted(gguf.requests[1:]) == _plan_slices(1000, 128)
+
+
+def test_parallel_download_failure_raises(client, tmp_path):
+    client.bucket("artifacts").blobs["run/model_path/artifacts/model.gguf"].fail_after = 2
+
+    with pytest.raises(DownloadError):
+        download_from_gcs(
+            "artifacts", "run/model_path", tmp_path,
+            client=client, max_workers=2, chunk_size=128
+        )
+
+
+def test_downloads_anonymously_from_emulator(tmp_path, monkeypatch):
+    from fake_object_server import FakeObjectServer, write_synthetic
+
+    server = FakeObjectServer().start()
+    try:
+        server.add("artifacts", "run/model_path/artifacts/model.gguf", write_synthetic(tmp_path / "blob", 3000))
+        monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
+        monkeypatch.setenv("STORAGE_EMULATOR_HOST", server.url)
+
+        paths = download_from_gcs("artifacts", "run/model_path", tmp_path / "out", max_workers=2, chunk_size=1024)
+    finally:
+        server.close()
+
+    assert [p.read_bytes() for p in paths] == [(tmp_path / "blob").read_bytes()]
+
+
+def test_managers_pass_download_concurrency(tmp_path, monkeypatch):
+    import serve.experiment_tracker.mlflow.mlflow_gcp_llamacpp.download as gcp_download
+    from serve.servers.embedding.main import EmbeddingManager
+    from serve.servers.llamacpp.serve import LlamaCppServer
+
+    calls = []
+
+    def download_model_artifact(client, model_name, alias, artifact_path, local_dir, max_workers, chunk_size):
+        calls.append((model_name, max_workers, chunk_size))
+        (local_dir / artifact_path).mkdir(parents=True)
+        (local_dir / artifact_path / "model.gguf").write_bytes(os.urandom(64))
+
+    monkeypatch.setattr(gcp_download, "download_model_artifact", download_model_artifact)
+    monkeypatch.setenv("MLFLOW_GCS_BUCKET", "bucket")
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", str(tmp_path / "credentials.json"))
+    client = SimpleNamespace(get_model_version_by_alias=lambda name, alias: SimpleNamespace(run_id=f"run-{name}"))
+
+    LlamaCppServer(tmp_path / "llm", client, readiness_timeout=None, download_workers=4,
+                   download_chunk_size=2 ** 20).download_model("qa", "champion")
+    EmbeddingManager(tmp_path / "embedding", client, gcp=True, readiness_timeout=None,
+                     download_workers=3).download_model("embed", "champion")
+
+    assert calls == [("qa", 4, 2 ** 20), ("embed", 3, DEFAULT_CHUNK_SIZE)]
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+from serve.utils.gcs.download import DownloadError, download_from_gcs
+from test_gcs_download.fake_storage import FakeClient
+
+SOURCE = "run/model_path"
+GGUF = "run/model_path/artifacts/model.gguf"
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    client.bucket("artifacts").add(GGUF, os.urandom(1000))
+    return client
+
+
+def test_interrupted_download_resumes(client, tmp_path):
+    blob = client.bucket("artifacts").blobs[GGUF]
+    blob.fail_after = 3
+
+    with pytest.raises(DownloadError):
+        download_from_gcs("artifacts", SOURCE, tmp_path, client=client, chunk_size=100)
+
+    target = tmp_path / "artifacts" / "model.gguf"
+    manifest = json.loads(target.with_name("model.gguf.part.json").read_text())
+    assert not target.exists()
+    assert manifest["completed"] == [0, 100, 200]
+
+    blob.fail_after = None
+    blob.requests.clear()
+    download_from_gcs("artifacts", SOURCE, tmp_path, client=client, chunk_size=100)
+
+    assert target.read_bytes() == blob.data
+    assert blob.requests[0] == (300, 399)
+    assert len(blob.requests) == 7
+    assert not target.with_name("model.gguf.part").exists()
+    assert not target.with_name("model.gguf.part.json").exists()
+
+
+def test_changed_remote_discards_partial(client, tmp_path):
+    bucket = client.bucket("artifacts")
+    bucket.blobs[GGUF].fail_after = 3
+    with pytest.raises(DownloadError):
+        download_from_gcs("artifacts", SOURCE, tmp_path, client=client, chunk_size=100)
+
+    blob = bucket.add(GGUF, os.urandom(1000), generation=2)
+    download_from_gcs("artifacts", SOURCE, tmp_path, client=client, chunk_size=100)
+
+    assert (tmp_path / "artifacts" / "model.gguf").read_bytes() == blob.data
+    assert len(blob.requests) == 10
+
+
+def test_up_to_date_file_is_skipped(client, tmp_path):
+    download_from_gcs("artifacts", SOURCE, tmp_path, client=client)
+    blob = client.bucket("artifacts").blobs[GGUF]
+    blob.requests.clear()
+
+    files = download_from_gcs("artifacts", SOURCE, tmp_path, client=client)
+
+    assert files == [tmp_path / "artifacts" / "model.gguf"]
+    assert blob.requests == []
+
+
+def test_corrupt_download_is_rejected(client, tmp_path):
+    blob = client.bucket("artifacts").blobs[GGUF]
+    blob.crc32c = "AAAAAA=="
+
+    with pytest.raises(DownloadError, match="Checksum mismatch"):
+        download_from_gcs("artifacts", SOURCE, tmp_path, client=client)
+
+    assert list((tmp_path / "artifacts").iterdir()) == []
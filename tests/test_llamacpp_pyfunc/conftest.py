@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("llama_cpp")
+pytest.importorskip("gguf")
+
+from tiny_gguf import write_tiny_gguf  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tiny_gguf(tmp_path_factory):
+    return write_tiny_gguf(tmp_path_factory.mktemp("gguf") / "model.gguf")
+
+
+@pytest.fixture
+def context(tiny_gguf):
+    return SimpleNamespace(artifacts={"model_path": str(tiny_gguf)})
@@ -0,0 +1,77 @@
+import ctypes
+
+import llama_cpp
+import numpy as np
+import pandas as pd
+import pytest
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.batching import SAMPLER_DEFAULTS, token_distribution
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+PROMPTS = [f"the model is {i} and" for i in range(7)] + ["a"]
+
+
+def _load(context, **kwargs):
+    wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, **kwargs)
+    wrapper.load_context(context)
+    return wrapper
+
+
+def test_batched_matches_serial_greedy(context):
+    serial = _load(context).predict(context, PROMPTS, max_tokens=12, temperature=0.0)
+    batched = _load(context, max_batch_size=3).predict(context, PROMPTS, max_tokens=12, temperature=0.0)
+
+    assert batched == serial
+
+
+def test_batched_accepts_dataframe_and_echo(context):
+    wrapper = _load(context, max_batch_size=4)
+    results = wrapper.predict(context, pd.DataFrame({"prompt": PROMPTS[:2]}), max_tokens=4, echo=True)
+
+    assert len(results) == 2
+    assert all(result.startswith(prompt) for result, prompt in zip(results, PROMPTS))
+
+
+def _llama_cpp_distribution(logits, temperature, top_p, top_k, min_p):
+    """Run llama.cpp's own sampler chain, without the final draw, over ``logits``."""
+    candidates = (llama_cpp.llama_token_data * len(logits))(
+        *(llama_cpp.llama_token_data(id=i, logit=float(logit), p=0.0) for i, logit in enumerate(logits))
+    )
+    array = llama_cpp.llama_token_data_array(data=candidates, size=len(logits), selected=-1, sorted=False)
+    chain = llama_cpp.llama_sampler_chain_init(llama_cpp.llama_sampler_chain_default_params())
+    llama_cpp.llama_sampler_chain_add(chain, llama_cpp.llama_sampler_init_top_k(top_k))
+    llama_cpp.llama_sampler_chain_add(chain, llama_cpp.llama_sampler_init_top_p(top_p, 1))
+    llama_cpp.llama_sampler_chain_add(chain, llama_cpp.llama_sampler_init_min_p(min_p, 1))
+    llama_cpp.llama_sampler_chain_add(chain, llama_cpp.llama_sampler_init_temp(temperature))
+    try:
+        llama_cpp.llama_sampler_apply(chain, ctypes.byref(array))
+        kept = {array.data[i].id: array.data[i].logit for i in range(array.size)}
+    finally:
+        llama_cpp.llama_sampler_free(chain)
+    scaled = np.array(list(kept.values()))
+    probs = np.exp(scaled - scaled.max())
+    return dict(zip(kept, probs / probs.sum()))
+
+
+@pytest.mark.parametrize("temperature,top_p,top_k,min_p", [
+    (0.7, 1.0, SAMPLER_DEFAULTS["top_k"], SAMPLER_DEFAULTS["min_p"]),
+    (0.7, 0.9, 40, 0.05),
+    (1.0, 0.5, 0, 0.0),
+    (0.3, 1.0, 5, 0.2),
+])
+def test_batched_sampling_matches_llama_cpp_sampler(temperature, top_p, top_k, min_p):
+    logits = np.random.default_rng(0).normal(0.0, 2.0, 200).astype(np.float32)
+
+    tokens, probs = token_distribution(logits, temperature, top_p, top_k, min_p)
+    expected = _llama_cpp_distribution(logits, temperature, top_p, top_k, min_p)
+
+    assert set(tokens.tolist()) == set(expected)
+    np.testing.assert_allclose(probs, [expected[token] for token in tokens], rtol=1e-4)
+
+
+def test_batched_passes_sampler_settings(context):
+    wrapper = _load(context, max_batch_size=3)
+    serial = [wrapper.model(prompt, max_tokens=8, temperature=0.7, top_k=1)["choices"][0]["text"]
+              for prompt in PROMPTS]
+
+    assert wrapper._batcher.generate(PROMPTS, max_tokens=8, temperature=0.7, top_k=1, stop=[]) == serial
@@ -0,0 +1,114 @@
+import json
+import os
+from types import SimpleNamespace
+
+import llama_cpp
+import pytest
+from click.testing import CliRunner
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.cli import mlflow_llamacpp
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.loading_profile import (
+    LoadingProfile, LoadingProfileError, ProfileResult, best_profile, candidate_profiles
+)
+
+
+def test_profile_validation_and_round_trip(tmp_path):
+    profile = LoadingProfile(use_mlock=True, numa="distribute", cpu_affinity=[3, 1, 1], n_batch=1024, n_ubatch=256)
+
+    assert profile.cpu_affinity == (1, 3)
+    assert LoadingProfile.load(profile.save(tmp_path / "profile.json")) == profile
+    assert profile.llama_kwargs(4) == {"use_mmap": True, "use_mlock": True, "numa": 1, "n_threads": 4,
+                                       "n_threads_batch": 4, "n_batch": 1024, "n_ubatch": 256}
+    with pytest.raises(LoadingProfileError):
+        LoadingProfile(numa="everywhere")
+    with pytest.raises(LoadingProfileError):
+        LoadingProfile(n_batch=256, n_ubatch=512)
+    with pytest.raises(LoadingProfileError):
+        LoadingProfile.from_dict({"use_mmap": True, "prefetch": True})
+
+
+def test_candidates_cover_memory_modes_and_batches():
+    profiles = candidate_profiles(n_threads=[2], n_batch=[64, 1024])
+
+    assert {(p.use_mmap, p.use_mlock) for p in profiles} == {(True, False), (True, True), (False, False)}
+    assert {(p.n_batch, p.n_ubatch) for p in profiles} == {(64, 64), (1024, 512)}
+    assert {p.n_threads for p in profiles if p.cpu_affinity is None} == {2}
+
+
+def test_best_profile_by_objective():
+    fast_load = ProfileResult(LoadingProfile(), load_seconds=0.1, tokens_per_second=10)
+    fast_decode = ProfileResult(LoadingProfile(use_mmap=False), load_seconds=2.0, tokens_per_second=50)
+    failed = ProfileResult(LoadingProfile(use_mlock=True), error="mlock failed")
+
+    assert best_profile([fast_load, fast_decode, failed]) is fast_decode
+    assert best_profile([fast_load, fast_decode, failed], objective="load") is fast_load
+    with pytest.raises(LoadingProfileError):
+        best_profile([failed])
+
+
+def test_artifact_profile_configures_the_model(context, tmp_path):
+    cpus = sorted(os.sched_getaffinity(0))
+    profile_path = LoadingProfile(use_mmap=False, cpu_affinity=cpus[:1], n_threads=1, n_batch=64,
+                                  n_ubatch=32).save(tmp_path / "profile.json")
+    wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=2, verbose=False, max_batch_size=2,
+                               loading_profile={"n_batch": 128})
+    try:
+        wrapper.load_context(SimpleNamespace(artifacts=dict(context.artifacts, loading_profile=str(profile_path))))
+
+        assert wrapper.loading_profile.n_batch == 64
+        params = wrapper.model.model_params
+        if hasattr(params, "load_mode"):
+            assert params.load_mode == llama_cpp.LLAMA_LOAD_MODE_NONE
+        else:
+            assert not params.use_mmap
+        assert wrapper.model.context_params.n_batch == 64
+        assert wrapper.model.context_params.n_ubatch == 32
+        assert wrapper.model.context_params.n_threads == 1
+        assert wrapper._batcher.n_batch == 64
+        assert os.sched_getaffinity(0) == set(cpus[:1])
+        assert len(wrapper.predict(context, ["the model is", "a model"], max_tokens=2, temperature=0.0)) == 2
+    finally:
+        wrapper.close()
+        os.sched_setaffinity(0, cpus)
+
+
+def test_sweep_records_best_profile(tiny_gguf, tmp_path):
+    output = tmp_path / "best.json"
+
+    result = CliRunner().invoke(mlflow_llamacpp, [
+        "sweep-profile", str(tiny_gguf), "--output", str(output), "--n-threads", "1", "--n-batch", "64",
+        "--max-tokens", "2", "--n-ctx", "256"
+    ])
+
+    assert result.exit_code == 0, result.output
+    sweep = json.loads((tmp_path / "best_sweep.json").read_text())
+    assert len(sweep) == len(candidate_profiles(n_threads=[1], n_batch=[64]))
+    assert all(entry["error"] is None and entry["tokens_per_second"] > 0 for entry in sweep)
+    best = LoadingProfile.load(output)
+    assert best.to_dict() in [entry["profile"] for entry in sweep]
+
+
+def test_swept_profile_reaches_the_logged_model(tiny_gguf, tmp_path, monkeypatch):
+    mlflow = pytest.importorskip("mlflow")
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    experiment_id = mlflow.create_experiment("sweep", artifact_location=(tmp_path / "artifacts").as_uri())
+    with mlflow.start_run(experiment_id=experiment_id) as run:
+        pass
+    output = tmp_path / "best.json"
+    cpus = sorted(os.sched_getaffinity(0))
+
+    result = CliRunner().invoke(mlflow_llamacpp, [
+        "sweep-profile", str(tiny_gguf), "--output", str(output), "--n-threads", "1", "--n-batch", "64",
+        "--max-tokens", "2", "--n-ctx", "256", "--run-id", run.info.run_id, "--log-model", "model_path"
+    ])
+
+    assert result.exit_code == 0, result.output
+    model = mlflow.pyfunc.load_model(f"runs:/{run.info.run_id}/model_path")
+    wrapper = model.unwrap_python_model()
+    try:
+        assert wrapper.loading_profile == LoadingProfile.load(output)
+        assert len(model.predict(["the model is"], params={"max_tokens": 2, "temperature": 0.0})) == 1
+    finally:
+        wrapper.close()
+        os.sched_setaffinity(0, cpus)
@@ -0,0 +1,43 @@
+import pytest
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+PROMPTS = ["the model is", "a model of the"]
+
+
+@pytest.fixture
+def wrapper(context):
+    wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False)
+    wrapper.load_context(context)
+    return wrapper
+
+
+def test_stream_matches_predict(wrapper, context):
+    expected = wrapper.predict(context, PROMPTS, max_tokens=8, temperature=0.0)
+    chunks = list(wrapper.predict_stream(context, PROMPTS, max_tokens=8, temperature=0.0))
+
+    streamed = ["".join(c["text"] for c in chunks if c["index"] == i) for i in range(len(PROMPTS))]
+    assert streamed == expected
+    for i in range(len(PROMPTS)):
+        prompt_chunks = [c for c in chunks if c["index"] == i]
+        assert prompt_chunks[-1]["finish_reason"] is not None
+        elapsed = [c["timing"]["elapsed"] for c in prompt_chunks]
+        assert elapsed == sorted(elapsed)
+        assert all(c["timing"]["delta"] >= 0 for c in prompt_chunks)
+
+
+def test_closing_stream_stops_decoding(wrapper, context):
+    kwargs = dict(max_tokens=100, temperature=0.0, stop=[])
+    list(wrapper.predict_stream(context, PROMPTS[:1], **kwargs))
+    full_tokens = wrapper.model.n_tokens
+
+    stream = wrapper.predict_stream(context, PROMPTS[:1], **kwargs)
+    next(stream)
+    stream.close()
+
+    assert wrapper.model.n_tokens < full_tokens
+
+
+def test_stream_validates_parameters(wrapper, context):
+    with pytest.raises(ValueError):
+        next(wrapper.predict_stream(context, PROMPTS, temperature=2.0))
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+
+import numpy as np
+from llama_cpp import LlamaState
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.prefix_cache import PrefixKVCache, block_hashes
+
+SYSTEM = "the model is to the model and of the model in a model " * 3
+OTHER = "a model of the model is in the model to a model and " * 3
+PROMPTS = [SYSTEM + "the", OTHER + "a", SYSTEM + "in", OTHER + "of"]
+
+
+def _load(context, **kwargs):
+    wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, **kwargs)
+    wrapper.load_context(context)
+    return wrapper
+
+
+def test_block_hashes_chain_prefixes():
+    assert block_hashes([1, 2, 3, 4, 5], 2) == block_hashes([1, 2, 3, 4, 9], 2)
+    assert block_hashes([1, 2, 3, 4], 2)[1] != block_hashes([0, 2, 3, 4], 2)[1]
+    assert block_hashes([1, 2, 3], 4) == []
+
+
+def test_prefix_cache_reuses_shared_prefixes(context):
+    baseline = _load(context).predict(context, PROMPTS, max_tokens=4, temperature=0.0)
+    wrapper = _load(context, prefix_cache_bytes=64 << 20, prefix_cache_block_size=8)
+
+    assert wrapper.predict(context, PROMPTS, max_tokens=4, temperature=0.0) == baseline
+    stats = wrapper.prefix_cache_stats()
+    assert stats["hits"] >= 2
+    assert stats["saved_tokens"] > 0
+    # Prompts sharing their block-aligned prefix share an entry
+    assert stats["entries"] == 2
+
+
+def test_prefix_cache_persists_to_disk(context, tmp_path):
+    first = _load(context, prefix_cache_bytes=64 << 20, prefix_cache_block_size=8, prefix_cache_dir=str(tmp_path))
+    expected = first.predict(context, PROMPTS[:1], max_tokens=4, temperature=0.0)
+    first.close()
+
+    second = _load(context, prefix_cache_bytes=64 << 20, prefix_cache_block_size=8, prefix_cache_dir=str(tmp_path))
+    assert second.prefix_cache_stats()["entries"] == 1
+    assert second.predict(context, PROMPTS[:1], max_tokens=4, temperature=0.0) == expected
+    assert second.prefix_cache_stats()["hits"] == 1
+
+
+def test_prefix_cache_disabled_by_default(context):
+    assert _load(context).prefix_cache_stats() == {}
+
+
+def _state(tokens, size=100):
+    tokens = np.asarray(tokens, dtype=np.intc)
+    return LlamaState(tokens, np.zeros((len(tokens), 1), dtype=np.single), len(tokens), b"x" * size, size, 0)
+
+
+def test_prefix_cache_indexes_prompt_only():
+    cache = PrefixKVCache(capacity_bytes=1 << 20, block_size=2)
+    prompt = [1, 2, 3, 4]
+    for completion in ([5, 6], [7, 8]):
+        try:
+            cache[prompt]
+        except KeyError:
+            pass
+        cache[prompt + completion] = _state(prompt + completion)
+
+    assert cache.stats()["entries"] == 1
+    assert [7, 8, 9] not in cache
+    assert [1, 2, 3, 4, 9] in cache
+
+
+def test_prefix_cache_is_namespaced_per_model(tmp_path):
+    cache = PrefixKVCache(block_size=2, cache_dir=tmp_path, namespace="run-a")
+    cache[[1, 2, 3, 4]] = _state([1, 2, 3, 4])
+    cache.close()
+
+    assert PrefixKVCache(block_size=2, cache_dir=tmp_path, namespace="run-a").stats()["entries"] == 1
+    assert PrefixKVCache(block_size=2, cache_dir=tmp_path, namespace="run-b").stats()["entries"] == 0
+
+
+def test_prefix_cache_deletes_files_beyond_disk_budget(tmp_path):
+    cache = PrefixKVCache(capacity_bytes=150, block_size=2, cache_dir=tmp_path, disk_bytes=1000)
+    for first in range(10):
+        cache[[first, 0]] = _state([first, 0])
+        cache.flush()
+
+    on_disk = list(tmp_path.glob("*.state"))
+    assert 0 < len(on_disk) < 10
+    assert sum(path.stat().st_size for path in on_disk) <= 1000
+    assert cache.stats()["disk_bytes"] <= 1000
+    # Evicted from RAM and disk
+    assert [0, 0] not in cache
+    assert cache[[9, 0]].n_tokens == 2
+    cache.close()
+
+    reloaded = PrefixKVCache(capacity_bytes=150, block_size=2, cache_dir=tmp_path, disk_bytes=1000)
+    assert reloaded.stats()["entries"] == len(on_disk)
+
+
+def test_prefix_cache_dir_is_namespaced_by_run(context, tmp_path):
+    config = SimpleNamespace(artifacts=context.artifacts, model_config={"run_id": "run-a"})
+    wrapper = _load(config, prefix_cache_bytes=64 << 20, prefix_cache_block_size=8, prefix_cache_dir=str(tmp_path))
+    wrapper.predict(config, PROMPTS[:1], max_tokens=2, temperature=0.0)
+    wrapper.close()
+
+    namespaces = [path for path in tmp_path.iterdir() if path.is_dir()]
+    assert len(namespaces) == 1
+    assert len(list(namespaces[0].glob("*.state"))) == 1
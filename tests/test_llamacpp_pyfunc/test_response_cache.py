@@ -0,0 +1,34 @@
+import pytest
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+
+PROMPTS = ["the model is", "a model of the", "the model is"]
+
+
+@pytest.fixture
+def wrapper(context):
+    wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, response_cache_bytes=1 << 20)
+    wrapper.load_context(context)
+    return wrapper
+
+
+def test_cached_predict_matches_uncached(wrapper, context):
+    plain = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False)
+    plain.load_context(context)
+    expected = plain.predict(context, PROMPTS, max_tokens=8, temperature=0.0)
+
+    assert wrapper.predict(context, PROMPTS, max_tokens=8, temperature=0.0) == expected
+    assert wrapper.response_cache_stats()["misses"] == 2
+
+    assert wrapper.predict(context, PROMPTS, max_tokens=8, temperature=0.0) == expected
+    assert wrapper.response_cache_stats()["hits"] == 2
+
+
+def test_params_and_sampling_bypass_cache(wrapper, context):
+    wrapper.predict(context, PROMPTS[:1], max_tokens=8, temperature=0.0)
+    wrapper.predict(context, PROMPTS[:1], max_tokens=4, temperature=0.0)
+    wrapper.predict(context, PROMPTS[:1], max_tokens=8, temperature=0.5)
+
+    stats = wrapper.response_cache_stats()
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
@@ -0,0 +1,28 @@
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+from serve.utils import tracing
+
+from test_tracing.test_tracing import Collected
+
+
+def test_load_and_predict_are_traced(context, monkeypatch):
+    caller = tracing.Span("rollout", "a" * 32, "b" * 16, None, 0)
+    monkeypatch.setenv(tracing.TRACEPARENT_ENV, caller.traceparent)
+    exporter = Collected()
+    tracing.enable()
+    tracing.TRACER.exporters = [exporter]
+    try:
+        wrapper = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False)
+        wrapper.load_context(context)
+        wrapper.predict(context, ["the model is"], max_tokens=2, temperature=0.0)
+        list(wrapper.predict_stream(context, ["the model is"], max_tokens=2, temperature=0.0))
+    finally:
+        tracing.disable()
+
+    load, predict, stream = exporter.traces
+    spans = {span.name: span for span in load}
+    assert spans["pyfunc.load_context"].trace_id == caller.trace_id
+    assert spans["pyfunc.load_context"].parent_id == caller.span_id
+    assert spans["pyfunc.load_model"].parent_id == spans["pyfunc.load_context"].span_id
+    assert [span.name for span in predict] == ["pyfunc.predict"]
+    assert predict[0].trace_id != caller.trace_id
+    assert [span.name for span in stream] == ["pyfunc.predict_stream"]
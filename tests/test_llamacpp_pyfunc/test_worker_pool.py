@@ -0,0 +1,71 @@
+import pytest
+
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.llama_cpp_pyfunc import LlamaGGUFWrapper
+from serve.experiment_tracker.mlflow.mlflow_llamacpp.worker_pool import autotune_split, candidate_splits, split_cpus
+from serve.servers.bluegreen import free_port
+from serve.utils import metrics
+
+PROMPTS = [f"the model is {i} and" for i in range(9)]
+
+
+def test_pool_matches_in_process_greedy(context):
+    serial = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False)
+    serial.load_context(context)
+    pooled = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, n_workers=2)
+    pooled.load_context(context)
+    try:
+        assert pooled.predict(context, PROMPTS, max_tokens=6, temperature=0.0) == \
+            serial.predict(context, PROMPTS, max_tokens=6, temperature=0.0)
+    finally:
+        pooled.close()
+
+
+def test_pool_parent_loads_the_full_model_only_to_stream(context):
+    pooled = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, n_workers=2, max_batch_size=4)
+    pooled.load_context(context)
+    try:
+        assert pooled._batcher is None
+        assert pooled.model.model_params.vocab_only
+        assert pooled.predict(context, PROMPTS[:2], max_tokens=2, temperature=0.0)
+        assert pooled._deferred_load is not None
+
+        chunks = list(pooled.predict_stream(context, PROMPTS[:1], max_tokens=2, temperature=0.0))
+        assert chunks[-1]["finish_reason"] is not None
+        assert pooled._deferred_load is None
+    finally:
+        pooled.close()
+
+
+def test_candidate_splits_cover_thread_budget():
+    assert candidate_splits(8) == [(1, 8), (2, 4), (4, 2), (8, 1)]
+    assert candidate_splits(6) == [(1, 6), (2, 3), (4, 1)]
+
+
+def test_split_cpus_gives_each_worker_its_own_set():
+    assert split_cpus([3, 0, 1, 2], 2) == [(0, 1), (2, 3)]
+    assert split_cpus(range(5), 2) == [(0, 1, 2), (3, 4)]
+    assert split_cpus([4, 5], 3) == [(4,), (5,), (4,)]
+
+
+def test_autotune_returns_a_candidate(tiny_gguf):
+    candidates = [(1, 2), (2, 1)]
+    best = autotune_split(str(tiny_gguf), PROMPTS[:2], candidates=candidates,
+                          max_tokens=2, n_ctx=128, verbose=False)
+    assert best in candidates
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        LlamaGGUFWrapper(n_workers=0)
+
+
+def test_pool_workers_leave_the_metrics_port_to_the_parent(context, monkeypatch):
+    monkeypatch.setenv(metrics.PORT_ENV, str(free_port()))
+    pooled = LlamaGGUFWrapper(n_ctx=256, n_threads=1, verbose=False, n_workers=2)
+    try:
+        pooled.load_context(context)
+        assert len(pooled.predict(context, PROMPTS, max_tokens=2, temperature=0.0)) == len(PROMPTS)
+        assert "serve_predict_prompts_total" in metrics.REGISTRY.render()
+    finally:
+        pooled.close()
+        metrics.disable()
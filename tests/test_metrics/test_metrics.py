@@ -0,0 +1,132 @@
+import threading
+import urllib.request
+
+import pytest
+from click.testing import CliRunner
+
+from serve.serve_cli import cli
+from serve.servers.readiness import COLD_START_SECONDS, ReadinessProbe
+from serve.utils import metrics
+from serve.utils.metrics import MetricsError, MetricsExporter, MetricsRegistry
+from serve.utils.response_cache import ResponseCache
+
+from test_readiness.test_readiness import HealthServer
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    registry.enabled = True
+    return registry
+
+
+@pytest.fixture
+def enabled():
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.disable()
+    metrics.REGISTRY.reset()
+
+
+def test_render_counter_gauge_and_histogram(registry):
+    requests = registry.counter("requests_total", "Requests", ["path"])
+    registry.gauge("temperature", "Degrees").set(21.5)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0, float("inf")))
+
+    requests.inc(path="/a")
+    requests.inc(2, path='/"b"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter\n" in text
+    assert 'requests_total{path="/a"} 1\n' in text
+    assert 'requests_total{path="/\\"b\\""} 2\n' in text
+    assert "temperature 21.5\n" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "latency_seconds_count 2\n" in text
+    assert "latency_seconds_sum 0.55\n" in text
+
+
+def test_recording_is_a_no_op_when_disabled(registry):
+    requests = registry.counter("requests_total", "Requests")
+    registry.enabled = False
+
+    requests.inc()
+    with registry.histogram("latency_seconds", "Latency").time():
+        pass
+
+    assert requests.value() == 0
+    assert "latency_seconds_count" not in registry.render()
+
+
+def test_declarations_must_agree(registry):
+    assert registry.counter("requests_total", "Requests", ["path"]) is registry.counter("requests_total", "x", ["path"])
+    with pytest.raises(MetricsError):
+        registry.gauge("requests_total", "Requests", ["path"])
+    with pytest.raises(MetricsError):
+        registry.counter("requests_total", "Requests").inc(path="/", method="GET")
+
+
+def test_tracked_caches_report_hits_and_misses(registry):
+    cache = ResponseCache(max_bytes=100)
+    registry.track_cache("response", cache)
+    cache.put("a", b"1")
+    cache.get("a")
+    cache.get("b")
+
+    text = registry.render()
+    assert 'serve_cache_hits_total{cache="response"} 1\n' in text
+    assert 'serve_cache_misses_total{cache="response"} 1\n' in text
+
+    del cache
+    assert 'serve_cache_hits_total{cache="response"} 0\n' in registry.render()
+
+
+def test_exporter_serves_metrics_and_writes_textfile(registry, tmp_path):
+    registry.counter("requests_total", "Requests").inc(3)
+    textfile = tmp_path / "serve.prom"
+    exporter = MetricsExporter(registry, port=0, textfile=textfile, interval=3600).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics") as response:
+            assert "requests_total 3\n" in response.read().decode()
+        registry.counter("requests_total", "Requests").inc()
+    finally:
+        exporter.close()
+
+    assert "requests_total 4\n" in textfile.read_text()
+
+
+def test_readiness_probe_observes_cold_start(enabled):
+    health = HealthServer()
+    try:
+        threading.Timer(0.05, health.ready.set).start()
+        ReadinessProbe(timeout=5, initial_delay=0.001, max_delay=0.02).wait(health.url, model="m1")
+    finally:
+        health.shutdown()
+        health.server_close()
+
+    assert COLD_START_SECONDS.count(model="m1") == 1
+    assert 'serve_cold_start_duration_seconds_count{model="m1"} 1\n' in enabled.render()
+
+
+def test_observe_download(enabled):
+    metrics.observe_download("gcs", 1000, 0.5)
+
+    assert metrics.DOWNLOAD_BYTES.value(source="gcs") == 1000
+    assert 'serve_download_throughput_bytes_per_second{source="gcs"} 2000\n' in enabled.render()
+
+
+def test_cli_writes_textfile_on_exit(tmp_path, monkeypatch):
+    textfile = tmp_path / "serve.prom"
+    monkeypatch.setenv("SERVE_METRICS_TEXTFILE", str(textfile))
+    try:
+        result = CliRunner().invoke(cli, ["watch", "--help"])
+    finally:
+        metrics.disable()
+
+    assert result.exit_code == 0
+    assert "# TYPE serve_download_bytes_total counter" in textfile.read_text()
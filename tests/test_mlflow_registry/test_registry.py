@@ -0,0 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+from mlflow import MlflowClient
+from mlflow.exceptions import MlflowException
+
+from serve.utils.mlflow.config import MLflowModelConfigManager
+from serve.utils.mlflow.registry import RegistryClient
+
+
+class CountingClient:
+    """Delegates to an MLflow client, counting and optionally slowing alias lookups."""
+
+    def __init__(self, client, delay=0.0):
+        self.client = client
+        self.delay = delay
+        self.lookups = []
+        self._lock = threading.Lock()
+
+    def get_model_version_by_alias(self, name, alias):
+        with self._lock:
+            self.lookups.append((name, alias))
+        time.sleep(self.delay)
+        return self.client.get_model_version_by_alias(name, alias)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def registry(tmp_path_factory):
+    """Local MLflow file store with models m0-m5, each with a ``prod`` alias on a fresh run."""
+    uri = (tmp_path_factory.mktemp("mlruns")).as_uri()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+        # runs:/ sources are resolved against the default tracking URI
+        mp.setenv("MLFLOW_TRACKING_URI", uri)
+        client = MlflowClient(tracking_uri=uri, registry_uri=uri)
+        experiment_id = client.create_experiment("registry")
+        for i in range(6):
+            _promote(client, experiment_id, f"m{i}")
+        yield client, experiment_id
+
+
+def _promote(client, experiment_id, name, alias="prod"):
+    """Register a new version of ``name`` on a new run and point ``alias`` at it."""
+    run_id = client.create_run(experiment_id).info.run_id
+    try:
+        client.create_registered_model(name)
+    except MlflowException:
+        pass
+    version = client.create_model_version(name, source=f"runs:/{run_id}/model", run_id=run_id)
+    client.set_registered_model_alias(name, alias, version.version)
+    return run_id
+
+
+def test_alias_lookups_are_cached_until_ttl(registry):
+    client, experiment_id = registry
+    counting, clock = CountingClient(client), Clock()
+    cached = RegistryClient(counting, ttl=30.0, clock=clock)
+
+    first = cached.get_model_version_by_alias("m0", "prod")
+    assert cached.get_model_version_by_alias("m0", "prod") is first
+    assert len(counting.lookups) == 1
+
+    run_id = _promote(client, experiment_id, "m0")
+    clock.now = 29.0
+    assert cached.get_model_version_by_alias("m0", "prod").run_id == first.run_id
+    assert cached.get_model_version_by_alias("m0", "prod", max_age=0).run_id == run_id
+    clock.now = 100.0
+    cached.invalidate("m0")
+    assert cached.get_model_version_by_alias("m0", "prod").run_id == run_id
+    assert len(counting.lookups) == 3
+    assert cached.stats()["hits"] == 2
+    assert cached.get_model_version("m0", first.version).run_id == first.run_id
+    assert cached.tracking_uri == client.tracking_uri
+
+
+def test_concurrent_lookups_of_an_alias_share_one_request(registry):
+    counting = CountingClient(registry[0], delay=0.2)
+    cached = RegistryClient(counting)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = list(pool.map(lambda _: cached.get_model_version_by_alias("m1", "prod"), range(8)))
+
+    assert len({v.run_id for v in versions}) == 1
+    assert counting.lookups == [("m1", "prod")]
+    assert cached.stats()["coalesced"] == 7
+
+
+def test_get_many_fans_out_stale_lookups(registry):
+    counting = CountingClient(registry[0], delay=0.2)
+    cached = RegistryClient(counting, max_workers=8)
+    lookups = [(f"m{i}", "prod") for i in range(6)] + [("m0", "missing")]
+    cached.get_model_version_by_alias("m5", "prod")
+
+    start = time.perf_counter()
+    versions = cached.get_many(lookups)
+    elapsed = time.perf_counter() - start
+    cached.close()
+
+    assert list(versions) == lookups
+    assert isinstance(versions[("m0", "missing")], MlflowException)
+    assert all(v.run_id for key, v in versions.items() if key != ("m0", "missing"))
+    assert len(counting.lookups) == 7
+    # Six lookups at 0.2 s each would take 1.2 s one after the other
+    assert elapsed < 0.8
+
+
+def test_config_manager_checks_all_models_in_one_round(registry, tmp_path):
+    client, experiment_id = registry
+    counting = CountingClient(client)
+    manager = MLflowModelConfigManager(counting, config_path=tmp_path / "config.json")
+    for i in range(3):
+        run_id = counting.get_model_version_by_alias(f"m{i}", "prod").run_id
+        manager.model_config.update_model_info(run_id, f"m{i}", "prod")
+    counting.lookups.clear()
+
+    _promote(client, experiment_id, "m2")
+    assert manager.check_for_updates() == {"m0": False, "m1": False, "m2": True}
+    assert manager.check_for_update("m2", "prod")
+    assert manager.check_for_updates() == {"m0": False, "m1": False, "m2": True}
+    assert len(counting.lookups) == 3
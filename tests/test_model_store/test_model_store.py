@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from serve.utils.model_store import ModelStore, directory_digest, file_digest
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(tmp_path / ".store")
+
+
+def _make_artifact(path, payload: bytes):
+    (path / "artifacts").mkdir(parents=True)
+    (path / "artifacts" / "model.gguf").write_bytes(payload)
+    (path / "MLmodel").write_text("flavors: {}\n")
+    return path
+
+
+def test_ingest_replaces_files_with_links(store, tmp_path):
+    artifact = _make_artifact(tmp_path / "qa" / "model_path", os.urandom(256))
+    digest = file_digest(artifact / "artifacts" / "model.gguf")
+
+    files = store.ingest("mlflow:run1/model_path", artifact)
+
+    assert files["artifacts/model.gguf"] == digest
+    assert os.path.samefile(artifact / "artifacts" / "model.gguf", store.blob_path(digest))
+    assert store.has_snapshot("mlflow:run1/model_path")
+
+
+def test_stores_sharing_a_root_keep_every_reference(tmp_path):
+    stores = [ModelStore(tmp_path / ".store") for _ in range(2)]
+    artifacts = [_make_artifact(tmp_path / f"m{i}" / "model_path", os.urandom(256)) for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: stores[i % 2].ingest(f"mlflow:run{i}/model_path", artifacts[i]), range(16)))
+
+    refs = [ref for entry in stores[0]._load_index().values() for ref in entry["refs"]]
+    assert len(refs) == 16 * 2
+
+
+def test_materialize_shares_blobs(store, tmp_path):
+    payload = os.urandom(256)
+    store.ingest("mlflow:run1/model_path", _make_artifact(tmp_path / "qa" / "model_path", payload))
+    usage = store.usage()
+
+    assert store.materialize("mlflow:run1/model_path", tmp_path / "qa_alias" / "model_path")
+    assert (tmp_path / "qa_alias" / "model_path" / "artifacts" / "model.gguf").read_bytes() == payload
+    assert store.usage() == usage
+    assert not store.materialize("mlflow:run2/model_path", tmp_path / "other")
+
+
+def test_identical_files_are_stored_once(store, tmp_path):
+    payload = os.urandom(256)
+    store.ingest("mlflow:run1/model_path", _make_artifact(tmp_path / "a" / "model_path", payload))
+    usage = store.usage()
+    store.ingest("mlflow:run2/model_path", _make_artifact(tmp_path / "b" / "model_path", payload))
+
+    assert store.usage() == usage
+
+
+def test_gc_evicts_only_unreferenced_blobs(tmp_path):
+    store = ModelStore(tmp_path / ".store")
+    old = _make_artifact(tmp_path / "old" / "model_path", os.urandom(1000))
+    store.ingest("mlflow:old/model_path", old)
+    store.ingest("mlflow:new/model_path", _make_artifact(tmp_path / "new" / "model_path", os.urandom(1000)))
+
+    assert store.gc(budget_bytes=0) == []
+
+    store.release(tmp_path / "old")
+    shutil.rmtree(tmp_path / "old")
+    evicted = store.gc(budget_bytes=1500)
+
+    assert len(evicted) == 1
+    assert not store.has_snapshot("mlflow:old/model_path")
+    assert store.has_snapshot("mlflow:new/model_path")
+
+
+def test_move_keeps_references(store, tmp_path):
+    staged = _make_artifact(tmp_path / "staging" / "m1", b"weights")
+    store.ingest("k1", staged)
+
+    store.move(staged, tmp_path / "models" / "m1")
+
+    assert (tmp_path / "models" / "m1" / "artifacts" / "model.gguf").read_bytes() == b"weights"
+    assert store.gc(budget_bytes=0) == []
+
+
+def test_directory_digest_follows_content(tmp_path):
+    first = _make_artifact(tmp_path / "a", b"weights")
+    second = _make_artifact(tmp_path / "b", b"weights")
+    (second / "__pycache__").mkdir()
+    (second / "__pycache__" / "x.pyc").write_bytes(b"junk")
+    digest = directory_digest(first)
+
+    assert directory_digest(second) == digest
+    (second / "MLmodel").write_text("flavors: {python_function: {}}\n")
+    assert directory_digest(second) != digest
+    os.chmod(first / "MLmodel", 0o755)
+    assert directory_digest(first) != digest
+
+
+def test_directory_digest_reuses_stat_cache(store, tmp_path, monkeypatch):
+    artifact = _make_artifact(tmp_path / "qa" / "model_path", os.urandom(256))
+    store.ingest("mlflow:run1/model_path", artifact)
+    cache = tmp_path / "digests.json"
+    digest = directory_digest(artifact, stat_cache=cache)
+
+    shutil.rmtree(artifact)
+    assert store.materialize("mlflow:run1/model_path", artifact)
+    hashed = []
+    monkeypatch.setattr("serve.utils.model_store.file_digest", lambda path: hashed.append(path) or "")
+    assert directory_digest(artifact, stat_cache=cache) == digest
+    assert hashed == []
+
+
+def test_ingest_hashes_without_the_store_lock(store, tmp_path, monkeypatch):
+    artifact = _make_artifact(tmp_path / "qa" / "model_path", os.urandom(256))
+    (artifact / "artifacts" / "copy.gguf").write_bytes((artifact / "artifacts" / "model.gguf").read_bytes())
+    locked = []
+
+    def digest(path):
+        locked.append(store._lock_depth)
+        return file_digest(path)
+
+    monkeypatch.setattr("serve.utils.model_store.file_digest", digest)
+    files = store.ingest("mlflow:run1/model_path", artifact)
+
+    assert locked == [0, 0, 0]
+    assert len(set(files.values())) == 2
+    assert not list(store.blobs_dir.rglob("*.ingest"))
+
+
+def test_hugging_face_download_is_stored_once(tmp_path, monkeypatch):
+    pytest.importorskip("huggingface_hub")
+    import serve.experiment_tracker.hugging_face.download as hf_download
+
+    payload = os.urandom(256)
+    downloads = []
+
+    def hf_hub_download(repo_id, filename, revision, local_dir):
+        downloads.append(revision)
+        path = Path(local_dir) / "gguf" / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(payload)
+        return str(path)
+
+    monkeypatch.setattr(hf_download, "hf_hub_download", hf_hub_download)
+    first = hf_download.download_model_artifact("org/model", tmp_path / "a", model_url="model.gguf")
+    second = hf_download.download_model_artifact("org/model", tmp_path / "b", model_url="model.gguf")
+    hf_download.download_model_artifact("org/model", tmp_path / "c", model_url="model.gguf", revision="abc123")
+
+    assert first == tmp_path / "a" / "model_path" / "artifacts"
+    assert second == tmp_path / "b" / "model_path" / "artifacts"
+    assert downloads == [None, "abc123"]
+    assert os.path.samefile(first / "model.gguf", second / "model.gguf")
+    assert (second / "model.gguf").read_bytes() == payload
+
+
+def test_ingest_copies_across_file_systems(store, tmp_path, monkeypatch):
+    artifact = _make_artifact(tmp_path / "qa" / "model_path", os.urandom(256))
+    digest = file_digest(artifact / "artifacts" / "model.gguf")
+    replace = os.replace
+
+    def cross_device_replace(source, target):
+        # The artifact and the store are on different file systems
+        if (str(tmp_path / "qa") in str(source)) != (str(tmp_path / "qa") in str(target)):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", cross_device_replace)
+    files = store.ingest("mlflow:run1/model_path", artifact)
+
+    assert files["artifacts/model.gguf"] == digest
+    assert file_digest(store.blob_path(digest)) == digest
+    assert os.path.samefile(artifact / "artifacts" / "model.gguf", store.blob_path(digest))
+    assert not [p for p in store.blobs_dir.rglob("*") if p.suffix in (".ingest", ".copy")]
@@ -0,0 +1,109 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.llamacpp.serve import LlamaCppConfig, LlamaCppServer
+from serve.servers.readiness import ColdStartHistogram, ReadinessError, ReadinessProbe
+
+
+class HealthServer(ThreadingHTTPServer):
+    """Answers /health with 503 until ``ready`` is set."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.hits = 0
+        super().__init__(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/health"
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        self.send_response(200 if self.server.ready.is_set() else 503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class StartingBackend(FakeBackend):
+    """Fake backend whose server becomes healthy shortly after serve."""
+
+    def __init__(self, health, delay=0.05):
+        super().__init__()
+        self.health = health
+        self.delay = delay
+
+    def serve(self, spec):
+        super().serve(spec)
+        threading.Timer(self.delay, self.health.ready.set).start()
+
+
+@pytest.fixture
+def health():
+    server = HealthServer()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_wait_backs_off_until_ready(health):
+    probe = ReadinessProbe(timeout=5, initial_delay=0.001, max_delay=0.05)
+    threading.Timer(0.1, health.ready.set).start()
+
+    elapsed = probe.wait(health.url, model="m1")
+
+    assert 0.1 <= elapsed < 1
+    # Exponential backoff needs far fewer polls than a fixed 1ms interval
+    assert health.hits < 20
+    assert probe.histogram.snapshot()["m1"]["count"] == 1
+
+
+def test_wait_times_out(health):
+    probe = ReadinessProbe(timeout=0.2, max_delay=0.05)
+    with pytest.raises(ReadinessError):
+        probe.wait(health.url)
+
+
+def test_fatal_container_event_aborts_wait(health):
+    probe = ReadinessProbe(timeout=30, initial_delay=0.5, max_delay=5)
+    start = time.monotonic()
+    with pytest.raises(ReadinessError, match="die"):
+        probe.wait(health.url, events=iter([{"Action": "die"}]))
+    assert time.monotonic() - start < 2
+
+
+def test_histogram_is_cumulative_and_persisted(tmp_path):
+    histogram = ColdStartHistogram(tmp_path / "cold_starts.json")
+    histogram.observe("m1", 0.3)
+    histogram.observe("m1", 7.0)
+
+    reloaded = ColdStartHistogram(tmp_path / "cold_starts.json").snapshot()["m1"]
+    assert reloaded["count"] == 2
+    assert reloaded["sum"] == pytest.approx(7.3)
+    assert reloaded["buckets"]["0.25"] == 0
+    assert reloaded["buckets"]["0.5"] == 1
+    assert reloaded["buckets"]["10.0"] == 2
+    assert reloaded["buckets"]["inf"] == 2
+
+
+def test_server_records_cold_start_only_when_cold(health, tmp_path):
+    backend = StartingBackend(health)
+    server = LlamaCppServer(tmp_path, None, backend=backend, readiness_timeout=5)
+    server.config_update(LlamaCppConfig(model_name="m1", alias="prod", model_path=tmp_path / "m1", run_id="r1"))
+    port = health.server_address[1]
+
+    server.run_serve("m1", port=port)
+    server.run_serve("m1", port=port)
+
+    assert server.readiness.histogram.snapshot()["m1"]["count"] == 1
+    assert (tmp_path / "cold_starts.json").exists()
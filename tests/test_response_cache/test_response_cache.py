@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from serve.utils.response_cache import ResponseCache, cache_key, is_deterministic
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_is_deterministic():
+    assert is_deterministic({"temperature": 0})
+    assert is_deterministic({"temperature": 0.8, "top_k": 1})
+    assert not is_deterministic({"temperature": 0.2})
+    assert not is_deterministic({"prompt": "hi"})
+    assert not is_deterministic({"temperature": "hot"})
+
+
+def test_key_normalizes_params():
+    base = cache_key("run-a", {"prompt": "hi", "temperature": 0, "stop": ["\n"]}, "/completion")
+
+    assert cache_key("run-a", {"stop": "\n", "temperature": 0.0, "prompt": "hi", "stream": False},
+                     "/completion") == base
+    assert cache_key("run-b", {"prompt": "hi", "temperature": 0, "stop": ["\n"]}, "/completion") != base
+    assert cache_key("run-a", {"prompt": "hi", "temperature": 0, "stop": ["\n"]}, "/v1/completions") != base
+    assert cache_key("run-a", {"prompt": "hi!", "temperature": 0, "stop": ["\n"]}, "/completion") != base
+
+
+def test_lru_eviction_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+
+def test_entries_expire():
+    clock = Clock()
+    cache = ResponseCache(ttl=5, clock=clock)
+    cache.put("a", "text")
+    clock.now = 4.9
+    assert cache.get("a") == "text"
+    clock.now = 5.0
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_identical_requests_are_coalesced():
+    cache = ResponseCache()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "done"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["done"] * 5
+    assert cache.get_or_compute("k", compute) == "done"
+    assert calls == [1]
+
+
+def test_owner_failure_reaches_waiters_and_is_not_cached():
+    cache = ResponseCache()
+    owner, _ = cache.begin("k")
+    _, waiter = cache.begin("k")
+    cache.fail("k", RuntimeError("boom"))
+
+    with pytest.raises(RuntimeError):
+        waiter.result()
+    assert cache.begin("k")[0]
+
+
+def test_unstored_result_is_only_shared_with_waiters():
+    cache = ResponseCache()
+    cache.begin("k")
+    _, waiter = cache.begin("k")
+    cache.finish("k", None, store=False)
+
+    assert waiter.result() is None
+    assert cache.begin("k")[0]
@@ -0,0 +1,141 @@
+from pathlib import Path
+from types import SimpleNamespace
+import shutil
+import time
+
+import pytest
+
+from serve.servers.backends import BackendError, FakeBackend, TaskCLIBackend
+from serve.servers.llamacpp.serve import LlamaCppServer
+from serve.servers.rollout import RolloutTarget
+from test_backends.fake_docker import FakeDockerCLI
+
+DOWNLOAD_SECONDS = 0.2
+
+
+class FakeRegistry:
+    """MLflow client stand-in resolving aliases to run IDs."""
+
+    def __init__(self, runs):
+        self.runs = runs
+
+    def get_model_version_by_alias(self, name, alias):
+        return SimpleNamespace(run_id=self.runs[name])
+
+
+class FailingBackend(FakeBackend):
+    """Fake backend failing to start selected containers."""
+
+    def __init__(self):
+        super().__init__()
+        self.broken = set()
+
+    def serve(self, spec):
+        if spec.name in self.broken:
+            raise BackendError(f"{spec.name} crashed")
+        super().serve(spec)
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    failing = set()
+
+    def download_artifacts(run_id, artifact_path, dst_path):
+        time.sleep(DOWNLOAD_SECONDS)
+        if run_id in failing:
+            raise RuntimeError(f"download of {run_id} failed")
+        artifacts = Path(dst_path) / artifact_path / "artifacts"
+        artifacts.mkdir(parents=True)
+        (artifacts / "model.gguf").write_text(run_id)
+
+    monkeypatch.setattr("serve.utils.mlflow.model.download_artifacts", download_artifacts)
+    return failing
+
+
+@pytest.fixture
+def server(tmp_path, downloads):
+    registry = FakeRegistry({f"m{i}": f"run-{i}-a" for i in range(4)})
+    server = LlamaCppServer(tmp_path, registry, backend=FailingBackend(), readiness_timeout=None)
+    server.rollout([RolloutTarget(f"m{i}", "prod", 9000 + i) for i in range(4)])
+    return server
+
+
+def _gguf(server, name):
+    return (Path(server.get_configs()[name]["model_path"]) / "model.gguf").read_text()
+
+
+def test_rollout_runs_models_concurrently(tmp_path, downloads):
+    registry = FakeRegistry({f"m{i}": f"run-{i}" for i in range(4)})
+    server = LlamaCppServer(tmp_path, registry, backend=FakeBackend(), readiness_timeout=None)
+
+    report = server.rollout([RolloutTarget(f"m{i}", "prod", 9000 + i) for i in range(4)], network_concurrency=4)
+
+    assert [r.status for r in report.results] == ["updated"] * 4
+    assert report.wall_seconds < 3 * DOWNLOAD_SECONDS
+    assert report.phase_totals()["download"] >= 4 * DOWNLOAD_SECONDS
+    assert _gguf(server, "m2") == "run-2"
+    assert server.backend.containers["lmorbits-llamacpp-m3"] == "running"
+    assert "wall time" in report.summary()
+
+
+def test_unchanged_models_are_only_started(server):
+    report = server.rollout([RolloutTarget("m0", "prod", 9000)])
+
+    assert report.results[0].status == "unchanged"
+    assert report.results[0].run_id == "run-0-a"
+    assert "download" not in report.results[0].phases
+
+
+def test_failed_start_rolls_back_only_that_model(server):
+    server.mlflow_client.runs.update({"m0": "run-0-b", "m1": "run-1-b"})
+    server.backend.broken.add("lmorbits-llamacpp-m1")
+
+    report = server.rollout([RolloutTarget("m0", "prod", 9000), RolloutTarget("m1", "prod", 9001)])
+    server.backend.broken.clear()
+
+    statuses = {r.model_name: r.status for r in report.results}
+    assert statuses == {"m0": "updated", "m1": "rolled_back"}
+    assert _gguf(server, "m0") == "run-0-b"
+    assert _gguf(server, "m1") == "run-1-a"
+    assert server.get_configs()["m1"]["run_id"] == "run-1-a"
+    assert not (server.desrie_path / ".staging" / "m1.old").exists()
+
+
+def test_failed_download_leaves_model_untouched(server, downloads):
+    server.mlflow_client.runs["m2"] = "run-2-b"
+    downloads.add("run-2-b")
+    calls_before = len(server.backend.calls)
+
+    report = server.rollout([RolloutTarget("m2", "prod", 9002)])
+
+    assert report.results[0].status == "failed"
+    assert "download of run-2-b failed" in report.results[0].error
+    assert _gguf(server, "m2") == "run-2-a"
+    assert len(server.backend.calls) == calls_before
+    assert server.backend.containers["lmorbits-llamacpp-m2"] == "running"
+
+
+@pytest.mark.skipif(shutil.which("task") is None, reason="go-task is not installed")
+def test_rollout_with_task_backend_deletes_only_updated_model(tmp_path, downloads, monkeypatch):
+    docker = FakeDockerCLI(tmp_path / "bin", {})
+    monkeypatch.setenv("PATH", docker.path)
+    registry = FakeRegistry({"m0": "run-0-a", "m1": "run-1-a"})
+    taskfile_dir = Path(__file__).parents[2] / "src" / "serve" / "servers" / "llamacpp"
+    server = LlamaCppServer(tmp_path / "models", registry, backend=TaskCLIBackend(taskfile_dir),
+                            readiness_timeout=None)
+    targets = [RolloutTarget("m0", "prod", 9000), RolloutTarget("m1", "prod", 9001)]
+    server.rollout(targets)
+
+    registry.runs["m0"] = "run-0-b"
+    report = server.rollout(targets)
+
+    assert [r.status for r in report.results] == ["updated", "unchanged"]
+    assert [call for call in docker.calls if call[0] == "rm"] == [["rm", "-f", "lmorbits-llamacpp-m0"]]
+    assert docker.containers == {"lmorbits-llamacpp-m0": "running", "lmorbits-llamacpp-m1": "running"}
+
+    server.stop_all_serve()
+    assert sorted(call for call in docker.calls if call[0] == "stop") == [
+        ["stop", "lmorbits-llamacpp-m0"], ["stop", "lmorbits-llamacpp-m1"]
+    ]
+    server.delete_all_serve()
+    assert docker.containers == {}
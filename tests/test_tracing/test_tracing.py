@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import subprocess
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from serve._cli import TaskCLI
+from serve.serve_cli import cli
+from serve.servers.backends import FakeBackend
+from serve.servers.llamacpp.serve import LlamaCppServer
+from serve.servers.rollout import RolloutTarget
+from serve.utils import tracing
+from serve.utils.tracing import OTLPHttpExporter, Span, Tracer, render_timeline, to_otlp
+
+from test_rollout.test_rollout import FakeRegistry, downloads  # noqa: F401
+
+
+class Collected:
+    """Exporter keeping every exported trace."""
+
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+@pytest.fixture
+def collected():
+    exporter = Collected()
+    tracing.enable()
+    tracing.TRACER.exporters = [exporter]
+    yield exporter
+    tracing.disable()
+
+
+def _names(spans):
+    return sorted(span.name for span in spans)
+
+
+def test_spans_nest_and_export_when_root_ends():
+    tracer = Tracer()
+    tracer.enabled = True
+    exporter = tracer.exporters = [Collected()]
+
+    with tracer.span("root", model="m") as root:
+        with tracer.span("child") as child:
+            pass
+        assert exporter[0].traces == []
+
+    spans, = exporter[0].traces
+    assert _names(spans) == ["child", "root"]
+    assert child.parent_id == root.span_id and child.trace_id == root.trace_id
+    assert root.parent_id is None and root.attributes["model"] == "m"
+    assert root.end_ns >= child.end_ns >= child.start_ns >= root.start_ns
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    tracer.exporters = [Collected()]
+
+    with tracer.span("root") as span:
+        span.set_attribute("ignored", 1)
+    tracer.record("later", 0)
+
+    assert span.traceparent is None
+    assert tracer.exporters[0].traces == []
+
+
+def test_errors_are_recorded_and_raised(collected):
+    with pytest.raises(ValueError):
+        with tracing.span("root"):
+            with tracing.span("failing"):
+                raise ValueError("boom")
+
+    spans = {span.name: span for span in collected.traces[0]}
+    assert spans["failing"].error == "ValueError: boom"
+    assert to_otlp([spans["failing"]])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["status"] == {
+        "code": 2, "message": "ValueError: boom"}
+
+
+def test_propagate_joins_worker_threads(collected):
+    def work(i):
+        with tracing.span("work", i=i) as span:
+            return span
+
+    with tracing.span("root") as root, ThreadPoolExecutor(max_workers=3) as executor:
+        workers = list(executor.map(tracing.propagate(work), range(3)))
+
+    assert len(collected.traces) == 1
+    assert {w.parent_id for w in workers} == {root.span_id}
+
+
+def test_remote_parent_continues_trace(collected):
+    with tracing.span("caller") as caller:
+        traceparent = caller.traceparent
+    with tracing.span("callee", parent=traceparent) as callee:
+        pass
+
+    assert callee.trace_id == caller.trace_id
+    assert callee.parent_id == caller.span_id
+    assert len(collected.traces) == 2
+
+
+def test_timeline_places_bars_by_time():
+    spans = [
+        Span("root", "t" * 32, "a", None, 0, 100_000_000),
+        Span("download", "t" * 32, "b", "a", 0, 50_000_000),
+        Span("start", "t" * 32, "c", "a", 50_000_000, 100_000_000, error="BackendError: crashed"),
+    ]
+
+    lines = render_timeline(spans, width=10).splitlines()
+
+    assert lines[0] == f"trace {'t' * 32} 100.0 ms"
+    assert lines[1].startswith("root       |##########|")
+    assert lines[2].startswith("  download |#####     |")
+    assert lines[3].startswith("  start    |     #####|") and lines[3].endswith("!")
+
+
+def test_file_and_collector_exporters(tmp_path):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    collector = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=collector.serve_forever, daemon=True).start()
+    try:
+        tracing.enable(file=tmp_path / "trace.jsonl", endpoint=f"http://127.0.0.1:{collector.server_address[1]}",
+                       timeline=tmp_path / "timeline.txt")
+        with tracing.span("root", count=2, ratio=0.5, ok=True):
+            with tracing.span("child"):
+                pass
+    finally:
+        tracing.disable()
+        collector.shutdown()
+        collector.server_close()
+
+    request = json.loads((tmp_path / "trace.jsonl").read_text())
+    assert received == [("/v1/traces", request)]
+    spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if s["name"] == "root")
+    child = next(s for s in spans if s["name"] == "child")
+    assert child["parentSpanId"] == root["spanId"]
+    assert {"key": "count", "value": {"intValue": "2"}} in root["attributes"]
+    assert {"key": "ratio", "value": {"doubleValue": 0.5}} in root["attributes"]
+    assert {"key": "ok", "value": {"boolValue": True}} in root["attributes"]
+    assert "  child" in (tmp_path / "timeline.txt").read_text()
+
+
+def test_collector_export_runs_in_the_background():
+    release = threading.Event()
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            release.wait(5)
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    collector = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=collector.serve_forever, daemon=True).start()
+    exporter = OTLPHttpExporter(f"http://127.0.0.1:{collector.server_address[1]}", max_queue_size=2,
+                                schedule_delay=0.0)
+    spans = [Span(f"s{i}", "t" * 32, f"{i:016x}", None, 0, 1) for i in range(6)]
+    try:
+        started = time.monotonic()
+        exporter.export(spans[:1])
+        # Let the sender pick up the first span and block on the collector
+        time.sleep(0.2)
+        exporter.export(spans[1:])
+        assert time.monotonic() - started < 1.0
+        assert exporter.dropped == 3
+        release.set()
+        exporter.shutdown()
+    finally:
+        release.set()
+        collector.shutdown()
+        collector.server_close()
+
+    sent = [s["name"] for request in received for s in request["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert sent == ["s0", "s1", "s2"]
+
+
+def test_rollout_is_one_trace(tmp_path, collected, downloads):  # noqa: F811
+    server = LlamaCppServer(tmp_path, FakeRegistry({"m0": "run-0", "m1": "run-1"}), backend=FakeBackend(),
+                            readiness_timeout=None)
+
+    server.rollout([RolloutTarget("m0", "prod", 9000), RolloutTarget("m1", "prod", 9001)])
+
+    spans, = collected.traces
+    by_id = {span.span_id: span for span in spans}
+    root, = [span for span in spans if span.parent_id is None]
+    assert root.name == "rollout"
+    models = [span for span in spans if span.name == "rollout.model"]
+    assert {span.attributes["status"] for span in models} == {"updated"}
+    assert {by_id[span.parent_id].name for span in spans if span.name == "mlflow.get_model"} == {"rollout.model"}
+    assert {"mlflow.resolve_alias", "mlflow.download_artifacts", "store.ingest", "rollout.swap",
+            "llamacpp.run_serve", "backend.serve"} <= {span.name for span in spans}
+
+
+def test_task_run_hands_trace_to_the_task(tmp_path, collected, monkeypatch):
+    calls = []
+
+    def run(command, env=None, **kwargs):
+        calls.append(env)
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    with tracing.span("root"):
+        TaskCLI(str(tmp_path)).run("serve", model_id="m")
+
+    spans = {span.name: span for span in collected.traces[0]}
+    assert calls[0][tracing.TRACEPARENT_ENV] == spans["task.run"].traceparent
+    assert spans["task.run"].attributes["returncode"] == 0
+
+
+def test_cli_run_is_one_trace(tmp_path):
+    try:
+        result = CliRunner().invoke(cli, ["--trace-file", str(tmp_path / "trace.jsonl"), "watch", "--help"])
+    finally:
+        tracing.disable()
+
+    assert result.exit_code == 0
+    request = json.loads((tmp_path / "trace.jsonl").read_text())
+    assert request["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "serve-cmd watch"
@@ -0,0 +1,128 @@
+from pathlib import Path
+from types import SimpleNamespace
+import json
+import time
+
+import pytest
+
+from serve.servers.backends import FakeBackend
+from serve.servers.embedding.main import EmbeddingManager
+from serve.servers.llamacpp.serve import LlamaCppServer
+from serve.servers.watcher import UpdateWatcher
+
+
+class FakeRegistry:
+
+    def __init__(self, runs):
+        self.runs = runs
+
+    def get_model_version_by_alias(self, name, alias):
+        return SimpleNamespace(run_id=self.runs[name])
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    downloaded, broken = [], set()
+
+    def download_artifacts(run_id, artifact_path, dst_path):
+        if run_id in broken:
+            raise RuntimeError(f"download of {run_id} failed")
+        downloaded.append(run_id)
+        artifacts = Path(dst_path) / artifact_path / "artifacts"
+        artifacts.mkdir(parents=True)
+        (artifacts / "model.gguf").write_text(run_id)
+
+    monkeypatch.setattr("serve.utils.mlflow.model.download_artifacts", download_artifacts)
+    return SimpleNamespace(runs=downloaded, broken=broken)
+
+
+@pytest.fixture
+def watched(tmp_path, downloads):
+    registry = FakeRegistry({"m1": "run-a", "m2": "run-a", "e1": "emb-a"})
+    llama = LlamaCppServer(tmp_path, registry, backend=FakeBackend(), readiness_timeout=None)
+    embedding = EmbeddingManager(tmp_path, registry, backend=FakeBackend(), readiness_timeout=None)
+    llama.add_serve("m1", "prod")
+    llama.add_serve("m2", "prod")
+    embedding.add_serve("e1", "prod")
+    clock = Clock()
+    watcher = UpdateWatcher({"llamacpp": llama, "embedding": embedding}, interval=60, jitter=0.1,
+                            max_backoff=300, status_path=tmp_path / "watch_status.json", seed=0, clock=clock)
+    yield SimpleNamespace(registry=registry, llama=llama, embedding=embedding, clock=clock, watcher=watcher)
+    watcher.close()
+
+
+def test_swaps_moved_aliases_after_predownload(watched, downloads, tmp_path):
+    assert watched.watcher.check() == []
+    watched.clock.now += 6
+    assert watched.watcher.check() == []
+
+    watched.registry.runs.update({"m1": "run-b", "e1": "emb-b"})
+    downloads.runs.clear()
+    watched.clock.now += 70
+    swapped = watched.watcher.check()
+
+    assert sorted(state.model_name for state in swapped) == ["e1", "m1"]
+    assert watched.llama.get_configs()["m1"]["run_id"] == "run-b"
+    assert watched.llama.get_configs()["m2"]["run_id"] == "run-a"
+    assert watched.embedding.get_configs()["e1"]["run_id"] == "emb-b"
+    # The swap materialized the pre-downloaded run from the model store
+    assert sorted(downloads.runs) == ["emb-b", "run-b"]
+    assert not any((tmp_path / ".prefetch").iterdir())
+
+    status = json.loads((tmp_path / "watch_status.json").read_text())
+    assert set(status) == {"llamacpp/m1", "llamacpp/m2", "embedding/e1"}
+    m1 = status["llamacpp/m1"]
+    assert m1["run_id"] == "run-b"
+    assert m1["last_check"] == watched.clock.now
+    assert m1["last_swap_seconds"] >= m1["last_download_seconds"] >= 0
+    assert status["llamacpp/m2"]["last_swap"] is None
+    assert 54 <= m1["next_check"] - watched.clock.now <= 66
+
+
+def test_failures_back_off_and_keep_serving(watched, downloads):
+    watched.watcher.check()
+    watched.registry.runs["m1"] = "run-b"
+    downloads.broken.add("run-b")
+    del watched.registry.runs["e1"]
+    delays = []
+    for _ in range(4):
+        watched.clock.now += 1000
+        assert watched.watcher.check() == []
+        status = watched.watcher.status()
+        delays.append(status["llamacpp/m1"]["next_check"] - watched.clock.now)
+        assert status["embedding/e1"]["last_error"]
+
+    assert status["llamacpp/m1"]["failures"] == 4
+    assert watched.llama.get_configs()["m1"]["run_id"] == "run-a"
+    assert watched.llama.backend.containers["lmorbits-llamacpp-m1"] == "running"
+    assert 108 <= delays[0] <= 132 and 216 <= delays[1] <= 264
+    assert all(270 <= delay <= 330 for delay in delays[2:])
+
+    downloads.broken.clear()
+    watched.clock.now += 1000
+    assert [state.model_name for state in watched.watcher.check()] == ["m1"]
+    assert watched.watcher.status()["llamacpp/m1"]["failures"] == 0
+
+
+def test_background_thread_follows_alias(watched):
+    watcher = UpdateWatcher({"llamacpp": watched.llama}, interval=0.2, jitter=0.5)
+    watcher.start()
+    try:
+        watched.registry.runs["m2"] = "run-c"
+        deadline = time.monotonic() + 5
+        while watched.llama.get_configs()["m2"]["run_id"] != "run-c" and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.close()
+
+    assert watched.llama.get_configs()["m2"]["run_id"] == "run-c"
+    assert watcher.status()["llamacpp/m2"]["last_swap"] is not None